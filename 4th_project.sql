@@ -66,6 +66,7 @@ CREATE TABLE IF NOT EXISTS sessions (
     display_order INT DEFAULT 0,
     files_data LONGTEXT COMMENT 'JSON data of analyzed files',
     directory_structure TEXT COMMENT 'Repository directory structure',
+    index_name VARCHAR(255) COMMENT 'Shared vector index (owner, repo, commit sha) referenced by this session',
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     
     -- Foreign keys
@@ -74,6 +75,7 @@ CREATE TABLE IF NOT EXISTS sessions (
     -- Indexes for performance
     INDEX idx_session_id (session_id),
     INDEX idx_user_id (user_id),
+    INDEX idx_index_name (index_name),
     INDEX idx_created_at (created_at)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='Chat sessions for repository analysis';
 
@@ -115,6 +117,34 @@ CREATE TABLE IF NOT EXISTS code_changes (
     INDEX idx_timestamp (timestamp)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='Code modification history';
 
+-- =====================================================
+-- 4-1. Repository Analysis Jobs Table
+-- =====================================================
+CREATE TABLE IF NOT EXISTS analysis_jobs (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    job_id VARCHAR(255) NOT NULL UNIQUE,
+    user_id INT NOT NULL,
+    session_id VARCHAR(255) NOT NULL,
+    repo_url VARCHAR(255),
+    status VARCHAR(50) NOT NULL DEFAULT 'queued' COMMENT 'queued, running, completed, failed, cancelled',
+    stage VARCHAR(50) COMMENT 'Last progress stage reported by the analyzer',
+    progress INT DEFAULT 0,
+    message TEXT,
+    error TEXT,
+    cancel_requested BOOLEAN DEFAULT FALSE COMMENT 'Set by a cancel request from any app process; checked by the running job',
+    index_name VARCHAR(255) COMMENT 'Shared vector index the job builds or reuses; counted as a reference while the job is active',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    
+    -- Foreign keys
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    
+    -- Indexes for performance
+    INDEX idx_job_session (session_id),
+    INDEX idx_job_user (user_id),
+    INDEX idx_job_index (index_name)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='Background repository analysis jobs';
+
 -- =====================================================
 -- 5. Add columns to existing tables (Migration support)
 -- =====================================================
@@ -199,6 +229,37 @@ PREPARE alterIfNotExists FROM @preparedStatement;
 EXECUTE alterIfNotExists;
 DEALLOCATE PREPARE alterIfNotExists;
 
+SET @tablename = 'analysis_jobs';
+SET @columnname = 'cancel_requested';
+SET @preparedStatement = (SELECT IF(
+  (
+    SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS
+    WHERE TABLE_SCHEMA = @dbname
+      AND TABLE_NAME = @tablename
+      AND COLUMN_NAME = @columnname
+  ) > 0,
+  'SELECT "cancel_requested already exists" AS status;',
+  'ALTER TABLE analysis_jobs ADD COLUMN cancel_requested BOOLEAN DEFAULT FALSE AFTER error;'
+));
+PREPARE alterIfNotExists FROM @preparedStatement;
+EXECUTE alterIfNotExists;
+DEALLOCATE PREPARE alterIfNotExists;
+
+SET @columnname = 'index_name';
+SET @preparedStatement = (SELECT IF(
+  (
+    SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS
+    WHERE TABLE_SCHEMA = @dbname
+      AND TABLE_NAME = @tablename
+      AND COLUMN_NAME = @columnname
+  ) > 0,
+  'SELECT "index_name already exists" AS status;',
+  'ALTER TABLE analysis_jobs ADD COLUMN index_name VARCHAR(255) AFTER cancel_requested, ADD INDEX idx_job_index (index_name);'
+));
+PREPARE alterIfNotExists FROM @preparedStatement;
+EXECUTE alterIfNotExists;
+DEALLOCATE PREPARE alterIfNotExists;
+
 -- =====================================================
 -- 6. Default Test Data
 -- =====================================================
@@ -0,0 +1,449 @@
+"""
+저장소 분석 백그라운드 작업 모듈
+
+/analyze 요청을 처리하는 웹 워커가 분석이 끝날 때까지 붙잡혀 있지 않도록
+analyze_repository를 제한된 크기의 스레드 풀에서 실행하고,
+GitHubRepositoryFetcher / RepositoryEmbedder가 보내는 단계별 진행 이벤트를 작업별로 보관합니다.
+NDJSON 응답은 작업 이벤트를 따라 읽기만(tail) 합니다.
+
+주요 함수:
+    - submit_analysis_job: 분석 작업을 등록하고 작업 ID를 반환
+    - iter_job_events: 작업 진행 이벤트를 순서대로 반환하는 제너레이터 (NDJSON 스트리밍용)
+    - cancel_job: 실행 중인 작업 취소 요청 (DB에 기록하여 다른 프로세스의 작업도 취소)
+    - get_job_status: 작업 상태 조회
+"""
+
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, Iterator, List
+
+import db
+from github_analyzer import analyze_repository, AnalysisCancelled
+from repo_store import get_repo_store
+
+# ----------------- 상수 정의 -----------------
+ANALYSIS_WORKERS = int(os.environ.get('ANALYSIS_WORKERS', 2))  # 동시에 실행할 분석 작업 수
+MAX_PENDING_JOBS = 20  # 대기 + 실행 중 작업 최대 수 (초과 시 새 작업 거부)
+JOB_RETENTION_SECONDS = 3600  # 완료된 작업의 이벤트를 메모리에 보관하는 시간
+DB_UPDATE_INTERVAL = 5.0  # 같은 단계 안에서 DB 진행 상태를 갱신하는 최소 간격 (초)
+CANCEL_CHECK_INTERVAL = 2.0  # DB에 기록된 취소 요청(다른 프로세스에서 요청)을 확인하는 최소 간격 (초)
+STALE_JOB_SECONDS = 300  # 다른 프로세스의 작업이 이 시간 동안 갱신되지 않으면 중단된 것으로 간주
+FINISHED_STATUSES = ('completed', 'failed', 'cancelled')
+
+# 단계별 진행률 구간 (시작%, 끝%) - current/total 비율로 구간 안에서 진행률 계산
+STAGE_PROGRESS = {
+    'started': (2, 2),
+    'tree_listed': (10, 10),
+    'files_fetched': (10, 40),
+    'chunked': (45, 45),
+    # 임베딩과 DB 저장은 동시에 진행되므로 같은 구간에서 시작 (저장이 임베딩보다 앞서지 않음)
+    'embedding': (45, 90),
+    'stored': (45, 95),
+    'index_reused': (90, 90),
+    'saving': (95, 95),
+}
+
+executor = ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS, thread_name_prefix='analysis')
+jobs = {}
+jobs_lock = threading.Lock()
+
+
+class AnalysisJob:
+    """
+    저장소 분석 작업 하나의 상태와 진행 이벤트를 보관하는 클래스
+
+    이벤트는 /analyze NDJSON 응답과 같은 형식의 딕셔너리
+    ({'status', 'progress', 'session_id', 'job_id', 'stage', ...})이며,
+    여러 클라이언트가 동시에 같은 작업을 따라 읽을 수 있습니다.
+    """
+
+    def __init__(self, user_id: int, session_id: str, repo_url: str, token: Optional[str] = None,
+                 refresh: bool = False, previous_index: Optional[str] = None,
+                 include_globs: Optional[List[str]] = None, exclude_globs: Optional[List[str]] = None):
+        """
+        작업 초기화
+
+        Args:
+            user_id (int): 작업을 요청한 사용자 ID
+            session_id (str): 분석 결과를 저장할 세션 ID
+            repo_url (str): GitHub 저장소 URL
+            token (Optional[str]): GitHub 개인 액세스 토큰
+            refresh (bool): True면 기존 세션의 증분 재분석
+            previous_index (Optional[str]): 증분 재분석 시 세션이 현재 사용 중인 벡터 인덱스
+            include_globs (Optional[List[str]]): 분석할 파일 패턴 (file_filters 참고)
+            exclude_globs (Optional[List[str]]): 분석에서 제외할 파일 패턴
+        """
+        self.job_id = str(uuid.uuid4())
+        self.user_id = user_id
+        self.session_id = session_id
+        self.repo_url = repo_url
+        self.token = token
+        self.refresh = refresh
+        self.previous_index = previous_index
+        self.include_globs = include_globs
+        self.exclude_globs = exclude_globs
+
+        self.status = 'queued'
+        self.stage = 'queued'
+        self.progress = 0
+        self.message = '분석 대기 중...'
+        self.error = None
+        self.finished_at = None
+
+        self.events = []
+        self.condition = threading.Condition()
+        self.cancel_event = threading.Event()
+        self.last_db_stage = None
+        self.last_db_update = 0.0
+        self.last_cancel_check = 0.0
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    def add_event(self, event: Dict[str, Any]):
+        """이벤트를 추가하고 대기 중인 구독자를 깨움"""
+        event.setdefault('session_id', self.session_id)
+        event.setdefault('job_id', self.job_id)
+        with self.condition:
+            self.events.append(event)
+            self.condition.notify_all()
+
+    def progress_callback(self, stage: str, current: int = 0, total: int = 0, message: str = ''):
+        """
+        분석 모듈에서 호출하는 진행 콜백 (github_analyzer.emit_progress 형식)
+        취소 요청(이 프로세스 또는 DB의 cancel_requested)이 있으면 AnalysisCancelled를 발생시켜 분석을 중단시킵니다.
+        """
+        self.check_cancelled()
+
+        start, end = STAGE_PROGRESS.get(stage, (self.progress, self.progress))
+        # 단계가 뒤섞여 들어와도 진행률이 뒤로 가지 않도록 최대값 유지
+        # 전체 수를 아직 모르는 이벤트(total=0)는 구간이 고정된 단계만 진행률에 반영
+        if total:
+            ratio = min(current / total, 1.0)
+            self.progress = max(self.progress, int(start + (end - start) * ratio))
+        elif start == end:
+            self.progress = max(self.progress, start)
+        self.stage = stage
+        self.message = message or self.message
+
+        self.add_event({
+            'status': self.message,
+            'progress': self.progress,
+            'stage': stage,
+            'current': current,
+            'total': total
+        })
+
+        now = time.time()
+        if stage != self.last_db_stage or now - self.last_db_update >= DB_UPDATE_INTERVAL:
+            db.update_analysis_job(self.job_id, stage=stage, progress=self.progress, message=self.message)
+            self.last_db_stage = stage
+            self.last_db_update = now
+
+    def record_index(self, index_name: str):
+        """
+        분석이 사용할 벡터 인덱스를 DB에 기록 (analyze_repository의 index_callback)
+        진행 중인 작업의 인덱스는 참조로 계산되므로, 인덱스를 만든 뒤 세션 행을 저장하기 전에
+        다른 세션 삭제가 같은 인덱스를 지우지 않습니다. (db.release_repo_index 참고)
+        """
+        db.update_analysis_job(self.job_id, index_name=index_name)
+
+    def check_cancelled(self):
+        """취소 요청이 있으면 AnalysisCancelled 발생 (DB는 CANCEL_CHECK_INTERVAL마다 확인)"""
+        now = time.time()
+        if not self.cancel_event.is_set() and now - self.last_cancel_check >= CANCEL_CHECK_INTERVAL:
+            self.last_cancel_check = now
+            if db.is_analysis_job_cancel_requested(self.job_id):
+                print(f"[INFO] 다른 프로세스의 분석 작업 취소 요청 확인: {self.job_id}")
+                self.cancel_event.set()
+        if self.cancel_event.is_set():
+            raise AnalysisCancelled()
+
+    def finish(self, status: str, event: Dict[str, Any], error: Optional[str] = None):
+        """작업 종료 상태 기록 및 마지막 이벤트 전달"""
+        self.error = error
+        self.stage = status
+        if status == 'completed':
+            self.progress = 100
+        self.message = event.get('status', self.message)
+        db.update_analysis_job(self.job_id, status=status, stage=status, progress=self.progress,
+                               message=self.message, error=error)
+        with self.condition:
+            self.status = status
+            self.finished_at = time.time()
+        self.add_event(dict(event, stage=status))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """상태 조회 응답용 딕셔너리"""
+        return {
+            'job_id': self.job_id,
+            'session_id': self.session_id,
+            'repo_url': self.repo_url,
+            'status': self.status,
+            'stage': self.stage,
+            'progress': self.progress,
+            'message': self.message,
+            'error': self.error
+        }
+
+
+def run_job(job: AnalysisJob):
+    """스레드 풀에서 실행되는 분석 작업 본체"""
+    try:
+        job.check_cancelled()
+        job.status = 'running'
+        db.update_analysis_job(job.job_id, status='running')
+        job.progress_callback('started', message='저장소 분석 시작' if not job.refresh else '변경 사항 확인 중...')
+
+        if job.refresh:
+            result = analyze_repository(job.repo_url, job.token, job.session_id, incremental=True,
+                                        previous_index=job.previous_index,
+                                        progress_callback=job.progress_callback,
+                                        include_globs=job.include_globs, exclude_globs=job.exclude_globs,
+                                        index_callback=job.record_index)
+        else:
+            result = analyze_repository(job.repo_url, job.token, job.session_id,
+                                        progress_callback=job.progress_callback,
+                                        include_globs=job.include_globs, exclude_globs=job.exclude_globs,
+                                        index_callback=job.record_index)
+
+        if not result.get('success'):
+            raise Exception(result.get('error', '저장소 분석에 실패했습니다.'))
+
+        # 저장 직전까지는 취소 가능 (이후 세션 저장은 중간에 끊지 않음)
+        job.progress_callback('saving', message='세션 데이터 저장 중...')
+        files = result['files']
+        directory_structure = result['directory_structure']
+
+        if job.refresh:
+            db.update_session_files_data(job.session_id, files, directory_structure)
+
+            # 새 커밋 인덱스로 같은 레포의 세션들을 옮기고, 더 이상 참조되지 않는 이전 인덱스 정리
+            if result.get('index_name') and result['index_name'] != job.previous_index:
+                previous_indexes = db.update_repo_sessions_index(job.user_id, job.repo_url, result['index_name'])
+                for previous_index in previous_indexes or []:
+                    db.release_repo_index(previous_index)
+                # 공유 인덱스 도입 전 세션 전용 컬렉션도 더 이상 쓰이지 않음
+                if not job.previous_index and previous_indexes is not None:
+                    db.release_repo_index(f"repo_{job.session_id}")
+        else:
+            db.create_session(job.session_id, job.user_id, job.repo_url, job.token, result.get('index_name'))
+            db.update_session_files_data(job.session_id, files, directory_structure)
+
+        completed_event = {
+            'status': '분석 완료',
+            'progress': 100,
+            'session_id': job.session_id,
+            'file_count': len(files)
+        }
+        if result.get('changes') is not None:
+            completed_event['changes'] = result['changes']
+        index_status = result.get('index_status')
+        if index_status and index_status['status'] == 'partial':
+            # 임베딩에 실패한 청크는 백그라운드에서 재시도되며, 그 전까지 해당 청크는 검색되지 않음
+            completed_event['index_status'] = index_status
+            completed_event['message'] = (f"분석 완료 (일부 청크 {index_status['pending_chunks'] + index_status['failed_chunks']}개는 "
+                                          f"임베딩 재시도 중이며 완료되면 검색에 자동 반영됩니다)")
+        job.finish('completed', completed_event)
+
+        # 채팅/코드 수정용 세션 worktree를 분석한 커밋으로 미리 준비 (실패해도 첫 사용 시 다시 시도)
+        get_repo_store().ensure_session_worktree(job.session_id, job.repo_url, job.token, result.get('commit_sha'))
+
+    except AnalysisCancelled:
+        print(f"[INFO] 분석 작업 취소: {job.job_id}")
+        job.finish('cancelled', {'status': '분석 취소됨', 'error': '분석이 취소되었습니다.', 'progress': -1},
+                   error='cancelled')
+    except Exception as e:
+        print(f"[ERROR] 분석 작업 실패 ({job.job_id}): {e}")
+        traceback.print_exc()
+        job.finish('failed', {'status': '에러', 'error': str(e), 'progress': -1}, error=str(e))
+
+
+def prune_finished_jobs():
+    """보관 시간이 지난 완료 작업을 메모리에서 제거 (jobs_lock 안에서 호출)"""
+    now = time.time()
+    expired = [job_id for job_id, job in jobs.items()
+               if job.finished_at and now - job.finished_at > JOB_RETENTION_SECONDS]
+    for job_id in expired:
+        del jobs[job_id]
+
+
+def submit_analysis_job(user_id: int, session_id: str, repo_url: str, token: Optional[str] = None,
+                        refresh: bool = False, previous_index: Optional[str] = None,
+                        include_globs: Optional[List[str]] = None,
+                        exclude_globs: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    저장소 분석 작업을 등록하고 백그라운드에서 실행
+
+    같은 사용자가 같은 저장소를 이미 분석 중이면 새 작업을 만들지 않고 기존 작업을 반환합니다.
+
+    Args:
+        user_id (int): 사용자 ID
+        session_id (str): 분석 결과를 저장할 세션 ID
+        repo_url (str): GitHub 저장소 URL
+        token (Optional[str]): GitHub 개인 액세스 토큰
+        refresh (bool): True면 기존 세션의 증분 재분석
+        previous_index (Optional[str]): 증분 재분석 시 세션이 현재 사용 중인 벡터 인덱스
+        include_globs (Optional[List[str]]): 분석할 파일 패턴 (file_filters 참고)
+        exclude_globs (Optional[List[str]]): 분석에서 제외할 파일 패턴
+
+    Returns:
+        Dict[str, Any]: {'success': True, 'job_id', 'session_id'} 또는 {'success': False, 'error'}
+    """
+    with jobs_lock:
+        prune_finished_jobs()
+
+        for job in jobs.values():
+            if not job.finished and job.user_id == user_id and job.repo_url == repo_url:
+                print(f"[DEBUG] 진행 중인 분석 작업 재사용: {job.job_id}")
+                return {'success': True, 'job_id': job.job_id, 'session_id': job.session_id}
+
+        active = sum(1 for job in jobs.values() if not job.finished)
+        if active >= MAX_PENDING_JOBS:
+            return {'success': False, 'error': '분석 요청이 많아 대기열이 가득 찼습니다. 잠시 후 다시 시도해주세요.'}
+
+        job = AnalysisJob(user_id, session_id, repo_url, token, refresh, previous_index,
+                          include_globs, exclude_globs)
+        jobs[job.job_id] = job
+
+    db.create_analysis_job(job.job_id, user_id, session_id, repo_url)
+    job.add_event({'status': job.message, 'progress': 0, 'stage': 'queued'})
+    executor.submit(run_job, job)
+    print(f"[INFO] 분석 작업 등록: {job.job_id} (대기/실행 중 {active + 1}개)")
+    return {'success': True, 'job_id': job.job_id, 'session_id': session_id}
+
+
+def get_job(job_id: str) -> Optional[AnalysisJob]:
+    """메모리에 있는 작업 조회 (이 프로세스에서 실행한 작업만)"""
+    with jobs_lock:
+        return jobs.get(job_id)
+
+
+def event_from_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """DB의 작업 행을 진행 이벤트 형식으로 변환"""
+    status = row.get('status')
+    event = {
+        'status': row.get('message') or '',
+        'progress': row.get('progress') or 0,
+        'session_id': row.get('session_id'),
+        'job_id': row.get('job_id'),
+        'stage': row.get('stage') or status
+    }
+    if status == 'completed':
+        event['progress'] = 100
+    elif status in ('failed', 'cancelled'):
+        event['progress'] = -1
+        event['error'] = row.get('error') or status
+    return event
+
+
+def iter_job_events(job_id: str, start: int = 0, poll_interval: float = 1.0) -> Iterator[Dict[str, Any]]:
+    """
+    작업 진행 이벤트를 순서대로 반환하는 제너레이터 (작업이 끝나면 종료)
+
+    이 프로세스에서 실행 중인 작업은 메모리 이벤트를 기다렸다가 바로 전달하고,
+    다른 워커 프로세스의 작업은 DB에 기록된 진행 상태를 주기적으로 조회하여 전달합니다.
+
+    Args:
+        job_id (str): 작업 ID
+        start (int): 이어서 읽을 이벤트 위치 (재연결 시 사용)
+        poll_interval (float): DB 조회 간격 (초)
+
+    Yields:
+        Dict[str, Any]: 진행 이벤트
+    """
+    job = get_job(job_id)
+    if job:
+        index = start
+        while True:
+            with job.condition:
+                while index >= len(job.events) and not job.finished:
+                    job.condition.wait(timeout=30)
+                new_events = job.events[index:]
+                finished = job.finished
+            for event in new_events:
+                yield event
+            index += len(new_events)
+            if finished and index >= len(job.events):
+                return
+
+    last_event = None
+    while True:
+        row = db.get_analysis_job(job_id)
+        if not row:
+            yield {'status': '에러', 'error': '분석 작업을 찾을 수 없습니다.', 'progress': -1, 'job_id': job_id}
+            return
+
+        if row['status'] not in FINISHED_STATUSES and row.get('updated_at'):
+            # 작업을 실행하던 프로세스가 종료된 경우 (더 이상 갱신되지 않음)
+            updated_at = row['updated_at'].timestamp() if hasattr(row['updated_at'], 'timestamp') else 0
+            if updated_at and time.time() - updated_at > STALE_JOB_SECONDS:
+                yield {'status': '에러', 'error': '분석 작업이 중단되었습니다. 다시 분석해주세요.', 'progress': -1,
+                       'session_id': row.get('session_id'), 'job_id': job_id, 'stage': 'failed'}
+                return
+
+        event = event_from_row(row)
+        if event != last_event:
+            yield event
+            last_event = event
+        if row['status'] in FINISHED_STATUSES:
+            return
+        time.sleep(poll_interval)
+
+
+def cancel_job(job_id: str) -> bool:
+    """
+    작업 취소 요청 (다음 진행 이벤트 시점에 분석이 중단됨)
+
+    요청은 DB(cancel_requested)에 기록되므로 다른 프로세스에서 실행 중인 작업도
+    그 프로세스의 진행 콜백이 확인하여 중단됩니다.
+
+    Returns:
+        bool: 취소 요청 여부 (이미 끝난 작업이면 False)
+    """
+    job = get_job(job_id)
+    if job is None:
+        requested = db.request_analysis_job_cancel(job_id)
+        if requested:
+            print(f"[INFO] 분석 작업 취소 요청 기록 (다른 프로세스에서 실행 중): {job_id}")
+        return requested
+    if job.finished:
+        return False
+    db.request_analysis_job_cancel(job_id)
+    job.cancel_event.set()
+    job.message = '분석 취소 요청됨'
+    job.add_event({'status': job.message, 'progress': job.progress, 'stage': 'cancelling'})
+    print(f"[INFO] 분석 작업 취소 요청: {job_id}")
+    return True
+
+
+def get_job_status(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    작업 상태 조회 (메모리에 없으면 DB에서 조회)
+
+    Returns:
+        Optional[Dict[str, Any]]: 작업 상태 딕셔너리 (user_id 포함) 또는 None
+    """
+    job = get_job(job_id)
+    if job:
+        return dict(job.to_dict(), user_id=job.user_id)
+
+    row = db.get_analysis_job(job_id)
+    if not row:
+        return None
+    return {
+        'job_id': row['job_id'],
+        'session_id': row['session_id'],
+        'repo_url': row.get('repo_url'),
+        'status': row['status'],
+        'stage': row.get('stage'),
+        'progress': row.get('progress'),
+        'message': row.get('message'),
+        'error': row.get('error'),
+        'user_id': row['user_id']
+    }
@@ -2,11 +2,18 @@ from flask import Flask, render_template, request, redirect, url_for, jsonify, R
 import uuid
 import time
 from github_analyzer import analyze_repository, GitHubRepositoryFetcher, get_repository_branches, get_repository_file_tree, get_file_content
+from github_analyzer import get_index_status, start_embedding_retry_worker
+from code_chunker import start_chunk_executor
+from github_client import github_get, get_rate_limit_status, token_key
+from repo_store import get_repo_store
 from chat_handler import handle_chat, handle_modify_request, apply_changes
+from chat_cache import invalidate_collection_cache
+from chat_stream import stream_handler
 from dotenv import load_dotenv
 import os
 import sys
 import db
+import analysis_jobs
 import traceback
 import json
 import openai
@@ -50,6 +57,12 @@ if not db_initialized:
 
 # 파일 기반 저장 제거 - 모든 데이터는 DB에 저장됨
 
+# 청킹 프로세스 풀은 백그라운드 스레드를 시작하기 전에 생성 (fork 안전)
+start_chunk_executor()
+
+# 이전 실행에서 남은 임베딩 재시도 항목을 백그라운드에서 계속 처리
+start_embedding_retry_worker()
+
 app = Flask(__name__)
 # Flask 세션을 위한 고정 secret_key 설정 (배포 환경에서 세션 유지)
 app.secret_key = os.environ.get('FLASK_SECRET_KEY', 'your-fixed-secret-key-here-change-in-production')
@@ -189,7 +202,7 @@ def github_callback():
     # 액세스 토큰을 사용하여 사용자 정보 가져오기
     user_info_url = "https://api.github.com/user"
     headers = {'Authorization': f'token {access_token}'}
-    user_info_response = requests.get(user_info_url, headers=headers)
+    user_info_response = github_get(user_info_url, headers=headers)
     user_info = user_info_response.json()
 
     # GitHub 사용자 정보
@@ -202,7 +215,7 @@ def github_callback():
     if not github_email:
         try:
             emails_url = "https://api.github.com/user/emails"
-            emails_response = requests.get(emails_url, headers=headers)
+            emails_response = github_get(emails_url, headers=headers)
             emails_data = emails_response.json()
             
             # 기본 이메일(primary) 찾기
@@ -336,7 +349,7 @@ def index():
         # 사용자의 레포지토리 목록 가져오기
         repos_url = 'https://api.github.com/user/repos?type=owner&sort=updated&per_page=10'
         try:
-            response = requests.get(repos_url, headers=headers)
+            response = github_get(repos_url, headers=headers)
             response.raise_for_status()
             repositories = response.json()
             print(f"[DEBUG] Fetched {len(repositories)} repositories for user {user_info.get('login') if user_info else 'Unknown'}")
@@ -465,6 +478,11 @@ def get_chat_sessions():
         'chat_sessions': chat_sessions
     })
 
+def stream_job_events(job_id, start=0):
+    """분석 작업 진행 이벤트를 NDJSON 줄로 변환하는 제너레이터"""
+    for event in analysis_jobs.iter_job_events(job_id, start):
+        yield json.dumps(event) + '\n'
+
 @app.route('/analyze', methods=['POST'])
 def analyze():
     try:
@@ -487,6 +505,9 @@ def analyze():
         
         repo_url = data.get('repo_url')
         token = data.get('token')
+        # 분석 대상 파일 패턴 (목록 또는 쉼표 구분 문자열, 예: "src/**, *.md" / "tests/, *.ipynb")
+        include_globs = data.get('include_globs')
+        exclude_globs = data.get('exclude_globs')
         print(f"[DEBUG] repo_url: {repo_url}, token: {'있음' if token else '없음'}")
         
         # 토큰이 제공되지 않았으면 세션에서 GitHub 토큰 사용
@@ -523,7 +544,7 @@ def analyze():
                     headers['Authorization'] = f'token {token}'
                     print(f"[DEBUG] 토큰 사용하여 API 호출")
                 
-                response = requests.get(api_url, headers=headers)
+                response = github_get(api_url, headers=headers)
                 print(f"[DEBUG] GitHub API 응답: status_code={response.status_code}")
                 
                 if response.status_code == 200:
@@ -567,9 +588,6 @@ def analyze():
         if error and error != "private_repo_needs_token":
             return jsonify({'status': '에러', 'error': error}), 400
         
-        # GitHub 분석 모듈 미리 임포트
-        from github_analyzer import analyze_repository, GitHubRepositoryFetcher
-        
         # 새 세션 ID 생성 - 처음부터 생성하여 사용
         session_id = str(uuid.uuid4())
         print(f"[DEBUG] 새 세션 ID 생성: {session_id}")
@@ -579,131 +597,117 @@ def analyze():
         if existing_session:
             session_id = existing_session['session_id']
             print(f"[DEBUG] 기존에 분석된 레포지토리를 발견했습니다. 세션 ID: {session_id}")
-            
-            # 기존 채팅 화면으로 리다이렉트
-            return jsonify({
-                'status': '분석 완료', 
-                'progress': 100,
-                'session_id': session_id,
-                'message': '이미 분석된 레포지토리입니다. 기존 채팅 화면으로 이동합니다.'
-            })
-        
-        # 분석 진행 상황을 위한 응답 헤더 설정
-        def generate_progress():
-            # 초기 진행 상태 - 0%
-            yield json.dumps({'status': '분석 시작', 'progress': 0, 'session_id': session_id}) + '\n'
-            time.sleep(0.5)  # 상태 변경 사이에 약간의 지연 추가
-            
-            # 저장소 정보 수집 - 5%
-            yield json.dumps({'status': '저장소 정보 수집 중...', 'progress': 5, 'session_id': session_id}) + '\n'
-            time.sleep(0.5)
-            
-            try:
-                # 저장소 클론 시작 - 10%
-                yield json.dumps({'status': '저장소 클론 중...', 'progress': 10, 'session_id': session_id}) + '\n'
-                time.sleep(0.5)
-                
-                # 저장소 클론 진행 - 15%
-                yield json.dumps({'status': '저장소 파일 다운로드 중...', 'progress': 15, 'session_id': session_id}) + '\n'
-                
-                print(f"[DEBUG] analyze_repository 호출 시작 (repo_url: {repo_url}, session_id: {session_id})")
-                try:
-                    # 저장소 클론 완료 - 20%
-                    yield json.dumps({'status': '저장소 클론 완료', 'progress': 20, 'session_id': session_id}) + '\n'
-                    time.sleep(0.5)
-                    
-                    # 파일 구조 분석 - 25%
-                    yield json.dumps({'status': '파일 구조 분석 중...', 'progress': 25, 'session_id': session_id}) + '\n'
-                    time.sleep(0.5)
-                    
-                    # 코드 분석 시작 - 30%
-                    yield json.dumps({'status': '코드 분석 시작...', 'progress': 30, 'session_id': session_id}) + '\n'
-                    
-                    result = analyze_repository(repo_url, token, session_id)
-                    print(f"[DEBUG] analyze_repository 결과: {list(result.keys())}")
-                    
-                    # 코드 분석 진행 - 40%
-                    yield json.dumps({'status': '코드 청크 생성 중...', 'progress': 40, 'session_id': session_id}) + '\n'
-                    time.sleep(0.5)
-                    
-                    if 'files' not in result or 'directory_structure' not in result:
-                        print(f"[ERROR] analyze_repository 결과가 올바르지 않습니다: {result}")
-                        raise Exception("analyze_repository가 올바른 결과를 반환하지 않았습니다.")
-                    
-                    files = result['files']
-                    directory_structure = result['directory_structure']
-                    
-                    # 임베딩 생성 - 50%
-                    yield json.dumps({'status': '임베딩 생성 중...', 'progress': 50, 'session_id': session_id}) + '\n'
-                    time.sleep(0.5)
-                    
-                    print(f"[DEBUG] 분석된 파일 수: {len(files)}")
-                    print(f"[DEBUG] 디렉토리 구조 길이: {len(directory_structure) if directory_structure else 0}")
-                    
-                    # 파일 분석 완료 - 60%
-                    yield json.dumps({'status': '파일 분석 완료', 'progress': 60, 'session_id': session_id}) + '\n'
-                except Exception as e:
-                    print(f"[ERROR] analyze_repository 호출 중 오류: {e}")
-                    traceback.print_exc()
-                    yield json.dumps({'status': '에러', 'error': str(e), 'progress': -1, 'session_id': session_id}) + '\n'
-                    raise e
-                
-                # 디렉토리 구조 정보 로그 추가
-                # 디렉토리 구조 생성 - 65%
-                yield json.dumps({'status': '디렉토리 구조 생성 중...', 'progress': 65, 'session_id': session_id}) + '\n'
-                time.sleep(0.5)
-                
-                if directory_structure:
-                    print(f"[DEBUG] 디렉토리 구조 정보 생성 성공 (길이: {len(directory_structure)} 문자)")
-                    # 전체 디렉토리 구조 출력
-                    print("[DEBUG] 디렉토리 구조 전체:\n" + directory_structure)
-                    
-                    # 디렉토리 구조 생성 완료 - 70%
-                    yield json.dumps({'status': '디렉토리 구조 생성 완료', 'progress': 70, 'session_id': session_id}) + '\n'
-                else:
-                    print("[DEBUG] 디렉토리 구조 정보가 생성되지 않았습니다.")
-                    yield json.dumps({'status': '디렉토리 구조 생성 실패', 'progress': 70, 'session_id': session_id}) + '\n'
-                
-                # 세션 데이터 준비 - 75%
-                yield json.dumps({'status': '세션 데이터 준비 중...', 'progress': 75, 'session_id': session_id}) + '\n'
-                time.sleep(0.5)
-                
-                # 세션 데이터 저장 - 80%
-                yield json.dumps({'status': '세션 데이터 저장 중...', 'progress': 80, 'session_id': session_id}) + '\n'
-                
-                # 세션 데이터를 데이터베이스에 저장
-                db.create_session(session_id, user_id, repo_url, token)
-                
-                # 파일 데이터와 디렉토리 구조를 DB에 저장
-                db.update_session_files_data(session_id, files, directory_structure)
-                
-                # 세션 데이터 저장 완료 - 90%
-                yield json.dumps({'status': '세션 데이터 저장 완료', 'progress': 90, 'session_id': session_id}) + '\n'
-                time.sleep(0.5)
-                
-                # 최종 처리 - 95%
-                yield json.dumps({'status': '최종 처리 중...', 'progress': 95, 'session_id': session_id}) + '\n'
-                time.sleep(0.5)
-                
-                # 분석 완료 - 100%
-                yield json.dumps({
+
+            # 새로고침 요청이 아니면 기존 채팅 화면으로 리다이렉트
+            if not data.get('refresh'):
+                return jsonify({
                     'status': '분석 완료', 
                     'progress': 100,
-                    'session_id': session_id, 
-                    'file_count': len(files)
-                }) + '\n'
-                
-            except Exception as e:
-                error_msg = str(e)
-                print(f"[ERROR] 저장소 분석 중 오류 발생: {error_msg}")
-                yield json.dumps({'status': '에러', 'error': error_msg, 'progress': -1, 'session_id': session_id}) + '\n'
+                    'session_id': session_id,
+                    'message': '이미 분석된 레포지토리입니다. 기존 채팅 화면으로 이동합니다.'
+                })
+        
+        # 분석은 백그라운드 작업으로 실행하고, 응답은 작업 진행 이벤트만 스트리밍
+        # (새로고침 요청 시 변경된 파일만 증분 재분석)
+        if existing_session:
+            job = analysis_jobs.submit_analysis_job(
+                user_id, session_id, repo_url, token or existing_session.get('token'),
+                refresh=True, previous_index=existing_session.get('index_name'),
+                include_globs=include_globs, exclude_globs=exclude_globs
+            )
+        else:
+            job = analysis_jobs.submit_analysis_job(user_id, session_id, repo_url, token,
+                                                    include_globs=include_globs, exclude_globs=exclude_globs)
+        if not job['success']:
+            return jsonify({'status': '에러', 'error': job['error']}), 503
         
-        return Response(generate_progress(), mimetype='application/x-ndjson')
+        return Response(stream_job_events(job['job_id']), mimetype='application/x-ndjson')
     except Exception as e:
         print("[분석 알 수 없는 에러]", str(e))
         traceback.print_exc()
         return jsonify({'status': '에러', 'error': f'알 수 없는 오류: {str(e)}'}), 500
 
+@app.route('/api/analysis-jobs/<job_id>', methods=['GET'])
+def analysis_job_status(job_id):
+    """분석 작업 상태 조회"""
+    if 'user_id' not in session:
+        return jsonify({'error': '로그인이 필요합니다.'}), 401
+    
+    status = analysis_jobs.get_job_status(job_id)
+    if not status or status.get('user_id') != session['user_id']:
+        return jsonify({'error': '분석 작업을 찾을 수 없습니다.'}), 404
+    status.pop('user_id', None)
+    return jsonify(status)
+
+@app.route('/api/analysis-jobs/<job_id>/events', methods=['GET'])
+def analysis_job_events(job_id):
+    """분석 작업 진행 이벤트 스트리밍 (재연결 시 ?from=이벤트 위치)"""
+    if 'user_id' not in session:
+        return jsonify({'error': '로그인이 필요합니다.'}), 401
+    
+    status = analysis_jobs.get_job_status(job_id)
+    if not status or status.get('user_id') != session['user_id']:
+        return jsonify({'error': '분석 작업을 찾을 수 없습니다.'}), 404
+    
+    start = request.args.get('from', 0, type=int)
+    return Response(stream_job_events(job_id, start), mimetype='application/x-ndjson')
+
+@app.route('/api/analysis-jobs/<job_id>/cancel', methods=['POST'])
+def cancel_analysis_job(job_id):
+    """분석 작업 취소 요청"""
+    if 'user_id' not in session:
+        return jsonify({'error': '로그인이 필요합니다.'}), 401
+    
+    status = analysis_jobs.get_job_status(job_id)
+    if not status or status.get('user_id') != session['user_id']:
+        return jsonify({'error': '분석 작업을 찾을 수 없습니다.'}), 404
+    
+    if not analysis_jobs.cancel_job(job_id):
+        return jsonify({'success': False, 'error': '이미 종료되었거나 취소할 수 없는 작업입니다.', 'status': status['status']}), 409
+    return jsonify({'success': True, 'job_id': job_id})
+
+@app.route('/api/sessions/<session_id>/index-status', methods=['GET'])
+def session_index_status(session_id):
+    """세션 벡터 인덱스의 색인 상태 (임베딩 재시도 대기 중인 청크가 있으면 partial)"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': '로그인이 필요합니다.'}), 401
+    session_info = db.get_session_by_id(session_id)
+    if not session_info or session_info.get('user_id') != session['user_id']:
+        return jsonify({'success': False, 'error': '세션을 찾을 수 없습니다.'}), 404
+    index_name = session_info.get('index_name') or f"repo_{session_id}"
+    return jsonify(dict(get_index_status(index_name), success=True))
+
+@app.route('/api/github/rate-limit', methods=['GET'])
+def github_rate_limit():
+    """GitHub API 호출 제한 텔레메트리 조회 (본인 토큰과 익명 호출 상태만 반환)"""
+    if 'user_id' not in session:
+        return jsonify({'error': '로그인이 필요합니다.'}), 401
+
+    status = get_rate_limit_status()
+    visible_keys = {token_key(None), token_key(session.get('github_token'))}
+    return jsonify({
+        'stats': status['stats'],
+        'rate_limits': {k: v for k, v in status['rate_limits'].items() if k in visible_keys}
+    })
+
+def chat_error_message(e):
+    """챗봇 스트리밍 응답 중 발생한 예외를 사용자용 오류 메시지로 변환"""
+    msg = str(e)
+    if 'OPENAI_API_KEY' in msg:
+        return 'OpenAI API 키가 올바르지 않거나 누락되었습니다.'
+    elif 'context length' in msg:
+        return '질문 또는 코드가 너무 깁니다. 질문을 더 짧게 입력해 주세요.'
+    return f'챗봇 응답 오류: {msg}'
+
+def modify_error_message(e):
+    """코드 수정 스트리밍 응답 중 발생한 예외를 사용자용 오류 메시지로 변환"""
+    msg = str(e)
+    if 'OPENAI_API_KEY' in msg:
+        return 'OpenAI API 키가 올바르지 않거나 누락되었습니다.'
+    elif 'context length' in msg:
+        return '수정 요청 또는 코드가 너무 깁니다. 요청을 더 구체적으로 입력해 주세요.'
+    return f'코드 수정 중 오류: {msg}'
+
 @app.route('/chat', methods=['POST'])
 def chat_api():
     try:
@@ -716,6 +720,10 @@ def chat_api():
         message = data.get('message')
         if not session_id or not message:
             return jsonify({'error': '세션ID와 질문을 모두 입력하세요.'}), 400
+        if data.get('stream'):
+            # 스트리밍 모드: 모델 응답 조각을 NDJSON 줄로 바로 전달 (연결이 끊기면 모델 호출 중단)
+            return Response(stream_handler(handle_chat, session_id, message, format_error=chat_error_message),
+                            mimetype='application/x-ndjson')
         try:
             import chat_handler
             result = chat_handler.handle_chat(session_id, message)
@@ -764,6 +772,10 @@ def modify_request():
         message = data.get('message')
         if not session_id or not message:
             return jsonify({'error': '세션ID와 수정 요청을 모두 입력하세요.'}), 400
+        if data.get('stream'):
+            # 스트리밍 모드: 모델 응답 조각을 NDJSON 줄로 바로 전달 (연결이 끊기면 모델 호출 중단)
+            return Response(stream_handler(handle_modify_request, session_id, message, format_error=modify_error_message),
+                            mimetype='application/x-ndjson')
         try:
             result = handle_modify_request(session_id, message)
             return jsonify(result)
@@ -1053,6 +1065,11 @@ def delete_chat_session():
     if not success:
         return jsonify({'status': '에러', 'error': '세션 삭제 실패'}), 500
     
+    # 세션 worktree 정리 (저장소 미러는 다른 세션과 공유하므로 유지)
+    get_repo_store().remove_session_worktree(session_id, repo_url)
+    # 채팅 경로에 캐시된 세션의 컬렉션 핸들 제거
+    invalidate_collection_cache(session_id)
+    
     # 같은 레포의 다른 세션 찾기
     remaining_sessions = db.get_all_chat_sessions(user_id, repo_url)
     next_session_id = remaining_sessions[0]['session_id'] if remaining_sessions else None
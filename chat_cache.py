@@ -0,0 +1,171 @@
+"""
+채팅 검색 경로 인메모리 캐시 모듈
+
+/chat, /modify_request는 질문마다 검색 전에 질문 임베딩(네트워크 호출)과
+컬렉션 조회(list_collections -> get_collection -> count)를 반복합니다.
+노드에 세션 컬렉션이 수천 개 쌓이면 list_collections 비용이 커지므로,
+이 모듈은 두 가지 프로세스 내 캐시로 검색 전 비용을 질문 수와 무관하게 일정하게 만듭니다.
+
+    - QueryEmbeddingCache: (제공자 서명, 정규화한 질문) -> 질문 임베딩 LRU
+    - CollectionResolver: 세션 -> (컬렉션 이름, 컬렉션 핸들, 문서 수) 캐시
+      분석/인덱스 삭제/세션 삭제 시 invalidate_collection_cache로 무효화합니다.
+
+분석 모듈(github_analyzer)과 app에서도 무효화를 호출하므로 chat_handler와 분리된 모듈로 둡니다.
+
+주요 함수:
+    - embed_query_cached: 캐시를 거쳐 컬렉션을 만든 제공자로 질문 임베딩 생성
+    - get_collection_resolver: 프로세스 공용 컬렉션 조회 캐시
+    - invalidate_collection_cache: 세션/컬렉션의 캐시 항목 제거
+"""
+
+import collections
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from embedding_providers import get_collection_provider
+
+# ----------------- 상수 정의 -----------------
+QUERY_EMBEDDING_CACHE_SIZE = int(os.environ.get('QUERY_EMBEDDING_CACHE_SIZE', 1024))  # 보관할 질문 임베딩 수
+COLLECTION_CACHE_SIZE = int(os.environ.get('COLLECTION_CACHE_SIZE', 4096))  # 보관할 세션별 컬렉션 핸들 수
+
+
+def normalize_query(text: str) -> str:
+    """캐시 키용 질문 정규화 (앞뒤/연속 공백 제거)"""
+    return ' '.join(text.split())
+
+
+class QueryEmbeddingCache:
+    """
+    (제공자 서명, 정규화한 질문) -> 질문 임베딩을 보관하는 크기 제한 LRU 캐시
+
+    제공자 서명(제공자/모델/차원)을 키에 포함하므로 다른 제공자로 만든 컬렉션의 질문과 섞이지 않습니다.
+    여러 스레드에서 동시에 사용할 수 있도록 내부 잠금을 사용합니다.
+    """
+
+    def __init__(self, max_entries: int = QUERY_EMBEDDING_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, signature: tuple, text: str) -> Optional[List[float]]:
+        """캐시된 임베딩 조회 (없으면 None)"""
+        key = (signature, normalize_query(text))
+        with self.lock:
+            embedding = self.entries.get(key)
+            if embedding is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return embedding
+
+    def put(self, signature: tuple, text: str, embedding: List[float]):
+        """임베딩 저장 (max_entries를 넘으면 가장 오래 사용되지 않은 항목부터 제거)"""
+        key = (signature, normalize_query(text))
+        with self.lock:
+            self.entries[key] = list(embedding)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+class CollectionResolver:
+    """
+    세션 -> (컬렉션 이름, 컬렉션 핸들, 문서 수)를 보관하는 크기 제한 LRU 캐시
+
+    캐시 항목이 있으면 list_collections/get_collection/count 호출 없이 핸들을 돌려줍니다.
+    세션이 가리키는 컬렉션 이름이 바뀌면(재분석으로 새 커밋 인덱스 사용 등) 캐시 항목은 쓰지 않으며,
+    문서 수가 0인 컬렉션은 분석 중일 수 있으므로 캐시하지 않습니다.
+    """
+
+    def __init__(self, max_entries: int = COLLECTION_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = collections.OrderedDict()  # 세션 ID -> {'name', 'collection', 'count'}
+        self.lock = threading.Lock()
+
+    def get(self, session_id: str, collection_name: str) -> Optional[Dict[str, Any]]:
+        """
+        캐시된 컬렉션 조회
+
+        Returns:
+            Optional[Dict[str, Any]]: {'name', 'collection', 'count'} 또는 None (캐시 없음/이름 불일치)
+        """
+        with self.lock:
+            entry = self.entries.get(session_id)
+            if entry is None or entry['name'] != collection_name:
+                return None
+            self.entries.move_to_end(session_id)
+            return entry
+
+    def put(self, session_id: str, collection_name: str, collection, count: int):
+        """조회한 컬렉션 핸들과 문서 수 저장 (빈 컬렉션은 저장하지 않음)"""
+        if not count:
+            return
+        with self.lock:
+            self.entries[session_id] = {'name': collection_name, 'collection': collection, 'count': count}
+            self.entries.move_to_end(session_id)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, session_id: Optional[str] = None, collection_name: Optional[str] = None):
+        """세션 또는 컬렉션을 가리키는 캐시 항목 제거"""
+        with self.lock:
+            if session_id is not None:
+                self.entries.pop(session_id, None)
+            if collection_name is not None:
+                for key in [key for key, entry in self.entries.items() if entry['name'] == collection_name]:
+                    del self.entries[key]
+
+
+_default_query_cache: Optional[QueryEmbeddingCache] = None
+_default_resolver: Optional[CollectionResolver] = None
+_default_lock = threading.Lock()
+
+
+def get_query_embedding_cache() -> QueryEmbeddingCache:
+    """프로세스 공용 질문 임베딩 캐시를 반환 (최초 호출 시 생성)"""
+    global _default_query_cache
+    with _default_lock:
+        if _default_query_cache is None:
+            _default_query_cache = QueryEmbeddingCache()
+        return _default_query_cache
+
+
+def get_collection_resolver() -> CollectionResolver:
+    """프로세스 공용 컬렉션 조회 캐시를 반환 (최초 호출 시 생성)"""
+    global _default_resolver
+    with _default_lock:
+        if _default_resolver is None:
+            _default_resolver = CollectionResolver()
+        return _default_resolver
+
+
+def invalidate_collection_cache(session_id: Optional[str] = None, collection_name: Optional[str] = None):
+    """세션/컬렉션의 컬렉션 조회 캐시 항목 제거 (분석 완료, 인덱스 삭제, 세션 삭제 시 호출)"""
+    get_collection_resolver().invalidate(session_id, collection_name)
+
+
+def embed_query_cached(collection, text: str) -> List[float]:
+    """
+    컬렉션을 만든 제공자로 질문 임베딩 생성 (같은 질문은 캐시된 임베딩 재사용)
+
+    Args:
+        collection: ChromaDB 컬렉션
+        text (str): 질문 텍스트
+
+    Returns:
+        List[float]: 질문 임베딩 (캐시와 공유하는 리스트이므로 수정하지 말 것)
+    """
+    provider = get_collection_provider(collection)
+    cache = get_query_embedding_cache()
+    embedding = cache.get(provider.signature, text)
+    if embedding is not None:
+        print(f"[DEBUG] 질문 임베딩 캐시 적중 (적중 {cache.hits}회, 미스 {cache.misses}회)")
+        return embedding
+    embedding = provider.embed([text])[0]
+    if embedding:
+        cache.put(provider.signature, text, embedding)
+    return embedding
@@ -2,8 +2,16 @@
 
 import openai
 import chromadb
-from github_analyzer import chroma_client
+from chromadb.errors import NotFoundError
+from github_analyzer import chroma_client, schedule_role_tagging
 from git_modifier import create_branch_and_commit
+from repo_store import get_repo_store
+from compact_vectors import query_collection
+from chunk_dedup import collapse_duplicates
+from lexical_index import get_lexical_index, symbol_candidates, symbol_results, fuse_results
+from chat_cache import embed_query_cached, get_collection_resolver
+from outline_index import get_outline_index, render_outline
+from chat_stream import StreamCancelled, create_completion
 import re
 import tiktoken
 import db
@@ -179,7 +187,54 @@ def parse_llm_code_response(llm_response):
         return m2.group(1).strip(), m2.group(2).strip()
     return None, llm_response.strip()
 
-def handle_chat(session_id, message):
+def build_outline_context(collection, file_names, max_tokens):
+    """
+    코드 개요 색인으로 파일 전체/전체 함수 질문의 컨텍스트 구성 (질문 임베딩/유사도 검색 없음)
+
+    질문에 파일 이름이 있으면 그 파일의 개요 뒤에 청크 본문을 라인 순서대로 토큰 제한까지 붙이고,
+    파일 이름이 없으면 저장소 전체 파일의 개요만 제공합니다.
+
+    Returns:
+        str 또는 None: 컨텍스트 (개요 색인이 없거나 일치하는 파일이 없으면 None)
+    """
+    outline_index = get_outline_index()
+    if not outline_index:
+        return None
+    if not outline_index.has_collection(collection.name):
+        outline_index.index_collection(collection)
+    if file_names:
+        paths = outline_index.match_files(collection.name, file_names)
+    else:
+        paths = outline_index.list_files(collection.name)
+    if not paths:
+        return None
+
+    count_tokens = lambda text: len(enc.encode(text))
+    context, included = render_outline(outline_index.get_outline(collection.name, paths), max_tokens, count_tokens,
+                                       detailed=bool(file_names))
+    print(f"[DEBUG] 코드 개요 조회: {len(paths)}개 파일, {included}개 함수/클래스 (유사도 검색 생략)")
+    if not file_names:
+        return context
+
+    # 개요에 남은 토큰으로 파일 청크 본문을 라인 순서대로 추가
+    remaining = max_tokens - count_tokens(context)
+    rows = collection.get(where={'path': {'$in': paths}}, include=['documents', 'metadatas'])
+    chunks = sorted(zip(rows.get('documents') or [], rows.get('metadatas') or []),
+                    key=lambda row: (paths.index(row[1].get('path')) if row[1].get('path') in paths else len(paths),
+                                     row[1].get('chunk_index', 0)))
+    bodies = []
+    for document, meta in chunks:
+        body = f"[파일명: {meta.get('file_name', '')}/라인: {meta.get('start_line')}~{meta.get('end_line')}]\n{document}"
+        tokens = count_tokens(body)
+        if tokens > remaining:
+            break
+        bodies.append(body)
+        remaining -= tokens
+    if bodies:
+        context += "\n\n=== 코드 본문 (라인 순) ===\n\n" + '\n\n'.join(bodies)
+    return context
+
+def handle_chat(session_id, message, stream=None):
     # DB에서 세션 정보 확인
     session_data = db.get_session_data_from_db(session_id)
     if not session_data:
@@ -202,8 +257,8 @@ def handle_chat(session_id, message):
     full_file_contexts = []
     directory_structure = ""
     
-    # 1. 질문 임베딩 생성
-    print(f"[DEBUG] 질문 임베딩 생성 시작: '{message[:50]}...'")
+    # 1. 질문 임베딩 입력 준비 (임베딩은 컬렉션을 만든 제공자로 컬렉션 조회 후 생성)
+    print(f"[DEBUG] 질문 임베딩 준비 시작: '{message[:50]}...'")
     try:
         # OpenAI API 키 확인
         api_key = openai.api_key
@@ -227,27 +282,9 @@ def handle_chat(session_id, message):
             truncated_tokens = tokens[:8000]
             embedding_input = enc.decode(truncated_tokens)
             print(f"[DEBUG] 잘라낸 메시지 토큰 수: {len(enc.encode(embedding_input))}")
-        
-        # 임베딩 생성 시도
-        print(f"[DEBUG] OpenAI 임베딩 API 호출 시도")
-        embedding_response = openai.embeddings.create(
-            input=embedding_input,
-            model="text-embedding-3-large"
-        )
-        
-        # 임베딩 결과 처리
-        if not embedding_response or not embedding_response.data or not embedding_response.data[0].embedding:
-            print(f"[ERROR] 임베딩 결과가 비어 있습니다: {embedding_response}")
-            return {
-                'answer': "임베딩 생성 중 오류가 발생했습니다: 임베딩 결과가 비어 있습니다.",
-                'error': "empty_embedding"
-            }
-            
-        embedding = embedding_response.data[0].embedding
-        print(f"[DEBUG] 질문 임베딩 생성 성공 (차원: {len(embedding)})")
     except Exception as e:
         import traceback
-        print(f"[ERROR] 질문 임베딩 생성 실패: {e}")
+        print(f"[ERROR] 질문 임베딩 준비 실패: {e}")
         traceback.print_exc()
         return {
             'answer': f"임베딩 생성 중 오류가 발생했습니다: {str(e)}",
@@ -264,89 +301,101 @@ def handle_chat(session_id, message):
                 'error': "chroma_client_not_initialized"
             }
         
-        # 컬렉션 이름 생성 및 조회 시도
-        collection_name = f"repo_{session_id}"
+        # 컬렉션 이름 생성 및 조회 시도 (공유 벡터 인덱스를 참조하면 그 인덱스 사용)
+        collection_name = (session_data or {}).get('index_name') or f"repo_{session_id}"
         print(f"[DEBUG] ChromaDB 컬렉션 조회 시도: {collection_name}")
         
-        # 컬렉션 목록 확인
-        try:
-            collections = chroma_client.list_collections()
-            collection_names = [col.name for col in collections]
-            print(f"[DEBUG] 사용 가능한 컬렉션 목록: {collection_names}")
-        except Exception as e:
-            import traceback
-            print(f"[ERROR] ChromaDB 컬렉션 목록 조회 실패: {e}")
-            traceback.print_exc()
-            return {
-                'answer': f"저장소 분석 데이터 접근 중 오류가 발생했습니다: {str(e)}",
-                'error': "collection_list_error"
-            }
-        
-        # 컬렉션 존재 여부 확인
-        if collection_name not in collection_names:
-            print(f"[WARNING] 컬렉션을 찾을 수 없음: {collection_name}")
+        # 캐시된 컬렉션 핸들이 있으면 목록/조회/문서 수 확인 없이 바로 사용
+        resolver = get_collection_resolver()
+        cached = resolver.get(session_id, collection_name)
+        if cached:
+            collection = cached['collection']
+            collection_count = cached['count']
+            print(f"[DEBUG] 컬렉션 캐시 사용: {collection_name} (문서 수: {collection_count})")
+        else:
+            # 컬렉션 직접 조회 (전체 컬렉션 목록은 찾지 못한 경우에만 조회)
+            collection = None
+            fallback_used = False
+            try:
+                collection = chroma_client.get_collection(name=collection_name)
+                print(f"[DEBUG] 컬렉션 조회 성공: {collection_name}")
+            except NotFoundError:
+                print(f"[WARNING] 컬렉션을 찾을 수 없음: {collection_name}")
+            except Exception as e:
+                import traceback
+                print(f"[ERROR] 컬렉션 가져오기 실패: {e}")
+                traceback.print_exc()
+                return {
+                    'answer': f"저장소 분석 데이터 접근 중 오류가 발생했습니다: {str(e)}",
+                    'error': "collection_access_error"
+                }
             
-            # 같은 레포지토리의 다른 세션 컬렉션 찾기
-            repo_url = session_data.get('repo_url', '')
-            if repo_url:
-                print(f"[DEBUG] 같은 레포지토리의 다른 컬렉션 검색 중...")
-                try:
-                    # 같은 레포지토리의 다른 세션들 조회
-                    user_id = session_data.get('user_id')
-                    if user_id:
-                        other_sessions = db.get_all_chat_sessions(user_id, repo_url)
-                        for other_session in other_sessions:
-                            if other_session['session_id'] != session_id:
-                                other_collection_name = f"repo_{other_session['session_id']}"
-                                if other_collection_name in collection_names:
+            if collection is None:
+                # 같은 레포지토리의 다른 세션 컬렉션 찾기
+                repo_url = session_data.get('repo_url', '')
+                if repo_url:
+                    print(f"[DEBUG] 같은 레포지토리의 다른 컬렉션 검색 중...")
+                    try:
+                        # 같은 레포지토리의 다른 세션들 조회
+                        user_id = session_data.get('user_id')
+                        if user_id:
+                            other_sessions = db.get_all_chat_sessions(user_id, repo_url)
+                            for other_session in other_sessions:
+                                if other_session['session_id'] != session_id:
+                                    other_collection_name = f"repo_{other_session['session_id']}"
+                                    try:
+                                        collection = chroma_client.get_collection(name=other_collection_name)
+                                    except NotFoundError:
+                                        continue
                                     print(f"[DEBUG] 대체 컬렉션 발견: {other_collection_name}")
                                     collection_name = other_collection_name
+                                    fallback_used = True
                                     break
-                except Exception as e:
-                    print(f"[WARNING] 대체 컬렉션 검색 실패: {e}")
+                    except Exception as e:
+                        print(f"[WARNING] 대체 컬렉션 검색 실패: {e}")
+                
+                # 여전히 컬렉션을 찾지 못한 경우
+                if collection is None:
+                    print(f"[ERROR] 사용 가능한 컬렉션을 찾을 수 없음")
+                    try:
+                        collection_names = [col.name for col in chroma_client.list_collections()]
+                    except Exception as e:
+                        print(f"[ERROR] ChromaDB 컬렉션 목록 조회 실패: {e}")
+                        collection_names = []
+                    return {
+                        'answer': f"저장소 분석 데이터를 찾을 수 없습니다.\n\n현재 세션: {session_id}\n사용 가능한 컬렉션: {', '.join(collection_names) if collection_names else '없음'}\n\n저장소를 다시 분석하거나 기존 채팅 세션을 사용해주세요.",
+                        'error': "collection_not_found"
+                    }
             
-            # 여전히 컬렉션을 찾지 못한 경우
-            if collection_name not in collection_names:
-                print(f"[ERROR] 사용 가능한 컬렉션을 찾을 수 없음")
+            # 컬렉션 내 문서 수 확인
+            collection_count = None
+            try:
+                collection_count = collection.count()
+                print(f"[DEBUG] 컬렉션 내 문서 수: {collection_count}")
+            except Exception as e:
+                import traceback
+                print(f"[WARNING] 컬렉션 문서 수 확인 실패: {e}")
+                traceback.print_exc()
+                # 문서 수 확인 실패는 치명적이지 않을 수 있으므로 계속 진행
+            # 세션 자신의 컬렉션만 캐시 (대체 컬렉션은 매번 다시 찾음)
+            if not fallback_used:
+                resolver.put(session_id, collection_name, collection, collection_count)
+        
+        if collection_count == 0:
+            print(f"[WARNING] 컬렉션이 비어 있습니다: {collection_name}")
+            # 디렉토리 구조만으로 답변 생성
+            directory_structure = session_data.get('directory_structure', '')
+            if directory_structure:
+                answer = f"이 저장소는 분석 가능한 코드 파일이 없지만, 디렉토리 구조를 확인할 수 있습니다:\n\n{directory_structure}\n\n저장소에 대한 구체적인 질문이 있으시면 말씀해 주세요."
+                return {'answer': answer}
+            else:
                 return {
-                    'answer': f"저장소 분석 데이터를 찾을 수 없습니다.\n\n현재 세션: {session_id}\n사용 가능한 컬렉션: {', '.join(collection_names) if collection_names else '없음'}\n\n저장소를 다시 분석하거나 기존 채팅 세션을 사용해주세요.",
-                    'error': "collection_not_found"
+                    'answer': "저장소 분석 데이터가 비어 있습니다. 저장소를 다시 분석해주세요.",
+                    'error': "empty_collection"
                 }
         
-        # 컬렉션 가져오기
-        try:    
-            collection = chroma_client.get_collection(name=collection_name)
-            print(f"[DEBUG] 컬렉션 조회 성공: {collection_name}")
-        except Exception as e:
-            import traceback
-            print(f"[ERROR] 컬렉션 가져오기 실패: {e}")
-            traceback.print_exc()
-            return {
-                'answer': f"저장소 분석 데이터 접근 중 오류가 발생했습니다: {str(e)}",
-                'error': "collection_access_error"
-            }
-        
-        # 컬렉션 내 문서 수 확인
-        try:
-            collection_count = collection.count()
-            print(f"[DEBUG] 컬렉션 내 문서 수: {collection_count}")
-            if collection_count == 0:
-                print(f"[WARNING] 컬렉션이 비어 있습니다: {collection_name}")
-                # 디렉토리 구조만으로 답변 생성
-                directory_structure = session_data.get('directory_structure', '')
-                if directory_structure:
-                    answer = f"이 저장소는 분석 가능한 코드 파일이 없지만, 디렉토리 구조를 확인할 수 있습니다:\n\n{directory_structure}\n\n저장소에 대한 구체적인 질문이 있으시면 말씀해 주세요."
-                    return {'answer': answer}
-                else:
-                    return {
-                        'answer': "저장소 분석 데이터가 비어 있습니다. 저장소를 다시 분석해주세요.",
-                        'error': "empty_collection"
-                    }
-        except Exception as e:
-            import traceback
-            print(f"[WARNING] 컬렉션 문서 수 확인 실패: {e}")
-            traceback.print_exc()
-            # 문서 수 확인 실패는 치명적이지 않을 수 있으므로 계속 진행
+        # 역할 태그 없이 만들어진 기존 인덱스는 백그라운드 태깅 예약 (이미 한 번 처리한 인덱스는 건너뜀)
+        schedule_role_tagging(collection.name)
         
         # 파일 전체 함수 설명 요청 감지 (변수를 먼저 정의)
         is_full_function_description = any([
@@ -356,27 +405,10 @@ def handle_chat(session_id, message):
             'all method' in message.lower()
         ])
         
-        # 유사 코드 청크 검색
-        # 파일 전체 함수 설명 요청 시 더 많은 청크 검색
-        search_top_k = EXTENDED_TOP_K if is_full_function_description else TOP_K
-        print(f"[DEBUG] 유사 코드 청크 검색 시작 (TOP_K={search_top_k})")
-        try:
-            results = collection.query(
-                query_embeddings=[embedding],
-                n_results=search_top_k
-            )
-            print(f"[DEBUG] 검색 결과 구조: {list(results.keys())}")
-        except Exception as e:
-            import traceback
-            print(f"[ERROR] 유사 코드 청크 검색 실패: {e}")
-            traceback.print_exc()
-            return {
-                'answer': f"코드 검색 중 오류가 발생했습니다: {str(e)}",
-                'error': "query_error"
-            }
+        # 파일 전체 코드 요구 패턴 감지
+        file_full_keywords = ["전체", "전체 코드", "전체내용", "전체 보여", "전체 출력"]
+        is_full_file_request = any(kw in message for kw in file_full_keywords)
         
-        # 1. 질문 의도 태깅 비활성화 (Lazy Loading으로 대체)
-        question_role_tag = ''  # 질문 의도 태깅 제거
         # 스코프 키워드 추출
         scope = extract_scope_from_question(message)
         
@@ -384,6 +416,84 @@ def handle_chat(session_id, message):
         question_tokens = len(enc.encode(message))
         max_context_tokens = 8192 - question_tokens - 1000  # 응답 공간 확보
         
+        # 유사 코드 청크 검색
+        # 파일 전체 함수 설명 요청 시 더 많은 청크 검색
+        search_top_k = EXTENDED_TOP_K if is_full_function_description else TOP_K
+        
+        results = None
+        lexical_ids = []
+        outline_context = None
+        
+        # 전체 함수/파일 전체 질문은 유사도 검색 대신 코드 개요 색인을 직접 조회 (모든 함수를 순서대로, 적은 토큰으로)
+        if is_full_function_description or (is_full_file_request and scope['file']):
+            try:
+                outline_context = build_outline_context(collection, scope['file'], max_context_tokens)
+            except Exception as e:
+                print(f"[WARNING] 코드 개요 조회 실패, 유사도 검색 사용: {e}")
+            if outline_context:
+                results = {'ids': [[]], 'documents': [[]], 'metadatas': [[]], 'distances': [[]]}
+        
+        # 어휘(BM25/식별자) 색인 검색: 질문의 식별자가 함수/클래스 하나와 정확히 일치하면 임베딩 없이 그 청크 사용
+        lexical_index = get_lexical_index()
+        if lexical_index and results is None:
+            try:
+                if not lexical_index.has_collection(collection.name):
+                    lexical_index.index_collection(collection)
+                symbol_ids = None if is_full_function_description else lexical_index.lookup_symbol(
+                    collection.name, symbol_candidates(message))
+                if symbol_ids:
+                    results = symbol_results(collection, symbol_ids)
+                    print(f"[DEBUG] 정확한 심볼 일치: {len(symbol_ids)}개 청크 (임베딩/벡터 검색 생략)")
+                else:
+                    lexical_ids = lexical_index.search(collection.name, message, search_top_k)
+                    print(f"[DEBUG] 어휘 색인 검색 결과: {len(lexical_ids)}개 청크")
+            except Exception as e:
+                print(f"[WARNING] 어휘 색인 검색 실패, 벡터 검색만 사용: {e}")
+        
+        if results is None:
+            # 질문 임베딩 생성 (컬렉션에 기록된 임베딩 제공자 사용, 다른 벡터 공간으로 검색하지 않도록)
+            try:
+                embedding = embed_query_cached(collection, embedding_input)
+                if not embedding:
+                    print(f"[ERROR] 임베딩 결과가 비어 있습니다")
+                    return {
+                        'answer': "임베딩 생성 중 오류가 발생했습니다: 임베딩 결과가 비어 있습니다.",
+                        'error': "empty_embedding"
+                    }
+                print(f"[DEBUG] 질문 임베딩 생성 성공 (차원: {len(embedding)})")
+            except Exception as e:
+                import traceback
+                print(f"[ERROR] 질문 임베딩 생성 실패: {e}")
+                traceback.print_exc()
+                return {
+                    'answer': f"임베딩 생성 중 오류가 발생했습니다: {str(e)}",
+                    'error': "embedding_error"
+                }
+            
+            print(f"[DEBUG] 유사 코드 청크 검색 시작 (TOP_K={search_top_k})")
+            try:
+                # 컬렉션 저장 방식(full/compact)에 맞게 질문 임베딩을 변환하여 검색 (compact는 전체 차원으로 re-rank)
+                # 복사된 코드의 중복 청크는 하나로 합쳐 상위 결과가 복제본으로 채워지지 않게 함
+                results = query_collection(collection, embedding, search_top_k, collapse=True)
+                if lexical_ids:
+                    # 벡터 검색과 어휘 검색 순위를 RRF로 결합
+                    results = collapse_duplicates(fuse_results(collection, results, lexical_ids, search_top_k * 2),
+                                                  search_top_k)
+                print(f"[DEBUG] 검색 결과 구조: {list(results.keys())}")
+            except Exception as e:
+                import traceback
+                # 다른 프로세스에서 삭제된 컬렉션일 수 있으므로 다음 질문은 다시 조회
+                resolver.invalidate(session_id)
+                print(f"[ERROR] 유사 코드 청크 검색 실패: {e}")
+                traceback.print_exc()
+                return {
+                    'answer': f"코드 검색 중 오류가 발생했습니다: {str(e)}",
+                    'error': "query_error"
+                }
+        
+        # 1. 질문 의도 태깅 비활성화 (Lazy Loading으로 대체)
+        question_role_tag = ''  # 질문 의도 태깅 제거
+        
         # 정규화된 질문 의도 키워드 추출
         question_keywords = []
         if question_role_tag:
@@ -391,18 +501,18 @@ def handle_chat(session_id, message):
         print(f"[DEBUG] 질문 키워드: {question_keywords}")
         
         # 청크 스코어링 및 선택 함수
-        def score_chunk(doc, meta, distance, chunk_id=None):
+        def score_chunk(doc, meta, distance, chunk_id=None, relevance=None):
             score = 0
             
-            # 1. 유사도 점수 (거리가 작을수록 높은 점수)
-            similarity_score = 1 - min(distance, 1.0)  # 0~1 범위 정규화
+            # 1. 유사도 점수 (거리가 작을수록 높은 점수, 어휘 검색과 결합한 결과는 정규화된 RRF 점수 사용)
+            similarity_score = relevance if relevance is not None else 1 - min(distance, 1.0)  # 0~1 범위 정규화
             score += similarity_score * 10  # 기본 가중치 10
             
             # 2. 역할 태그 매칭 점수
             role_tag = meta.get('role_tag', '')
             
-            # Lazy Loading 비활성화 (현재 role_tag가 항상 비어있음)
-            # v0에서는 role_tag가 있었지만, 현재 버전에서는 비용 절감을 위해 비활성화
+            # role_tag는 인덱스 빌드 후 백그라운드 작업(role_tagger)이 채움 (태깅 전에는 비어 있음)
+            # 질문 의도 태깅은 비용 절감을 위해 비활성화
             
             if question_role_tag and role_tag:
                 # 완전 일치 또는 포함 관계 점수
@@ -453,7 +563,8 @@ def handle_chat(session_id, message):
                 'meta': meta,
                 'score': score,
                 'identity': identity,
-                'tokens': len(enc.encode(doc)),
+                # 청킹 때 저장한 토큰 수 사용 (token_count가 없는 이전 인덱스만 다시 토큰화)
+                'tokens': meta.get('token_count') if isinstance(meta.get('token_count'), int) and meta['token_count'] >= 0 else len(enc.encode(doc)),
                 'distance': distance
             }
         
@@ -475,10 +586,11 @@ def handle_chat(session_id, message):
                     # ids 정보도 가져오기 (에러 방지)
                     ids_list = results.get('ids', [[]])
                     ids = ids_list[0] if ids_list and len(ids_list) > 0 else [None] * len(documents)
+                    relevances = (results.get('scores') or [[None] * len(documents)])[0]
                     
                     for i, (doc, meta, distance) in enumerate(zip(documents, metadatas, distances)):
                         chunk_id = ids[i] if i < len(ids) else None
-                        scored_chunks.append(score_chunk(doc, meta, distance, chunk_id))
+                        scored_chunks.append(score_chunk(doc, meta, distance, chunk_id, relevances[i]))
                 
                 # 점수 기준 내림차순 정렬
                 scored_chunks.sort(key=lambda x: x['score'], reverse=True)
@@ -517,36 +629,9 @@ def handle_chat(session_id, message):
             if meta.get('start_line') and meta.get('end_line'):
                 meta_info.append(f"라인: {meta['start_line']}~{meta['end_line']}")
             if meta.get('chunk_type'): meta_info.append(f"타입: {meta['chunk_type']}")
+            if meta.get('duplicate_paths'): meta_info.append(f"동일 코드: {meta['duplicate_paths']}")
             
-            # Lazy Loading: 필요한 경우만 role_tag 생성 (질문에 "역할"이나 "기능" 포함 시)
-            # 파일 전체 함수 설명 요청 시 모든 청크에 대해 역할 태깅 수행
-            should_tag = ('역할' in message or '기능' in message or '설명' in message or 
-                         '목적' in message or 'role' in message.lower() or is_full_function_description)
-            
-            if should_tag:
-                if not meta.get('role_tag') and chunk['doc']:
-                    try:
-                        chunk_content = chunk['doc'][:1000]
-                        # 함수/클래스 이름 포함한 구체적인 태깅 요청
-                        if meta.get('function_name') or meta.get('class_name'):
-                            entity_name = meta.get('function_name') or meta.get('class_name')
-                            tag_prompt = f"'{entity_name}'의 역할/기능을 한 문장으로 설명해줘:\n\n{chunk_content[:500]}"
-                        else:
-                            tag_prompt = f"아래 코드는 어떤 역할(기능/목적)을 하나요? 한글로 간단히 요약해줘.\n\n코드:\n{chunk_content}"
-                        
-                        # gpt-4o-mini로 변경하여 품질 향상
-                        tag_resp = openai.chat.completions.create(
-                            model="gpt-4o-mini",
-                            messages=[{"role": "user", "content": tag_prompt}],
-                            temperature=0.0,
-                            max_tokens=64
-                        )
-                        role_tag = tag_resp.choices[0].message.content.strip()
-                        meta['role_tag'] = role_tag
-                        print(f"[DEBUG] Lazy 역할 태깅: {meta.get('file_name', 'unknown')} -> {role_tag[:30]}...")
-                    except Exception as e:
-                        print(f"[WARNING] Lazy 역할 태깅 실패: {e}")
-            
+            # 역할 태그는 인덱스 빌드 후 백그라운드 작업(role_tagger)이 메타데이터에 기록한 값만 사용
             if meta.get('role_tag'): meta_info.append(f"역할: {meta['role_tag']}")
             
             # 청크 컨텍스트에 추가
@@ -561,6 +646,10 @@ def handle_chat(session_id, message):
             if len(context_chunks) >= max_chunks or token_count >= max_context_tokens * 0.9:
                 break
         
+        # 코드 개요 조회 결과는 그대로 컨텍스트로 사용
+        if outline_context:
+            context_chunks.insert(0, outline_context)
+        
         # 컨텍스트가 너무 적으면 스코어가 낮은 청크도 추가
         if len(context_chunks) < 3 and scored_chunks:
             for chunk in scored_chunks:
@@ -572,25 +661,7 @@ def handle_chat(session_id, message):
                     if meta.get('class_name'): meta_info.append(f"클래스: {meta['class_name']}")
                     if meta.get('start_line') and meta.get('end_line'):
                         meta_info.append(f"라인: {meta['start_line']}~{meta['end_line']}")
-                    
-                    # 스코어가 낮은 청크도 필요 시 role_tag 생성
-                    if ('역할' in message or '기능' in message or '목적' in message or 'role' in message.lower()):
-                        if not meta.get('role_tag') and chunk['doc']:
-                            try:
-                                chunk_content = chunk['doc'][:1000]
-                                tag_prompt = f"아래 코드는 어떤 역할(기능/목적)을 하나요? 한글로 간단히 요약해줘.\n\n코드:\n{chunk_content}"
-                                tag_resp = openai.chat.completions.create(
-                                    model="gpt-3.5-turbo",
-                                    messages=[{"role": "user", "content": tag_prompt}],
-                                    temperature=0.0,
-                                    max_tokens=64
-                                )
-                                role_tag = tag_resp.choices[0].message.content.strip()
-                                meta['role_tag'] = role_tag
-                                print(f"[DEBUG] Lazy 역할 태깅: {meta.get('file_name', 'unknown')} -> {role_tag[:30]}...")
-                            except Exception as e:
-                                print(f"[WARNING] Lazy 역할 태깅 실패: {e}")
-                    
+                    if meta.get('duplicate_paths'): meta_info.append(f"동일 코드: {meta['duplicate_paths']}")
                     if meta.get('role_tag'): meta_info.append(f"역할: {meta['role_tag']}")
                     
                     chunk_str = f"[{'/'.join(meta_info)}]\n{chunk['doc']}"
@@ -648,19 +719,25 @@ def handle_chat(session_id, message):
         print("[DEBUG] 디렉토리 구조 정보가 없습니다.")
         directory_structure = "프로젝트 구조 정보가 없습니다. 파일 내용만 참고하여 응답하겠습니다."
 
-    # 파일 전체 코드 요구 패턴 감지
-    file_full_keywords = ["전체", "전체 코드", "전체내용", "전체 보여", "전체 출력"]
-    is_full_file_request = any(kw in message for kw in file_full_keywords)
-    scope = extract_scope_from_question(message)
+    # 파일 전체 코드 요청이면 파일 내용을 그대로 컨텍스트로 사용
     full_file_contexts = []
     if is_full_file_request and scope['file']:
+        file_paths = []
         for fname in scope['file']:
             # 세션 데이터에서 파일 경로 찾기
-            file_path = None
             for f in session_data.get('files', []):
                 if f.get('file_name') and fname in f['file_name']:
-                    file_path = f['path']
+                    file_paths.append(f['path'])
                     break
+        if file_paths:
+            # 세션 worktree에 필요한 파일만 꺼냄 (저장소 미러에서 누락된 blob만 받아옴)
+            local = get_repo_store().ensure_session_files(session_id, session_data.get('repo_url'),
+                                                          session_data.get('token'), file_paths)
+            if local.get('success'):
+                repo_path = local['repo_path']
+            else:
+                print(f"[WARNING] 세션 worktree 준비 실패: {local.get('error')}")
+        for file_path in file_paths:
             if file_path:
                 try:
                     with open(f"{repo_path}/{file_path}", 'r', encoding='utf-8') as f:
@@ -745,25 +822,16 @@ def handle_chat(session_id, message):
             )
             print(f"[DEBUG] 수정된 프롬프트 길이: {len(prompt)} 문자")
         
-        # LLM 호출
-        print(f"[DEBUG] OpenAI API 호출 시작 (model=gpt-4o, temperature=0.2)")
-        response = openai.chat.completions.create(
+        # LLM 호출 (스트리밍 모드면 응답 조각을 도착하는 대로 전달, 기록 저장은 전체 응답을 받은 뒤)
+        print(f"[DEBUG] OpenAI API 호출 시작 (model=gpt-4o, temperature=0.2, stream={stream is not None})")
+        answer = create_completion(
+            stream,
             model="gpt-4o",
             messages=[{"role": "system", "content": SYSTEM_PROMPT_QA},
                       {"role": "user", "content": prompt}],
             temperature=0.2,
             max_tokens=4096
-        )
-        
-        # 응답 처리
-        if not response or not response.choices or not response.choices[0].message:
-            print(f"[ERROR] LLM 응답이 비어 있습니다: {response}")
-            return {
-                'answer': "응답 생성 중 오류가 발생했습니다. 다시 시도해주세요.",
-                'error': "empty_response"
-            }
-        
-        answer = response.choices[0].message.content.strip() if response.choices[0].message.content else ""
+        ).strip()
         print(f"[DEBUG] LLM 응답 성공 (길이: {len(answer)} 문자)")
         
         # 대화 기록 저장 (DB에만)
@@ -849,6 +917,9 @@ def handle_chat(session_id, message):
         
         # 성공적인 응답 반환
         return {'answer': answer}
+    except StreamCancelled:
+        # 클라이언트 연결 종료: 응답이 완성되지 않았으므로 대화 기록을 저장하지 않음
+        raise
     except Exception as e:
         import traceback
         print(f"[ERROR] LLM 호출 오류: {e}")
@@ -858,7 +929,7 @@ def handle_chat(session_id, message):
             'error': "llm_error"
         }
 
-def handle_modify_request(session_id, message):
+def handle_modify_request(session_id, message, stream=None):
     print(f"[DEBUG] 현재 세션 ID: {session_id}")
     
     # DB에서 세션 데이터 조회
@@ -905,30 +976,6 @@ def handle_modify_request(session_id, message):
             }
         print(f"[DEBUG] OpenAI API 키 확인: {api_key[:4]}...{api_key[-4:]}")
         
-        # 임베딩 생성
-        print(f"[DEBUG] 수정 요청 임베딩 생성 시작: '{message[:50]}...'")
-        embedding_response = openai.embeddings.create(
-            input=message,
-                            model="text-embedding-3-large"
-        )
-        
-        # 임베딩 결과 처리
-        if not embedding_response or not embedding_response.data or not embedding_response.data[0].embedding:
-            print(f"[ERROR] 임베딩 결과가 비어 있습니다: {embedding_response}")
-            return {
-                'answer': "임베딩 생성 중 오류가 발생했습니다: 임베딩 결과가 비어 있습니다.",
-                'error': "empty_embedding",
-                'modified_code': "",
-                'file_name': "",
-                'has_push_intent': has_push_intent,
-                'token_exists': token_exists,
-                'requires_confirmation': requires_confirmation,
-                'push_intent_message': push_intent_message
-            }
-            
-        embedding = embedding_response.data[0].embedding
-        print(f"[DEBUG] 수정 요청 임베딩 생성 성공 (차원: {len(embedding)})")
-        
         # ChromaDB 클라이언트 상태 확인
         if not chroma_client:
             print("[ERROR] ChromaDB 클라이언트가 초기화되지 않았습니다.")
@@ -943,17 +990,22 @@ def handle_modify_request(session_id, message):
                 'push_intent_message': push_intent_message
             }
         
-        # 컬렉션 이름 생성 및 조회 시도
-        collection_name = f"repo_{session_id}"
+        # 컬렉션 이름 생성 및 조회 시도 (공유 벡터 인덱스를 참조하면 그 인덱스 사용)
+        collection_name = (session_data or {}).get('index_name') or f"repo_{session_id}"
         print(f"[DEBUG] ChromaDB 컬렉션 조회 시도: {collection_name}")
         
-        # 컬렉션 존재 확인
-        try:
-            collections = chroma_client.list_collections()
-            collection_names = [col.name for col in collections]
-            print(f"[DEBUG] 사용 가능한 컬렉션 목록: {collection_names}")
-            
-            if collection_name not in collection_names:
+        # 캐시된 컬렉션 핸들이 있으면 조회/문서 수 확인 없이 바로 사용
+        resolver = get_collection_resolver()
+        cached = resolver.get(session_id, collection_name)
+        if cached:
+            collection = cached['collection']
+            print(f"[DEBUG] 컬렉션 캐시 사용: {collection_name} (문서 수: {cached['count']})")
+        else:
+            # 컬렉션 가져오기 (전체 컬렉션 목록을 조회하지 않고 이름으로 직접 조회)
+            try:
+                collection = chroma_client.get_collection(name=collection_name)
+                print(f"[DEBUG] 컬렉션 조회 성공: {collection_name}")
+            except NotFoundError:
                 print(f"[ERROR] 컬렉션을 찾을 수 없음: {collection_name}")
                 return {
                     'answer': "저장소 분석 데이터를 찾을 수 없습니다. 저장소를 다시 분석해주세요.",
@@ -965,25 +1017,20 @@ def handle_modify_request(session_id, message):
                     'requires_confirmation': requires_confirmation,
                     'push_intent_message': push_intent_message
                 }
-        except Exception as e:
-            import traceback
-            print(f"[ERROR] ChromaDB 컬렉션 목록 조회 실패: {e}")
-            traceback.print_exc()
-            return {
-                'answer': f"저장소 분석 데이터 접근 중 오류가 발생했습니다: {str(e)}",
-                'error': "collection_list_error",
-                'modified_code': "",
-                'file_name': "",
-                'has_push_intent': has_push_intent,
-                'token_exists': token_exists,
-                'requires_confirmation': requires_confirmation,
-                'push_intent_message': push_intent_message
-            }
-        
-        # 컬렉션 가져오기
-        try:
-            collection = chroma_client.get_collection(name=collection_name)
-            print(f"[DEBUG] 컬렉션 조회 성공: {collection_name}")
+            except Exception as e:
+                import traceback
+                print(f"[ERROR] 컬렉션 가져오기 실패: {e}")
+                traceback.print_exc()
+                return {
+                    'answer': f"저장소 분석 데이터 접근 중 오류가 발생했습니다: {str(e)}",
+                    'error': "collection_access_error",
+                    'modified_code': "",
+                    'file_name': "",
+                    'has_push_intent': has_push_intent,
+                    'token_exists': token_exists,
+                    'requires_confirmation': requires_confirmation,
+                    'push_intent_message': push_intent_message
+                }
             
             # 컬렉션 내 문서 수 확인
             try:
@@ -1001,16 +1048,19 @@ def handle_modify_request(session_id, message):
                         'requires_confirmation': requires_confirmation,
                         'push_intent_message': push_intent_message
                     }
+                resolver.put(session_id, collection_name, collection, collection_count)
             except Exception as e:
                 print(f"[WARNING] 컬렉션 문서 수 확인 실패: {e}")
                 # 문서 수 확인 실패는 치명적이지 않을 수 있으므로 계속 진행
-        except Exception as e:
-            import traceback
-            print(f"[ERROR] 컬렉션 가져오기 실패: {e}")
-            traceback.print_exc()
+        
+        # 임베딩 생성 (컬렉션에 기록된 임베딩 제공자 사용)
+        print(f"[DEBUG] 수정 요청 임베딩 생성 시작: '{message[:50]}...'")
+        embedding = embed_query_cached(collection, message)
+        if not embedding:
+            print(f"[ERROR] 임베딩 결과가 비어 있습니다")
             return {
-                'answer': f"저장소 분석 데이터 접근 중 오류가 발생했습니다: {str(e)}",
-                'error': "collection_access_error",
+                'answer': "임베딩 생성 중 오류가 발생했습니다: 임베딩 결과가 비어 있습니다.",
+                'error': "empty_embedding",
                 'modified_code': "",
                 'file_name': "",
                 'has_push_intent': has_push_intent,
@@ -1018,6 +1068,7 @@ def handle_modify_request(session_id, message):
                 'requires_confirmation': requires_confirmation,
                 'push_intent_message': push_intent_message
             }
+        print(f"[DEBUG] 수정 요청 임베딩 생성 성공 (차원: {len(embedding)})")
         
         # 파일 전체 함수 설명 요청 감지 (handle_modify_request에서도 필요)
         is_full_function_description = any([
@@ -1032,13 +1083,24 @@ def handle_modify_request(session_id, message):
         search_top_k = EXTENDED_TOP_K if is_full_function_description else TOP_K
         print(f"[DEBUG] 유사 코드 청크 검색 시작 (TOP_K={search_top_k})")
         try:
-            results = collection.query(
-                query_embeddings=[embedding],
-                n_results=search_top_k
-            )
+            # 컬렉션 저장 방식(full/compact)에 맞게 질문 임베딩을 변환하여 검색 (compact는 전체 차원으로 re-rank)
+            results = query_collection(collection, embedding, search_top_k)
+            # 어휘(BM25/식별자) 색인 검색 결과와 RRF로 결합 (질문에 적은 함수/파일 이름을 놓치지 않도록)
+            lexical_index = get_lexical_index()
+            if lexical_index:
+                try:
+                    if not lexical_index.has_collection(collection.name):
+                        lexical_index.index_collection(collection)
+                    lexical_ids = lexical_index.search(collection.name, message, search_top_k)
+                    if lexical_ids:
+                        results = fuse_results(collection, results, lexical_ids, search_top_k)
+                except Exception as e:
+                    print(f"[WARNING] 어휘 색인 검색 실패, 벡터 검색만 사용: {e}")
             print(f"[DEBUG] 검색 결과 구조: {list(results.keys())}")
         except Exception as e:
             import traceback
+            # 다른 프로세스에서 삭제된 컬렉션일 수 있으므로 다음 요청은 다시 조회
+            resolver.invalidate(session_id)
             print(f"[ERROR] 유사 코드 청크 검색 실패: {e}")
             traceback.print_exc()
             return {
@@ -1121,6 +1183,14 @@ def handle_modify_request(session_id, message):
     full_file_contents = []
     failed_files = []
     
+    # 세션 worktree에 관련 파일만 꺼냄 (실패하면 아래에서 GitHub API로 파일별 조회)
+    local = get_repo_store().ensure_session_files(session_id, session_data.get('repo_url'),
+                                                  session_data.get('token'), related_files)
+    if local.get('success'):
+        repo_path = local['repo_path']
+    else:
+        print(f"[WARNING] 세션 worktree 준비 실패: {local.get('error')}")
+    
     for file_path in related_files:
         print(f"[DEBUG] 파일 로드 시도: {file_path}")
         try:
@@ -1326,29 +1396,15 @@ def handle_modify_request(session_id, message):
         
         # LLM 호출
         print(f"[DEBUG] 코드수정용 OpenAI API 호출 시작 (model=gpt-4o, temperature=0.2, max_tokens=4096)")
-        response = openai.chat.completions.create(
+        # (스트리밍 모드면 응답 조각을 도착하는 대로 전달, 기록 저장은 전체 응답을 받은 뒤)
+        llm_code = create_completion(
+            stream,
             model="gpt-4o",
             messages=[{"role": "system", "content": SYSTEM_PROMPT_MODIFY},
                       {"role": "user", "content": prompt}],
             temperature=0.2,
             max_tokens=4096
-        )
-        
-        # 응답 처리
-        if not response or not response.choices or not response.choices[0].message:
-            print(f"[ERROR] 코드수정 LLM 응답이 비어 있습니다: {response}")
-            return {
-                'answer': "코드 수정 중 오류가 발생했습니다. 다시 시도해주세요.",
-                'error': "empty_response",
-                'modified_code': "",
-                'file_name': "",
-                'has_push_intent': has_push_intent,
-                'token_exists': token_exists,
-                'requires_confirmation': requires_confirmation,
-                'push_intent_message': push_intent_message
-            }
-        
-        llm_code = response.choices[0].message.content.strip() if response.choices[0].message.content else ""
+        ).strip()
         print(f"[DEBUG] 코드수정 LLM 응답 성공 (길이: {len(llm_code)} 문자)")
         
         # 대화 기록 저장 (DB에만)
@@ -1455,6 +1511,9 @@ def handle_modify_request(session_id, message):
                 'token_exists': token_exists,
                 'requires_confirmation': requires_confirmation,
                 'push_intent_message': push_intent_message}
+    except StreamCancelled:
+        # 클라이언트 연결 종료: 응답이 완성되지 않았으므로 대화 기록을 저장하지 않음
+        raise
     except Exception as e:
         import traceback
         print(f"[ERROR] 코드수정 LLM 호출 오류: {e}")
@@ -1569,15 +1628,20 @@ def apply_changes(session_id, file_name, new_content, push_to_github=False, comm
     repo_path = f"./repos/{session_id}"
     print(f"[DEBUG] 저장소 경로: {repo_path}")
     
+    # DB에서 세션 데이터 조회하여 토큰 가져오기
+    session_data = db.get_session_data_from_db(session_id)
+    token = session_data.get('token') if session_data else None
+    
+    # 세션 worktree가 없으면 저장소 미러에서 생성
     import os
+    if not os.path.exists(repo_path) and session_data:
+        local = get_repo_store().ensure_session_worktree(session_id, session_data.get('repo_url'), token)
+        if not local.get('success'):
+            print(f"[WARNING] 세션 worktree 준비 실패: {local.get('error')}")
     if not os.path.exists(repo_path):
         print(f"[ERROR] 저장소 경로가 존재하지 않습니다: {repo_path}")
         return {'result': f'에러: 저장소 경로가 존재하지 않습니다: {repo_path}', 'success': False}
     
-    # DB에서 세션 데이터 조회하여 토큰 가져오기
-    session_data = db.get_session_data_from_db(session_id)
-    token = session_data.get('token') if session_data else None
-    
     # GitHub 푸시 여부 확인
     can_push = push_to_github and token
     if push_to_github and not token:
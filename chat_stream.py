@@ -0,0 +1,152 @@
+"""
+채팅/코드 수정 응답 스트리밍 모듈
+
+/chat, /modify_request는 gpt-4o 응답(max_tokens=4096)이 끝날 때까지 기다렸다가 JSON 하나를 돌려주므로
+사용자는 20~60초 동안 빈 화면을 봅니다. 스트리밍 모드에서는 핸들러(handle_chat / handle_modify_request)를
+작업 스레드에서 실행하고, 모델 응답 조각(delta)이 도착하는 대로 /analyze와 같은 NDJSON 줄로 전달합니다.
+대화 기록 저장은 핸들러가 전체 응답을 받은 뒤 기존과 같이 한 번만 수행하며,
+클라이언트 연결이 끊기면 상위 모델 호출을 닫아 남은 토큰을 생성하지 않게 합니다.
+
+NDJSON 이벤트:
+    - {"type": "delta", "content": "..."}: 모델 응답 조각
+    - {"type": "done", ...}: 핸들러 결과 (비스트리밍 응답의 JSON과 같은 키)
+    - {"type": "error", "error": "..."}: 핸들러 예외
+
+주요 클래스:
+    - ChatStream: 작업 스레드의 응답 조각을 응답 제너레이터로 전달하고 취소 여부를 알려주는 통로
+
+주요 함수:
+    - create_completion: 스트림이 있으면 stream=True로 호출하여 조각을 전달하고 전체 응답 텍스트를 반환
+    - stream_handler: 핸들러를 작업 스레드에서 실행하며 NDJSON 줄을 반환하는 제너레이터
+"""
+
+import json
+import queue
+import threading
+import traceback
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import openai
+
+# ----------------- 상수 정의 -----------------
+STREAM_KEEPALIVE_SECONDS = 15.0  # 검색 단계가 길 때 연결 유지를 위해 빈 줄을 보내는 간격 (초)
+
+
+class StreamCancelled(Exception):
+    """클라이언트 연결이 끊겨 스트리밍 응답 생성을 중단함"""
+    pass
+
+
+class ChatStream:
+    """
+    작업 스레드의 모델 응답 조각을 응답 제너레이터로 전달하는 통로
+
+    응답 제너레이터가 닫히면(클라이언트 연결 끊김) cancel()이 호출되며,
+    작업 스레드는 다음 조각을 보낼 때 StreamCancelled로 중단됩니다.
+    """
+
+    def __init__(self):
+        self.events = queue.Queue()
+        self.cancelled = threading.Event()
+
+    def check(self):
+        """취소되었으면 StreamCancelled 발생"""
+        if self.cancelled.is_set():
+            raise StreamCancelled()
+
+    def send(self, content: str):
+        """모델 응답 조각 전달"""
+        self.check()
+        if content:
+            self.events.put({'type': 'delta', 'content': content})
+
+    def finish(self, event: Dict[str, Any]):
+        """마지막 이벤트(done/error) 전달"""
+        self.events.put(event)
+
+    def cancel(self):
+        self.cancelled.set()
+
+
+def create_completion(stream: Optional[ChatStream], **kwargs) -> str:
+    """
+    OpenAI 채팅 응답 생성
+
+    stream이 없으면 기존처럼 한 번에 받고, 있으면 stream=True로 호출하여 조각을 stream에 전달합니다.
+    스트리밍 중 취소되면 상위 연결을 닫고 StreamCancelled를 발생시킵니다.
+
+    Args:
+        stream (Optional[ChatStream]): 응답 조각을 전달할 통로 (None이면 비스트리밍)
+        **kwargs: openai.chat.completions.create 인자
+
+    Returns:
+        str: 전체 응답 텍스트 (비어 있을 수 있음)
+    """
+    if stream is None:
+        response = openai.chat.completions.create(**kwargs)
+        if not response or not response.choices or not response.choices[0].message:
+            print(f"[ERROR] LLM 응답이 비어 있습니다: {response}")
+            return ''
+        return response.choices[0].message.content or ''
+
+    stream.check()
+    response = openai.chat.completions.create(stream=True, **kwargs)
+    parts = []
+    try:
+        for chunk in response:
+            if not chunk.choices:
+                continue
+            content = chunk.choices[0].delta.content
+            if content:
+                parts.append(content)
+                stream.send(content)
+    except StreamCancelled:
+        print(f"[INFO] 클라이언트 연결 종료로 LLM 스트리밍 중단 ({len(parts)}개 조각 수신)")
+        raise
+    finally:
+        # 취소/오류 시 상위 HTTP 연결을 닫아 남은 토큰 생성을 중단
+        response.close()
+    return ''.join(parts)
+
+
+def stream_handler(handler: Callable[..., Dict[str, Any]], *args,
+                   format_error: Optional[Callable[[Exception], str]] = None) -> Iterator[str]:
+    """
+    핸들러를 작업 스레드에서 실행하며 응답 조각과 결과를 NDJSON 줄로 반환하는 제너레이터
+
+    제너레이터가 닫히면(클라이언트 연결 끊김) 스트림을 취소하여 진행 중인 모델 호출을 중단시킵니다.
+
+    Args:
+        handler: stream 키워드 인자를 받는 핸들러 (handle_chat / handle_modify_request)
+        *args: 핸들러 인자
+        format_error: 예외를 사용자용 오류 메시지로 바꾸는 함수 (없으면 str(e))
+    """
+    stream = ChatStream()
+
+    def run():
+        try:
+            result = handler(*args, stream=stream)
+            stream.finish(dict(result, type='done'))
+        except StreamCancelled:
+            pass
+        except Exception as e:
+            print(f"[ERROR] 스트리밍 응답 생성 오류: {e}")
+            traceback.print_exc()
+            stream.finish({'type': 'error', 'error': format_error(e) if format_error else str(e)})
+
+    thread = threading.Thread(target=run, name='chat-stream', daemon=True)
+    thread.start()
+    try:
+        while True:
+            try:
+                event = stream.events.get(timeout=STREAM_KEEPALIVE_SECONDS)
+            except queue.Empty:
+                if not thread.is_alive():
+                    return
+                yield '\n'  # 연결 유지용 빈 줄 (클라이언트는 빈 줄을 무시)
+                continue
+            yield json.dumps(event) + '\n'
+            if event['type'] in ('done', 'error'):
+                return
+    finally:
+        stream.cancel()
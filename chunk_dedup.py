@@ -0,0 +1,203 @@
+"""
+중복/유사 청크 검출 모듈
+
+저장소에는 라이선스 헤더, 복사된 보일러플레이트, 거의 같은 테스트 픽스처처럼 반복되는 텍스트가 많습니다.
+인덱스 빌드 중 청크를 임베딩하기 전에 완전 중복(공백 정규화 후 같은 텍스트)과
+유사 중복(토큰 shingle 집합의 MinHash 추정 Jaccard 유사도 >= NEAR_DUPLICATE_THRESHOLD)을 찾아
+같은 묶음(cluster)의 청크는 대표 청크 하나만 임베딩합니다.
+중복 청크는 대표 청크의 벡터를 그대로 공유하여 파일별로 저장되므로 경로/라인 출처와 파일 단위 증분 갱신은
+그대로 유지되고, 검색 시에는 collapse_duplicates로 같은 묶음을 하나로 합쳐 상위 결과가 복제본으로 채워지지 않게 합니다.
+묶음은 청크 ID가 아니라 대표 청크 내용의 해시(메타데이터 'dup_group', content_key)로 기록하므로
+증분 재분석으로 대표 청크의 파일이 삭제/재청킹되어도 다른 청크와 잘못 묶이지 않습니다.
+
+주요 클래스:
+    - ChunkDeduplicator: 인덱스 빌드 한 번 동안 대표 청크를 기억하며 중복 여부를 판정
+
+주요 함수:
+    - collapse_duplicates: collection.query 결과에서 같은 묶음의 청크를 하나로 합침
+"""
+
+import hashlib
+import os
+import re
+import zlib
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# ----------------- 상수 정의 -----------------
+CHUNK_DEDUP = os.environ.get('CHUNK_DEDUP', '1') != '0'  # 인덱스 빌드 시 중복 청크 검출 사용 여부
+NEAR_DUPLICATE_THRESHOLD = 0.9  # 유사 중복으로 볼 최소 추정 Jaccard 유사도
+SHINGLE_SIZE = 5  # shingle 하나를 이루는 연속 토큰 수
+MIN_SHINGLES = 8  # shingle이 이보다 적은 짧은 청크는 완전 중복만 검사 (짧은 텍스트의 유사도는 불안정)
+MINHASH_PERMUTATIONS = 64  # MinHash 서명 길이
+LSH_BANDS = 16  # LSH 밴드 수 (밴드당 MINHASH_PERMUTATIONS / LSH_BANDS개 값)
+DUPLICATE_OVERSAMPLE = 2  # 검색 시 중복을 합친 뒤에도 n_results개가 남도록 더 가져올 배수
+DUPLICATE_MAX_OVERSAMPLE = 16  # 합친 결과가 모자랄 때 두 배씩 늘려 다시 검색할 최대 배수
+
+TOKEN_PATTERN = re.compile(r'\w+|[^\w\s]')
+
+
+def content_key(text: str) -> str:
+    """공백을 정규화한 청크 텍스트의 해시 (완전 중복 판정과 중복 묶음 키로 사용)"""
+    return hashlib.sha1(' '.join(TOKEN_PATTERN.findall(text or '')).encode('utf-8')).hexdigest()
+
+
+class ChunkDeduplicator:
+    """
+    인덱스 빌드 한 번 동안 대표 청크를 기억하며 새 청크가 중복인지 판정하는 클래스
+
+    완전 중복은 정규화 텍스트 해시로, 유사 중복은 MinHash 서명의 LSH 밴드 버킷으로 후보를 찾은 뒤
+    서명 일치 비율(추정 Jaccard 유사도)로 확인합니다. 스레드 안전하지 않으므로 한 곳에서 순서대로 호출해야 합니다.
+
+    Attributes:
+        stats (Dict[str, int]): {'exact': 완전 중복 수, 'near': 유사 중복 수}
+    """
+
+    def __init__(self, threshold: float = NEAR_DUPLICATE_THRESHOLD, num_perm: int = MINHASH_PERMUTATIONS,
+                 bands: int = LSH_BANDS):
+        """
+        Args:
+            threshold (float): 유사 중복으로 볼 최소 추정 Jaccard 유사도
+            num_perm (int): MinHash 서명 길이
+            bands (int): LSH 밴드 수 (num_perm의 약수)
+        """
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        # 해시 함수별 시드 (프로세스와 무관하게 같은 결과가 나오도록 고정 시드 사용)
+        rng = np.random.default_rng(20240607)
+        self.seeds = rng.integers(0, np.iinfo(np.uint64).max, size=num_perm, dtype=np.uint64, endpoint=True)
+        self.exact: Dict[str, str] = {}  # 정규화 텍스트 해시 -> 대표 청크 ID
+        self.buckets: Dict[tuple, List[str]] = {}  # (밴드, 밴드 값) -> 대표 청크 ID 목록
+        self.signatures: Dict[str, np.ndarray] = {}  # 대표 청크 ID -> MinHash 서명
+        self.group_keys: Dict[str, str] = {}  # 대표 청크 ID -> 묶음 키 (대표 청크의 content_key)
+        self.stats = {'exact': 0, 'near': 0}
+
+    def signature(self, tokens: List[str]) -> Optional[np.ndarray]:
+        """토큰 목록의 MinHash 서명 (shingle이 MIN_SHINGLES개 미만이면 None)"""
+        count = len(tokens) - SHINGLE_SIZE + 1
+        if count < MIN_SHINGLES:
+            return None
+        shingles = np.fromiter(
+            (zlib.crc32(' '.join(tokens[i:i + SHINGLE_SIZE]).encode('utf-8')) for i in range(count)),
+            dtype=np.uint64, count=count
+        )
+        # 시드와 섞은 뒤 splitmix64로 비선형 혼합 (uint64 곱셈은 2^64로 나눈 나머지로 계산됨)
+        hashed = np.unique(shingles)[:, None] ^ self.seeds
+        hashed = (hashed ^ (hashed >> np.uint64(30))) * np.uint64(0xbf58476d1ce4e5b9)
+        hashed = (hashed ^ (hashed >> np.uint64(27))) * np.uint64(0x94d049bb133111eb)
+        hashed ^= hashed >> np.uint64(31)
+        return hashed.min(axis=0)
+
+    def find(self, chunk_id: str, text: str) -> Optional[str]:
+        """
+        청크가 이미 본 청크의 중복이면 대표 청크 ID를 반환하고, 아니면 대표 청크로 등록
+
+        Args:
+            chunk_id (str): 청크 ID
+            text (str): 청크 텍스트
+
+        Returns:
+            Optional[str]: 대표 청크 ID (중복이 아니면 None)
+        """
+        tokens = TOKEN_PATTERN.findall(text)
+        key = hashlib.sha1(' '.join(tokens).encode('utf-8')).hexdigest()  # content_key와 같은 값
+        canonical = self.exact.get(key)
+        if canonical is not None:
+            self.stats['exact'] += 1
+            return canonical
+
+        signature = self.signature(tokens)
+        if signature is not None:
+            band_keys = [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+                         for band in range(self.bands)]
+            best_id, best_similarity = None, 0.0
+            seen = set()
+            for band_key in band_keys:
+                for candidate in self.buckets.get(band_key, ()):
+                    if candidate in seen:
+                        continue
+                    seen.add(candidate)
+                    similarity = float(np.mean(self.signatures[candidate] == signature))
+                    if similarity > best_similarity:
+                        best_id, best_similarity = candidate, similarity
+            if best_id is not None and best_similarity >= self.threshold:
+                self.stats['near'] += 1
+                return best_id
+            self.signatures[chunk_id] = signature
+            for band_key in band_keys:
+                self.buckets.setdefault(band_key, []).append(chunk_id)
+
+        self.exact[key] = chunk_id
+        self.group_keys[chunk_id] = key
+        return None
+
+
+def duplicate_group(chunk_id: str, metadata: Optional[Dict[str, Any]], document: Optional[str] = None) -> str:
+    """
+    청크가 속한 중복 묶음 키
+
+    저장된 'dup_group'(대표 청크 내용의 해시)을 사용하고, 이 키 없이 만들어진 이전 인덱스는
+    청크 텍스트의 해시(완전 중복만 묶임), 텍스트도 없으면 청크 ID를 사용합니다.
+    """
+    group = (metadata or {}).get('dup_group')
+    if group:
+        return group
+    return content_key(document) if document else chunk_id
+
+
+def describe_location(metadata: Dict[str, Any]) -> str:
+    """출처 표시용 '경로:시작-끝' 문자열"""
+    start, end = metadata.get('start_line', -1), metadata.get('end_line', -1)
+    if isinstance(start, int) and isinstance(end, int) and start >= 0 and end >= 0:
+        return f"{metadata.get('path', '')}:{start}-{end}"
+    return metadata.get('path', '')
+
+
+def collapse_duplicates(results: Dict[str, Any], n_results: int) -> Dict[str, Any]:
+    """
+    collection.query 형식의 결과에서 같은 중복 묶음의 청크를 가장 가까운 하나로 합침
+
+    남긴 청크의 메타데이터에는 합쳐진 다른 위치를 'duplicate_paths'('경로:시작-끝' 쉼표 구분)로 기록하여
+    답변에서 출처를 모두 밝힐 수 있게 합니다.
+
+    Args:
+        results (Dict[str, Any]): collection.query 형식 결과 (거리 오름차순)
+        n_results (int): 합친 뒤 남길 최대 청크 수
+
+    Returns:
+        Dict[str, Any]: 같은 형식의 결과
+    """
+    ids = (results.get('ids') or [[]])[0]
+    if not ids:
+        return results
+    metadatas = (results.get('metadatas') or [[None] * len(ids)])[0]
+    documents = (results.get('documents') or [[None] * len(ids)])[0]
+
+    kept = []
+    kept_by_group = {}
+    extra_locations = {}
+    for position, chunk_id in enumerate(ids):
+        metadata = metadatas[position] if position < len(metadatas) else None
+        group = duplicate_group(chunk_id, metadata, documents[position] if position < len(documents) else None)
+        if group in kept_by_group:
+            if metadata:
+                extra_locations.setdefault(kept_by_group[group], []).append(describe_location(metadata))
+            continue
+        if len(kept) < n_results:
+            kept_by_group[group] = position
+            kept.append(position)
+
+    collapsed = {}
+    for key in ('ids', 'documents', 'metadatas', 'distances', 'scores'):
+        if results.get(key):
+            collapsed[key] = [[results[key][0][position] for position in kept]]
+    if collapsed.get('metadatas'):
+        for index, position in enumerate(kept):
+            metadata = collapsed['metadatas'][0][index]
+            if position in extra_locations and metadata is not None:
+                # 이미 합쳐진 결과를 다시 합치는 경우 기존 위치 목록에 이어 붙임
+                locations = ([metadata['duplicate_paths']] if metadata.get('duplicate_paths') else []) + extra_locations[position]
+                collapsed['metadatas'][0][index] = dict(metadata, duplicate_paths=', '.join(locations))
+    return collapsed
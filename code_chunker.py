@@ -0,0 +1,619 @@
+"""
+코드 청킹 모듈
+
+파일 내용을 확장자별 청커(Python AST / 마크다운 / JavaScript / Jupyter 노트북 / 토큰 단위)로 나눕니다.
+청킹은 AST 파싱, 정규식 탐색, tiktoken 인코딩 등 CPU 작업이므로
+RepositoryEmbedder의 파이프라인은 파일 묶음 단위로 프로세스 풀에서 실행합니다.
+(이벤트 루프가 임베딩 요청을 계속 처리할 수 있고, 청킹 속도가 코어 수에 비례)
+
+토큰화는 파일마다 한 번만 합니다 (TokenizedText). 클래스/함수/섹션의 토큰 수는 토큰 배열의
+글자 오프셋으로 세고, 긴 블록은 같은 토큰 배열을 잘라 나누므로 같은 텍스트를 다시 인코딩하지 않습니다.
+청크마다 토큰 수(token_count)를 함께 돌려주어 임베딩/검색 단계에서도 다시 토큰화하지 않습니다.
+임베딩 입력 상한(EMBEDDING_MAX_INPUT_TOKENS)을 넘는 청크는 잘라 버리지 않고 토큰 단위로 나눕니다.
+
+프로세스 사이에는 (경로, 내용) 쌍과 압축된 청크 레코드
+(chunk, token_start, token_end, func_name, class_name, start_line, end_line, token_count) 튜플만 주고받습니다.
+
+주요 클래스:
+    - TokenizedText: 한 번 인코딩한 토큰 배열과 토큰 <-> 글자 오프셋 <-> 라인 번호 변환
+
+주요 함수:
+    - chunk_content: 파일 하나를 청킹하여 청크 레코드 목록 반환
+    - split_oversized_chunks: 임베딩 입력 상한을 넘는 청크를 토큰 단위로 나눔
+    - truncate_to_tokens: 텍스트를 토큰 경계에서 자름 (상한을 넘는 기존 청크의 임베딩 입력용)
+    - chunk_file_batch: 여러 파일을 순서대로 청킹 (프로세스 풀 작업 단위)
+    - get_chunk_executor: 청킹용 모듈 전역 프로세스 풀 반환 (CHUNK_WORKERS가 1 이하면 None)
+    - start_chunk_executor: 서버 시작 시 청킹 프로세스 풀을 미리 생성
+"""
+
+import ast
+import multiprocessing
+import os
+import re
+import threading
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate
+from typing import List, Optional, Tuple
+
+import nbformat
+import tiktoken
+
+from embedding_scheduler import EMBEDDING_MAX_INPUT_TOKENS
+
+# ----------------- 상수 정의 -----------------
+CHUNK_WORKERS = int(os.environ.get('CHUNK_WORKERS', os.cpu_count() or 1))  # 청킹 프로세스 수 (1 이하면 스레드에서 청킹)
+CHUNK_BATCH_FILES = 8  # 프로세스 풀에 한 번에 보내는 최대 파일 수
+CHUNK_BATCH_CHARS = 256 * 1024  # 프로세스 풀에 한 번에 보내는 최대 글자 수
+CHUNK_TIMEOUT_SECONDS = float(os.environ.get('CHUNK_TIMEOUT_SECONDS', 120))  # 파일 묶음 하나의 청킹 제한 시간 (초)
+TOKENIZER_MODEL = "gpt-3.5-turbo"
+DEFAULT_MAX_TOKENS = 256  # 구조 정보가 없는 텍스트의 청크 크기 (토큰)
+DEFAULT_OVERLAP = 64  # 구조 정보가 없는 텍스트의 청크 겹침 (토큰)
+
+_encoder = None
+_token_char_lengths = None
+_NON_CONTINUATION_BYTES = bytes(b for b in range(256) if not 0x80 <= b < 0xC0)
+
+def get_encoder():
+    """청킹용 tiktoken 인코더 (프로세스마다 한 번만 생성)"""
+    global _encoder
+    if _encoder is None:
+        _encoder = tiktoken.encoding_for_model(TOKENIZER_MODEL)
+    return _encoder
+
+def get_token_char_lengths() -> List[int]:
+    """
+    토큰 ID별 글자 수 표 (프로세스마다 한 번만 생성)
+
+    글자 수 = 바이트 수 - UTF-8 연속 바이트 수이므로 여러 토큰에 걸친 멀티바이트 문자는
+    첫 바이트가 있는 토큰에 속하며, 파일 전체 합계는 len(text)와 같습니다.
+    """
+    global _token_char_lengths
+    if _token_char_lengths is None:
+        encoder = get_encoder()
+        lengths = []
+        for token in range(encoder.n_vocab):
+            try:
+                token_bytes = encoder.decode_single_token_bytes(token)
+            except KeyError:
+                lengths.append(0)
+                continue
+            lengths.append(len(token_bytes) - len(token_bytes.translate(None, _NON_CONTINUATION_BYTES)))
+        _token_char_lengths = lengths
+    return _token_char_lengths
+
+def count_tokens(text: str) -> int:
+    """원문에 없는 텍스트(헤더 등)의 토큰 수"""
+    return len(get_encoder().encode(text, disallowed_special=()))
+
+def truncate_to_tokens(text: str, max_tokens: int = EMBEDDING_MAX_INPUT_TOKENS) -> str:
+    """텍스트를 토큰 경계에서 max_tokens 이하로 자름 (글자 수로 자르면 CJK 텍스트는 상한을 넘을 수 있음)"""
+    tokens = get_encoder().encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return get_encoder().decode(tokens[:max_tokens])
+
+
+class TokenizedText:
+    """
+    텍스트를 한 번만 인코딩하고 토큰/글자/라인 위치를 서로 변환하는 클래스
+
+    offsets[i]는 i번째 토큰이 시작하는 글자 위치이며 (offsets[n] == len(text)),
+    글자 구간의 토큰 수와 토큰 구간의 원문 텍스트를 다시 인코딩하지 않고 구합니다.
+    라인은 str.splitlines() 기준이라 청커가 쓰는 lines와 번호가 같습니다.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.lines = text.splitlines()
+        self.line_starts = list(accumulate(map(len, text.splitlines(True)), initial=0))
+        self.tokens = get_encoder().encode(text, disallowed_special=())
+        self.offsets = list(accumulate(map(get_token_char_lengths().__getitem__, self.tokens), initial=0))
+
+    def token_range(self, char_start: int, char_end: int) -> Tuple[int, int]:
+        """글자 구간 [char_start, char_end)에 걸친 토큰 구간 [t_start, t_end)"""
+        n = len(self.tokens)
+        t_start = max(0, bisect_right(self.offsets, char_start, 0, n) - 1)
+        if char_end <= char_start:
+            return t_start, t_start
+        return t_start, max(t_start, bisect_left(self.offsets, char_end, 0, n))
+
+    def line_span(self, start: int, end: int) -> Tuple[int, int]:
+        """0부터 시작하는 라인 구간 [start, end)의 글자 구간 ('\\n'.join(lines[start:end])과 같은 범위)"""
+        end = min(end, len(self.lines))
+        if end <= start:
+            position = self.line_starts[min(start, len(self.lines))]
+            return position, position
+        return self.line_starts[start], self.line_starts[end - 1] + len(self.lines[end - 1])
+
+    def line_token_range(self, start: int, end: int) -> Tuple[int, int]:
+        """0부터 시작하는 라인 구간 [start, end)에 걸친 토큰 구간"""
+        return self.token_range(*self.line_span(start, end))
+
+    def line_of(self, char_position: int) -> int:
+        """글자 위치의 라인 번호 (1부터 시작)"""
+        return min(max(1, bisect_right(self.line_starts, char_position)), max(1, len(self.lines)))
+
+    def split_span(self, char_start: int, char_end: int, max_tokens: int = DEFAULT_MAX_TOKENS,
+                   overlap: int = DEFAULT_OVERLAP, strip: bool = False) -> List[Tuple]:
+        """
+        글자 구간을 토큰 단위로 겹치게 나눔 (max_tokens 이하이면 구간 전체가 청크 하나)
+
+        Args:
+            char_start (int): 시작 글자 위치
+            char_end (int): 끝 글자 위치 (포함하지 않음)
+            max_tokens (int): 청크당 최대 토큰 수
+            overlap (int): 이웃 청크와 겹치는 토큰 수
+            strip (bool): True면 구간 앞뒤 공백 제외 (str.strip()과 같은 결과)
+
+        Returns:
+            List[Tuple]: (chunk, t_start, t_end, start_line, end_line, token_count) 목록
+        """
+        text = self.text
+        if strip:
+            while char_start < char_end and text[char_start].isspace():
+                char_start += 1
+            while char_end > char_start and text[char_end - 1].isspace():
+                char_end -= 1
+        t_start, t_end = self.token_range(char_start, char_end)
+        chunks = []
+        start = t_start
+        while start < t_end:
+            end = min(start + max_tokens, t_end)
+            # 토큰 경계 대신 원문을 잘라 구간 밖 글자가 섞이지 않게 함
+            c0 = max(char_start, self.offsets[start])
+            c1 = min(char_end, self.offsets[end])
+            chunks.append((text[c0:c1], start, end, self.line_of(c0), self.line_of(max(c0, c1 - 1)), end - start))
+            if end == t_end:
+                break
+            start += max_tokens - overlap
+        return chunks
+
+    def split_lines(self, start: int, end: int, max_tokens: int = DEFAULT_MAX_TOKENS,
+                    overlap: int = DEFAULT_OVERLAP) -> List[Tuple]:
+        """0부터 시작하는 라인 구간 [start, end)를 토큰 단위로 나눔 (split_span 참고)"""
+        return self.split_span(*self.line_span(start, end), max_tokens=max_tokens, overlap=overlap)
+
+
+def split_by_tokens(text, max_tokens=DEFAULT_MAX_TOKENS, overlap=DEFAULT_OVERLAP):
+    """텍스트를 토큰 단위로 겹치게 나누어 (chunk, token_start, token_end) 목록 반환"""
+    return [chunk[:3] for chunk in TokenizedText(text).split_span(0, len(text), max_tokens, overlap)]
+
+def chunk_python_functions(source_code):
+    """Python 코드를 AST 기준 클래스/함수 단위로 청킹하는 함수"""
+    doc = TokenizedText(source_code)
+    try:
+        tree = ast.parse(source_code)
+    except Exception as e:
+        print(f"[WARNING] AST 파싱 실패: {e}")
+        return [(source_code, 0, len(doc.tokens), None, None, 1, len(doc.lines), len(doc.tokens))]
+    
+    lines = doc.lines
+    chunks = []
+    imports = []
+    
+    # 임포트 문 수집
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            start = node.lineno - 1
+            end = getattr(node, 'end_lineno', start + 1)
+            import_text = '\n'.join(lines[start:end])
+            imports.append(import_text)
+    
+    # 전체 임포트 문자열
+    imports_text = '\n'.join(imports)
+    
+    # 복잡도 계산 함수
+    def calculate_complexity(node):
+        """AST 노드의 복잡도 계산"""
+        if isinstance(node, ast.FunctionDef):
+            # 기본 복잡도 + 파라미터 수 + 내부 조건문/반복문 수
+            complexity = 1 + len(node.args.args)
+            for n in ast.walk(node):
+                if isinstance(n, (ast.If, ast.For, ast.While, ast.Try)):
+                    complexity += 1
+            return complexity
+        elif isinstance(node, ast.ClassDef):
+            # 기본 복잡도 + 상속 수 + 메소드 수
+            complexity = 1 + len(node.bases)
+            for n in node.body:
+                if isinstance(n, ast.FunctionDef):
+                    complexity += 1
+            return complexity
+        return 1
+    
+    def add_definition(start, end, func_name, class_name, complexity, header_prefix, docstring):
+        """클래스/함수 하나를 청크로 추가 (max_tokens를 넘으면 헤더 청크 + 본문 분할 청크)"""
+        # 가변 청크 크기 (복잡도에 따라 조정)
+        max_tokens = min(512, 128 + complexity * 32)
+        overlap = min(128, 32 + complexity * 8)
+        
+        t_start, t_end = doc.line_token_range(start, end)
+        if t_end - t_start <= max_tokens:
+            # 전체를 하나의 청크로
+            chunks.append(('\n'.join(lines[start:end]), t_start, t_end,
+                           func_name, class_name, start+1, end, t_end - t_start))
+            return
+        
+        # 임포트 + 정의 라인 + docstring을 첫 청크에 포함
+        header = header_prefix
+        if docstring:
+            header += f"{lines[start]}\n    \"\"\"\n    {docstring}\n    \"\"\"\n"
+        else:
+            header += f"{lines[start]}\n"
+        h_start, h_end = doc.line_token_range(start, start+1)
+        chunks.append((
+            header, h_start, h_end,
+            func_name, class_name, start+1, start+1+(1 if not docstring else len(docstring.splitlines())+2),
+            count_tokens(header)
+        ))
+        
+        # 나머지 본문을 같은 토큰 배열에서 잘라 청킹
+        for sub_chunk, s_start, s_end, sub_start_line, sub_end_line, token_count in doc.split_lines(start+1, end, max_tokens, overlap):
+            chunks.append((sub_chunk, s_start, s_end, func_name, class_name, sub_start_line, sub_end_line, token_count))
+    
+    # 계층적 청킹 함수
+    def process_node(node, parent_class=None, parent_func=None, depth=0):
+        """노드를 재귀적으로 처리하여 청크 생성"""
+        if not hasattr(node, 'lineno'):
+            return
+        
+        start = node.lineno - 1
+        end = getattr(node, 'end_lineno', None)
+        if end is None:
+            return
+        
+        # 노드 유형에 따른 처리
+        if isinstance(node, ast.ClassDef):
+            class_name = node.name
+            header_prefix = f"{imports_text}\n\n" if imports_text else ""
+            add_definition(start, end, None, class_name, calculate_complexity(node),
+                           header_prefix, ast.get_docstring(node))
+            
+            # 클래스 내부 메소드 처리
+            for child in node.body:
+                process_node(child, class_name, None, depth+1)
+        
+        elif isinstance(node, ast.FunctionDef):
+            func_name = node.name
+            header_prefix = f"{imports_text}\n\n" if imports_text and not parent_class else ""
+            add_definition(start, end, func_name, parent_class, calculate_complexity(node),
+                           header_prefix, ast.get_docstring(node))
+            
+            # 중첩 함수 처리
+            for child in node.body:
+                process_node(child, parent_class, func_name, depth+1)
+    
+    # 최상위 노드 처리
+    for node in tree.body:
+        process_node(node)
+    
+    # 청크가 없으면 기본 토큰 기반 청킹 적용
+    if not chunks:
+        print(f"[INFO] 구조적 청크 없음, 토큰 기반 청킹 적용")
+        for chunk, t_start, t_end, start_line, end_line, token_count in doc.split_span(0, len(source_code)):
+            chunks.append((chunk, t_start, t_end, None, None, start_line, end_line, token_count))
+    
+    return chunks
+
+def chunk_markdown(md_text):
+    """마크다운을 섹션/코드 블록 단위로 청킹하는 함수"""
+    doc = TokenizedText(md_text)
+    # 마크다운 파싱을 위한 개선된 패턴
+    section_pattern = r'(^|\n)(#+\s+.+)($|\n)'  # 헤더
+    code_pattern = r'(^|\n)```[\s\S]+?```'  # 코드 블록
+    
+    # 섹션 제목과 코드 블록 찾기
+    sections = re.finditer(section_pattern, md_text, re.MULTILINE)
+    code_blocks = re.finditer(code_pattern, md_text, re.MULTILINE)
+    
+    # 섹션과 코드 블록의 위치 정보 수집
+    markers = []
+    for section in sections:
+        markers.append((section.start(), section.group(2), 'section'))
+    for block in code_blocks:
+        markers.append((block.start(), block.group(0), 'code'))
+    
+    # 위치 순으로 정렬
+    markers.sort(key=lambda x: x[0])
+    
+    def add_span(char_start, char_end, func_name, title, strip=True):
+        """글자 구간을 (256토큰 초과 시 나누어) 청크로 추가"""
+        for chunk, t_start, t_end, start_line, end_line, token_count in doc.split_span(char_start, char_end, strip=strip):
+            chunks.append((chunk, t_start, t_end, func_name, title, start_line, end_line, token_count))
+    
+    # 의미 단위로 분할
+    chunks = []
+    last_pos = 0
+    for pos, content, marker_type in markers:
+        # 이전 위치부터 현재 마커까지의 텍스트 처리
+        if pos > last_pos:
+            add_span(last_pos, pos, None, "일반 텍스트")
+        
+        # 마커 자체 처리
+        if marker_type == 'section':
+            # 섹션 제목 및 다음 내용 파악
+            section_title = content
+            next_marker_pos = md_text.find('\n#', pos + len(content)) if pos + len(content) < len(md_text) else -1
+            if next_marker_pos == -1:
+                next_marker_pos = len(md_text)
+            
+            add_span(pos, next_marker_pos, None, section_title)
+            last_pos = next_marker_pos
+        elif marker_type == 'code':
+            code_block = content
+            code_lang = re.search(r'```(\w+)', code_block)
+            code_lang = code_lang.group(1) if code_lang else ''
+            
+            add_span(pos, pos + len(code_block), code_lang, "코드 블록", strip=False)
+            last_pos = pos + len(code_block)
+    
+    # 남은 텍스트 처리
+    if last_pos < len(md_text):
+        add_span(last_pos, len(md_text), None, "일반 텍스트")
+    
+    # 청크가 없으면 기본 토큰 기반 청킹 적용
+    if not chunks:
+        add_span(0, len(md_text), None, "마크다운", strip=False)
+    
+    return chunks
+    
+def chunk_js(source_code):
+    """JavaScript 코드를 구조적으로 청킹하는 함수"""
+    doc = TokenizedText(source_code)
+    # 함수/클래스/메소드 정의 패턴
+    func_pattern = r'(async\s+)?function\s+(\w+)\s*\([^)]*\)\s*\{'
+    arrow_func_pattern = r'(const|let|var)\s+(\w+)\s*=\s*(async\s+)?\([^)]*\)\s*=>'
+    class_pattern = r'class\s+(\w+)(\s+extends\s+(\w+))?\s*\{'
+    method_pattern = r'(async\s+)?(\w+)\s*\([^)]*\)\s*\{'
+    
+    lines = doc.lines
+    chunks = []
+    
+    # 임포트/모듈 문 찾기
+    import_lines = []
+    for i, line in enumerate(lines):
+        if re.match(r'^\s*(import|require|export)\b', line):
+            import_lines.append(line)
+    
+    imports_text = '\n'.join(import_lines)
+    
+    # 정규식 패턴 매칭으로 함수/클래스 찾기
+    def find_block_end(start_line, opening_char='{', closing_char='}'):
+        """중괄호 짝을 맞춰 블록 끝 라인 찾기"""
+        balance = 0
+        for i in range(start_line, len(lines)):
+            line = lines[i]
+            balance += line.count(opening_char) - line.count(closing_char)
+            if balance <= 0:
+                return i
+        return len(lines) - 1
+    
+    # 함수/클래스 찾기
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        
+        # 함수 정의 찾기
+        func_match = re.search(func_pattern, line)
+        arrow_match = re.search(arrow_func_pattern, line)
+        class_match = re.search(class_pattern, line)
+        
+        if func_match or arrow_match or class_match:
+            start = i
+            
+            if func_match:
+                name = func_match.group(2)
+                is_class = False
+            elif arrow_match:
+                name = arrow_match.group(2)
+                is_class = False
+            else:  # class_match
+                name = class_match.group(1)
+                is_class = True
+            func_name = None if is_class else name
+            class_name = name if is_class else None
+            
+            # 블록 끝 찾기
+            end = find_block_end(start)
+            
+            # 전체 코드 청크
+            chunk = '\n'.join(lines[start:end+1])
+            
+            # 복잡도 추정 (라인 수 + 중첩 레벨)
+            complexity = (end - start) // 5 + chunk.count('{') - chunk.count('}')
+            complexity = max(1, complexity)
+            
+            # 가변 청크 크기
+            max_tokens = min(512, 128 + complexity * 32)
+            overlap = min(128, 32 + complexity * 8)
+            
+            t_start, t_end = doc.line_token_range(start, end+1)
+            if t_end - t_start <= max_tokens:
+                # 전체 함수/클래스를 하나의 청크로
+                chunks.append((chunk, t_start, t_end, func_name, class_name, start+1, end+1, t_end - t_start))
+            else:
+                # 헤더 (임포트 + 함수/클래스 선언)
+                header = f"{imports_text}\n\n" if imports_text else ""
+                header += lines[start]
+                h_start, h_end = doc.line_token_range(start, start+1)
+                chunks.append((header, h_start, h_end, func_name, class_name, start+1, start+1, count_tokens(header)))
+                
+                # 본문 청킹
+                for sub_chunk, s_start, s_end, sub_start_line, sub_end_line, token_count in doc.split_lines(start+1, end+1, max_tokens, overlap):
+                    chunks.append((sub_chunk, s_start, s_end, func_name, class_name, sub_start_line, sub_end_line, token_count))
+            
+            # 클래스 내부 메소드 찾기 (클래스인 경우)
+            if is_class:
+                method_start = start + 1
+                while method_start < end:
+                    method_line = lines[method_start]
+                    method_match = re.search(method_pattern, method_line)
+                    
+                    if method_match:
+                        method_name = method_match.group(2)
+                        method_end = find_block_end(method_start)
+                        
+                        # 메소드 청킹 (클래스 청크 크기의 절반 기준)
+                        m_start, m_end = doc.line_token_range(method_start, method_end+1)
+                        if m_end - m_start <= max_tokens // 2:
+                            chunks.append((
+                                '\n'.join(lines[method_start:method_end+1]), m_start, m_end,
+                                method_name, name, method_start+1, method_end+1, m_end - m_start
+                            ))
+                        else:
+                            for sub_chunk, s_start, s_end, sub_start_line, sub_end_line, token_count in doc.split_lines(method_start, method_end+1, max_tokens//2, overlap//2):
+                                chunks.append((sub_chunk, s_start, s_end, method_name, name, sub_start_line, sub_end_line, token_count))
+                        
+                        method_start = method_end + 1
+                    else:
+                        method_start += 1
+            
+            i = end + 1
+        else:
+            i += 1
+    
+    # 청크가 없으면 기본 토큰 기반 청킹 적용
+    if not chunks:
+        for chunk, t_start, t_end, start_line, end_line, token_count in doc.split_span(0, len(source_code)):
+            chunks.append((chunk, t_start, t_end, None, None, start_line, end_line, token_count))
+    
+    return chunks
+
+def chunk_ipynb(ipynb_text):
+    """Jupyter 노트북을 셀 단위로 청킹하는 함수 (셀마다 한 번 토큰화)"""
+    try:
+        nb = nbformat.reads(ipynb_text, as_version=4)
+    except Exception as e:
+        print(f"[WARNING] ipynb 파싱 실패: {e}")
+        token_count = count_tokens(ipynb_text)
+        return [(ipynb_text, 0, token_count, None, "ipynb", 1, len(ipynb_text.splitlines()), token_count)]
+    chunks = []
+    for idx, cell in enumerate(nb.cells):
+        cell_type = cell.get('cell_type', '')
+        source = cell.get('source', '')
+        if not source.strip():
+            continue
+        # 셀 타입별로 태그
+        tag = f"{cell_type} 셀"
+        # 토큰 단위로 분할 (라인 번호 대신 셀 번호 사용)
+        for chunk, t_start, t_end, _, _, token_count in TokenizedText(source).split_span(0, len(source)):
+            chunks.append((chunk, t_start, t_end, None, tag, idx+1, idx+1, token_count))
+    if not chunks:
+        token_count = count_tokens(ipynb_text)
+        chunks.append((ipynb_text, 0, token_count, None, "ipynb", 1, len(ipynb_text.splitlines()), token_count))
+    return chunks
+
+def split_oversized_chunks(chunks: List[Tuple], max_tokens: int = EMBEDDING_MAX_INPUT_TOKENS) -> List[Tuple]:
+    """
+    임베딩 입력 상한을 넘는 청크(AST 파싱 실패 시 파일 전체 청크 등)를 토큰 단위로 나눔
+
+    나눈 청크의 토큰/라인 위치는 원래 청크의 시작 위치를 더해 파일 기준으로 맞춥니다.
+    """
+    result = []
+    for chunk, t_start, t_end, func_name, class_name, start_line, end_line, token_count in chunks:
+        if token_count <= max_tokens:
+            result.append((chunk, t_start, t_end, func_name, class_name, start_line, end_line, token_count))
+            continue
+        for sub_chunk, s_start, s_end, sub_start_line, sub_end_line, sub_tokens in TokenizedText(chunk).split_span(
+                0, len(chunk), max_tokens, DEFAULT_OVERLAP):
+            result.append((sub_chunk, t_start + s_start, t_start + s_end, func_name, class_name,
+                           start_line + sub_start_line - 1, start_line + sub_end_line - 1, sub_tokens))
+    return result
+
+def chunk_content(path: str, content: str) -> List[Tuple]:
+    """
+    파일 하나를 확장자별 청커로 나누어 청크 레코드 목록 반환
+
+    Args:
+        path (str): 저장소 기준 파일 경로 (확장자로 청커 선택)
+        content (str): 파일 내용
+
+    Returns:
+        List[Tuple]: (chunk, t_start, t_end, func_name, class_name, start_line, end_line, token_count) 목록
+            (목록 안의 순서가 청크 ID {path}_{i}의 i, t_start/t_end는 파일 토큰 배열 기준 위치,
+            token_count는 EMBEDDING_MAX_INPUT_TOKENS 이하)
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.py':
+        chunks = chunk_python_functions(content)
+    elif ext == '.md':
+        chunks = chunk_markdown(content)
+    elif ext == '.js':
+        chunks = chunk_js(content)
+    elif ext == '.ipynb':
+        chunks = chunk_ipynb(content)
+    else:
+        # 일반 파일은 토큰 단위로 나눔
+        chunks = [
+            (chunk, t_start, t_end, None, None, start_line, end_line, token_count)
+            for chunk, t_start, t_end, start_line, end_line, token_count in TokenizedText(content).split_span(0, len(content))
+        ]
+    
+    chunks = split_oversized_chunks(chunks)
+    
+    # 파일별 청크 수 요약 로그 (과도한 개별 로그 대신)
+    if chunks:
+        print(f"[DEBUG] 파일 청킹 완료: {path} - {len(chunks)}개 청크")
+    return chunks
+
+def chunk_file_batch(items: List[Tuple[str, str]]) -> List[List[Tuple]]:
+    """
+    (경로, 내용) 목록을 순서대로 청킹 (프로세스 풀 작업 단위)
+
+    Returns:
+        List[List[Tuple]]: 입력 순서와 같은 파일별 청크 레코드 목록
+    """
+    return [chunk_content(path, content) for path, content in items]
+
+# 모듈 전역 청킹 프로세스 풀 (처음 사용할 때 생성)
+_default_executor = None
+_default_executor_lock = threading.Lock()
+
+def get_chunk_executor() -> Optional[ProcessPoolExecutor]:
+    """
+    청킹용 모듈 전역 프로세스 풀 반환
+
+    워커는 fork로 만들어 spawn/forkserver처럼 메인 모듈(app.py)을 다시 import하지 않습니다.
+    다른 스레드가 있을 때 fork하면 그 스레드가 잡고 있던 잠금이 복제되어 워커가 멈출 수 있으므로,
+    풀은 서버 시작 시 start_chunk_executor로 미리 만들고 여기서는 프로세스에 스레드가 하나뿐일 때만 새로 만듭니다.
+
+    Returns:
+        Optional[ProcessPoolExecutor]: 프로세스 풀 (CHUNK_WORKERS가 1 이하이거나 안전하게 만들 수 없으면 None)
+    """
+    global _default_executor
+    if CHUNK_WORKERS <= 1:
+        return None
+    with _default_executor_lock:
+        if _default_executor is None:
+            if threading.active_count() > 1:
+                return None
+            context = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+            _default_executor = ProcessPoolExecutor(max_workers=CHUNK_WORKERS, mp_context=context)
+            # fork 풀은 첫 작업 제출 시 워커를 모두 만들므로 스레드가 생기기 전에 바로 시작
+            _default_executor.submit(int).result()
+            print(f"[INFO] 청킹 프로세스 풀 생성 ({CHUNK_WORKERS}개 프로세스)")
+        return _default_executor
+
+def start_chunk_executor():
+    """서버 시작 시(다른 스레드를 만들기 전) 청킹 프로세스 풀을 미리 생성"""
+    if get_chunk_executor() is None and CHUNK_WORKERS > 1:
+        print("[WARNING] 실행 중인 스레드가 있어 청킹 프로세스 풀을 만들지 않음 (스레드에서 청킹)")
+
+def reset_chunk_executor(executor: Optional[ProcessPoolExecutor] = None, terminate: bool = False):
+    """
+    프로세스 풀이 깨졌거나(BrokenProcessPool) 작업이 제한 시간을 넘겼을 때 다음 사용 시 새로 만들도록 초기화
+
+    Args:
+        executor: 오류가 난 풀 (지정하면 그 사이 새로 만든 풀은 그대로 둠)
+        terminate (bool): True면 응답 없는 워커 프로세스를 종료
+    """
+    global _default_executor
+    with _default_executor_lock:
+        if _default_executor is None or (executor is not None and _default_executor is not executor):
+            return
+        broken, _default_executor = _default_executor, None
+    if terminate:
+        for process in list((getattr(broken, '_processes', None) or {}).values()):
+            process.terminate()
+    broken.shutdown(wait=False, cancel_futures=True)
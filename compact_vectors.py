@@ -0,0 +1,274 @@
+"""
+축소 차원 + 양자화 벡터 저장 모듈
+
+text-embedding-3 계열 임베딩은 앞쪽 차원만 잘라 다시 정규화해도 API의 dimensions 파라미터로
+받은 짧은 임베딩과 같은 벡터가 됩니다. compact 모드 컬렉션은 이 성질을 이용해
+ChromaDB(HNSW)에는 짧은 벡터만 저장하여 후보를 찾고, 전체 차원 벡터는 int8로 양자화해
+디스크(SQLite)에 따로 보관했다가 후보를 다시 정렬(re-rank)하는 데 사용합니다.
+임베딩 API는 전체 차원으로 한 번만 호출하므로 임베딩 캐시도 그대로 재사용됩니다.
+
+저장 방식은 컬렉션 메타데이터('vector_mode', 'vector_dimensions')에 컬렉션별로 기록되며,
+메타데이터가 없는 기존 컬렉션은 full 모드(전체 차원 float 벡터를 ChromaDB에 저장)로 취급합니다.
+
+주요 클래스:
+    - RerankVectorStore: 컬렉션별 전체 차원 int8 벡터를 보관하는 디스크 저장소
+
+주요 함수:
+    - get_vector_config: 컬렉션의 벡터 저장 방식 조회
+    - to_collection_vectors: 전체 차원 임베딩을 컬렉션 저장 형식으로 변환
+    - query_collection: 저장 방식에 맞게 질문 임베딩을 변환하여 검색 (compact 모드는 re-rank 포함)
+"""
+
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from chunk_dedup import DUPLICATE_OVERSAMPLE, DUPLICATE_MAX_OVERSAMPLE, collapse_duplicates
+
+# ----------------- 상수 정의 -----------------
+# 새로 만드는 컬렉션의 벡터 저장 방식: 'compact' = 축소 차원 + int8 re-rank, 'full' = 전체 차원 float (기존 방식)
+VECTOR_STORAGE_MODE = os.environ.get('VECTOR_STORAGE_MODE', 'compact')
+COMPACT_VECTOR_DIMENSIONS = int(os.environ.get('COMPACT_VECTOR_DIMENSIONS', 256))  # HNSW에 저장할 차원 수
+RERANK_OVERSAMPLE = 4  # compact 모드 검색 시 re-rank 후보로 가져올 배수 (n_results * RERANK_OVERSAMPLE)
+RERANK_VECTOR_PATH = "./repo_analysis_db/rerank_vectors.sqlite3"
+
+
+def get_vector_config(collection) -> Dict[str, Any]:
+    """
+    컬렉션의 벡터 저장 방식
+
+    Returns:
+        Dict[str, Any]: {'mode': 'full' | 'compact', 'dimensions': HNSW 벡터 차원 수 (full 모드는 None)}
+    """
+    metadata = collection.metadata or {}
+    if metadata.get('vector_mode') == 'compact':
+        return {'mode': 'compact', 'dimensions': int(metadata.get('vector_dimensions') or COMPACT_VECTOR_DIMENSIONS)}
+    return {'mode': 'full', 'dimensions': None}
+
+
+def default_vector_config(dimensions: int, shortenable: bool = True) -> Dict[str, Any]:
+    """
+    새 컬렉션에 적용할 기본 저장 방식 (VECTOR_STORAGE_MODE)
+
+    Args:
+        dimensions (int): 임베딩 제공자의 전체 차원 수
+        shortenable (bool): 앞쪽 차원만 잘라 써도 되는 임베딩인지 여부 (아니면 항상 full)
+    """
+    if VECTOR_STORAGE_MODE == 'compact' and shortenable and dimensions > COMPACT_VECTOR_DIMENSIONS:
+        return {'mode': 'compact', 'dimensions': COMPACT_VECTOR_DIMENSIONS}
+    return {'mode': 'full', 'dimensions': None}
+
+
+def vector_config_metadata(config: Dict[str, Any]) -> Dict[str, Any]:
+    """컬렉션 생성 시 메타데이터에 기록할 저장 방식 항목"""
+    if config['mode'] == 'compact':
+        return {'vector_mode': 'compact', 'vector_dimensions': config['dimensions']}
+    return {'vector_mode': 'full'}
+
+
+def shorten(vectors, dimensions: int) -> np.ndarray:
+    """임베딩의 앞쪽 dimensions개 차원만 남기고 다시 L2 정규화 (API dimensions 파라미터와 같은 결과)"""
+    short = np.asarray(vectors, dtype=np.float32)[..., :dimensions]
+    norms = np.linalg.norm(short, axis=-1, keepdims=True)
+    return short / np.where(norms == 0, 1, norms)
+
+
+def quantize(vectors) -> List[tuple]:
+    """벡터별 스케일을 둔 대칭 int8 양자화 -> [(scale, int8 바이트), ...]"""
+    matrix = np.asarray(vectors, dtype=np.float32)
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales = np.where(scales == 0, 1.0, scales)
+    codes = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+    return [(float(scale), code.tobytes()) for scale, code in zip(scales, codes)]
+
+
+def to_collection_vectors(config: Dict[str, Any], embeddings: List[List[float]]) -> List[List[float]]:
+    """전체 차원 임베딩을 컬렉션에 저장할 벡터로 변환 (compact 모드는 축소 차원)"""
+    if config['mode'] != 'compact' or not embeddings:
+        return embeddings
+    return shorten(embeddings, config['dimensions']).tolist()
+
+
+class RerankVectorStore:
+    """
+    compact 모드 컬렉션의 전체 차원 벡터(int8 양자화)를 보관하는 디스크 저장소
+
+    (컬렉션, 청크 ID)별로 스케일과 int8 바이트를 저장하며, 검색 후보의 벡터만 조회합니다.
+    여러 스레드에서 동시에 사용할 수 있도록 내부 잠금을 사용합니다.
+    """
+
+    def __init__(self, db_path: str = RERANK_VECTOR_PATH):
+        """
+        저장소 초기화
+
+        Args:
+            db_path (str): SQLite 파일 경로
+        """
+        self.db_path = db_path
+        self.lock = threading.Lock()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS rerank_vectors (
+                collection_name TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                path TEXT NOT NULL,
+                scale REAL NOT NULL,
+                vector BLOB NOT NULL,
+                PRIMARY KEY (collection_name, chunk_id)
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_rerank_vectors_path ON rerank_vectors(collection_name, path)")
+        self.conn.commit()
+
+    def put_many(self, collection_name: str, ids: List[str], paths: List[str], embeddings: List[List[float]]):
+        """전체 차원 임베딩을 int8로 양자화하여 저장"""
+        if not ids:
+            return
+        rows = [
+            (collection_name, chunk_id, path, scale, blob)
+            for chunk_id, path, (scale, blob) in zip(ids, paths, quantize(embeddings))
+        ]
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO rerank_vectors (collection_name, chunk_id, path, scale, vector) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self.conn.commit()
+
+    def get_many(self, collection_name: str, ids: List[str]) -> Dict[str, np.ndarray]:
+        """
+        청크 ID별 전체 차원 벡터 조회 (역양자화된 float32)
+
+        Returns:
+            Dict[str, np.ndarray]: {청크 ID: 벡터} (저장된 항목만 포함)
+        """
+        found = {}
+        with self.lock:
+            # SQLite 바인딩 변수 제한(999)을 넘지 않도록 나누어 조회
+            for start in range(0, len(ids), 500):
+                part = ids[start:start + 500]
+                placeholders = ','.join('?' * len(part))
+                rows = self.conn.execute(
+                    f"SELECT chunk_id, scale, vector FROM rerank_vectors WHERE collection_name = ? AND chunk_id IN ({placeholders})",
+                    [collection_name] + part
+                ).fetchall()
+                for chunk_id, scale, blob in rows:
+                    found[chunk_id] = np.frombuffer(blob, dtype=np.int8).astype(np.float32) * scale
+        return found
+
+    def delete(self, collection_name: str, paths: Optional[List[str]] = None):
+        """컬렉션(또는 컬렉션의 지정 파일)의 벡터 삭제"""
+        with self.lock:
+            if paths is None:
+                self.conn.execute("DELETE FROM rerank_vectors WHERE collection_name = ?", (collection_name,))
+            else:
+                self.conn.executemany(
+                    "DELETE FROM rerank_vectors WHERE collection_name = ? AND path = ?",
+                    [(collection_name, path) for path in paths]
+                )
+            self.conn.commit()
+
+    def copy(self, source_collection: str, target_collection: str, paths: List[str]):
+        """다른 컬렉션에서 지정 파일의 벡터를 복사 (변경 없는 파일을 새 커밋 인덱스로 옮길 때)"""
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO rerank_vectors (collection_name, chunk_id, path, scale, vector) "
+                "SELECT ?, chunk_id, path, scale, vector FROM rerank_vectors WHERE collection_name = ? AND path = ?",
+                [(target_collection, source_collection, path) for path in paths]
+            )
+            self.conn.commit()
+
+    def close(self):
+        """DB 연결 종료"""
+        with self.lock:
+            self.conn.close()
+
+
+def query_collection(collection, embedding: List[float], n_results: int, collapse: bool = False) -> Dict[str, Any]:
+    """
+    컬렉션의 저장 방식에 맞게 질문 임베딩(전체 차원)을 변환하여 유사 청크 검색
+
+    compact 모드는 축소 차원 질문 벡터로 n_results * RERANK_OVERSAMPLE개 후보를 찾은 뒤
+    전체 차원 벡터로 다시 정렬합니다. 반환 형식과 거리(정규화 벡터의 제곱 L2 거리)는
+    collection.query와 같으므로 호출부의 점수 계산을 그대로 사용할 수 있습니다.
+
+    Args:
+        collection: ChromaDB 컬렉션
+        embedding (List[float]): 질문 임베딩 (전체 차원)
+        n_results (int): 반환할 청크 수
+        collapse (bool): 같은 중복 묶음의 청크를 하나로 합칠지 여부
+            (n_results * DUPLICATE_OVERSAMPLE개를 찾아 합친 뒤 n_results개 반환, 합쳐진 위치는 'duplicate_paths'.
+            합친 결과가 모자라면 DUPLICATE_MAX_OVERSAMPLE배까지 후보를 늘려 다시 검색)
+
+    Returns:
+        Dict[str, Any]: collection.query 형식의 결과 ('ids', 'documents', 'metadatas', 'distances')
+    """
+    if collapse:
+        oversample = DUPLICATE_OVERSAMPLE
+        while True:
+            results = query_collection(collection, embedding, n_results * oversample)
+            collapsed = collapse_duplicates(results, n_results)
+            found = len((results.get('ids') or [[]])[0])
+            if (len((collapsed.get('ids') or [[]])[0]) >= n_results or found < n_results * oversample
+                    or oversample >= DUPLICATE_MAX_OVERSAMPLE):
+                return collapsed
+            oversample *= 2
+
+    config = get_vector_config(collection)
+    if config['mode'] != 'compact':
+        return collection.query(query_embeddings=[embedding], n_results=n_results)
+
+    short_query = shorten(embedding, config['dimensions']).tolist()
+    results = collection.query(query_embeddings=[short_query], n_results=n_results * RERANK_OVERSAMPLE)
+    ids = (results.get('ids') or [[]])[0]
+    if not ids:
+        return results
+
+    store = get_rerank_store()
+    full_vectors = store.get_many(collection.name, ids) if store else {}
+    query = np.asarray(embedding, dtype=np.float32)
+    query /= np.linalg.norm(query) or 1.0
+    distances = list(results['distances'][0])
+    for position, chunk_id in enumerate(ids):
+        vector = full_vectors.get(chunk_id)
+        if vector is not None:
+            # 정규화 벡터의 제곱 L2 거리 = 2 - 2 * 코사인 유사도 (ChromaDB 기본 거리와 같은 척도)
+            distances[position] = float(2 - 2 * np.dot(query, vector) / (np.linalg.norm(vector) or 1.0))
+
+    order = sorted(range(len(ids)), key=lambda position: distances[position])[:n_results]
+    reranked = {'distances': [[distances[position] for position in order]]}
+    for key in ('ids', 'documents', 'metadatas'):
+        if results.get(key):
+            reranked[key] = [[results[key][0][position] for position in order]]
+    return reranked
+
+
+_default_store: Optional[RerankVectorStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_rerank_store() -> Optional[RerankVectorStore]:
+    """
+    프로세스 공용 re-rank 벡터 저장소를 반환 (최초 호출 시 생성)
+
+    Returns:
+        Optional[RerankVectorStore]: 저장소 객체 또는 None (파일을 열 수 없는 경우)
+    """
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            try:
+                _default_store = RerankVectorStore()
+            except Exception as e:
+                print(f"[WARNING] re-rank 벡터 저장소 초기화 실패: {e}")
+                return None
+        return _default_store
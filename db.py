@@ -14,6 +14,9 @@ DB_PASSWORD = os.environ.get('DB_PASSWORD')
 DB_NAME = os.environ.get('DB_NAME')
 DB_PORT = int(os.environ.get('DB_PORT', 3306))
 
+# 이 시간 동안 갱신되지 않은 분석 작업은 중단된 것으로 보고 벡터 인덱스 참조에서 제외 (초)
+ACTIVE_JOB_SECONDS = 300
+
 def get_db_connection():
     """데이터베이스 연결을 반환하는 함수"""
     try:
@@ -98,6 +101,30 @@ def init_db():
             )
             ''')
             
+            # 저장소 분석 작업 테이블 (백그라운드 분석 작업 상태)
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS analysis_jobs (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                job_id VARCHAR(255) NOT NULL UNIQUE,
+                user_id INT NOT NULL,
+                session_id VARCHAR(255) NOT NULL,
+                repo_url VARCHAR(255),
+                status VARCHAR(50) NOT NULL DEFAULT 'queued',
+                stage VARCHAR(50),
+                progress INT DEFAULT 0,
+                message TEXT,
+                error TEXT,
+                cancel_requested BOOLEAN DEFAULT FALSE,
+                index_name VARCHAR(255),
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+                INDEX idx_job_session (session_id),
+                INDEX idx_job_user (user_id),
+                INDEX idx_job_index (index_name)
+            )
+            ''')
+            
             # 필요한 경우 ALTER TABLE 명령으로 기존 테이블에 컬럼 추가
             try:
                 # name 컬럼 추가 (IF NOT EXISTS 문법은 MySQL에서 지원하지 않으므로 예외 처리로 관리)
@@ -140,6 +167,58 @@ def init_db():
                     else:
                         raise column_error
                 
+                # index_name 컬럼 추가 (세션이 참조하는 공유 벡터 인덱스 이름)
+                try:
+                    cursor.execute("ALTER TABLE sessions ADD COLUMN index_name VARCHAR(255)")
+                    print("[INFO] sessions 테이블에 index_name 컬럼 추가됨")
+                except Exception as column_error:
+                    if "Duplicate column" in str(column_error):
+                        print("[INFO] index_name 컬럼이 이미 존재합니다.")
+                    else:
+                        raise column_error
+
+                # index_name 인덱스 추가 (인덱스 참조 수 조회용)
+                try:
+                    cursor.execute("ALTER TABLE sessions ADD INDEX idx_index_name (index_name)")
+                    print("[INFO] sessions 테이블에 idx_index_name 인덱스 추가됨")
+                except Exception as index_error:
+                    if "Duplicate key name" in str(index_error):
+                        print("[INFO] idx_index_name 인덱스가 이미 존재합니다.")
+                    else:
+                        raise index_error
+
+                # cancel_requested 컬럼 추가 (다른 프로세스에서 실행 중인 분석 작업 취소 요청)
+                try:
+                    cursor.execute("ALTER TABLE analysis_jobs ADD COLUMN cancel_requested BOOLEAN DEFAULT FALSE")
+                    print("[INFO] analysis_jobs 테이블에 cancel_requested 컬럼 추가됨")
+                except Exception as column_error:
+                    if "Duplicate column" in str(column_error):
+                        print("[INFO] cancel_requested 컬럼이 이미 존재합니다.")
+                    else:
+                        raise column_error
+
+                # index_name 컬럼 추가 (작업이 만들거나 재사용하는 벡터 인덱스, 진행 중에는 참조로 계산)
+                try:
+                    cursor.execute("ALTER TABLE analysis_jobs ADD COLUMN index_name VARCHAR(255)")
+                    print("[INFO] analysis_jobs 테이블에 index_name 컬럼 추가됨")
+                except Exception as column_error:
+                    if "Duplicate column" in str(column_error):
+                        print("[INFO] analysis_jobs index_name 컬럼이 이미 존재합니다.")
+                    else:
+                        raise column_error
+
+                # analysis_jobs 조회용 인덱스 추가 (세션/사용자/벡터 인덱스별 작업 조회)
+                for index_name, column in (('idx_job_session', 'session_id'), ('idx_job_user', 'user_id'),
+                                           ('idx_job_index', 'index_name')):
+                    try:
+                        cursor.execute(f"ALTER TABLE analysis_jobs ADD INDEX {index_name} ({column})")
+                        print(f"[INFO] analysis_jobs 테이블에 {index_name} 인덱스 추가됨")
+                    except Exception as index_error:
+                        if "Duplicate key name" in str(index_error):
+                            print(f"[INFO] {index_name} 인덱스가 이미 존재합니다.")
+                        else:
+                            raise index_error
+
                 # is_google_user 컬럼 추가 (Google 로그인 사용자 구분)
                 try:
                     cursor.execute("ALTER TABLE users ADD COLUMN is_google_user BOOLEAN DEFAULT FALSE")
@@ -367,8 +446,8 @@ def update_last_login(user_id):
     finally:
         conn.close()
 
-def create_session(session_id, user_id, repo_url=None, token=None):
-    """새 세션을 생성하는 함수"""
+def create_session(session_id, user_id, repo_url=None, token=None, index_name=None):
+    """새 세션을 생성하는 함수 (index_name: 세션이 참조할 공유 벡터 인덱스 이름)"""
     conn = get_db_connection()
     if not conn:
         return False
@@ -376,10 +455,10 @@ def create_session(session_id, user_id, repo_url=None, token=None):
     try:
         with conn.cursor() as cursor:
             sql = '''
-            INSERT INTO sessions (session_id, user_id, repo_url, token)
-            VALUES (%s, %s, %s, %s)
+            INSERT INTO sessions (session_id, user_id, repo_url, token, index_name)
+            VALUES (%s, %s, %s, %s, %s)
             '''
-            cursor.execute(sql, (session_id, user_id, repo_url, token))
+            cursor.execute(sql, (session_id, user_id, repo_url, token, index_name))
         conn.commit()
         return True
     except Exception as e:
@@ -455,11 +534,17 @@ def create_new_chat_session(user_id, repo_url, token):
         session_id = str(uuid.uuid4())
         
         with conn.cursor() as cursor:
+            # 같은 레포의 기존 세션이 참조하는 벡터 인덱스를 그대로 참조
+            sql = "SELECT index_name FROM sessions WHERE user_id = %s AND repo_url = %s ORDER BY created_at ASC LIMIT 1"
+            cursor.execute(sql, (user_id, repo_url))
+            existing = cursor.fetchone()
+            index_name = existing['index_name'] if existing else None
+            
             sql = '''
-            INSERT INTO sessions (session_id, user_id, repo_url, token)
-            VALUES (%s, %s, %s, %s)
+            INSERT INTO sessions (session_id, user_id, repo_url, token, index_name)
+            VALUES (%s, %s, %s, %s, %s)
             '''
-            cursor.execute(sql, (session_id, user_id, repo_url, token))
+            cursor.execute(sql, (session_id, user_id, repo_url, token, index_name))
         conn.commit()
         return session_id
     except Exception as e:
@@ -601,11 +686,13 @@ def delete_session(session_id):
     try:
         with conn.cursor() as cursor:
             # 1. 먼저 해당 세션이 존재하는지 확인
-            sql = "SELECT session_id FROM sessions WHERE session_id = %s"
+            sql = "SELECT session_id, index_name FROM sessions WHERE session_id = %s"
             cursor.execute(sql, (session_id,))
-            if not cursor.fetchone():
+            session_row = cursor.fetchone()
+            if not session_row:
                 print(f"[WARNING] 삭제하려는 세션 {session_id}이 존재하지 않습니다.")
                 return False
+            index_name = session_row.get('index_name')
             
             # 2. 관련 코드 변경 기록 삭제 (있다면)
             try:
@@ -633,6 +720,10 @@ def delete_session(session_id):
         
         conn.commit()
         print(f"[SUCCESS] 세션 {session_id} 삭제 완료")
+        
+        # 5. 마지막 참조 세션이었다면 공유 벡터 인덱스 삭제
+        if index_name:
+            release_repo_index(index_name)
         return True
     except Exception as e:
         import traceback
@@ -650,6 +741,178 @@ def delete_session(session_id):
         except:
             pass
 
+def count_index_references(index_name):
+    """
+    공유 벡터 인덱스를 참조하는 세션 수 + 진행 중인 분석 작업 수를 조회하는 함수 (참조 카운트)
+    분석 작업은 인덱스를 만들거나 재사용한 뒤 세션 행을 저장하므로, 그 사이에도 참조로 계산합니다.
+    (ACTIVE_JOB_SECONDS 동안 갱신되지 않은 작업은 중단된 것으로 보고 제외)
+    """
+    conn = get_db_connection()
+    if not conn:
+        return None
+    
+    try:
+        with conn.cursor() as cursor:
+            sql = "SELECT COUNT(*) AS ref_count FROM sessions WHERE index_name = %s"
+            cursor.execute(sql, (index_name,))
+            session_count = cursor.fetchone()['ref_count']
+            
+            sql = """
+            SELECT COUNT(*) AS ref_count FROM analysis_jobs
+            WHERE index_name = %s AND status IN ('queued', 'running')
+              AND updated_at >= NOW() - INTERVAL %s SECOND
+            """
+            cursor.execute(sql, (index_name, ACTIVE_JOB_SECONDS))
+            return session_count + cursor.fetchone()['ref_count']
+    except Exception as e:
+        print(f"[ERROR] 벡터 인덱스 참조 수 조회 오류: {e}")
+        return None
+    finally:
+        conn.close()
+
+def release_repo_index(index_name):
+    """
+    참조하는 세션/진행 중인 분석 작업이 더 이상 없으면 공유 벡터 인덱스를 삭제하는 함수
+    같은 인덱스를 만들거나 재사용하는 분석과 겹치지 않도록 인덱스 빌드 잠금 안에서 세고 삭제합니다.
+    """
+    from github_analyzer import drop_repo_index, get_index_build_lock
+    
+    with get_index_build_lock(index_name):
+        ref_count = count_index_references(index_name)
+        if ref_count is None:
+            # 참조 수를 확인할 수 없으면 다른 세션이 쓰고 있을 수 있으므로 삭제하지 않음
+            return False
+        if ref_count > 0:
+            print(f"[DEBUG] 벡터 인덱스 {index_name}를 참조하는 세션/작업 {ref_count}개 남음")
+            return False
+        
+        return drop_repo_index(index_name)
+
+def update_repo_sessions_index(user_id, repo_url, index_name):
+    """사용자의 같은 레포 세션들이 참조하는 벡터 인덱스를 변경하는 함수 (이전 인덱스 이름 목록 반환)"""
+    conn = get_db_connection()
+    if not conn:
+        return None
+    
+    try:
+        with conn.cursor() as cursor:
+            sql = "SELECT DISTINCT index_name FROM sessions WHERE user_id = %s AND repo_url = %s"
+            cursor.execute(sql, (user_id, repo_url))
+            previous = [row['index_name'] for row in cursor.fetchall() if row['index_name'] and row['index_name'] != index_name]
+            
+            sql = "UPDATE sessions SET index_name = %s WHERE user_id = %s AND repo_url = %s"
+            cursor.execute(sql, (index_name, user_id, repo_url))
+        conn.commit()
+        return previous
+    except Exception as e:
+        print(f"[ERROR] 세션 벡터 인덱스 변경 오류: {e}")
+        return None
+    finally:
+        conn.close()
+
+def create_analysis_job(job_id, user_id, session_id, repo_url):
+    """저장소 분석 작업을 등록하는 함수"""
+    conn = get_db_connection()
+    if not conn:
+        return False
+    
+    try:
+        with conn.cursor() as cursor:
+            sql = '''
+            INSERT INTO analysis_jobs (job_id, user_id, session_id, repo_url, status)
+            VALUES (%s, %s, %s, %s, 'queued')
+            '''
+            cursor.execute(sql, (job_id, user_id, session_id, repo_url))
+        conn.commit()
+        return True
+    except Exception as e:
+        print(f"[ERROR] 분석 작업 등록 오류: {e}")
+        return False
+    finally:
+        conn.close()
+
+def update_analysis_job(job_id, status=None, stage=None, progress=None, message=None, error=None, index_name=None):
+    """저장소 분석 작업의 상태/진행 단계/사용하는 벡터 인덱스를 갱신하는 함수 (None인 값은 변경하지 않음)"""
+    conn = get_db_connection()
+    if not conn:
+        return False
+    
+    try:
+        fields = {'status': status, 'stage': stage, 'progress': progress, 'message': message, 'error': error,
+                  'index_name': index_name}
+        updates = {key: value for key, value in fields.items() if value is not None}
+        if not updates:
+            return True
+        
+        with conn.cursor() as cursor:
+            set_clause = ', '.join(f"{key} = %s" for key in updates)
+            sql = f"UPDATE analysis_jobs SET {set_clause} WHERE job_id = %s"
+            cursor.execute(sql, list(updates.values()) + [job_id])
+        conn.commit()
+        return True
+    except Exception as e:
+        print(f"[ERROR] 분석 작업 갱신 오류: {e}")
+        return False
+    finally:
+        conn.close()
+
+def request_analysis_job_cancel(job_id):
+    """저장소 분석 작업에 취소 요청을 기록하는 함수 (이미 종료된 작업이면 False)"""
+    conn = get_db_connection()
+    if not conn:
+        return False
+    
+    try:
+        with conn.cursor() as cursor:
+            sql = """
+            UPDATE analysis_jobs SET cancel_requested = TRUE
+            WHERE job_id = %s AND status NOT IN ('completed', 'failed', 'cancelled')
+            """
+            cursor.execute(sql, (job_id,))
+            requested = cursor.rowcount > 0
+        conn.commit()
+        return requested
+    except Exception as e:
+        print(f"[ERROR] 분석 작업 취소 요청 오류: {e}")
+        return False
+    finally:
+        conn.close()
+
+def is_analysis_job_cancel_requested(job_id):
+    """저장소 분석 작업에 취소 요청이 기록되어 있는지 확인하는 함수"""
+    conn = get_db_connection()
+    if not conn:
+        return False
+    
+    try:
+        with conn.cursor() as cursor:
+            sql = "SELECT cancel_requested FROM analysis_jobs WHERE job_id = %s"
+            cursor.execute(sql, (job_id,))
+            row = cursor.fetchone()
+            return bool(row and row['cancel_requested'])
+    except Exception as e:
+        print(f"[ERROR] 분석 작업 취소 요청 조회 오류: {e}")
+        return False
+    finally:
+        conn.close()
+
+def get_analysis_job(job_id):
+    """저장소 분석 작업 정보를 조회하는 함수"""
+    conn = get_db_connection()
+    if not conn:
+        return None
+    
+    try:
+        with conn.cursor() as cursor:
+            sql = "SELECT * FROM analysis_jobs WHERE job_id = %s"
+            cursor.execute(sql, (job_id,))
+            return cursor.fetchone()
+    except Exception as e:
+        print(f"[ERROR] 분석 작업 조회 오류: {e}")
+        return None
+    finally:
+        conn.close()
+
 def get_analyzed_repositories(user_id):
     """사용자가 분석한 모든 레포지토리 목록을 가져오는 함수"""
     conn = get_db_connection()
@@ -755,7 +1018,8 @@ def get_session_data_from_db(session_id):
                 'repo_url': session_info.get('repo_url'),
                 'token': session_info.get('token'),
                 'github_token': session_info.get('token'),  # GitHub 토큰도 같이 제공
-                'user_id': session_info.get('user_id')
+                'user_id': session_info.get('user_id'),
+                'index_name': session_info.get('index_name')  # 참조하는 벡터 인덱스 (없으면 repo_{session_id})
             }
             
             # 파일 데이터 추가
@@ -0,0 +1,170 @@
+"""
+청크 임베딩 영구 캐시 모듈
+
+같은 청크 텍스트를 같은 모델로 다시 임베딩하지 않도록
+(모델명, 청크 텍스트의 sha256) 키로 임베딩 벡터를 SQLite에 저장합니다.
+세션/저장소와 무관한 내용 주소(content-addressed) 캐시이므로
+다른 세션에서 같은 파일을 분석해도 캐시가 재사용됩니다.
+
+주요 클래스:
+    - EmbeddingCache: 크기 제한(LRU 방출)이 있는 디스크 기반 임베딩 캐시
+"""
+
+import os
+import sqlite3
+import hashlib
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional
+
+# ----------------- 상수 정의 -----------------
+EMBEDDING_CACHE_PATH = "./embedding_cache/embeddings.sqlite3"
+EMBEDDING_CACHE_MAX_ENTRIES = 50000  # text-embedding-3-large(3072차원, float32) 기준 약 600MB
+
+
+def hash_text(text: str) -> str:
+    """청크 텍스트의 sha256 해시 (캐시 키)"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    (모델, 텍스트 해시) -> 임베딩 벡터를 저장하는 디스크 캐시
+
+    벡터는 float32 바이트로 저장하고, 조회 시 last_access를 갱신하여
+    max_entries를 넘으면 가장 오래 사용되지 않은 항목부터 삭제합니다.
+    여러 스레드에서 동시에 사용할 수 있도록 내부 잠금을 사용합니다.
+    """
+
+    def __init__(self, db_path: str = EMBEDDING_CACHE_PATH, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        """
+        캐시 초기화
+
+        Args:
+            db_path (str): SQLite 파일 경로
+            max_entries (int): 보관할 최대 항목 수 (초과 시 LRU 방출)
+        """
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings(last_access)")
+        self.conn.commit()
+
+    def get_many(self, model: str, texts: List[str]) -> Dict[int, List[float]]:
+        """
+        여러 텍스트의 캐시된 임베딩을 한 번에 조회
+
+        Args:
+            model (str): 임베딩 모델 이름
+            texts (List[str]): 임베딩할 텍스트 목록
+
+        Returns:
+            Dict[int, List[float]]: {texts 내 인덱스: 임베딩 벡터} (캐시에 있는 항목만 포함)
+        """
+        hashes = [hash_text(t) for t in texts]
+        found = {}
+        with self.lock:
+            unique_hashes = list(set(hashes))
+            # SQLite 바인딩 변수 제한(999)을 넘지 않도록 나누어 조회
+            for start in range(0, len(unique_hashes), 500):
+                part = unique_hashes[start:start + 500]
+                placeholders = ','.join('?' * len(part))
+                rows = self.conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model] + part
+                ).fetchall()
+                for text_hash, blob in rows:
+                    vector = array('f')
+                    vector.frombytes(blob)
+                    found[text_hash] = vector.tolist()
+
+            if found:
+                now = time.time()
+                self.conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, h) for h in found]
+                )
+                self.conn.commit()
+
+        return {i: found[h] for i, h in enumerate(hashes) if h in found}
+
+    def put_many(self, model: str, texts: List[str], vectors: List[List[float]]):
+        """
+        텍스트별 임베딩을 캐시에 저장하고 크기 제한을 넘으면 오래된 항목을 방출
+
+        Args:
+            model (str): 임베딩 모델 이름
+            texts (List[str]): 임베딩한 텍스트 목록
+            vectors (List[List[float]]): texts와 같은 순서의 임베딩 벡터
+        """
+        if not texts:
+            return
+        now = time.time()
+        rows = [
+            (model, hash_text(text), len(vector), array('f', vector).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, dim, vector, last_access) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        """max_entries를 넘는 만큼 last_access가 가장 오래된 항목 삭제 (잠금 안에서 호출)"""
+        count = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self.conn.execute(
+                "DELETE FROM embeddings WHERE rowid IN "
+                "(SELECT rowid FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+                (overflow,)
+            )
+            print(f"[DEBUG] 임베딩 캐시 LRU 방출: {overflow}개")
+
+    def close(self):
+        """DB 연결 종료"""
+        with self.lock:
+            self.conn.close()
+
+
+_default_cache: Optional[EmbeddingCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """
+    프로세스 공용 임베딩 캐시를 반환 (최초 호출 시 생성)
+
+    Returns:
+        Optional[EmbeddingCache]: 캐시 객체 또는 None (캐시 파일을 열 수 없는 경우)
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            try:
+                _default_cache = EmbeddingCache()
+            except Exception as e:
+                print(f"[WARNING] 임베딩 캐시 초기화 실패 (캐시 없이 진행): {e}")
+                return None
+        return _default_cache
@@ -0,0 +1,239 @@
+"""
+임베딩 제공자(provider) 모듈
+
+인덱스 빌드와 질문 임베딩이 OpenAI 임베딩 API에 고정되지 않도록 제공자 인터페이스를 둡니다.
+컬렉션은 생성 시 메타데이터('embedding_provider', 'embedding_model', 'embedding_dimensions')에
+어떤 제공자로 만들었는지 기록하며, 질문 임베딩은 항상 컬렉션에 기록된 제공자로 만듭니다.
+메타데이터가 없는 기존 컬렉션은 OpenAI text-embedding-3-large(3072차원)로 취급합니다.
+
+제공자:
+    - openai: OpenAI 임베딩 API (EmbeddingScheduler로 동시성/호출 제한 관리)
+    - hashing: 프로세스 안에서 식별자/단어를 해싱하여 만드는 CPU 임베딩 (네트워크/API 키 불필요)
+      테스트나 외부 접속이 없는 환경에서 지연 없이 색인/검색할 때 사용합니다.
+
+주요 함수:
+    - get_embedding_provider: 이름/모델/차원으로 제공자 조회 (기본값: EMBEDDING_PROVIDER)
+    - get_collection_provider: 컬렉션을 만든 제공자 조회
+    - embed_query: 컬렉션과 같은 제공자로 질문 임베딩 생성
+"""
+
+import abc
+import asyncio
+import os
+import re
+import math
+import zlib
+import collections
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+import openai
+
+from embedding_scheduler import EmbeddingScheduler
+
+# ----------------- 상수 정의 -----------------
+EMBEDDING_PROVIDER = os.environ.get('EMBEDDING_PROVIDER', 'openai')  # 새 인덱스를 만들 때 사용할 제공자
+OPENAI_EMBEDDING_MODEL = "text-embedding-3-large"
+OPENAI_EMBEDDING_DIMENSIONS = 3072
+HASHING_EMBEDDING_MODEL = "hashing-v1"
+HASHING_EMBEDDING_DIMENSIONS = int(os.environ.get('HASHING_EMBEDDING_DIMENSIONS', 1024))
+LOCAL_EMBEDDING_WORKERS = int(os.environ.get('LOCAL_EMBEDDING_WORKERS', os.cpu_count() or 1))  # 로컬 임베딩 스레드 수
+
+# 식별자/단어/숫자/한글 토큰 (camelCase, snake_case는 하위 단어로도 나눔)
+TOKEN_PATTERN = re.compile(r'[A-Za-z_][A-Za-z0-9_]*|[0-9]+|[가-힣]+')
+SUBWORD_PATTERN = re.compile(r'[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+')
+
+
+class EmbeddingProvider(abc.ABC):
+    """
+    임베딩 제공자 기본 클래스 (embed / open_scheduler를 구현해야 인스턴스를 만들 수 있음)
+
+    Attributes:
+        name (str): 제공자 이름 (컬렉션 메타데이터에 기록)
+        model (str): 모델 이름 (임베딩 캐시 키에도 사용)
+        dimensions (int): 임베딩 차원 수
+        remote (bool): 외부 API를 호출하는지 여부 (API 호출 수 집계용)
+        cacheable (bool): 임베딩 캐시에 저장할 가치가 있는지 여부 (로컬 계산은 캐시보다 빠름)
+        shortenable (bool): 앞쪽 차원만 잘라 써도 되는 임베딩인지 여부 (compact 저장 방식 사용 가능)
+    """
+
+    name = ''
+    model = ''
+    dimensions = 0
+    remote = False
+    cacheable = False
+    shortenable = False
+
+    @property
+    def signature(self) -> tuple:
+        """같은 벡터 공간인지 비교하기 위한 (제공자, 모델, 차원)"""
+        return (self.name, self.model, self.dimensions)
+
+    def collection_metadata(self) -> Dict[str, Any]:
+        """컬렉션 생성 시 메타데이터에 기록할 제공자 정보"""
+        return {'embedding_provider': self.name, 'embedding_model': self.model,
+                'embedding_dimensions': self.dimensions}
+
+    @abc.abstractmethod
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """텍스트 목록을 임베딩 (동기 호출, 질문 임베딩/재시도용)"""
+
+    @abc.abstractmethod
+    def open_scheduler(self):
+        """
+        인덱스 빌드 파이프라인용 스케줄러를 여는 비동기 컨텍스트 매니저
+        (EmbeddingScheduler의 acquire/release/create 인터페이스를 제공)
+        """
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """OpenAI 임베딩 API 제공자"""
+
+    name = 'openai'
+    remote = True
+    cacheable = True
+    shortenable = True  # text-embedding-3 계열은 앞쪽 차원만 잘라 다시 정규화해도 됨
+
+    def __init__(self, model: str = OPENAI_EMBEDDING_MODEL, dimensions: int = OPENAI_EMBEDDING_DIMENSIONS):
+        self.model = model
+        self.dimensions = dimensions
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        response = openai.embeddings.create(input=texts, model=self.model)
+        return [item.embedding for item in response.data]
+
+    @asynccontextmanager
+    async def open_scheduler(self):
+        # 재시도/호출 제한 대기는 스케줄러가 직접 처리 (429를 관측해야 동시 요청 수를 조절할 수 있음)
+        async with openai.AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"), max_retries=0) as client:
+            yield EmbeddingScheduler(client, self.model)
+
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """
+    특성 해싱(feature hashing) 기반 로컬 임베딩 제공자
+
+    식별자 전체와 camelCase/snake_case 하위 단어, 인접 토큰 쌍을 crc32로 해싱하여
+    고정 차원 벡터의 부호 있는 칸에 (1 + log tf) 가중치로 더하고 L2 정규화합니다.
+    crc32는 프로세스와 무관하게 같은 값을 주므로 색인과 질문이 다른 프로세스여도 같은 벡터가 됩니다.
+    의미 유사도는 학습된 모델보다 떨어지지만 코드 식별자 일치에는 잘 반응합니다.
+    """
+
+    name = 'hashing'
+    remote = False
+    cacheable = False
+    shortenable = False
+
+    def __init__(self, model: str = HASHING_EMBEDDING_MODEL, dimensions: int = HASHING_EMBEDDING_DIMENSIONS):
+        self.model = model
+        self.dimensions = dimensions
+
+    def features(self, text: str) -> collections.Counter:
+        """텍스트의 해싱 특성 빈도"""
+        counts = collections.Counter()
+        previous = None
+        for token in TOKEN_PATTERN.findall(text):
+            lowered = token.lower()
+            counts[lowered] += 1
+            subwords = [part.lower() for part in SUBWORD_PATTERN.findall(token)]
+            if len(subwords) > 1:
+                counts.update(subwords)
+            if previous is not None:
+                counts[f"{previous} {lowered}"] += 1
+            previous = lowered
+        return counts
+
+    def embed_one(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        for feature, count in self.features(text).items():
+            hashed = zlib.crc32(feature.encode('utf-8'))
+            weight = 1.0 + math.log(count)
+            # 하위 비트로 칸을, 최상위 비트로 부호를 정함 (해시 충돌 편향 상쇄)
+            vector[hashed % self.dimensions] += -weight if hashed & 0x80000000 else weight
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_one(text) for text in texts]
+
+    @asynccontextmanager
+    async def open_scheduler(self):
+        # 로컬 계산은 호출 제한이 없으므로 스레드 수만큼 고정 동시성으로 실행
+        workers = max(1, LOCAL_EMBEDDING_WORKERS)
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='local-embedding')
+        try:
+            yield EmbeddingScheduler(LocalEmbeddingClient(self, executor), self.model,
+                                     initial_concurrency=workers, min_concurrency=workers, max_concurrency=workers)
+        finally:
+            executor.shutdown(wait=False)
+
+
+class LocalEmbeddingClient:
+    """
+    로컬 제공자를 EmbeddingScheduler에서 쓸 수 있도록 AsyncOpenAI의 embeddings.create 형식으로 감싼 클라이언트
+    배치 임베딩은 스레드 풀에서 실행하여 이벤트 루프를 막지 않습니다.
+    """
+
+    def __init__(self, provider: EmbeddingProvider, executor: ThreadPoolExecutor):
+        self.provider = provider
+        self.executor = executor
+        self.embeddings = self
+
+    async def create(self, input: List[str], model: str):
+        loop = asyncio.get_running_loop()
+        vectors = await loop.run_in_executor(self.executor, self.provider.embed, input)
+        return SimpleNamespace(data=[SimpleNamespace(embedding=vector) for vector in vectors])
+
+
+PROVIDER_CLASSES = {
+    'openai': OpenAIEmbeddingProvider,
+    'hashing': HashingEmbeddingProvider,
+}
+
+_providers: Dict[tuple, EmbeddingProvider] = {}
+_providers_lock = threading.Lock()
+
+
+def get_embedding_provider(name: Optional[str] = None, model: Optional[str] = None,
+                           dimensions: Optional[int] = None) -> EmbeddingProvider:
+    """
+    이름/모델/차원으로 제공자 조회 (같은 설정은 같은 객체를 재사용)
+
+    Args:
+        name (Optional[str]): 제공자 이름 (기본값: EMBEDDING_PROVIDER)
+        model (Optional[str]): 모델 이름 (기본값: 제공자 기본 모델)
+        dimensions (Optional[int]): 차원 수 (기본값: 제공자 기본 차원)
+
+    Raises:
+        ValueError: 알 수 없는 제공자 이름
+    """
+    name = name or EMBEDDING_PROVIDER
+    if name not in PROVIDER_CLASSES:
+        raise ValueError(f"알 수 없는 임베딩 제공자: {name}")
+    key = (name, model, dimensions)
+    with _providers_lock:
+        if key not in _providers:
+            kwargs = {}
+            if model:
+                kwargs['model'] = model
+            if dimensions:
+                kwargs['dimensions'] = int(dimensions)
+            _providers[key] = PROVIDER_CLASSES[name](**kwargs)
+        return _providers[key]
+
+
+def get_collection_provider(collection) -> EmbeddingProvider:
+    """컬렉션을 만든 제공자 (메타데이터가 없는 기존 컬렉션은 OpenAI text-embedding-3-large)"""
+    metadata = collection.metadata or {}
+    if not metadata.get('embedding_provider'):
+        return get_embedding_provider('openai')
+    return get_embedding_provider(metadata['embedding_provider'], metadata.get('embedding_model'),
+                                  metadata.get('embedding_dimensions'))
+
+
+def embed_query(collection, text: str) -> List[float]:
+    """컬렉션을 만든 제공자로 질문 임베딩 생성 (검색 벡터 공간을 항상 일치시킴)"""
+    return get_collection_provider(collection).embed([text])[0]
@@ -0,0 +1,352 @@
+"""
+임베딩 실패 청크 재시도 큐 모듈
+
+임베딩 API 호출이 끝내 실패한 청크를 0 벡터로 저장하지 않고
+(컬렉션, 청크 ID) 단위로 SQLite에 보관했다가 백그라운드에서 다시 임베딩합니다.
+재시도는 지수 백오프로 간격을 늘리고, 여러 청크 묶음이 실패하면 반으로 나누어(bisection)
+문제가 되는 청크만 남도록 좁혀 갑니다. 재시도 대기 중인 청크가 남아 있는 인덱스는
+'일부만 색인됨(partial)' 상태로 표시됩니다.
+
+주요 클래스:
+    - EmbeddingRetryQueue: 실패 청크를 보관하고 재시도 시점/분할을 관리하는 디스크 큐
+    - EmbeddingRetryWorker: 재시도 기한이 된 묶음을 주기적으로 다시 임베딩하는 백그라운드 스레드
+"""
+
+import os
+import json
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+# ----------------- 상수 정의 -----------------
+EMBEDDING_RETRY_QUEUE_PATH = "./embedding_cache/retry_queue.sqlite3"
+RETRY_MAX_ATTEMPTS = 8  # 청크 하나가 이 횟수만큼 실패하면 더 이상 재시도하지 않음 (failed 상태)
+RETRY_BACKOFF_BASE = 30.0  # 첫 재시도 대기 시간 (초)
+RETRY_BACKOFF_MAX = 3600.0  # 재시도 대기 시간 상한 (초)
+RETRY_POLL_INTERVAL = 10.0  # 백그라운드 작업자가 재시도 기한을 확인하는 간격 (초)
+RETRY_BATCHES_PER_POLL = 20  # 한 번 확인할 때 처리하는 최대 묶음 수
+
+
+def retry_delay(attempts: int) -> float:
+    """attempts번 실패한 묶음의 다음 재시도까지 대기 시간 (지수 백오프 + 지터)"""
+    delay = min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * (2 ** max(0, attempts - 1)))
+    return delay * random.uniform(0.8, 1.2)
+
+
+class EmbeddingRetryQueue:
+    """
+    임베딩에 실패한 청크를 보관하는 디스크 큐
+
+    청크는 묶음(batch_id) 단위로 재시도하며, 묶음이 다시 실패하면 두 묶음으로 나누어
+    다음 재시도에서 실패 원인이 된 청크를 좁혀 갑니다. 같은 (컬렉션, 청크 ID)는 한 번만 보관합니다.
+    여러 스레드에서 동시에 사용할 수 있도록 내부 잠금을 사용합니다.
+    """
+
+    def __init__(self, db_path: str = EMBEDDING_RETRY_QUEUE_PATH):
+        """
+        큐 초기화
+
+        Args:
+            db_path (str): SQLite 파일 경로
+        """
+        self.db_path = db_path
+        self.lock = threading.Lock()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS retry_chunks (
+                collection_name TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                path TEXT NOT NULL,
+                document TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                batch_id TEXT NOT NULL,
+                attempts INTEGER NOT NULL,
+                next_attempt_at REAL NOT NULL,
+                status TEXT NOT NULL,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (collection_name, chunk_id)
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_retry_chunks_due ON retry_chunks(status, next_attempt_at)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_retry_chunks_batch ON retry_chunks(batch_id)")
+        self.conn.commit()
+
+    def enqueue(self, collection_name: str, ids: List[str], documents: List[str],
+                metadatas: List[Dict[str, Any]], error: str = ''):
+        """
+        임베딩에 실패한 청크 묶음을 큐에 추가 (이미 1회 실패한 것으로 보고 백오프 후 재시도)
+
+        Args:
+            collection_name (str): 청크를 저장할 컬렉션 이름
+            ids (List[str]): 청크 ID 목록
+            documents (List[str]): 청크 텍스트 목록
+            metadatas (List[Dict[str, Any]]): 청크 메타데이터 목록
+            error (str): 실패 사유
+        """
+        if not ids:
+            return
+        now = time.time()
+        batch_id = uuid.uuid4().hex
+        next_attempt_at = now + retry_delay(1)
+        rows = [
+            (collection_name, chunk_id, metadata.get('path', ''), document, json.dumps(metadata, ensure_ascii=False),
+             batch_id, 1, next_attempt_at, 'pending', error[:500], now)
+            for chunk_id, document, metadata in zip(ids, documents, metadatas)
+        ]
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO retry_chunks (collection_name, chunk_id, path, document, metadata, "
+                "batch_id, attempts, next_attempt_at, status, last_error, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self.conn.commit()
+        print(f"[INFO] 임베딩 재시도 큐에 추가: {collection_name} {len(ids)}개 청크")
+
+    def due_batches(self, limit: int = RETRY_BATCHES_PER_POLL) -> List[Dict[str, Any]]:
+        """
+        재시도 기한이 된 묶음 목록 (오래 기다린 묶음부터)
+
+        Returns:
+            List[Dict[str, Any]]: {'batch_id', 'collection_name', 'attempts', 'ids', 'documents', 'metadatas'} 목록
+        """
+        with self.lock:
+            batch_ids = [row[0] for row in self.conn.execute(
+                "SELECT batch_id FROM retry_chunks WHERE status = 'pending' AND next_attempt_at <= ? "
+                "GROUP BY batch_id ORDER BY MIN(next_attempt_at) LIMIT ?",
+                (time.time(), limit)
+            ).fetchall()]
+            batches = []
+            for batch_id in batch_ids:
+                rows = self.conn.execute(
+                    "SELECT collection_name, chunk_id, document, metadata, attempts FROM retry_chunks "
+                    "WHERE batch_id = ? AND status = 'pending' ORDER BY rowid",
+                    (batch_id,)
+                ).fetchall()
+                if not rows:
+                    continue
+                batches.append({
+                    'batch_id': batch_id,
+                    'collection_name': rows[0][0],
+                    'attempts': max(row[4] for row in rows),
+                    'ids': [row[1] for row in rows],
+                    'documents': [row[2] for row in rows],
+                    'metadatas': [json.loads(row[3]) for row in rows],
+                })
+        return batches
+
+    def complete(self, collection_name: str, ids: List[str]):
+        """재시도에 성공한 청크를 큐에서 제거"""
+        with self.lock:
+            self.conn.executemany(
+                "DELETE FROM retry_chunks WHERE collection_name = ? AND chunk_id = ?",
+                [(collection_name, chunk_id) for chunk_id in ids]
+            )
+            self.conn.commit()
+
+    def fail(self, batch: Dict[str, Any], error: str, transient: bool = True):
+        """
+        재시도에 실패한 묶음을 다시 예약
+
+        여러 청크 묶음은 반으로 나누어 각각 다시 예약합니다 (실패 원인 청크 격리).
+        일시적 오류가 아니면(요청 자체가 거부됨) 나눈 묶음을 바로 재시도하고,
+        청크 하나짜리 묶음이 거부되거나 RETRY_MAX_ATTEMPTS번 실패하면 failed 상태로 남겨 더 이상 재시도하지 않습니다.
+
+        Args:
+            batch (Dict[str, Any]): due_batches가 반환한 묶음
+            error (str): 실패 사유
+            transient (bool): 호출 제한/네트워크 오류처럼 시간이 지나면 성공할 수 있는 오류인지 여부
+        """
+        attempts = batch['attempts'] + 1
+        ids = batch['ids']
+        now = time.time()
+        error = error[:500]
+
+        with self.lock:
+            if len(ids) == 1 and (attempts > RETRY_MAX_ATTEMPTS or not transient):
+                self.conn.execute(
+                    "UPDATE retry_chunks SET status = 'failed', attempts = ?, last_error = ? "
+                    "WHERE collection_name = ? AND chunk_id = ?",
+                    (attempts, error, batch['collection_name'], ids[0])
+                )
+                print(f"[WARNING] 임베딩 재시도 포기: {batch['collection_name']} {ids[0]} ({error})")
+            else:
+                next_attempt_at = now + (retry_delay(attempts) if transient else 0)
+                half = (len(ids) + 1) // 2
+                parts = [ids[:half], ids[half:]] if len(ids) > 1 else [ids]
+                for part in parts:
+                    if not part:
+                        continue
+                    batch_id = uuid.uuid4().hex
+                    self.conn.executemany(
+                        "UPDATE retry_chunks SET batch_id = ?, attempts = ?, next_attempt_at = ?, last_error = ? "
+                        "WHERE collection_name = ? AND chunk_id = ?",
+                        [(batch_id, attempts, next_attempt_at, error, batch['collection_name'], chunk_id) for chunk_id in part]
+                    )
+            self.conn.commit()
+
+    def pending_counts(self, collection_name: str) -> Dict[str, int]:
+        """
+        컬렉션의 재시도 대기/실패 청크 수
+
+        Returns:
+            Dict[str, int]: {'pending': 재시도 대기 중, 'failed': 재시도 포기}
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT status, COUNT(*) FROM retry_chunks WHERE collection_name = ? GROUP BY status",
+                (collection_name,)
+            ).fetchall()
+        counts = {'pending': 0, 'failed': 0}
+        counts.update({status: count for status, count in rows})
+        return counts
+
+    def discard(self, collection_name: str, paths: Optional[List[str]] = None):
+        """
+        컬렉션(또는 컬렉션의 지정 파일)의 재시도 항목 삭제 (컬렉션 삭제/파일 재임베딩 시)
+
+        Args:
+            collection_name (str): 컬렉션 이름
+            paths (Optional[List[str]]): 삭제할 파일 경로 목록 (None이면 컬렉션 전체)
+        """
+        with self.lock:
+            if paths is None:
+                self.conn.execute("DELETE FROM retry_chunks WHERE collection_name = ?", (collection_name,))
+            else:
+                self.conn.executemany(
+                    "DELETE FROM retry_chunks WHERE collection_name = ? AND path = ?",
+                    [(collection_name, path) for path in paths]
+                )
+            self.conn.commit()
+
+    def copy(self, source_collection: str, target_collection: str, paths: List[str]):
+        """
+        다른 컬렉션의 재시도 대기 항목 중 지정 파일의 청크를 새 컬렉션으로 복사
+        (변경 없는 파일을 새 커밋 인덱스로 옮길 때 아직 임베딩되지 않은 청크도 함께 옮김)
+        """
+        if not paths:
+            return
+        with self.lock:
+            path_set = set(paths)
+            rows = [
+                row for row in self.conn.execute(
+                    "SELECT chunk_id, path, document, metadata, batch_id, attempts, next_attempt_at, status, last_error, created_at "
+                    "FROM retry_chunks WHERE collection_name = ?",
+                    (source_collection,)
+                ).fetchall()
+                if row[1] in path_set
+            ]
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO retry_chunks (collection_name, chunk_id, path, document, metadata, "
+                "batch_id, attempts, next_attempt_at, status, last_error, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(target_collection, row[0], row[1], row[2], row[3], f"{row[4]}_{target_collection}") + row[5:] for row in rows]
+            )
+            self.conn.commit()
+        if rows:
+            print(f"[DEBUG] 임베딩 재시도 항목 복사: {source_collection} -> {target_collection} {len(rows)}개 청크")
+
+    def has_pending(self) -> bool:
+        """재시도 대기 중인 청크가 하나라도 있는지 여부"""
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM retry_chunks WHERE status = 'pending' LIMIT 1").fetchone() is not None
+
+    def close(self):
+        """DB 연결 종료"""
+        with self.lock:
+            self.conn.close()
+
+
+class EmbeddingRetryWorker:
+    """
+    재시도 기한이 된 묶음을 주기적으로 다시 임베딩하는 백그라운드 스레드
+
+    실제 임베딩/저장은 생성 시 받은 함수에 맡기므로 이 모듈은 OpenAI/ChromaDB에 의존하지 않습니다.
+    """
+
+    def __init__(self, queue: EmbeddingRetryQueue, process_batch: Callable[[Dict[str, Any]], None],
+                 is_transient: Callable[[Exception], bool], poll_interval: float = RETRY_POLL_INTERVAL):
+        """
+        작업자 초기화
+
+        Args:
+            queue (EmbeddingRetryQueue): 재시도 큐
+            process_batch: 묶음 하나를 임베딩하여 컬렉션에 저장하는 함수 (실패 시 예외 발생)
+            is_transient: 예외가 일시적 오류(백오프 후 재시도)인지 판별하는 함수
+            poll_interval (float): 재시도 기한 확인 간격 (초)
+        """
+        self.queue = queue
+        self.process_batch = process_batch
+        self.is_transient = is_transient
+        self.poll_interval = poll_interval
+        self.wake_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='embedding-retry', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def wake(self):
+        """대기 중인 작업자를 바로 깨움 (새 항목 추가 시)"""
+        self.wake_event.set()
+
+    def run_once(self) -> int:
+        """
+        재시도 기한이 된 묶음을 한 번 처리
+
+        Returns:
+            int: 재시도에 성공한 청크 수
+        """
+        succeeded = 0
+        for batch in self.queue.due_batches():
+            try:
+                self.process_batch(batch)
+            except Exception as e:
+                print(f"[WARNING] 임베딩 재시도 실패 ({batch['collection_name']}, {len(batch['ids'])}개 청크): {e}")
+                self.queue.fail(batch, str(e), transient=self.is_transient(e))
+                continue
+            self.queue.complete(batch['collection_name'], batch['ids'])
+            succeeded += len(batch['ids'])
+        if succeeded:
+            print(f"[INFO] 임베딩 재시도 성공: {succeeded}개 청크")
+        return succeeded
+
+    def run(self):
+        while True:
+            self.wake_event.wait(self.poll_interval)
+            self.wake_event.clear()
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"[ERROR] 임베딩 재시도 작업자 오류: {e}")
+
+
+_default_queue: Optional[EmbeddingRetryQueue] = None
+_default_queue_lock = threading.Lock()
+
+
+def get_retry_queue() -> Optional[EmbeddingRetryQueue]:
+    """
+    프로세스 공용 임베딩 재시도 큐를 반환 (최초 호출 시 생성)
+
+    Returns:
+        Optional[EmbeddingRetryQueue]: 큐 객체 또는 None (큐 파일을 열 수 없는 경우)
+    """
+    global _default_queue
+    with _default_queue_lock:
+        if _default_queue is None:
+            try:
+                _default_queue = EmbeddingRetryQueue()
+            except Exception as e:
+                print(f"[WARNING] 임베딩 재시도 큐 초기화 실패: {e}")
+                return None
+        return _default_queue
@@ -0,0 +1,280 @@
+"""
+임베딩 요청 스케줄러 모듈
+
+임베딩 배치를 청크 수가 아니라 토큰 예산으로 묶고, 동시에 보내는 요청 수를
+관측한 지연 시간과 429 응답에 따라 AIMD(가산 증가 / 곱셈 감소) 방식으로 조절합니다.
+v1~v6에서 손으로 맞추던 배치 크기/세마포어/요청 간 sleep 대신
+API의 실제 호출 제한(x-ratelimit-* 헤더, retry-after)에 맞춰 속도를 정합니다.
+
+- 성공: 지연 시간이 목표 이하이면 동시 요청 수를 조금씩 늘림 (요청 한 번에 +1/limit)
+- 지연 시간이 목표 초과: 동시 요청 수를 0.75배로 줄임
+- 429: 동시 요청 수를 절반으로 줄이고 retry-after 동안 모든 요청을 멈춘 뒤 재시도
+- 남은 토큰(x-ratelimit-remaining-tokens)이 다음 배치보다 적으면 초기화 시각까지 대기
+
+주요 클래스:
+    - EmbeddingScheduler: 동시성/호출 제한을 관리하며 임베딩 API를 호출
+"""
+
+import asyncio
+import random
+import re
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Optional
+
+import openai
+
+# ----------------- 상수 정의 -----------------
+EMBEDDING_MAX_BATCH_TOKENS = 60000  # 요청 1회에 담을 최대 토큰 수 (API 상한 300,000 토큰보다 작게 유지하여 지연 시간 제한)
+EMBEDDING_MAX_BATCH_ITEMS = 2048  # 요청 1회에 담을 최대 입력 수 (API 상한)
+EMBEDDING_MAX_INPUT_TOKENS = 8000  # 입력 하나의 최대 토큰 수 (API 상한 8191)
+EMBEDDING_INITIAL_CONCURRENCY = 4  # 시작 동시 요청 수
+EMBEDDING_MIN_CONCURRENCY = 1
+EMBEDDING_MAX_CONCURRENCY = 32  # 동시 요청 수 상한 (v4의 Semaphore(100) 교착 재발 방지)
+EMBEDDING_LATENCY_TARGET = 15.0  # 이 시간(초)을 넘는 응답은 과부하로 보고 동시 요청 수를 줄임
+EMBEDDING_MAX_RETRIES = 5  # 429/5xx/타임아웃 재시도 횟수
+EMBEDDING_BACKOFF_BASE = 1.0  # 지수 백오프 시작 대기 시간 (초)
+EMBEDDING_BACKOFF_MAX = 60.0  # 최대 대기 시간 (초)
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """
+    x-ratelimit-reset-* 헤더 형식('1s', '6m0s', '20ms', '1h2m3.5s')을 초 단위로 변환
+
+    Returns:
+        Optional[float]: 초 (형식이 맞지 않으면 None)
+    """
+    if not value:
+        return None
+    parts = re.findall(r'(\d+(?:\.\d+)?)(ms|h|m|s)', value)
+    if not parts:
+        return None
+    unit_seconds = {'h': 3600, 'm': 60, 's': 1, 'ms': 0.001}
+    return sum(float(number) * unit_seconds[unit] for number, unit in parts)
+
+
+def parse_retry_after(headers) -> Optional[float]:
+    """응답 헤더의 retry-after-ms / retry-after(초 또는 HTTP 날짜)를 초 단위로 변환"""
+    if not headers:
+        return None
+    try:
+        retry_after_ms = headers.get('retry-after-ms')
+        if retry_after_ms:
+            return float(retry_after_ms) / 1000
+        retry_after = headers.get('retry-after')
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+class EmbeddingScheduler:
+    """
+    임베딩 API 호출의 동시성과 호출 제한을 관리하는 클래스
+
+    사용 순서: acquire(tokens)로 자리를 얻고 create(texts, tokens)로 호출한 뒤 release()
+    (파이프라인은 자리를 얻은 뒤에만 다음 배치를 큐에서 꺼내므로 메모리 사용량이 제한됨)
+    """
+
+    def __init__(self, client, model: str, initial_concurrency: int = EMBEDDING_INITIAL_CONCURRENCY,
+                 min_concurrency: int = EMBEDDING_MIN_CONCURRENCY, max_concurrency: int = EMBEDDING_MAX_CONCURRENCY,
+                 latency_target: float = EMBEDDING_LATENCY_TARGET, max_retries: int = EMBEDDING_MAX_RETRIES):
+        """
+        스케줄러 초기화
+
+        Args:
+            client: AsyncOpenAI 클라이언트 (재시도는 스케줄러가 하므로 max_retries=0 권장)
+            model (str): 임베딩 모델명
+            initial_concurrency (int): 시작 동시 요청 수
+            min_concurrency (int): 최소 동시 요청 수
+            max_concurrency (int): 최대 동시 요청 수
+            latency_target (float): 목표 응답 시간 (초)
+            max_retries (int): 재시도 횟수
+        """
+        self.client = client
+        self.model = model
+        self.limit = float(initial_concurrency)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.latency_target = latency_target
+        self.max_retries = max_retries
+        self.in_flight = 0
+        self.condition = asyncio.Condition()
+        self.cooldown_until = 0.0
+        self.last_decrease = 0.0
+        self.remaining_tokens = None
+        self.tokens_reset_at = 0.0
+        self.started_at = None
+        self.stats = {
+            'requests': 0,
+            'tokens': 0,
+            'inputs': 0,
+            'retries': 0,
+            'rate_limited': 0,
+            'rate_limit_wait_seconds': 0.0,
+            'errors': 0,
+            'latency_total': 0.0,
+            'max_concurrency': initial_concurrency,
+        }
+
+    @property
+    def concurrency(self) -> int:
+        """현재 허용 동시 요청 수"""
+        return max(self.min_concurrency, int(self.limit))
+
+    def has_capacity(self) -> bool:
+        """바로 보낼 수 있는 자리가 있는지 (청킹 단계가 덜 찬 배치를 먼저 보낼지 판단할 때 사용)"""
+        return self.in_flight < self.concurrency and time.time() >= self.cooldown_until
+
+    async def acquire(self, tokens: int = 0):
+        """
+        요청 자리를 얻을 때까지 대기 (동시 요청 수, 429 대기 시간, 남은 토큰 한도를 모두 확인)
+
+        Args:
+            tokens (int): 보낼 토큰 수 (남은 토큰 한도 확인용)
+        """
+        async with self.condition:
+            while True:
+                now = time.time()
+                wait = self.cooldown_until - now
+                if (tokens and self.remaining_tokens is not None and tokens > self.remaining_tokens
+                        and now < self.tokens_reset_at):
+                    wait = max(wait, self.tokens_reset_at - now)
+                if wait > 0:
+                    try:
+                        await asyncio.wait_for(self.condition.wait(), timeout=wait)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                if self.in_flight < self.concurrency:
+                    break
+                await self.condition.wait()
+            self.in_flight += 1
+            if self.remaining_tokens is not None:
+                self.remaining_tokens -= tokens
+            if self.started_at is None:
+                self.started_at = time.time()
+
+    async def release(self):
+        """요청 자리 반납"""
+        async with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def update_rate_limits(self, headers):
+        """응답의 x-ratelimit-* 헤더로 남은 토큰 한도 갱신"""
+        if not headers:
+            return
+        try:
+            remaining = headers.get('x-ratelimit-remaining-tokens')
+            if remaining is not None:
+                self.remaining_tokens = int(remaining)
+                reset = parse_duration(headers.get('x-ratelimit-reset-tokens'))
+                self.tokens_reset_at = time.time() + (reset or 0)
+        except (TypeError, ValueError):
+            pass
+
+    def on_success(self, latency: float, tokens: int, inputs: int):
+        """성공한 요청 기록 및 동시 요청 수 조절 (가산 증가 / 지연 시 곱셈 감소)"""
+        self.stats['requests'] += 1
+        self.stats['tokens'] += tokens
+        self.stats['inputs'] += inputs
+        self.stats['latency_total'] += latency
+        now = time.time()
+        if latency > self.latency_target:
+            # 응답이 느려지면 줄이되, 같은 과부하 구간에서 여러 번 줄이지 않음
+            if now - self.last_decrease > self.latency_target:
+                self.limit = max(self.min_concurrency, self.limit * 0.75)
+                self.last_decrease = now
+        else:
+            self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+        self.stats['max_concurrency'] = max(self.stats['max_concurrency'], self.concurrency)
+
+    def on_rate_limited(self, retry_after: float):
+        """429 응답 기록: 동시 요청 수 절반으로 줄이고 retry_after 동안 모든 요청 중지"""
+        self.stats['rate_limited'] += 1
+        now = time.time()
+        if now >= self.cooldown_until:
+            self.limit = max(self.min_concurrency, self.limit / 2)
+            self.last_decrease = now
+        self.cooldown_until = max(self.cooldown_until, now + retry_after)
+        print(f"[WARNING] 임베딩 호출 제한(429): {retry_after:.1f}초 대기, 동시 요청 {self.concurrency}개로 축소")
+
+    def backoff_delay(self, attempt: int) -> float:
+        """지수 백오프 + 지터"""
+        delay = min(EMBEDDING_BACKOFF_MAX, EMBEDDING_BACKOFF_BASE * (2 ** attempt))
+        return delay * (0.5 + random.random() / 2)
+
+    async def create(self, texts: List[str], tokens: int = 0) -> List[List[float]]:
+        """
+        임베딩 API 호출 (acquire로 자리를 얻은 상태에서 호출)
+
+        429/5xx/타임아웃/연결 오류는 retry-after 또는 지수 백오프 후 재시도합니다.
+
+        Args:
+            texts (List[str]): 임베딩할 텍스트 목록
+            tokens (int): 텍스트 토큰 수 합계 (처리량 통계용)
+
+        Returns:
+            List[List[float]]: 입력 순서와 같은 임베딩 목록
+
+        Raises:
+            openai.APIError: 재시도할 수 없는 오류이거나 재시도 횟수를 모두 쓴 경우
+        """
+        params = {'input': texts, 'model': self.model}
+        attempt = 0
+        while True:
+            start = time.time()
+            try:
+                raw_creator = getattr(self.client.embeddings, 'with_raw_response', None)
+                if raw_creator is not None:
+                    raw = await raw_creator.create(**params)
+                    self.update_rate_limits(raw.headers)
+                    response = raw.parse()
+                else:
+                    response = await self.client.embeddings.create(**params)
+                self.on_success(time.time() - start, tokens, len(texts))
+                return [item.embedding for item in response.data]
+            except openai.RateLimitError as e:
+                # 할당량 소진은 기다려도 풀리지 않음
+                if getattr(e, 'code', None) == 'insufficient_quota' or attempt >= self.max_retries:
+                    self.stats['errors'] += 1
+                    raise
+                headers = getattr(getattr(e, 'response', None), 'headers', None)
+                self.update_rate_limits(headers)
+                self.on_rate_limited(parse_retry_after(headers) or self.backoff_delay(attempt))
+                delay = max(0.0, self.cooldown_until - time.time())
+                self.stats['rate_limit_wait_seconds'] += delay
+            except (openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError) as e:
+                if attempt >= self.max_retries:
+                    self.stats['errors'] += 1
+                    raise
+                delay = self.backoff_delay(attempt)
+                print(f"[WARNING] 임베딩 요청 실패, {delay:.1f}초 후 재시도 ({attempt + 1}/{self.max_retries}): {e}")
+            except openai.APIStatusError:
+                self.stats['errors'] += 1
+                raise
+            attempt += 1
+            self.stats['retries'] += 1
+            await asyncio.sleep(delay)
+
+    def tokens_per_second(self) -> float:
+        """첫 요청부터 지금까지 달성한 임베딩 처리량 (토큰/초)"""
+        if not self.started_at:
+            return 0.0
+        elapsed = time.time() - self.started_at
+        return self.stats['tokens'] / elapsed if elapsed > 0 else 0.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """스케줄러 통계 (처리량, 평균 지연 시간, 현재/최대 동시 요청 수 포함)"""
+        requests_count = self.stats['requests']
+        return {
+            **self.stats,
+            'tokens_per_second': self.tokens_per_second(),
+            'avg_latency': self.stats['latency_total'] / requests_count if requests_count else 0.0,
+            'concurrency': self.concurrency,
+        }
@@ -0,0 +1,315 @@
+"""
+파일 사전 필터링 모듈
+
+git/trees 조회 결과(경로, blob 크기)만으로 파일 내용을 받기 전에 분석 대상을 고릅니다.
+내용을 받은 뒤에 버릴 파일(큰 파일, vendored/생성/잠금/압축 파일, 사용자가 제외한 파일)은
+수집/청킹/임베딩 단계에 넘기지 않으므로 GitHub 호출과 임베딩 토큰이 함께 줄어듭니다.
+
+제외 기준 (우선순위 순):
+    1. 사용자 제외 패턴 (exclude_globs)
+    2. 사용자 포함 패턴 (include_globs): 지정하면 일치하는 파일만 남기며, 일치한 파일은 3~4의 경로 휴리스틱을 건너뜀
+    3. .gitattributes의 linguist-vendored / linguist-generated 속성 (false로 해제하면 4의 해당 휴리스틱도 건너뜀)
+    4. 경로 휴리스틱: vendored 디렉토리, 생성 코드, 잠금 파일, 압축(minified) 파일
+    5. blob 크기 (MAX_FILE_BYTES 초과)
+
+주요 클래스:
+    - GlobPattern: .gitignore 형식의 glob 패턴 (**, *, ?, [...])
+    - FileFilter: 트리 항목에 제외 기준을 적용하는 필터
+
+주요 함수:
+    - parse_gitattributes: .gitattributes 내용에서 linguist 속성 규칙 추출
+    - parse_globs: 쉼표/줄바꿈으로 구분된 패턴 문자열 또는 목록을 패턴 목록으로 변환
+"""
+
+import collections
+import hashlib
+import json
+import os
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+# ----------------- 상수 정의 -----------------
+MAX_FILE_BYTES = 100000  # 이보다 큰 blob은 내용을 받지 않음 (기존 100KB 제한을 트리 크기로 미리 적용)
+# 기본 포함/제외 패턴 (쉼표로 구분, 요청별 패턴과 합쳐짐)
+DEFAULT_INCLUDE_GLOBS = os.environ.get('FILE_INCLUDE_GLOBS', '')
+DEFAULT_EXCLUDE_GLOBS = os.environ.get('FILE_EXCLUDE_GLOBS', '')
+GITATTRIBUTES_MAX_FILES = 20  # 읽을 .gitattributes 파일 최대 수 (루트에 가까운 것부터)
+
+# 경로 어디에 있어도 vendored로 보는 디렉토리 이름
+VENDORED_DIRS = {
+    'node_modules', 'bower_components', 'jspm_packages', 'vendor', 'vendors', 'third_party', 'third-party',
+    'thirdparty', 'site-packages', '.venv', 'venv', '.tox', '__pycache__', '.git', 'Pods', 'Carthage',
+}
+GENERATED_GLOBS = [
+    '*_pb2.py', '*_pb2_grpc.py', '*_pb2.pyi', '*.pb.go', '*.pb.cc', '*.pb.h', '*.pb.swift',
+    '*_generated.*', '*.generated.*', '*.designer.cs', '*.g.cs', '*.g.dart', '*.freezed.dart',
+]
+LOCK_FILE_NAMES = {
+    'package-lock.json', 'npm-shrinkwrap.json', 'yarn.lock', 'pnpm-lock.yaml', 'poetry.lock', 'Pipfile.lock',
+    'uv.lock', 'pdm.lock', 'Cargo.lock', 'composer.lock', 'Gemfile.lock', 'go.sum', 'flake.lock', 'mix.lock',
+}
+MINIFIED_GLOBS = ['*.min.js', '*.min.css', '*-min.js', '*.min.mjs', '*.bundle.js', '*.chunk.js', '*.js.map', '*.css.map']
+# 경로 휴리스틱 사유 -> 이를 해제하는 .gitattributes 속성 (Linguist처럼 잠금/압축 파일은 생성 파일로 취급)
+HEURISTIC_ATTRIBUTES = {'vendored': 'vendored', 'generated': 'generated', 'lock': 'generated', 'minified': 'generated'}
+
+
+class GlobPattern:
+    """
+    .gitignore 형식의 glob 패턴
+
+    - 슬래시가 없는 패턴(예: *.ipynb)은 어느 깊이에서든 파일 이름과 비교하고,
+      match_dirs=True면 경로의 디렉토리 이름과도 비교합니다 (예: tests -> tests/ 아래 모든 파일).
+    - 슬래시가 있는 패턴(예: docs/**/*.md, /setup.py)은 base 디렉토리 기준 상대 경로 전체와 비교합니다.
+    - 끝이 '/'인 패턴(예: build/)은 그 디렉토리 아래 모든 파일과 일치합니다.
+    """
+
+    def __init__(self, pattern: str, base: str = '', match_dirs: bool = False):
+        """
+        Args:
+            pattern (str): glob 패턴
+            base (str): 패턴 기준 디렉토리 (예: 하위 디렉토리의 .gitattributes 위치, 루트는 '')
+            match_dirs (bool): 슬래시 없는 패턴을 디렉토리 이름과도 비교할지 여부
+        """
+        self.pattern = pattern
+        self.base = base.strip('/')
+        self.match_dirs = match_dirs
+
+        body = pattern.strip()
+        self.directory_only = body.endswith('/')
+        body = body.rstrip('/')
+        self.anchored = '/' in body
+        regex = self.translate(body.lstrip('/'))
+        if self.anchored and self.directory_only:
+            regex += '/.*'
+        self.regex = re.compile(regex)
+
+    @staticmethod
+    def translate(pattern: str) -> str:
+        """glob 패턴을 정규식으로 변환 (**는 디렉토리 경계를 넘고, *와 ?는 넘지 않음)"""
+        out = []
+        i = 0
+        while i < len(pattern):
+            if pattern.startswith('**/', i):
+                out.append('(?:.*/)?')
+                i += 3
+            elif pattern.startswith('**', i):
+                out.append('.*')
+                i += 2
+            elif pattern[i] == '*':
+                out.append('[^/]*')
+                i += 1
+            elif pattern[i] == '?':
+                out.append('[^/]')
+                i += 1
+            elif pattern[i] == '[' and pattern.find(']', i + 2) != -1:
+                end = pattern.find(']', i + 2)
+                chars = pattern[i + 1:end]
+                if chars.startswith('!'):
+                    chars = '^' + chars[1:]
+                out.append('[' + chars.replace('\\', '\\\\') + ']')
+                i = end + 1
+            else:
+                out.append(re.escape(pattern[i]))
+                i += 1
+        return ''.join(out)
+
+    def matches(self, path: str) -> bool:
+        """저장소 루트 기준 파일 경로가 패턴과 일치하는지 여부"""
+        if self.base:
+            if not path.startswith(self.base + '/'):
+                return False
+            path = path[len(self.base) + 1:]
+        if self.anchored:
+            return self.regex.fullmatch(path) is not None
+        parts = path.split('/')
+        if self.directory_only:
+            return any(self.regex.fullmatch(part) for part in parts[:-1])
+        if self.regex.fullmatch(parts[-1]):
+            return True
+        return self.match_dirs and any(self.regex.fullmatch(part) for part in parts[:-1])
+
+
+def parse_globs(globs: Union[None, str, Iterable[str]]) -> List[str]:
+    """쉼표/줄바꿈으로 구분된 패턴 문자열 또는 목록을 빈 항목 없는 패턴 목록으로 변환"""
+    if not globs:
+        return []
+    if isinstance(globs, str):
+        globs = re.split(r'[,\n]', globs)
+    return [glob.strip() for glob in globs if glob and glob.strip()]
+
+
+def parse_gitattributes(content: str, base: str = '') -> List[Tuple[GlobPattern, str, bool]]:
+    """
+    .gitattributes 내용에서 linguist-vendored / linguist-generated 규칙 추출
+
+    Args:
+        content (str): .gitattributes 파일 내용
+        base (str): .gitattributes가 있는 디렉토리 (루트는 '')
+
+    Returns:
+        List[Tuple[GlobPattern, str, bool]]: [(패턴, 'vendored' | 'generated', 설정 여부), ...] (파일 내 순서)
+    """
+    rules = []
+    for line in content.splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        fields = line.split()
+        pattern, attributes = fields[0], fields[1:]
+        for attribute in attributes:
+            name, _, value = attribute.partition('=')
+            enabled = True
+            if name.startswith(('-', '!')):
+                name, enabled = name[1:], False
+            elif value:
+                enabled = value.lower() not in ('false', '0')
+            if name in ('linguist-vendored', 'linguist-generated'):
+                rules.append((GlobPattern(pattern, base), name.split('-', 1)[1], enabled))
+    return rules
+
+
+class FileFilter:
+    """
+    트리 항목(경로, blob 크기)에 사전 필터링 기준을 적용하는 필터
+
+    Attributes:
+        include_globs (List[str]): 사용자 포함 패턴 (비어 있으면 모든 파일)
+        exclude_globs (List[str]): 사용자 제외 패턴
+        stats (collections.Counter): 마지막 apply 호출의 제외 사유별 파일 수
+    """
+
+    def __init__(self, include_globs: Union[None, str, Iterable[str]] = None,
+                 exclude_globs: Union[None, str, Iterable[str]] = None, max_file_bytes: int = MAX_FILE_BYTES):
+        """
+        필터 초기화
+
+        Args:
+            include_globs: 포함 패턴 목록 또는 쉼표 구분 문자열 (DEFAULT_INCLUDE_GLOBS와 합쳐짐)
+            exclude_globs: 제외 패턴 목록 또는 쉼표 구분 문자열 (DEFAULT_EXCLUDE_GLOBS와 합쳐짐)
+            max_file_bytes (int): 이보다 큰 blob은 제외
+        """
+        self.include_globs = parse_globs(DEFAULT_INCLUDE_GLOBS) + parse_globs(include_globs)
+        self.exclude_globs = parse_globs(DEFAULT_EXCLUDE_GLOBS) + parse_globs(exclude_globs)
+        self.max_file_bytes = max_file_bytes
+        self.includes = [GlobPattern(glob, match_dirs=True) for glob in self.include_globs]
+        self.excludes = [GlobPattern(glob, match_dirs=True) for glob in self.exclude_globs]
+        self.generated = [GlobPattern(glob) for glob in GENERATED_GLOBS]
+        self.minified = [GlobPattern(glob) for glob in MINIFIED_GLOBS]
+        self.attribute_rules: List[Tuple[GlobPattern, str, bool]] = []
+        self.stats = collections.Counter()
+
+    @property
+    def signature(self) -> str:
+        """
+        사용자 패턴 식별자 (패턴이 없으면 빈 문자열)
+        같은 커밋이라도 패턴이 다르면 색인 대상이 달라지므로 공유 인덱스 이름에 덧붙여 구분합니다.
+        """
+        if not self.include_globs and not self.exclude_globs:
+            return ''
+        key = json.dumps([sorted(self.include_globs), sorted(self.exclude_globs)])
+        return 'f' + hashlib.sha1(key.encode('utf-8')).hexdigest()[:10]
+
+    def add_gitattributes(self, content: str, path: str = '.gitattributes'):
+        """
+        .gitattributes 규칙 추가 (루트 파일부터 깊은 순서로 추가해야 하위 디렉토리 규칙이 우선함)
+
+        Args:
+            content (str): 파일 내용
+            path (str): 저장소 루트 기준 .gitattributes 경로
+        """
+        base = path.rsplit('/', 1)[0] if '/' in path else ''
+        self.attribute_rules.extend(parse_gitattributes(content, base))
+
+    def attribute_values(self, path: str) -> Dict[str, bool]:
+        """
+        파일에 명시된 .gitattributes 속성 값 (나중 규칙이 앞 규칙을 덮어씀)
+
+        Returns:
+            Dict[str, bool]: {'vendored' | 'generated': 설정 여부} (규칙이 없는 속성은 키 없음)
+        """
+        values = {}
+        for pattern, name, enabled in self.attribute_rules:
+            if pattern.matches(path):
+                values[name] = enabled
+        return values
+
+    def attribute_reason(self, path: str) -> Optional[str]:
+        """.gitattributes로 vendored/generated 지정된 파일이면 사유 반환"""
+        values = self.attribute_values(path)
+        for name in ('vendored', 'generated'):
+            if values.get(name):
+                return name
+        return None
+
+    def heuristic_reason(self, path: str) -> Optional[str]:
+        """경로만으로 판단한 vendored/생성/잠금/압축 파일 사유 (해당 없으면 None)"""
+        parts = path.split('/')
+        if any(part in VENDORED_DIRS for part in parts[:-1]):
+            return 'vendored'
+        if parts[-1] in LOCK_FILE_NAMES:
+            return 'lock'
+        if any(pattern.matches(path) for pattern in self.minified):
+            return 'minified'
+        if any(pattern.matches(path) for pattern in self.generated):
+            return 'generated'
+        return None
+
+    def exclusion_reason(self, path: str, size: Optional[int] = None) -> Optional[str]:
+        """
+        파일을 제외할 사유
+
+        Args:
+            path (str): 저장소 루트 기준 파일 경로
+            size (Optional[int]): blob 크기 (바이트, 모르면 None)
+
+        Returns:
+            Optional[str]: 'excluded', 'not_included', 'vendored', 'generated', 'lock', 'minified', 'size'
+                또는 None (분석 대상)
+        """
+        if any(pattern.matches(path) for pattern in self.excludes):
+            return 'excluded'
+        explicitly_included = False
+        if self.includes:
+            if not any(pattern.matches(path) for pattern in self.includes):
+                return 'not_included'
+            explicitly_included = True
+        if not explicitly_included:
+            values = self.attribute_values(path)
+            for name in ('vendored', 'generated'):
+                if values.get(name):
+                    return name
+            reason = self.heuristic_reason(path)
+            # linguist-vendored=false / linguist-generated=false로 해제한 파일은 해당 휴리스틱을 적용하지 않음
+            if reason and values.get(HEURISTIC_ATTRIBUTES[reason], True):
+                return reason
+        if size is not None and size > self.max_file_bytes:
+            return 'size'
+        return None
+
+    def apply(self, entries: List[Dict[str, Any]]) -> List[str]:
+        """
+        트리 항목 중 분석 대상 파일 경로만 남김 (제외 사유별 수는 self.stats에 기록)
+
+        Args:
+            entries (List[Dict[str, Any]]): {'path', 'size'(선택)} 형식의 파일 항목
+
+        Returns:
+            List[str]: 분석 대상 파일 경로 목록 (입력 순서 유지)
+        """
+        self.stats = collections.Counter()
+        kept = []
+        for entry in entries:
+            reason = self.exclusion_reason(entry['path'], entry.get('size'))
+            if reason:
+                self.stats[reason] += 1
+            else:
+                kept.append(entry['path'])
+        return kept
+
+    def filter_paths(self, paths: List[str]) -> List[str]:
+        """크기 정보 없이 경로만으로 필터 적용 (디렉토리 탐색 방식 파일 목록용)"""
+        return self.apply([{'path': path} for path in paths])
+
+    def describe_stats(self) -> str:
+        """마지막 apply 호출의 제외 사유 요약 문자열"""
+        return ', '.join(f"{reason} {count}개" for reason, count in self.stats.most_common()) or '없음'
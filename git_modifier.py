@@ -3,6 +3,7 @@ import git
 import os
 import base64
 import urllib.parse
+from repo_store import git_env
 
 def check_branch_exists(repo, branch_name):
     """지정된 브랜치가 존재하는지 확인"""
@@ -44,46 +45,22 @@ def checkout_branch(repo, branch_name, base_branch='main'):
         print(f"[ERROR] 브랜치 체크아웃 중 오류: {e}")
         raise
 
-def push_to_github(repo, branch_name, token=None):
-    """GitHub에 변경사항 푸시 (토큰 필요)"""
+def push_to_github(repo, branch_name, token=None, refspec=None):
+    """
+    GitHub에 변경사항 푸시 (토큰 필요, refspec을 주면 해당 refspec으로 푸시)
+
+    세션 worktree는 모든 세션이 함께 쓰는 bare 미러의 설정 파일을 공유하므로
+    원격 URL을 바꾸지 않고 토큰은 git_env의 환경 변수(http.extraHeader)로만 전달합니다.
+    """
     if not token:
         print("[WARNING] GitHub 토큰이 제공되지 않아 푸시를 건너뜁니다.")
         return False
     
     try:
-        # 원격 저장소 URL에 토큰 추가
-        origin = repo.remote(name='origin')
-        old_url = list(origin.urls)[0]
-        
-        # URL에 토큰 삽입
-        url_parts = old_url.split('://')
-        if len(url_parts) > 1 and 'github.com' in url_parts[1]:
-            if '@' in url_parts[1]:  # 이미 사용자 정보가 있는 경우
-                print("[INFO] URL에 이미 인증 정보가 있어 교체합니다.")
-                user_repo = url_parts[1].split('@')[1]
-                new_url = f"{url_parts[0]}://{token}@{user_repo}"
-            else:  # 사용자 정보가 없는 경우
-                new_url = f"{url_parts[0]}://{token}@{url_parts[1]}"
-            
-            # 일시적으로 URL 변경
-            origin.set_url(new_url)
-            
-            try:
-                # 푸시 실행
-                print(f"[INFO] GitHub에 {branch_name} 브랜치 푸시 시작")
-                push_info = origin.push(branch_name)
-                print(f"[INFO] 푸시 결과: {push_info[0].summary}")
-                
-                # URL 복원
-                origin.set_url(old_url)
-                
-                return True
-            except Exception as e:
-                # 에러 발생 시에도 URL 복원
-                origin.set_url(old_url)
-                raise e
-        else:
-            raise Exception("원격 저장소 URL 형식이 올바르지 않습니다.")
+        print(f"[INFO] GitHub에 {branch_name} 브랜치 푸시 시작")
+        output = repo.git.push('origin', refspec or branch_name, env=git_env(token))
+        print(f"[INFO] 푸시 결과: {output or '완료'}")
+        return True
     except Exception as e:
         print(f"[ERROR] GitHub 푸시 중 오류: {e}")
         raise
@@ -94,7 +71,13 @@ def create_branch_and_commit(repo_path, branch_name, file_path, new_content, com
         repo = git.Repo(repo_path)
         
         # 1. 브랜치 체크아웃 (없으면 생성)
-        checkout_branch(repo, branch_name)
+        # 저장소 미러의 세션 worktree(repo_store)는 detached HEAD로 만들어지고,
+        # 같은 브랜치를 여러 worktree에서 동시에 체크아웃할 수 없으므로 HEAD에 커밋한 뒤 브랜치로 푸시
+        refspec = None
+        if repo.head.is_detached:
+            refspec = f"HEAD:refs/heads/{branch_name}"
+        else:
+            checkout_branch(repo, branch_name)
         
         # 2. 파일 수정
         abs_path = os.path.join(repo_path, file_path)
@@ -108,7 +91,7 @@ def create_branch_and_commit(repo_path, branch_name, file_path, new_content, com
         # 4. 토큰이 제공된 경우 푸시
         push_result = False
         if token:
-            push_result = push_to_github(repo, branch_name, token)
+            push_result = push_to_github(repo, branch_name, token, refspec)
         
         return {
             'success': True,
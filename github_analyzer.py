@@ -22,22 +22,57 @@ import re
 import openai
 import git
 import base64
-from typing import Optional, List, Dict, Any, Tuple, Union
+import hashlib
+import tarfile
+import gzip
+import urllib3
+from typing import Optional, List, Dict, Any, Tuple, Union, Iterable, Iterator
 from langchain.schema import Document
 from cryptography.fernet import Fernet
-import tiktoken
-import ast
 import markdown
 from concurrent.futures import ThreadPoolExecutor, as_completed
+import concurrent.futures
+from concurrent.futures.process import BrokenProcessPool
+import collections
 import asyncio
 import sys
-import nbformat
 import time
+import threading
 from datetime import datetime
+from embedding_cache import get_embedding_cache
+from embedding_retry_queue import get_retry_queue, EmbeddingRetryWorker
+from compact_vectors import (get_vector_config, default_vector_config, vector_config_metadata,
+                             to_collection_vectors, get_rerank_store)
+from embedding_providers import get_embedding_provider, get_collection_provider
+from chunk_dedup import CHUNK_DEDUP, ChunkDeduplicator, content_key
+from chat_cache import invalidate_collection_cache
+from lexical_index import get_lexical_index
+from outline_index import get_outline_index
+from role_tagger import ROLE_TAGGING, RoleTagWorker
+from embedding_scheduler import (EMBEDDING_MAX_BATCH_TOKENS, EMBEDDING_MAX_BATCH_ITEMS,
+                                 EMBEDDING_MAX_INPUT_TOKENS, EMBEDDING_INITIAL_CONCURRENCY, EMBEDDING_MAX_CONCURRENCY)
+from code_chunker import (CHUNK_WORKERS, CHUNK_BATCH_FILES, CHUNK_BATCH_CHARS, CHUNK_TIMEOUT_SECONDS, chunk_file_batch,
+                          get_chunk_executor, reset_chunk_executor, truncate_to_tokens)
+from github_client import github_get, get_rate_limit_status
+from file_filters import FileFilter, GITATTRIBUTES_MAX_FILES
 
 # ----------------- 상수 정의 -----------------
 MAIN_EXTENSIONS = ['.py', '.js', '.md', '.ts', '.java', '.cpp', '.h', '.hpp', '.c', '.cs', '.txt','.ipynb']  # 분석할 주요 파일 확장자
 CHUNK_SIZE = 500  # 텍스트 청크 크기
+# 파일 목록 수집 방식: 'tree' = git/trees 재귀 조회 1회, 'contents' = 디렉토리별 /contents 재귀 탐색 (기존 방식)
+INGESTION_MODE = 'tree'
+# 파일 내용 수집 방식: 'archive' = tarball 1회 스트리밍 다운로드, 'contents' = 파일별 /contents 호출 (기존 방식),
+# 'graphql' = GraphQL 쿼리 하나에 최대 100개 파일을 묶어 조회 (토큰 필요, github_analyzer_graphql 참고)
+FETCH_MODE = 'archive'
+# 파일별로 가져올 파일이 이 수 이상이고 토큰이 있으면 /contents 개별 호출 대신 GraphQL 묶음 조회 사용
+GRAPHQL_THRESHOLD = 50
+MINIFIED_FILE_PATTERNS = ['.min.js', '.min.css', 'bootstrap.min', 'jquery.min']  # 임베딩에서 제외할 압축(minified) 파일 패턴
+MAX_FILE_CONTENT_SIZE = 100000  # 이 글자 수를 넘는 파일은 임베딩에서 제외
+SHARED_INDEX = True  # True면 같은 (owner, repo, 커밋 SHA)를 분석한 세션끼리 벡터 인덱스를 공유
+INCREMENTAL_CONTENTS_THRESHOLD = 30  # 증분 재분석 시 변경 파일이 이 수 이하면 아카이브 대신 파일별로 가져옴
+DB_BATCH_SIZE = 100  # ChromaDB에 한 번에 저장할 청크 수
+PIPELINE_FILE_QUEUE_SIZE = 16  # 수집 -> 청킹 단계 사이에 대기할 수 있는 최대 파일 수
+PIPELINE_BATCH_QUEUE_SIZE = 8  # 청킹 -> 임베딩 -> 저장 단계 사이 최대 배치 수
 GITHUB_TOKEN = "GITHUB_TOKEN"  # 환경 변수 키 이름
 KEY_FILE = ".key"  # 암호화 키 파일
 
@@ -55,7 +90,9 @@ os.makedirs(ANALYSIS_LOG_PATH, exist_ok=True)
 api_call_counter = {
     'github': 0,
     'openai_embedding': 0,
-    'openai_chat': 0
+    'openai_chat': 0,
+    'embedding_cache_hit': 0,  # API 호출 수가 아닌 청크 수 (총 API 호출 합계에서 제외)
+    'embedding_cache_miss': 0
 }
 
 def save_analysis_log(repo_url: str, file_count: int, directory_structure: str, total_time: float, session_id: str = None):
@@ -99,9 +136,21 @@ def save_analysis_log(repo_url: str, file_count: int, directory_structure: str,
         log_content.append(f"- GitHub API 호출: {api_call_counter.get('github', 0)}회")
         log_content.append(f"- OpenAI Embedding API 호출: {api_call_counter.get('openai_embedding', 0)}회")
         log_content.append(f"- OpenAI Role Tagging API 호출: {api_call_counter.get('openai_chat', 0)}회")
-        total_api_calls = sum(api_call_counter.values())
+        total_api_calls = sum(api_call_counter.get(key, 0) for key in ('github', 'openai_embedding', 'openai_chat'))
         log_content.append(f"- 총 API 호출: {total_api_calls}회")
-        
+        log_content.append(f"- 임베딩 캐시 적중/미스: {api_call_counter.get('embedding_cache_hit', 0)}/{api_call_counter.get('embedding_cache_miss', 0)} 청크")
+        if 'embedding_tokens_per_second' in api_call_counter:
+            log_content.append(f"- 임베딩 처리량: {api_call_counter['embedding_tokens_per_second']:,.0f} 토큰/초 "
+                               f"(최대 동시 요청 {api_call_counter.get('embedding_max_concurrency', 0)}개, "
+                               f"429 응답 {api_call_counter.get('embedding_rate_limited', 0)}회)")
+
+        # GitHub 호출 제한 텔레메트리 (프로세스 누적값)
+        rate_limit_status = get_rate_limit_status()
+        github_stats = rate_limit_status['stats']
+        log_content.append(f"- GitHub 재시도: {github_stats['retries']}회, 호출 제한 대기: {github_stats['rate_limit_waits']}회 ({github_stats['rate_limit_wait_seconds']:.1f}초), 제한으로 실패: {github_stats['rate_limited_responses']}회")
+        for key, info in rate_limit_status['rate_limits'].items():
+            log_content.append(f"- GitHub 호출 제한 ({key}): 남은 호출 {info.get('remaining')}/{info.get('limit')}, 해제 시각 {info.get('reset')}")
+
         if directory_structure:
             dir_lines = directory_structure.count('\n') + 1
             log_content.append(f"- 디렉토리 구조 크기: {len(directory_structure):,} 문자, {dir_lines} 줄")
@@ -129,17 +178,54 @@ def save_analysis_log(repo_url: str, file_count: int, directory_structure: str,
     except Exception as e:
         print(f"[WARNING] 분석 로그 저장 실패: {e}")
 
-def analyze_repository(repo_url: str, token: Optional[str] = None, session_id: Optional[str] = None) -> Dict[str, Any]:
+class AnalysisCancelled(Exception):
+    """분석 작업 취소 요청 시 진행 콜백에서 발생시키는 예외 (분석을 중단시킴)"""
+    pass
+
+def emit_progress(progress_callback, stage: str, current: int = 0, total: int = 0, message: str = ''):
+    """
+    진행 콜백이 있으면 단계별 진행 이벤트 전달
+
+    Args:
+        progress_callback: progress_callback(stage, current, total, message) 형태의 함수 또는 None
+        stage (str): 진행 단계 ('tree_listed', 'files_fetched', 'index_reused', 'chunked', 'embedding', 'stored')
+        current (int): 현재까지 처리한 수
+        total (int): 전체 수 (알 수 없으면 0)
+        message (str): 사용자에게 보여줄 진행 메시지
+    """
+    if progress_callback:
+        progress_callback(stage, current, total, message)
+
+def analyze_repository(repo_url: str, token: Optional[str] = None, session_id: Optional[str] = None,
+                       ingestion_mode: str = INGESTION_MODE, fetch_mode: str = FETCH_MODE,
+                       incremental: bool = False, previous_index: Optional[str] = None,
+                       shared_index: bool = SHARED_INDEX, progress_callback=None,
+                       include_globs: Optional[List[str]] = None, exclude_globs: Optional[List[str]] = None,
+                       index_callback=None) -> Dict[str, Any]:
     """
     GitHub 저장소를 분석하고 임베딩하는 함수
-    
+
     Args:
         repo_url (str): GitHub 저장소 URL
         token (Optional[str]): GitHub 개인 액세스 토큰
         session_id (Optional[str]): 세션 ID
-        
+        ingestion_mode (str): 파일 목록 수집 방식 ('tree' 또는 'contents')
+        fetch_mode (str): 파일 내용 수집 방식 ('archive', 'contents' 또는 'graphql')
+        incremental (bool): True면 기존 세션 컬렉션의 blob SHA와 현재 트리를 비교하여
+            추가/수정된 파일만 재임베딩하고 삭제된 파일의 청크를 제거
+        previous_index (Optional[str]): 증분 재분석 시 세션이 현재 사용 중인 인덱스 이름
+            (기본값: 세션 전용 컬렉션 repo_{session_id})
+        shared_index (bool): True면 (owner, repo, 커밋 SHA) 공유 인덱스에 저장/재사용
+        progress_callback: 단계별 진행 이벤트를 받을 함수 (emit_progress 참고)
+            콜백에서 AnalysisCancelled를 발생시키면 분석이 중단됨
+        include_globs (Optional[List[str]]): 분석할 파일 패턴 (지정하면 일치하는 파일만 분석, file_filters 참고)
+        exclude_globs (Optional[List[str]]): 분석에서 제외할 파일 패턴
+        index_callback: 사용할 인덱스 이름이 정해지면 인덱스 빌드 잠금을 잡기 전에 index_callback(index_name) 호출
+            (분석 작업이 세션 저장 전까지 인덱스를 참조 중으로 기록하는 데 사용)
+
     Returns:
         Dict[str, Any]: 분석 결과
+            ('index_name': 임베딩이 저장된 인덱스, 증분 재분석 시 'changes': 추가/수정/삭제 파일 수)
     """
     global api_call_counter
     
@@ -147,7 +233,9 @@ def analyze_repository(repo_url: str, token: Optional[str] = None, session_id: O
     api_call_counter = {
         'github': 0,
         'openai_embedding': 0,
-        'openai_chat': 0
+        'openai_chat': 0,
+        'embedding_cache_hit': 0,  # API 호출 수가 아닌 청크 수 (총 API 호출 합계에서 제외)
+        'embedding_cache_miss': 0
     }
     
     try:
@@ -155,34 +243,164 @@ def analyze_repository(repo_url: str, token: Optional[str] = None, session_id: O
         start_time = time.time()
         print(f"[DEBUG] 저장소 분석 시작: {repo_url}")
         
-        # ChromaDB 디렉토리 정리 (차원 불일치 문제 해결)
-        if session_id:
-            cleanup_chromadb_for_session(session_id)
-        
         # 저장소 정보 가져오기 (GitHub API 사용)
-        fetcher = GitHubRepositoryFetcher(repo_url, token, session_id)
+        file_filter = FileFilter(include_globs, exclude_globs)
+        fetcher = GitHubRepositoryFetcher(repo_url, token, session_id, progress_callback=progress_callback,
+                                          file_filter=file_filter)
+        
+        # 임베딩을 저장할 인덱스 결정
+        # 공유 인덱스: 기본 브랜치의 커밋 SHA를 고정하고 (owner, repo, 커밋 SHA) 컬렉션 사용
+        # 커밋 SHA를 얻지 못하면 기존처럼 세션 전용 컬렉션(repo_{session_id}) 사용
+        index_name = None
+        if session_id:
+            if shared_index and fetcher.resolve_commit_sha():
+                index_name = get_repo_index_name(fetcher.owner, fetcher.repo, fetcher.commit_sha, file_filter.signature)
+            else:
+                index_name = f"repo_{session_id}"
+                # ChromaDB 디렉토리 정리 (차원 불일치 문제 해결)
+                if not incremental:
+                    cleanup_chromadb_for_session(session_id)
+            print(f"[DEBUG] 벡터 인덱스: {index_name}")
+            if index_callback:
+                index_callback(index_name)
+        
+        # 증분 재분석: 세션이 현재 사용 중인 인덱스에 저장된 파일별 SHA를 읽어 둠
+        source_embedder = None
+        stored_shas = {}
+        if incremental and session_id:
+            source_index = previous_index or f"repo_{session_id}"
+            if repo_index_exists(source_index):
+                source_embedder = RepositoryEmbedder(session_id, source_index, progress_callback=progress_callback)
+                stored_shas = source_embedder.get_stored_file_shas()
+                if stored_shas and source_embedder.provider.signature != get_embedding_provider().signature:
+                    # 임베딩 제공자가 바뀌면 벡터 공간이 달라 기존 청크를 섞어 쓸 수 없으므로 전체 재분석
+                    print(f"[INFO] 임베딩 제공자 변경 ({source_embedder.provider.name} -> "
+                          f"{get_embedding_provider().name}), 전체 재분석합니다.")
+                    stored_shas = {}
+            print(f"[DEBUG] 증분 재분석: 기존 인덱스 {source_index} 파일 {len(stored_shas)}개")
         
         # GitHub API를 통한 데이터 로드 (클론 불필요)
-        print(f"[DEBUG] GitHub API를 통한 데이터 로드 시작")
-        if not fetcher.load_repo_data():
+        # 증분 재분석은 blob SHA 비교를 위해 항상 git/trees 조회 사용
+        use_tree = ingestion_mode == 'tree' or bool(stored_shas)
+        print(f"[DEBUG] GitHub API를 통한 데이터 로드 시작 (수집 방식: {'tree' if use_tree else 'contents'})")
+        if not fetcher.load_repo_data(use_tree=use_tree):
             return {'success': False, 'error': '저장소 데이터를 로드할 수 없습니다.'}
         print(f"[DEBUG] GitHub API 데이터 로드 완료")
         
-        files = fetcher.get_file_contents()
-        if not files:
-            return {'success': False, 'error': '저장소에서 파일을 찾을 수 없습니다.'}
+        current_shas = {item['path']: item.get('sha', '') for item in fetcher.tree_entries if item.get('type') == 'blob'}
+        candidates = [
+            path for path in fetcher.files
+            if not any(pattern in path.lower() for pattern in MINIFIED_FILE_PATTERNS)
+        ]
+        source_url_prefix = f"https://github.com/{fetcher.owner}/{fetcher.repo}/blob/{fetcher.commit_sha or fetcher.default_branch}"
+        
+        def metadata_only_files(shas: Dict[str, str], paths: List[str]) -> List[Dict[str, Any]]:
+            """내용 없이 메타데이터만 가진 파일 딕셔너리 목록 (재사용/변경 없는 파일용)"""
+            return [
+                {
+                    'path': path,
+                    'content': '',
+                    'file_name': path.split('/')[-1],
+                    'file_type': path.split('/')[-1].split('.')[-1],
+                    'sha': shas.get(path, ''),
+                    'source_url': f"{source_url_prefix}/{path}",
+                }
+                for path in paths
+            ]
+        
+        def diff_shas(old_shas: Dict[str, str], paths: List[str]):
+            """저장된 SHA와 현재 트리를 비교하여 (추가, 수정, 삭제) 파일 목록 반환"""
+            path_set = set(paths)
+            added = [path for path in paths if path not in old_shas]
+            modified = [path for path in paths if path in old_shas and old_shas[path] != current_shas.get(path)]
+            removed = [path for path in old_shas if path not in path_set]
+            return added, modified, removed
+        
+        changes = None
+        with get_index_build_lock(index_name or ''):
+            embedder = RepositoryEmbedder(session_id, index_name, progress_callback=progress_callback) if session_id else None
+            
+            # 같은 커밋을 이미 다른 세션이 분석했다면 임베딩 없이 그대로 재사용
+            # (세션 전용 인덱스를 제자리에서 증분 갱신하는 경우는 제외)
+            reuse = embedder is not None and embedder.is_ready() and not (
+                incremental and source_embedder is not None and source_embedder.collection_name == index_name
+            )
+            
+            if reuse:
+                index_shas = embedder.get_stored_file_shas()
+                print(f"[INFO] 공유 인덱스 재사용: {index_name} ({len(index_shas)}개 파일, 임베딩 생략)")
+                emit_progress(progress_callback, 'index_reused', len(index_shas), len(index_shas),
+                              '이미 분석된 커밋입니다. 기존 분석 결과를 재사용합니다.')
+                paths = [path for path in candidates if path in index_shas] if candidates else list(index_shas)
+                files = metadata_only_files(index_shas, paths)
+                if stored_shas:
+                    added, modified, removed = diff_shas(stored_shas, paths)
+                    changes = {'added': len(added), 'modified': len(modified), 'removed': len(removed)}
+            
+            elif stored_shas and fetcher.tree_entries:
+                # 현재 트리의 blob SHA와 저장된 SHA를 비교하여 추가/수정/삭제 파일 계산
+                added, modified, removed = diff_shas(stored_shas, candidates)
+                changed = added + modified
+                changes = {'added': len(added), 'modified': len(modified), 'removed': len(removed)}
+                print(f"[INFO] 증분 재분석 변경 사항: 추가 {len(added)}개, 수정 {len(modified)}개, 삭제 {len(removed)}개")
+                
+                changed_set = set(changed)
+                unchanged = [path for path in candidates if path not in changed_set and path in stored_shas]
+                if source_embedder.collection_name == index_name:
+                    # 같은 인덱스를 제자리에서 갱신: 수정/삭제된 파일의 기존 청크 제거
+                    embedder.delete_files(modified + removed)
+                else:
+                    # 새 커밋 인덱스: 변경 없는 파일의 청크를 이전 인덱스에서 복사 (재임베딩 없음)
+                    embedder.reset()
+                    embedder.copy_files_from(source_embedder, unchanged)
+                
+                changed_files = []
+                if changed:
+                    # 변경 파일만 내용 수집하며 바로 임베딩 (소수라면 아카이브 전체 대신 파일별 호출이 더 빠름)
+                    fetcher.files = changed
+                    # (그보다 많으면 토큰이 있을 때 GraphQL 묶음 조회, 없으면 기본 수집 방식)
+                    if len(changed) <= INCREMENTAL_CONTENTS_THRESHOLD:
+                        changed_fetch_mode = 'contents'
+                    else:
+                        changed_fetch_mode = 'graphql' if fetcher.token else fetch_mode
+                    try:
+                        changed_files = embedder.process_and_embed(fetcher.iter_file_contents_by_mode(changed_fetch_mode))
+                    finally:
+                        fetcher.files = candidates
+                    print(f"[DEBUG] 변경 파일 임베딩 처리 완료: {len(changed_files)}개")
+                
+                # 변경되지 않은 파일은 내용 없이 메타데이터만 반환
+                files = changed_files + metadata_only_files(current_shas, unchanged)
+            
+            else:
+                if stored_shas:
+                    # 트리 조회 실패 시 SHA 비교가 불가능하므로 전체 재분석
+                    print("[WARNING] git/trees 조회 실패로 증분 재분석 불가, 전체 재분석합니다.")
+                
+                if embedder:
+                    # 파일을 받는 대로 청킹/임베딩/저장 (중단된 이전 빌드가 남긴 데이터는 비우고 시작)
+                    # (이전 제공자로 만들어진 빈 컬렉션도 현재 제공자로 다시 생성)
+                    if embedder.collection.count() > 0 or embedder.provider.signature != get_embedding_provider().signature:
+                        embedder.reset()
+                    files = embedder.process_and_embed(fetcher.iter_file_contents_by_mode(fetch_mode))
+                    print(f"[DEBUG] 임베딩 처리 완료")
+                else:
+                    files = fetcher.get_file_contents_by_mode(fetch_mode)
+                if not files:
+                    return {'success': False, 'error': '저장소에서 파일을 찾을 수 없습니다.'}
+            
+            if embedder and not reuse:
+                embedder.mark_ready()
+            # 채팅 경로에 캐시된 이 세션/인덱스의 컬렉션 핸들과 문서 수는 다시 조회
+            invalidate_collection_cache(session_id, index_name)
+            # 새로 저장된 청크의 역할 태그는 백그라운드에서 생성 (채팅 경로는 저장된 태그만 읽음)
+            if embedder and not reuse:
+                schedule_role_tagging(index_name, force=True)
         
         # 디렉토리 구조 생성
         directory_structure = fetcher.get_directory_structure()
         
         print(f"[DEBUG] 파일 수집 완료: {len(files)} 파일")
-        
-        # 임베딩 처리
-        if session_id:
-            embedder = RepositoryEmbedder(session_id)
-            embedder.process_and_embed(files)
-            print(f"[DEBUG] 임베딩 처리 완료")
-        
 
         # 총 분석 시간 계산 및 출력
         total_time = time.time() - start_time
@@ -191,19 +409,192 @@ def analyze_repository(repo_url: str, token: Optional[str] = None, session_id: O
         # 분석 결과를 텍스트 파일로 저장
         save_analysis_log(repo_url, len(files), directory_structure, total_time, session_id)
         
-        return {
+        result = {
             'success': True,
             'files': files,
             'directory_structure': directory_structure,
             'total_files': len(files)
         }
-        
+        if changes is not None:
+            result['changes'] = changes
+        if index_name:
+            result['index_name'] = index_name
+            # 임베딩 재시도 대기 중인 청크가 있으면 partial (백그라운드 재시도가 끝나면 ready)
+            result['index_status'] = get_index_status(index_name)
+        if fetcher.commit_sha:
+            result['commit_sha'] = fetcher.commit_sha
+        return result
+        
+    except AnalysisCancelled:
+        print(f"[INFO] 저장소 분석 취소됨: {repo_url}")
+        raise
     except Exception as e:
         import traceback
         print(f"[ERROR] 저장소 분석 실패: {e}")
         traceback.print_exc()
         return {'success': False, 'error': f'저장소 분석 중 오류 발생: {str(e)}'}
 
+def get_repo_index_name(owner: str, repo: str, commit_sha: str, variant: str = '') -> str:
+    """
+    (owner, repo, 커밋 SHA)로 여러 세션이 공유하는 벡터 인덱스(컬렉션) 이름을 생성
+
+    Args:
+        owner (str): 저장소 소유자
+        repo (str): 저장소 이름
+        commit_sha (str): 분석 기준 커밋 SHA
+        variant (str): 색인 대상이 기본과 다를 때 덧붙일 식별자 (예: 사용자 파일 패턴 FileFilter.signature)
+
+    Returns:
+        str: ChromaDB 컬렉션 이름
+    """
+    # GitHub 저장소 이름은 대소문자를 구분하지 않으므로 소문자로 통일
+    # ChromaDB 이름 규칙상 연속된 마침표는 허용되지 않음
+    name = f"index_{owner.lower()}_{repo.lower()}_{commit_sha}"
+    if variant:
+        name += f"_{variant}"
+    return re.sub(r'\.{2,}', '.', name)
+
+def repo_index_exists(index_name: str) -> bool:
+    """컬렉션(인덱스) 존재 여부 확인"""
+    try:
+        chroma_client.get_collection(name=index_name)
+        return True
+    except Exception:
+        return False
+
+def drop_repo_index(index_name: str) -> bool:
+    """
+    벡터 인덱스(컬렉션) 삭제
+
+    Args:
+        index_name (str): 삭제할 컬렉션 이름
+
+    Returns:
+        bool: 삭제 여부 (존재하지 않으면 False)
+    """
+    invalidate_collection_cache(collection_name=index_name)
+    retry_queue = get_retry_queue()
+    if retry_queue:
+        retry_queue.discard(index_name)
+    rerank_store = get_rerank_store()
+    if rerank_store:
+        rerank_store.delete(index_name)
+    lexical_index = get_lexical_index()
+    if lexical_index:
+        lexical_index.delete(index_name)
+    outline_index = get_outline_index()
+    if outline_index:
+        outline_index.delete(index_name)
+    try:
+        chroma_client.delete_collection(name=index_name)
+        print(f"[INFO] 벡터 인덱스 삭제: {index_name}")
+        return True
+    except Exception as e:
+        print(f"[DEBUG] 벡터 인덱스 삭제 건너뜀 ({index_name}): {e}")
+        return False
+
+# 같은 인덱스를 동시에 두 번 만들지 않도록 인덱스별 잠금 사용
+index_build_locks = {}
+index_build_locks_guard = threading.Lock()
+
+def get_index_build_lock(index_name: str) -> threading.Lock:
+    """인덱스 이름별 빌드 잠금 반환"""
+    with index_build_locks_guard:
+        return index_build_locks.setdefault(index_name, threading.Lock())
+
+def get_index_status(index_name: str) -> Dict[str, Any]:
+    """
+    벡터 인덱스의 색인 상태 (임베딩 재시도 대기 중인 청크가 있으면 partial)
+
+    Returns:
+        Dict[str, Any]: {'status': 'ready' | 'partial', 'pending_chunks', 'failed_chunks'}
+    """
+    retry_queue = get_retry_queue()
+    counts = retry_queue.pending_counts(index_name) if retry_queue else {'pending': 0, 'failed': 0}
+    return {
+        'status': 'partial' if counts['pending'] or counts['failed'] else 'ready',
+        'pending_chunks': counts['pending'],
+        'failed_chunks': counts['failed']
+    }
+
+def is_transient_embedding_error(error: Exception) -> bool:
+    """시간이 지나면 성공할 수 있는 임베딩 오류인지 여부 (요청 자체가 거부된 4xx는 제외)"""
+    if isinstance(error, openai.APIStatusError):
+        return isinstance(error, (openai.RateLimitError, openai.InternalServerError))
+    return True
+
+def retry_embedding_batch(batch: Dict[str, Any]):
+    """
+    재시도 큐의 묶음 하나를 다시 임베딩하여 원래 컬렉션에 저장 (실패 시 예외 발생)
+    컬렉션이 이미 삭제되었으면 재시도할 필요가 없으므로 항목만 제거합니다.
+    """
+    if not repo_index_exists(batch['collection_name']):
+        print(f"[DEBUG] 삭제된 인덱스의 재시도 항목 제거: {batch['collection_name']}")
+        get_retry_queue().discard(batch['collection_name'])
+        return
+
+    embedder = RepositoryEmbedder(None, batch['collection_name'])
+    texts = [
+        truncate_to_tokens(document) if (metadata.get('token_count') or 0) > EMBEDDING_MAX_INPUT_TOKENS else document
+        for document, metadata in zip(batch['documents'], batch['metadatas'])
+    ]
+    # 컬렉션을 만든 제공자로 임베딩 (같은 벡터 공간 유지)
+    provider = embedder.provider
+    embeddings = provider.embed(texts)
+
+    cache = get_embedding_cache() if provider.cacheable else None
+    if cache:
+        try:
+            cache.put_many(provider.model, texts, embeddings)
+        except Exception as e:
+            print(f"[WARNING] 임베딩 캐시 저장 실패: {e}")
+    saved = embedder.add_chunk_batch(batch['ids'], embeddings, batch['documents'], batch['metadatas'])
+    if saved < len(batch['ids']):
+        raise RuntimeError(f"DB 저장 실패 ({len(batch['ids']) - saved}개 청크)")
+
+_retry_worker: Optional[EmbeddingRetryWorker] = None
+_retry_worker_lock = threading.Lock()
+
+def start_embedding_retry_worker() -> Optional[EmbeddingRetryWorker]:
+    """
+    임베딩 재시도 백그라운드 작업자를 시작 (이미 실행 중이면 깨우기만 함)
+    서버 시작 시와 분석 중 재시도 큐에 항목이 추가될 때 호출합니다.
+    """
+    global _retry_worker
+    retry_queue = get_retry_queue()
+    if not retry_queue:
+        return None
+    with _retry_worker_lock:
+        if _retry_worker is None:
+            _retry_worker = EmbeddingRetryWorker(retry_queue, retry_embedding_batch, is_transient_embedding_error)
+            _retry_worker.start()
+            print("[INFO] 임베딩 재시도 작업자 시작")
+        else:
+            _retry_worker.wake()
+        return _retry_worker
+
+_role_tag_worker: Optional[RoleTagWorker] = None
+_role_tag_worker_lock = threading.Lock()
+
+def schedule_role_tagging(index_name: str, force: bool = False):
+    """
+    인덱스의 태그 없는 청크를 백그라운드에서 역할 태깅하도록 예약 (작업자가 없으면 시작)
+    인덱스 빌드 완료 시(force=True)와 채팅에서 태그 없이 만들어진 기존 인덱스를 처음 사용할 때 호출합니다.
+
+    Args:
+        index_name (str): 벡터 인덱스(컬렉션) 이름
+        force (bool): True면 이미 처리한 인덱스도 새 청크와 태깅하지 못한 청크를 다시 확인
+    """
+    global _role_tag_worker
+    if not ROLE_TAGGING or not index_name:
+        return
+    with _role_tag_worker_lock:
+        if _role_tag_worker is None:
+            _role_tag_worker = RoleTagWorker(lambda name: chroma_client.get_collection(name=name))
+            _role_tag_worker.start()
+            print("[INFO] 역할 태깅 작업자 시작")
+    _role_tag_worker.enqueue(index_name, force=force)
+
 def cleanup_chromadb_for_session(session_id: str):
     """
     특정 세션의 ChromaDB 데이터를 정리하는 함수
@@ -257,7 +648,7 @@ def get_repository_branches(repo_url: str, token: Optional[str] = None) -> Dict[
         print(f"[DEBUG] 헤더 존재: {'Authorization' in headers}")
         print(f"[DEBUG] 토큰 첫 8자리: {token[:8] if token else 'None'}...")
         
-        response = requests.get(url, headers=headers, timeout=30)
+        response = github_get(url, headers=headers, use_cache=True, timeout=30)
         print(f"[DEBUG] API 응답: status_code={response.status_code}")
         
         if response.status_code == 200:
@@ -334,7 +725,7 @@ def get_repository_file_tree(repo_url: str, branch: str = 'main', token: Optiona
         print(f"[DEBUG] GitHub API 호출: {url}")
         print(f"[DEBUG] 헤더 존재: {'Authorization' in headers}")
         
-        response = requests.get(url, headers=headers)
+        response = github_get(url, headers=headers, use_cache=True)
         api_call_counter['github'] += 1  # GitHub API 호출 카운트
         print(f"[DEBUG] API 응답: status_code={response.status_code}")
         
@@ -424,7 +815,7 @@ def get_file_content(repo_url: str, file_path: str, branch: str = 'main', token:
         print(f"[DEBUG] GitHub API 호출: {url}")
         print(f"[DEBUG] 헤더 존재: {'Authorization' in headers}")
         
-        response = requests.get(url, headers=headers)
+        response = github_get(url, headers=headers, use_cache=True)
         api_call_counter['github'] += 1  # GitHub API 호출 카운트
         print(f"[DEBUG] API 응답: status_code={response.status_code}")
         
@@ -478,6 +869,81 @@ def get_file_content(repo_url: str, file_path: str, branch: str = 'main', token:
             'error': f'파일 내용 조회 중 오류 발생: {str(e)}'
         }
 
+# 아카이브 다운로드/압축 해제 실패로 간주하는 예외 (파일별 /contents 방식으로 폴백)
+# (응답 raw 스트림을 직접 읽으므로 urllib3 예외도 포함)
+ARCHIVE_ERRORS = (requests.exceptions.RequestException, urllib3.exceptions.HTTPError, tarfile.TarError, EOFError, OSError)
+
+def iter_tar_archive_files(fileobj, source_url_prefix: str, wanted_paths: Optional[set] = None):
+    """
+    GitHub tarball 스트림을 디스크에 풀지 않고 순차적으로 읽어 주요 파일 내용을 생성하는 제너레이터
+
+    get_file_contents와 동일한 형식의 딕셔너리를 반환하며,
+    MAIN_EXTENSIONS / 압축(minified) 파일 / 크기 제한 필터를 읽는 즉시 적용합니다.
+
+    Args:
+        fileobj: gzip 압축된 tar 스트림 (예: requests 응답의 raw 스트림)
+        source_url_prefix (str): 파일 경로 앞에 붙일 URL (예: https://github.com/{owner}/{repo}/blob/{ref})
+        wanted_paths (Optional[set]): 지정 시 이 경로에 포함된 파일만 반환 (트리 조회 결과 재사용)
+
+    Yields:
+        Dict[str, Any]: {'path', 'content', 'file_name', 'file_type', 'sha', 'source_url'}
+    """
+    # 'r|'는 순차 스트림 모드라 전체 아카이브를 메모리/디스크에 올리지 않음
+    # gzip 해제는 GzipFile로 직접 처리: tarfile의 'r|gz'는 스트림이 블록 경계에서 끊기면
+    # 정상 종료로 오인하지만, GzipFile은 EOFError를 발생시켜 폴백할 수 있게 함
+    gz = gzip.GzipFile(fileobj=fileobj, mode='rb')
+    with tarfile.open(fileobj=gz, mode='r|') as tar:
+        for member in tar:
+            # 심볼릭 링크/디렉토리 등은 제외 (pax 글로벌 헤더는 tarfile이 처리)
+            if not member.isfile():
+                continue
+
+            # 최상위 디렉토리({owner}-{repo}-{sha}/) 제거
+            parts = member.name.split('/', 1)
+            if len(parts) < 2 or not parts[1]:
+                continue
+            path = parts[1]
+
+            if wanted_paths is not None:
+                if path not in wanted_paths:
+                    continue
+            elif not any(path.endswith(ext) for ext in MAIN_EXTENSIONS):
+                continue
+            if any(pattern in path.lower() for pattern in MINIFIED_FILE_PATTERNS):
+                continue
+            # UTF-8 한 글자는 최대 4바이트이므로 이보다 크면 읽지 않고 건너뜀
+            if member.size > MAX_FILE_CONTENT_SIZE * 4:
+                print(f"[DEBUG] 큰 파일 제외 (크기: {member.size}): {path}")
+                continue
+
+            extracted = tar.extractfile(member)
+            if extracted is None:
+                continue
+            data = extracted.read()
+            try:
+                content = data.decode('utf-8')
+            except UnicodeDecodeError:
+                print(f"[WARNING] UTF-8이 아닌 파일 제외: {path}")
+                continue
+            if len(content) > MAX_FILE_CONTENT_SIZE:
+                print(f"[DEBUG] 큰 파일 제외 (크기: {len(content)}): {path}")
+                continue
+
+            file_name = path.split('/')[-1]
+            yield {
+                'path': path,
+                'content': content,
+                'file_name': file_name,
+                'file_type': file_name.split('.')[-1],
+                # /contents API가 돌려주는 것과 같은 git blob SHA
+                'sha': hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest(),
+                'source_url': f"{source_url_prefix}/{path}",
+            }
+
+    # 아카이브 끝 표시 뒤 남은 패딩까지 읽어 gzip 트레일러(CRC/길이) 검증
+    while gz.read(64 * 1024):
+        pass
+
 class GitHubRepositoryFetcher:
     """
     GitHub 저장소에서 파일을 가져오는 클래스
@@ -486,7 +952,8 @@ class GitHubRepositoryFetcher:
     LangChain Document 형식으로 변환하는 기능을 제공합니다.
     """
     
-    def __init__(self, repo_url: str, token: Optional[str] = None, session_id: Optional[str] = None):
+    def __init__(self, repo_url: str, token: Optional[str] = None, session_id: Optional[str] = None,
+                 progress_callback=None, file_filter: Optional[FileFilter] = None):
         """
         GitHub 저장소 뷰어 초기화
         
@@ -494,12 +961,21 @@ class GitHubRepositoryFetcher:
             repo_url (str): GitHub 저장소 URL
             token (Optional[str]): GitHub 개인 액세스 토큰
             session_id (Optional[str]): 세션 ID (기본값: owner_repo)
+            progress_callback: 단계별 진행 이벤트를 받을 함수 (emit_progress 참고)
+            file_filter (Optional[FileFilter]): 내용을 받기 전 파일 목록에 적용할 필터 (기본값: 기본 규칙만 적용)
         """
         self.repo_url = repo_url
+        self.progress_callback = progress_callback
+        self.file_filter = file_filter or FileFilter()
         self.token = token
         self.headers = {'Authorization': f'token {token}'} if token else {}
         self.files = []
-        
+        # git/trees 재귀 조회 결과 (tree 수집 방식에서 파일 목록과 디렉토리 구조를 함께 만드는 데 사용)
+        self.tree_entries = []
+        self.default_branch = None
+        # 분석 기준 커밋 SHA (설정되면 트리/아카이브 조회가 모두 이 커밋을 기준으로 함)
+        self.commit_sha = None
+
         # 저장소 정보 추출
         self.owner, self.repo, self.path = self.extract_repo_info(repo_url)
         if not self.owner or not self.repo:
@@ -601,17 +1077,19 @@ class GitHubRepositoryFetcher:
 
     def clone_repo(self):
         """
-        GitHub 저장소를 로컬에 클론
+        저장소를 로컬 작업 디렉토리(self.repo_path)에 준비
+
+        세션마다 전체 클론하지 않고 저장소별 blob 없는 미러에서 worktree를 만듦 (repo_store 참고)
         
         Raises:
-            Exception: 클론 실패 시 예외 발생
+            Exception: 준비 실패 시 예외 발생
         """
-        if not os.path.exists(self.repo_path):
-            try:
-                git.Repo.clone_from(self.repo_url, self.repo_path)
-            except Exception as e:
-                print("[DEBUG] GitHub 클론 에러:", e)
-                raise
+        from repo_store import get_repo_store
+        result = get_repo_store().ensure_session_worktree(self.session_id, self.repo_url, self.token, self.commit_sha)
+        if not result.get('success'):
+            print("[DEBUG] GitHub 클론 에러:", result.get('error'))
+            raise Exception(result.get('error'))
+        self.repo_path = result['repo_path']
 
     def get_repo_directory_contents(self, path: str = "") -> Union[List[Dict[str, Any]], Dict[str, Any]]:
         """
@@ -635,7 +1113,7 @@ class GitHubRepositoryFetcher:
                 headers["Authorization"] = f"token {self.token}"
             
             # API 요청 실행
-            response = requests.get(url, headers=headers)
+            response = github_get(url, headers=headers)
             api_call_counter['github'] += 1  # GitHub API 호출 카운트
             content = self.handle_github_response(response, path)
             
@@ -673,7 +1151,7 @@ class GitHubRepositoryFetcher:
                 headers["Authorization"] = f"token {self.token}"
             
             # API 요청 실행
-            response = requests.get(url, headers=headers)
+            response = github_get(url, headers=headers)
             api_call_counter['github'] += 1  # GitHub API 호출 카운트
             content_data = self.handle_github_response(response, path)
             
@@ -792,31 +1270,38 @@ class GitHubRepositoryFetcher:
         return files
 
     def filter_main_files(self):
-        self.files = self.get_all_main_files()
+        # 디렉토리 탐색 방식은 blob 크기를 모르므로 경로 기준 필터만 적용 (크기는 내용을 받은 뒤 확인)
+        self.files = self.file_filter.filter_paths(self.get_all_main_files())
+        print(f"[INFO] 사전 필터링 제외: {self.file_filter.describe_stats()}")
         print(f"[DEBUG] 필터링된 주요 파일: {self.files}")
         print(f"[DEBUG] 주요 파일 개수: {len(self.files)}")
+        emit_progress(self.progress_callback, 'tree_listed', len(self.files), len(self.files),
+                      f'파일 목록 수집 완료 ({len(self.files)}개 파일)')
 
-    def get_file_contents(self) -> List[Dict[str, Any]]:
+    def iter_file_contents(self, paths: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
         """
-        주요 파일의 내용을 병렬로 읽어 딕셔너리 리스트로 반환
-        ThreadPoolExecutor를 사용하여 GitHub API 호출을 병렬화
-        Returns:
-            List[Dict[str, Any]]: 
-                파일 경로와 내용을 포함하는 딕셔너리 리스트
-                [{'path': '...', 'content': '...', 'file_name': ..., 'file_type': ..., 'sha': ..., 'source_url': ...}, ...]
+        주요 파일의 내용을 병렬로 읽어 완료되는 순서대로 파일 딕셔너리를 생성하는 제너레이터
+        ThreadPoolExecutor를 사용하여 GitHub API 호출을 병렬화하며,
+        소비자가 중간에 멈추면(취소/오류) 대기 중인 요청은 실행하지 않습니다.
+
+        Args:
+            paths (Optional[List[str]]): 가져올 파일 경로 목록 (기본값: self.files)
+
+        Yields:
+            Dict[str, Any]: {'path', 'content', 'file_name', 'file_type', 'sha', 'source_url'}
         """
-        file_objs = []
-        
         # 큰 파일 필터링
         filtered_paths = [
-            path for path in self.files
-            if not any(pattern in path.lower() for pattern in ['.min.js', '.min.css', 'bootstrap.min', 'jquery.min'])
+            path for path in (self.files if paths is None else paths)
+            if not any(pattern in path.lower() for pattern in MINIFIED_FILE_PATTERNS)
         ]
         
         print(f"[DEBUG] 병렬 파일 내용 가져오기 시작: {len(filtered_paths)}개 파일")
         
         # ThreadPoolExecutor로 병렬 처리 (최대 30개 동시 실행)
-        with ThreadPoolExecutor(max_workers=30) as executor:
+        executor = ThreadPoolExecutor(max_workers=30)
+        success_count = 0
+        try:
             # 각 파일에 대한 작업 제출
             future_to_path = {
                 executor.submit(self.get_repo_content_as_document, path): path 
@@ -827,24 +1312,24 @@ class GitHubRepositoryFetcher:
             completed_count = 0
             for future in as_completed(future_to_path):
                 path = future_to_path[future]
+                file_obj = None
                 try:
                     doc = future.result(timeout=10)  # 10초 타임아웃
                     if doc:
                         # 내용 크기 확인
                         content_size = len(doc.page_content)
-                        if content_size > 100000:  # 100KB 이상 파일 제외
+                        if content_size > MAX_FILE_CONTENT_SIZE:  # 100KB 이상 파일 제외
                             print(f"[DEBUG] 큰 파일 제외 (크기: {content_size}): {path}")
-                            continue
-                        
-                        meta = doc.metadata
-                        file_objs.append({
-                            'path': path,
-                            'content': doc.page_content,
-                            'file_name': meta.get('file_name'),
-                            'file_type': meta.get('file_name', '').split('.')[-1] if meta.get('file_name') else '',
-                            'sha': meta.get('sha'),
-                            'source_url': meta.get('source'),
-                        })
+                        else:
+                            meta = doc.metadata
+                            file_obj = {
+                                'path': path,
+                                'content': doc.page_content,
+                                'file_name': meta.get('file_name'),
+                                'file_type': meta.get('file_name', '').split('.')[-1] if meta.get('file_name') else '',
+                                'sha': meta.get('sha'),
+                                'source_url': meta.get('source'),
+                            }
                     
                     completed_count += 1
                     if completed_count % 50 == 0:
@@ -852,9 +1337,156 @@ class GitHubRepositoryFetcher:
                         
                 except Exception as e:
                     print(f"[WARNING] 파일 가져오기 실패 {path}: {e}")
-        
-        print(f"[DEBUG] 병렬 파일 내용 가져오기 완료: {len(file_objs)}개 성공")
-        return file_objs
+                
+                emit_progress(self.progress_callback, 'files_fetched', completed_count, len(filtered_paths),
+                              f'파일 내용 수집 중 ({completed_count}/{len(filtered_paths)})')
+                if file_obj:
+                    success_count += 1
+                    yield file_obj
+        finally:
+            # 취소/중단 시 대기 중인 요청은 실행하지 않고 정리
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        print(f"[DEBUG] 병렬 파일 내용 가져오기 완료: {success_count}개 성공")
+
+    def get_file_contents(self) -> List[Dict[str, Any]]:
+        """
+        주요 파일의 내용을 병렬로 읽어 딕셔너리 리스트로 반환 (iter_file_contents 참고)
+        Returns:
+            List[Dict[str, Any]]: 
+                파일 경로와 내용을 포함하는 딕셔너리 리스트
+                [{'path': '...', 'content': '...', 'file_name': ..., 'file_type': ..., 'sha': ..., 'source_url': ...}, ...]
+        """
+        return list(self.iter_file_contents())
+
+    def iter_file_contents_by_mode(self, fetch_mode: str = FETCH_MODE) -> Iterator[Dict[str, Any]]:
+        """
+        수집 방식에 따라 self.files의 파일 내용을 받는 대로 생성하는 제너레이터
+        'archive' 방식이 실패하면 아직 받지 못한 파일만 파일별로 가져오며,
+        파일별로 가져올 파일이 GRAPHQL_THRESHOLD개 이상이면 GraphQL 묶음 조회를 사용합니다.
+
+        Args:
+            fetch_mode (str): 'archive', 'contents' 또는 'graphql'
+
+        Yields:
+            Dict[str, Any]: get_file_contents와 같은 형식의 파일 딕셔너리
+        """
+        if fetch_mode == 'archive':
+            received = set()
+            try:
+                for file_obj in self.iter_file_contents_from_archive():
+                    received.add(file_obj['path'])
+                    yield file_obj
+                return
+            except ARCHIVE_ERRORS as e:
+                print(f"[WARNING] 아카이브 처리 중 오류: {e}")
+            print(f"[WARNING] 아카이브 수집 실패, 파일별 호출 방식으로 폴백합니다. (이미 받은 파일 {len(received)}개 제외)")
+            yield from self.iter_file_contents_per_file([path for path in self.files if path not in received])
+            return
+        if fetch_mode == 'graphql' and self.token:
+            yield from self.iter_file_contents_graphql()
+            return
+        yield from self.iter_file_contents_per_file(self.files)
+
+    def iter_file_contents_per_file(self, paths: List[str]) -> Iterator[Dict[str, Any]]:
+        """
+        지정 파일을 파일 수에 따라 /contents 개별 호출 또는 GraphQL 묶음 조회로 가져오는 제너레이터
+        (GraphQL API는 인증이 필요하므로 토큰이 있을 때만 묶음 조회)
+        """
+        if self.token and len(paths) >= GRAPHQL_THRESHOLD:
+            print(f"[DEBUG] 파일 {len(paths)}개 - GraphQL 묶음 조회 사용 (기준 {GRAPHQL_THRESHOLD}개)")
+            yield from self.iter_file_contents_graphql(paths)
+            return
+        yield from self.iter_file_contents(paths)
+
+    def iter_file_contents_graphql(self, paths: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        self.files(또는 paths)의 파일 내용을 GraphQL 묶음 조회로 받는 대로 생성하는 제너레이터
+        쿼리 자체가 실패하면 아직 받지 못한 파일만 파일별 /contents 호출 방식으로 가져옵니다.
+        """
+        from github_analyzer_graphql import iter_graphql_file_contents
+        paths = self.files if paths is None else paths
+        received = set()
+        try:
+            for file_obj in iter_graphql_file_contents(self, paths):
+                received.add(file_obj['path'])
+                yield file_obj
+            return
+        except requests.exceptions.RequestException as e:
+            print(f"[WARNING] GraphQL 수집 실패: {e}")
+        print(f"[WARNING] 파일별 /contents 호출 방식으로 폴백합니다. (이미 받은 파일 {len(received)}개 제외)")
+        yield from self.iter_file_contents([path for path in paths if path not in received])
+
+    def get_file_contents_by_mode(self, fetch_mode: str = FETCH_MODE) -> List[Dict[str, Any]]:
+        """
+        수집 방식에 따라 self.files의 파일 내용을 가져옴 (iter_file_contents_by_mode 참고)
+
+        Args:
+            fetch_mode (str): 'archive' 또는 'contents'
+
+        Returns:
+            List[Dict[str, Any]]: get_file_contents와 같은 형식의 파일 딕셔너리 리스트
+        """
+        return list(self.iter_file_contents_by_mode(fetch_mode))
+
+    def iter_file_contents_from_archive(self, ref: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        저장소 tarball을 한 번 스트리밍 다운로드하며 주요 파일 내용을 읽는 대로 생성하는 제너레이터
+        파일마다 /contents를 호출하는 get_file_contents와 같은 형식의 딕셔너리를 생성합니다.
+
+        Args:
+            ref (Optional[str]): 브랜치/태그/커밋 SHA (기본값: self.commit_sha 또는 저장소 기본 브랜치)
+
+        Yields:
+            Dict[str, Any]: 파일 딕셔너리
+
+        Raises:
+            ARCHIVE_ERRORS: 다운로드/압축 해제 실패 시
+        """
+        ref = ref or self.commit_sha or self.get_default_branch()
+        if not ref:
+            raise requests.exceptions.RequestException('기본 브랜치를 확인할 수 없습니다.')
+
+        url = f"https://api.github.com/repos/{self.owner}/{self.repo}/tarball/{ref}"
+        headers = {}
+        if self.token:
+            headers["Authorization"] = f"token {self.token}"
+
+        print(f"[DEBUG] 저장소 아카이브 다운로드 시작: {self.owner}/{self.repo}@{ref}")
+        with github_get(url, headers=headers, stream=True, timeout=60) as response:
+            api_call_counter['github'] += 1  # GitHub API 호출 카운트
+            if response.status_code != 200:
+                raise requests.exceptions.HTTPError(f'아카이브 다운로드 실패: HTTP {response.status_code}')
+            response.raw.decode_content = True
+
+            # 트리 조회로 파일 목록이 이미 있다면 같은 목록만 사용
+            wanted_paths = set(self.files) if self.files else None
+            source_url_prefix = f"https://github.com/{self.owner}/{self.repo}/blob/{ref}"
+            total = len(wanted_paths) if wanted_paths else 0
+            received_count = 0
+            for file_obj in iter_tar_archive_files(response.raw, source_url_prefix, wanted_paths):
+                received_count += 1
+                emit_progress(self.progress_callback, 'files_fetched', received_count, total,
+                              f'파일 내용 수집 중 ({received_count}/{total or "?"})')
+                yield file_obj
+
+        print(f"[DEBUG] 아카이브 기반 파일 내용 가져오기 완료: {received_count}개")
+
+    def get_file_contents_from_archive(self, ref: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        저장소 tarball을 한 번 스트리밍 다운로드하여 주요 파일 내용을 가져옴 (iter_file_contents_from_archive 참고)
+
+        Args:
+            ref (Optional[str]): 브랜치/태그/커밋 SHA (기본값: self.commit_sha 또는 저장소 기본 브랜치)
+
+        Returns:
+            Optional[List[Dict[str, Any]]]: 파일 딕셔너리 리스트 또는 None (다운로드 실패 시)
+        """
+        try:
+            return list(self.iter_file_contents_from_archive(ref))
+        except ARCHIVE_ERRORS as e:
+            print(f"[WARNING] 아카이브 처리 중 오류: {e}")
+            return None
 
     def generate_directory_structure(self) -> str:
         """
@@ -874,6 +1506,19 @@ class GitHubRepositoryFetcher:
             return tree
         
         tree = build_tree()
+        return self.render_directory_tree(tree)
+
+    @staticmethod
+    def render_directory_tree(tree: Dict[str, Any]) -> str:
+        """
+        중첩 딕셔너리 형태의 디렉토리 트리를 들여쓰기 텍스트로 변환
+
+        Args:
+            tree (Dict[str, Any]): {"📁 이름": 하위 트리, "📄 이름": None} 형태의 트리
+
+        Returns:
+            str: 디렉토리 구조 트리 텍스트
+        """
         lines = []
         def traverse(node, prefix=""):
             for key, value in sorted(node.items()):
@@ -883,6 +1528,202 @@ class GitHubRepositoryFetcher:
         traverse(tree)
         return "\n".join(lines)
 
+    # ----------------- git/trees 기반 수집 기능 -----------------
+    def get_default_branch(self) -> Optional[str]:
+        """
+        저장소 기본 브랜치 이름을 조회 (GitHub API 1회 호출)
+
+        Returns:
+            Optional[str]: 기본 브랜치 이름 또는 None (조회 실패 시)
+        """
+        if self.default_branch:
+            return self.default_branch
+        try:
+            url = f"https://api.github.com/repos/{self.owner}/{self.repo}"
+            headers = {
+                "Accept": "application/vnd.github.v3+json"
+            }
+            if self.token:
+                headers["Authorization"] = f"token {self.token}"
+
+            response = github_get(url, headers=headers, timeout=30)
+            api_call_counter['github'] += 1  # GitHub API 호출 카운트
+            repo_info = self.handle_github_response(response)
+            if isinstance(repo_info, dict) and repo_info.get('error'):
+                print(f"[WARNING] 저장소 정보 조회 실패: {repo_info.get('message')}")
+                return None
+            self.default_branch = repo_info.get('default_branch')
+            return self.default_branch
+        except Exception as e:
+            print(f"[WARNING] 기본 브랜치 조회 중 오류: {e}")
+            return None
+
+    def resolve_commit_sha(self, ref: Optional[str] = None) -> Optional[str]:
+        """
+        브랜치(기본값: 기본 브랜치)가 가리키는 커밋 SHA를 조회하여 self.commit_sha에 고정
+        이후 트리/아카이브 조회가 같은 커밋을 기준으로 이루어집니다. (GitHub API 1회 호출)
+
+        Args:
+            ref (Optional[str]): 브랜치/태그 이름 (기본값: 저장소 기본 브랜치)
+
+        Returns:
+            Optional[str]: 커밋 SHA 또는 None (조회 실패 시)
+        """
+        try:
+            ref = ref or self.get_default_branch()
+            if not ref:
+                return None
+
+            url = f"https://api.github.com/repos/{self.owner}/{self.repo}/commits/{ref}"
+            headers = {
+                # SHA 문자열만 받는 미디어 타입 (커밋 본문/diff를 내려받지 않음)
+                "Accept": "application/vnd.github.sha"
+            }
+            if self.token:
+                headers["Authorization"] = f"token {self.token}"
+
+            response = github_get(url, headers=headers, timeout=30)
+            api_call_counter['github'] += 1  # GitHub API 호출 카운트
+            commit_sha = response.text.strip() if response.status_code == 200 else ''
+            if not re.fullmatch(r'[0-9a-f]{40}', commit_sha):
+                print(f"[WARNING] 커밋 SHA 조회 실패: HTTP {response.status_code}")
+                return None
+
+            self.commit_sha = commit_sha
+            print(f"[DEBUG] 분석 기준 커밋: {ref} -> {commit_sha}")
+            return commit_sha
+        except Exception as e:
+            print(f"[WARNING] 커밋 SHA 조회 중 오류: {e}")
+            return None
+
+    def get_repo_tree(self, ref: Optional[str] = None) -> Union[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        git/trees/{ref}?recursive=1 한 번의 호출로 저장소 전체 트리를 가져옴
+
+        Args:
+            ref (Optional[str]): 브랜치/태그/커밋 SHA (기본값: self.commit_sha 또는 저장소 기본 브랜치)
+
+        Returns:
+            Union[List[Dict[str, Any]], Dict[str, Any]]:
+                트리 항목 목록 ({'path', 'type', 'sha', 'size', 'mode'}) 또는 에러 정보
+                응답이 잘린(truncated) 경우에도 에러 정보를 반환하여 기존 방식으로 폴백하도록 함
+        """
+        try:
+            ref = ref or self.commit_sha or self.get_default_branch()
+            if not ref:
+                return self.create_error_response('기본 브랜치를 확인할 수 없습니다.', 500)
+
+            url = f"https://api.github.com/repos/{self.owner}/{self.repo}/git/trees/{ref}?recursive=1"
+            headers = {
+                "Accept": "application/vnd.github.v3+json"
+            }
+            if self.token:
+                headers["Authorization"] = f"token {self.token}"
+
+            response = github_get(url, headers=headers, timeout=60, use_cache=True)
+            api_call_counter['github'] += 1  # GitHub API 호출 카운트
+            tree_data = self.handle_github_response(response)
+
+            if isinstance(tree_data, dict) and tree_data.get('error'):
+                return tree_data
+            if not isinstance(tree_data, dict) or 'tree' not in tree_data:
+                return self.create_error_response("잘못된 응답 형식", 500)
+            if tree_data.get('truncated'):
+                # 항목 수 제한(10만 개/7MB)을 넘으면 GitHub가 목록을 잘라서 반환함
+                return self.create_error_response('트리 응답이 잘렸습니다 (truncated).', 413)
+
+            return tree_data['tree']
+
+        except requests.exceptions.RequestException as e:
+            return self.create_error_response(f'API 요청 실패: {str(e)}', 500)
+        except Exception as e:
+            return self.create_error_response(f'예상치 못한 오류: {str(e)}', 500)
+
+    def load_tree(self, ref: Optional[str] = None) -> bool:
+        """
+        재귀 트리를 한 번 조회하여 self.tree_entries와 주요 파일 목록(self.files)을 채움
+
+        Args:
+            ref (Optional[str]): 브랜치/태그/커밋 SHA (기본값: 저장소 기본 브랜치)
+
+        Returns:
+            bool: 트리 로드 성공 여부
+        """
+        entries = self.get_repo_tree(ref)
+        if isinstance(entries, dict) and entries.get('error'):
+            print(f"[WARNING] git/trees 조회 실패: {entries.get('message')}")
+            return False
+
+        self.tree_entries = entries
+        # 디렉토리 탐색 방식(get_all_main_files)과 동일한 기준으로 주요 파일 선택
+        # (심볼릭 링크는 /contents 목록에서 'file'로 나오지 않으므로 제외)
+        main_entries = [
+            item for item in entries
+            if item.get('type') == 'blob' and item.get('mode') != '120000'
+            and any(item['path'].endswith(ext) for ext in MAIN_EXTENSIONS)
+        ]
+        # 내용을 받기 전에 크기/vendored/생성 파일/사용자 패턴으로 걸러냄
+        self.load_gitattributes()
+        self.files = self.file_filter.apply(main_entries)
+        print(f"[DEBUG] git/trees 기반 파일 수집 완료: 전체 항목 {len(entries)}개, 주요 파일 {len(self.files)}개")
+        print(f"[INFO] 사전 필터링 제외: {self.file_filter.describe_stats()}")
+        emit_progress(self.progress_callback, 'tree_listed', len(self.files), len(self.files),
+                      f'파일 목록 수집 완료 ({len(self.files)}개 파일)')
+        return True
+
+    def load_gitattributes(self):
+        """
+        트리에 있는 .gitattributes 파일을 읽어 linguist-vendored/generated 규칙을 필터에 추가
+        루트에 가까운 파일부터 추가하여 하위 디렉토리 규칙이 우선하도록 하며,
+        blob SHA로 조회하므로 같은 내용은 ETag 캐시로 재사용됩니다.
+        """
+        attribute_entries = sorted(
+            (item for item in self.tree_entries
+             if item.get('type') == 'blob' and item['path'].split('/')[-1] == '.gitattributes'),
+            key=lambda item: (item['path'].count('/'), item['path'])
+        )[:GITATTRIBUTES_MAX_FILES]
+
+        headers = {"Accept": "application/vnd.github.raw"}
+        if self.token:
+            headers["Authorization"] = f"token {self.token}"
+        for item in attribute_entries:
+            try:
+                url = f"https://api.github.com/repos/{self.owner}/{self.repo}/git/blobs/{item['sha']}"
+                response = github_get(url, headers=headers, use_cache=True)
+                api_call_counter['github'] += 1  # GitHub API 호출 카운트
+                if response.status_code != 200:
+                    print(f"[WARNING] .gitattributes 조회 실패: HTTP {response.status_code} {item['path']}")
+                    continue
+                self.file_filter.add_gitattributes(response.content.decode('utf-8', errors='replace'), item['path'])
+            except requests.exceptions.RequestException as e:
+                print(f"[WARNING] .gitattributes 조회 중 오류: {e}")
+
+    def generate_directory_structure_from_tree(self) -> str:
+        """
+        이미 조회한 재귀 트리(self.tree_entries)로 디렉토리 구조 텍스트를 생성 (추가 API 호출 없음)
+        generate_directory_structure와 동일한 형식의 텍스트를 반환합니다.
+        """
+        root = {}
+        for item in self.tree_entries:
+            item_type = item.get('type')
+            if item_type == 'blob' and item.get('mode') == '120000':
+                continue
+            parts = item['path'].split('/')
+            node = root
+            # 상위 디렉토리 노드 생성 (트리 응답은 부모 디렉토리를 항상 먼저 포함하지만 방어적으로 처리)
+            for part in parts[:-1]:
+                child = node.setdefault(f"📁 {part}", {})
+                if child is None:
+                    child = node[f"📁 {part}"] = {}
+                node = child
+            name = parts[-1]
+            if item_type == 'tree':
+                node.setdefault(f"📁 {name}", {})
+            elif item_type in ('blob', 'commit'):
+                # 서브모듈(commit)은 /contents 목록에서 'file'로 표시되므로 파일로 취급
+                node[f"📄 {name}"] = None
+        return self.render_directory_tree(root)
+
     # ----------------- 토큰 관련 기능 -----------------
     @staticmethod
     def generate_key() -> bytes:
@@ -971,10 +1812,14 @@ class GitHubRepositoryFetcher:
             print(f"[오류] 토큰 저장 실패: {str(e)}")
             return False
 
-    def load_repo_data(self) -> bool:
+    def load_repo_data(self, use_tree: bool = True) -> bool:
         """
         GitHub API를 통해 저장소 데이터를 로드합니다.
         
+        Args:
+            use_tree (bool): True면 git/trees 재귀 조회 1회로 파일 목록을 수집하고,
+                실패하거나 응답이 잘린 경우 디렉토리별 /contents 탐색으로 폴백
+        
         Returns:
             bool: 데이터 로드 성공 여부
         """
@@ -984,9 +1829,15 @@ class GitHubRepositoryFetcher:
                 print("[DEBUG] 이미 파일 목록이 로드되어 있습니다.")
                 return True
                 
-            # GitHub API를 통한 파일 필터링 및 내용 가져오기
-            print("[DEBUG] GitHub API를 통한 파일 필터링 시작")
-            self.filter_main_files()
+            # git/trees 한 번의 호출로 파일 목록 수집 시도
+            if use_tree and not self.load_tree():
+                print("[WARNING] git/trees 수집 실패, 디렉토리 탐색 방식으로 폴백합니다.")
+                self.tree_entries = []
+
+            if not self.tree_entries:
+                # GitHub API를 통한 파일 필터링 및 내용 가져오기
+                print("[DEBUG] GitHub API를 통한 파일 필터링 시작")
+                self.filter_main_files()
             
             if not self.files:
                 print("[WARNING] 필터링된 파일 목록이 없습니다.")
@@ -994,6 +1845,8 @@ class GitHubRepositoryFetcher:
                 
             print(f"[DEBUG] GitHub API 데이터 로드 성공: {len(self.files)} 파일")
             return True
+        except AnalysisCancelled:
+            raise
         except Exception as e:
             import traceback
             print(f"[ERROR] GitHub API 데이터 로드 실패: {e}")
@@ -1007,6 +1860,9 @@ class GitHubRepositoryFetcher:
         Returns:
             str: 디렉토리 구조 트리 텍스트
         """
+        # 트리를 이미 조회했다면 추가 API 호출 없이 구조 생성
+        if self.tree_entries:
+            return self.generate_directory_structure_from_tree()
         return self.generate_directory_structure()
 
 class RepositoryEmbedder:
@@ -1017,672 +1873,299 @@ class RepositoryEmbedder:
     OpenAI API를 사용하여 임베딩한 후 ChromaDB에 저장합니다.
     """
     
-    def __init__(self, session_id: str):
+    def __init__(self, session_id: str, collection_name: Optional[str] = None, progress_callback=None):
         """
         임베더 초기화
         
         Args:
             session_id (str): 세션 ID
+            collection_name (Optional[str]): 저장할 컬렉션 이름
+                (기본값: 세션 전용 컬렉션 repo_{session_id}, 공유 인덱스 사용 시 get_repo_index_name 결과)
+            progress_callback: 단계별 진행 이벤트를 받을 함수 (emit_progress 참고)
         """
         self.session_id = session_id
-        collection_name = f"repo_{session_id}"
+        self.progress_callback = progress_callback
+        self.collection_name = collection_name or f"repo_{session_id}"
         
         # 컬렉션 가져오기 또는 생성 (v0 방식으로 복원)
+        # 임베딩 제공자와 벡터 저장 방식(full/compact)은 생성 시 메타데이터에 기록되며 기존 컬렉션은 기록된 방식을 유지
         self.collection = chroma_client.get_or_create_collection(
-            name=collection_name,
-            metadata={"description": f"Repository embeddings for session {session_id}"}
+            name=self.collection_name,
+            metadata=self.new_collection_metadata()
         )
+        self.provider = get_collection_provider(self.collection)
+        self.vector_config = get_vector_config(self.collection)
 
-    def process_and_embed(self, files: List[Dict[str, Any]]):
+    def new_collection_metadata(self) -> Dict[str, Any]:
+        """새 컬렉션 메타데이터 (기본 임베딩 제공자와 그 제공자에 맞는 기본 저장 방식 기록)"""
+        provider = get_embedding_provider()
+        return {
+            "description": f"Repository embeddings for {self.collection_name}",
+            **provider.collection_metadata(),
+            **vector_config_metadata(default_vector_config(provider.dimensions, provider.shortenable))
+        }
+
+    def reset(self):
+        """컬렉션을 비우고 다시 생성 (중단된 빌드의 일부 데이터 제거용, 제공자/저장 방식은 현재 기본값으로)"""
+        drop_repo_index(self.collection_name)
+        self.collection = chroma_client.get_or_create_collection(
+            name=self.collection_name,
+            metadata=self.new_collection_metadata()
+        )
+        self.provider = get_collection_provider(self.collection)
+        self.vector_config = get_vector_config(self.collection)
+
+    def is_ready(self) -> bool:
+        """임베딩이 끝까지 완료된 컬렉션인지 여부"""
+        return (self.collection.metadata or {}).get('status') == 'ready'
+
+    def mark_ready(self):
+        """임베딩 완료 표시 (다른 세션이 이 컬렉션을 그대로 재사용할 수 있음)"""
+        metadata = dict(self.collection.metadata or {})
+        metadata['status'] = 'ready'
+        self.collection.modify(metadata=metadata)
+
+    def copy_files_from(self, source: 'RepositoryEmbedder', paths: List[str]):
+        """
+        다른 컬렉션에서 지정한 파일들의 청크(임베딩 포함)를 그대로 복사
+        변경되지 않은 파일을 재임베딩 없이 새 커밋 인덱스로 옮길 때 사용합니다.
+        두 컬렉션의 벡터 저장 방식이 다르면 전체 차원 벡터로 되돌려 이 컬렉션의 방식으로 변환합니다.
+
+        Args:
+            source (RepositoryEmbedder): 원본 컬렉션의 임베더
+            paths (List[str]): 복사할 파일 경로 목록
+        """
+        copied = 0
+        for start in range(0, len(paths), 100):
+            part = paths[start:start + 100]
+            rows = source.collection.get(
+                where={'path': {'$in': part}},
+                include=['embeddings', 'documents', 'metadatas']
+            )
+            ids = rows.get('ids') or []
+            if source.vector_config != self.vector_config:
+                # 저장 방식이 다르면 전체 차원 벡터(compact 원본은 re-rank 저장소의 벡터)로 다시 저장
+                if source.vector_config['mode'] == 'compact':
+                    rerank_store = get_rerank_store()
+                    full_vectors = rerank_store.get_many(source.collection_name, ids) if rerank_store else {}
+                    keep = [j for j, chunk_id in enumerate(ids) if chunk_id in full_vectors]
+                    embeddings = [full_vectors[ids[j]].tolist() for j in keep]
+                else:
+                    keep = list(range(len(ids)))
+                    embeddings = [list(rows['embeddings'][j]) for j in keep]
+                copied += self.add_chunk_batch([ids[j] for j in keep], embeddings,
+                                               [rows['documents'][j] for j in keep], [rows['metadatas'][j] for j in keep])
+                continue
+            for batch_start in range(0, len(ids), 100):
+                batch_end = batch_start + 100
+                self.collection.add(
+                    ids=ids[batch_start:batch_end],
+                    embeddings=rows['embeddings'][batch_start:batch_end],
+                    documents=rows['documents'][batch_start:batch_end],
+                    metadatas=rows['metadatas'][batch_start:batch_end]
+                )
+            if self.vector_config['mode'] == 'compact' and get_rerank_store():
+                get_rerank_store().copy(source.collection_name, self.collection_name, part)
+            if get_lexical_index():
+                get_lexical_index().copy(source.collection_name, self.collection_name, part)
+            if get_outline_index():
+                get_outline_index().copy(source.collection_name, self.collection_name, part)
+            copied += len(ids)
+        # 원본 인덱스에서 아직 임베딩 재시도 대기 중인 청크도 함께 옮김
+        retry_queue = get_retry_queue()
+        if retry_queue:
+            retry_queue.copy(source.collection_name, self.collection_name, paths)
+        print(f"[DEBUG] 변경 없는 파일 청크 복사: {len(paths)}개 파일, {copied}개 청크")
+
+    def get_stored_file_shas(self) -> Dict[str, str]:
+        """
+        컬렉션에 저장된 파일별 blob SHA를 조회 (증분 재분석용)
+
+        Returns:
+            Dict[str, str]: {파일 경로: sha}
+        """
+        stored = {}
+        page_size = 5000
+        offset = 0
+        while True:
+            result = self.collection.get(include=['metadatas'], limit=page_size, offset=offset)
+            metadatas = result.get('metadatas') or []
+            for meta in metadatas:
+                if meta and meta.get('path'):
+                    stored[meta['path']] = meta.get('sha', '')
+            if len(metadatas) < page_size:
+                break
+            offset += page_size
+        return stored
+
+    def delete_files(self, paths: List[str]):
+        """
+        지정한 파일들의 모든 청크를 컬렉션에서 삭제
+
+        Args:
+            paths (List[str]): 삭제할 파일 경로 목록
+        """
+        paths = list(paths)
+        for start in range(0, len(paths), 100):
+            part = paths[start:start + 100]
+            self.collection.delete(where={'path': {'$in': part}})
+        retry_queue = get_retry_queue()
+        if retry_queue and paths:
+            retry_queue.discard(self.collection_name, paths)
+        rerank_store = get_rerank_store()
+        if rerank_store and paths and self.vector_config['mode'] == 'compact':
+            rerank_store.delete(self.collection_name, paths)
+        lexical_index = get_lexical_index()
+        if lexical_index and paths:
+            lexical_index.delete(self.collection_name, paths)
+        outline_index = get_outline_index()
+        if outline_index and paths:
+            outline_index.delete(self.collection_name, paths)
+        if paths:
+            print(f"[DEBUG] 변경/삭제된 파일 청크 제거: {len(paths)}개 파일")
+
+    def add_chunk_batch(self, ids: List[str], embeddings: List[List[float]], documents: List[str],
+                        metadatas: List[Dict[str, Any]]) -> int:
+        """
+        청크 배치를 컬렉션에 저장 (배치 저장 실패 시 개별 저장으로 폴백)
+        embeddings는 전체 차원 임베딩이며, compact 모드 컬렉션은 축소 차원 벡터로 저장하고
+        전체 차원 벡터는 re-rank 저장소에 int8로 보관합니다.
+        컬렉션에 저장된 청크만 re-rank 저장소, 어휘(BM25) 색인, 코드 개요 색인에 추가하므로
+        저장에 실패한 청크(재시도 대기)가 색인에만 남아 검색/개요에 나타나지 않습니다.
+
+        Returns:
+            int: 저장에 성공한 청크 수
+        """
+        collection_embeddings = embeddings
+        if self.vector_config['mode'] == 'compact':
+            collection_embeddings = to_collection_vectors(self.vector_config, embeddings)
+        try:
+            self.collection.add(
+                ids=ids,
+                embeddings=collection_embeddings,
+                documents=documents,
+                metadatas=metadatas
+            )
+            saved = list(range(len(ids)))
+        except Exception as e:
+            print(f"[WARNING] DB 배치 저장 실패: {e}")
+            # 실패 시 개별 저장으로 폴백
+            saved = []
+            for j in range(len(ids)):
+                try:
+                    self.collection.add(
+                        ids=[ids[j]],
+                        embeddings=[collection_embeddings[j]],
+                        documents=[documents[j]],
+                        metadatas=[metadatas[j]]
+                    )
+                    saved.append(j)
+                except:
+                    pass
+        if saved:
+            self.index_saved_chunks([ids[j] for j in saved], [embeddings[j] for j in saved],
+                                    [documents[j] for j in saved], [metadatas[j] for j in saved])
+        return len(saved)
+
+    def index_saved_chunks(self, ids: List[str], embeddings: List[List[float]], documents: List[str],
+                           metadatas: List[Dict[str, Any]]):
+        """컬렉션에 저장된 청크를 re-rank 저장소(compact 모드), 어휘 색인, 코드 개요 색인에 추가"""
+        if self.vector_config['mode'] == 'compact':
+            rerank_store = get_rerank_store()
+            if rerank_store:
+                try:
+                    rerank_store.put_many(self.collection_name, ids, [meta.get('path', '') for meta in metadatas], embeddings)
+                except Exception as e:
+                    print(f"[WARNING] re-rank 벡터 저장 실패: {e}")
+        lexical_index = get_lexical_index()
+        if lexical_index:
+            try:
+                lexical_index.add_many(self.collection_name, ids, documents, metadatas)
+            except Exception as e:
+                print(f"[WARNING] 어휘 색인 추가 실패: {e}")
+        outline_index = get_outline_index()
+        if outline_index:
+            try:
+                outline_index.add_many(self.collection_name, documents, metadatas)
+            except Exception as e:
+                print(f"[WARNING] 코드 개요 색인 추가 실패: {e}")
+
+    def add_duplicate_chunks(self, canonical_ids: List[str], ids: List[str], documents: List[str],
+                             metadatas: List[Dict[str, Any]]) -> List[int]:
+        """
+        중복 청크를 대표 청크의 저장된 벡터를 공유하여 저장 (임베딩 API 호출 없음)
+
+        Args:
+            canonical_ids (List[str]): 청크별 대표 청크 ID
+            ids, documents, metadatas: 저장할 중복 청크
+
+        Returns:
+            List[int]: 대표 청크가 저장되지 않아(임베딩 실패 등) 저장하지 못한 청크의 위치
+        """
+        unique_ids = list(dict.fromkeys(canonical_ids))
+        vectors = {}
+        if self.vector_config['mode'] == 'compact':
+            # 컬렉션에는 축소 차원만 있으므로 re-rank 저장소의 전체 차원 벡터를 사용
+            rerank_store = get_rerank_store()
+            if rerank_store:
+                vectors = {chunk_id: vector.tolist()
+                           for chunk_id, vector in rerank_store.get_many(self.collection_name, unique_ids).items()}
+        else:
+            for start in range(0, len(unique_ids), 500):
+                rows = self.collection.get(ids=unique_ids[start:start + 500], include=['embeddings'])
+                for chunk_id, embedding in zip(rows.get('ids') or [], rows['embeddings']):
+                    vectors[chunk_id] = list(embedding)
+
+        found = [j for j, canonical_id in enumerate(canonical_ids) if canonical_id in vectors]
+        for start in range(0, len(found), DB_BATCH_SIZE):
+            part = found[start:start + DB_BATCH_SIZE]
+            self.add_chunk_batch([ids[j] for j in part], [vectors[canonical_ids[j]] for j in part],
+                                 [documents[j] for j in part], [metadatas[j] for j in part])
+        return [j for j, canonical_id in enumerate(canonical_ids) if canonical_id not in vectors]
+
+    def process_and_embed(self, files: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        파일을 청킹/임베딩하여 컬렉션에 저장하는 스트리밍 파이프라인
+
+        파일 수집 -> 청킹 -> 임베딩 -> DB 저장 단계가 크기 제한 큐로 연결되어 동시에 진행됩니다.
+        첫 파일이 도착하면 바로 임베딩이 시작되고, 임베딩과 DB 저장이 겹쳐 실행되며,
+        파일 원문은 청킹 직후 해제되므로 저장소 크기와 무관하게 메모리 사용량이 일정합니다.
+
+        Args:
+            files (Iterable[Dict[str, Any]]): 파일 딕셔너리 리스트 또는 제너레이터
+                (예: GitHubRepositoryFetcher.iter_file_contents_by_mode)
+
+        Returns:
+            List[Dict[str, Any]]: 처리한 파일의 메타데이터 목록 (content는 빈 문자열)
+        """
         # 내부 비동기 함수 정의
         async def async_process_and_embed(files):
-            from openai import AsyncOpenAI
-            api_key = os.environ.get("OPENAI_API_KEY")
-            enc = tiktoken.encoding_for_model("gpt-3.5-turbo")
+            provider = self.provider
             def safe_meta(meta):
                 return {k: ('' if v is None else v if not isinstance(v, (int, float, bool)) else v) for k, v in meta.items()}
-            def split_by_tokens(text, max_tokens=256, overlap=64):
-                tokens = enc.encode(text)
-                chunks = []
-                start = 0
-                while start < len(tokens):
-                    end = min(start + max_tokens, len(tokens))
-                    chunk = enc.decode(tokens[start:end])
-                    chunks.append((chunk, start, end))
-                    if end == len(tokens):
-                        break
-                    start += max_tokens - overlap
-                return chunks
-            def chunk_python_functions(source_code):
-                try:
-                    tree = ast.parse(source_code)
-                except Exception as e:
-                    print(f"[WARNING] AST 파싱 실패: {e}")
-                    return [(source_code, 0, len(enc.encode(source_code)), None, None, 1, len(source_code.splitlines()), None, 0, None)]
-                
-                lines = source_code.splitlines()
-                chunks = []
-                imports = []
-                parent_map = {}  # 부모-자식 관계 추적
-                
-                # 부모-자식 관계 맵 구축
-                for node in ast.walk(tree):
-                    for child in ast.iter_child_nodes(node):
-                        parent_map[child] = node
-                
-                # 임포트 문 수집
-                for node in tree.body:
-                    if isinstance(node, (ast.Import, ast.ImportFrom)):
-                        start = node.lineno - 1
-                        end = getattr(node, 'end_lineno', start + 1)
-                        import_text = '\n'.join(lines[start:end])
-                        imports.append(import_text)
-                
-                # 전체 임포트 문자열
-                imports_text = '\n'.join(imports)
-                
-                # 복잡도 계산 함수
-                def calculate_complexity(node):
-                    """AST 노드의 복잡도 계산"""
-                    if isinstance(node, ast.FunctionDef):
-                        # 기본 복잡도 + 파라미터 수 + 내부 조건문/반복문 수
-                        complexity = 1 + len(node.args.args)
-                        for n in ast.walk(node):
-                            if isinstance(n, (ast.If, ast.For, ast.While, ast.Try)):
-                                complexity += 1
-                        return complexity
-                    elif isinstance(node, ast.ClassDef):
-                        # 기본 복잡도 + 상속 수 + 메소드 수
-                        complexity = 1 + len(node.bases)
-                        for n in node.body:
-                            if isinstance(n, ast.FunctionDef):
-                                complexity += 1
-                        return complexity
-                    return 1
-                
-                # 계층적 청킹 함수
-                def process_node(node, parent_class=None, parent_func=None, depth=0):
-                    """노드를 재귀적으로 처리하여 청크 생성"""
-                    if not hasattr(node, 'lineno'):
-                        return
-                    
-                    start = node.lineno - 1
-                    end = getattr(node, 'end_lineno', None)
-                    if end is None:
-                        return
-                    
-                    # 노드 유형에 따른 처리
-                    if isinstance(node, ast.ClassDef):
-                        class_name = node.name
-                        func_name = None
-                        
-                        # 클래스 docstring 추출
-                        docstring = ast.get_docstring(node)
-                        
-                        # 클래스 전체 코드
-                        chunk = '\n'.join(lines[start:end])
-                        complexity = calculate_complexity(node)
-                        
-                        # 부모 클래스 정보 추출
-                        parent_classes = []
-                        for base in node.bases:
-                            if isinstance(base, ast.Name):
-                                parent_classes.append(base.id)
-                        
-                        # 가변 청크 크기 (복잡도에 따라 조정)
-                        max_tokens = min(512, 128 + complexity * 32)
-                        overlap = min(128, 32 + complexity * 8)
-                        
-                        # 클래스 전체를 하나의 청크로
-                        if len(enc.encode(chunk)) <= max_tokens:
-                            chunks.append((
-                                chunk, 0, len(enc.encode(chunk)), 
-                                func_name, class_name, start+1, end, 
-                                parent_class, complexity, ','.join(parent_classes)
-                            ))
-                        else:
-                            # 임포트 + 클래스 정의 + docstring을 첫 청크에 포함
-                            class_header = f"{imports_text}\n\n" if imports_text else ""
-                            class_def_line = lines[start]
-                            if docstring:
-                                docstring_lines = docstring.splitlines()
-                                class_header += f"{class_def_line}\n    \"\"\"\n    {docstring}\n    \"\"\"\n"
-                            else:
-                                class_header += f"{class_def_line}\n"
-                            
-                            chunks.append((
-                                class_header, 0, len(enc.encode(class_header)), 
-                                func_name, class_name, start+1, start+1+(1 if not docstring else len(docstring.splitlines())+2), 
-                                parent_class, complexity, ','.join(parent_classes)
-                            ))
-                            
-                            # 나머지 클래스 본문을 청킹
-                            class_body = '\n'.join(lines[start+1:end])
-                            for sub_chunk, t_start, t_end in split_by_tokens(class_body, max_tokens=max_tokens, overlap=overlap):
-                                chunks.append((
-                                    sub_chunk, t_start, t_end, 
-                                    func_name, class_name, start+1, end, 
-                                    parent_class, complexity, ','.join(parent_classes)
-                                ))
-                        
-                        # 클래스 내부 메소드 처리
-                        for child in node.body:
-                            process_node(child, class_name, None, depth+1)
-                    
-                    elif isinstance(node, ast.FunctionDef):
-                        func_name = node.name
-                        
-                        # 함수 docstring 추출
-                        docstring = ast.get_docstring(node)
-                        
-                        # 함수 전체 코드
-                        chunk = '\n'.join(lines[start:end])
-                        complexity = calculate_complexity(node)
-                        
-                        # 가변 청크 크기 (복잡도에 따라 조정)
-                        max_tokens = min(512, 128 + complexity * 32)
-                        overlap = min(128, 32 + complexity * 8)
-                        
-                        # 함수 전체를 하나의 청크로
-                        if len(enc.encode(chunk)) <= max_tokens:
-                            chunks.append((
-                                chunk, 0, len(enc.encode(chunk)), 
-                                func_name, parent_class, start+1, end, 
-                                parent_func, complexity, None
-                            ))
-                        else:
-                            # 임포트 + 함수 정의 + docstring을 첫 청크에 포함
-                            func_header = f"{imports_text}\n\n" if imports_text and not parent_class else ""
-                            func_def_line = lines[start]
-                            if docstring:
-                                docstring_lines = docstring.splitlines()
-                                func_header += f"{func_def_line}\n    \"\"\"\n    {docstring}\n    \"\"\"\n"
-                            else:
-                                func_header += f"{func_def_line}\n"
-                            
-                            chunks.append((
-                                func_header, 0, len(enc.encode(func_header)), 
-                                func_name, parent_class, start+1, start+1+(1 if not docstring else len(docstring.splitlines())+2), 
-                                parent_func, complexity, None
-                            ))
-                            
-                            # 나머지 함수 본문을 청킹
-                            func_body = '\n'.join(lines[start+1:end])
-                            for sub_chunk, t_start, t_end in split_by_tokens(func_body, max_tokens=max_tokens, overlap=overlap):
-                                chunks.append((
-                                    sub_chunk, t_start, t_end, 
-                                    func_name, parent_class, start+1, end, 
-                                    parent_func, complexity, None
-                                ))
-                        
-                        # 중첩 함수 처리
-                        for child in node.body:
-                            process_node(child, parent_class, func_name, depth+1)
-                
-                # 최상위 노드 처리
-                for node in tree.body:
-                    process_node(node)
-                
-                # 청크가 없으면 기본 토큰 기반 청킹 적용
-                if not chunks:
-                    print(f"[INFO] 구조적 청크 없음, 토큰 기반 청킹 적용")
-                    for chunk, t_start, t_end in split_by_tokens(source_code, max_tokens=256, overlap=64):
-                        chunks.append((chunk, t_start, t_end, None, None, 1, len(source_code.splitlines()), None, 0, None))
-                
-                return chunks
-            def chunk_markdown(md_text):
-                # 마크다운 파싱을 위한 개선된 패턴
-                section_pattern = r'(^|\n)(#+\s+.+)($|\n)'  # 헤더
-                code_pattern = r'(^|\n)```[\s\S]+?```'  # 코드 블록
-                
-                # 섹션 제목과 코드 블록 찾기
-                sections = re.finditer(section_pattern, md_text, re.MULTILINE)
-                code_blocks = re.finditer(code_pattern, md_text, re.MULTILINE)
-                
-                # 섹션과 코드 블록의 위치 정보 수집
-                markers = []
-                for section in sections:
-                    markers.append((section.start(), section.group(2), 'section'))
-                for block in code_blocks:
-                    markers.append((block.start(), block.group(0), 'code'))
-                
-                # 위치 순으로 정렬
-                markers.sort(key=lambda x: x[0])
-                
-                # 의미 단위로 분할
-                chunks = []
-                last_pos = 0
-                for pos, content, marker_type in markers:
-                    # 이전 위치부터 현재 마커까지의 텍스트 처리
-                    if pos > last_pos:
-                        prev_text = md_text[last_pos:pos].strip()
-                        if prev_text:
-                            if len(enc.encode(prev_text)) > 256:
-                                for chunk, t_start, t_end in split_by_tokens(prev_text, max_tokens=256, overlap=64):
-                                    chunk_title = "일반 텍스트"
-                                    chunks.append((chunk, t_start, t_end, None, chunk_title, None, None, None, 1, None))
-                            else:
-                                chunk_title = "일반 텍스트"
-                                chunks.append((prev_text, 0, len(enc.encode(prev_text)), None, chunk_title, None, None, None, 1, None))
-                    
-                    # 마커 자체 처리
-                    if marker_type == 'section':
-                        # 섹션 제목 및 다음 내용 파악
-                        section_title = content
-                        next_marker_pos = md_text.find('\n#', pos + len(content)) if pos + len(content) < len(md_text) else -1
-                        if next_marker_pos == -1:
-                            next_marker_pos = len(md_text)
-                        
-                        section_content = md_text[pos:next_marker_pos].strip()
-                        if len(enc.encode(section_content)) > 256:
-                            for chunk, t_start, t_end in split_by_tokens(section_content, max_tokens=256, overlap=64):
-                                chunks.append((chunk, t_start, t_end, None, section_title, None, None, None, 2, None))
-                        else:
-                            chunks.append((section_content, 0, len(enc.encode(section_content)), None, section_title, None, None, None, 2, None))
-                        
-                        last_pos = next_marker_pos
-                    elif marker_type == 'code':
-                        code_block = content
-                        code_lang = re.search(r'```(\w+)', code_block)
-                        code_lang = code_lang.group(1) if code_lang else ''
-                        
-                        if len(enc.encode(code_block)) > 256:
-                            for chunk, t_start, t_end in split_by_tokens(code_block, max_tokens=256, overlap=64):
-                                chunks.append((chunk, t_start, t_end, code_lang, "코드 블록", None, None, None, 3, None))
-                        else:
-                            chunks.append((code_block, 0, len(enc.encode(code_block)), code_lang, "코드 블록", None, None, None, 3, None))
-                        
-                        last_pos = pos + len(code_block)
-                
-                # 남은 텍스트 처리
-                if last_pos < len(md_text):
-                    remaining_text = md_text[last_pos:].strip()
-                    if remaining_text:
-                        if len(enc.encode(remaining_text)) > 256:
-                            for chunk, t_start, t_end in split_by_tokens(remaining_text, max_tokens=256, overlap=64):
-                                chunks.append((chunk, t_start, t_end, None, "일반 텍스트", None, None, None, 1, None))
-                        else:
-                            chunks.append((remaining_text, 0, len(enc.encode(remaining_text)), None, "일반 텍스트", None, None, None, 1, None))
-                
-                # 청크가 없으면 기본 토큰 기반 청킹 적용
-                if not chunks:
-                    for chunk, t_start, t_end in split_by_tokens(md_text, max_tokens=256, overlap=64):
-                        chunks.append((chunk, t_start, t_end, None, "마크다운", None, None, None, 1, None))
-                
-                return chunks
-                
-            def chunk_js(source_code):
-                """JavaScript 코드를 구조적으로 청킹하는 함수"""
-                # 함수/클래스/메소드 정의 패턴
-                func_pattern = r'(async\s+)?function\s+(\w+)\s*\([^)]*\)\s*\{'
-                arrow_func_pattern = r'(const|let|var)\s+(\w+)\s*=\s*(async\s+)?\([^)]*\)\s*=>'
-                class_pattern = r'class\s+(\w+)(\s+extends\s+(\w+))?\s*\{'
-                method_pattern = r'(async\s+)?(\w+)\s*\([^)]*\)\s*\{'
-                
-                lines = source_code.splitlines()
-                chunks = []
-                
-                # 임포트/모듈 문 찾기
-                import_lines = []
-                for i, line in enumerate(lines):
-                    if re.match(r'^\s*(import|require|export)\b', line):
-                        import_lines.append(line)
-                
-                imports_text = '\n'.join(import_lines)
-                
-                # 정규식 패턴 매칭으로 함수/클래스 찾기
-                def find_block_end(start_line, opening_char='{', closing_char='}'):
-                    """중괄호 짝을 맞춰 블록 끝 라인 찾기"""
-                    balance = 0
-                    for i in range(start_line, len(lines)):
-                        line = lines[i]
-                        balance += line.count(opening_char) - line.count(closing_char)
-                        if balance <= 0:
-                            return i
-                    return len(lines) - 1
-                
-                # 함수/클래스 찾기
-                i = 0
-                while i < len(lines):
-                    line = lines[i]
-                    
-                    # 함수 정의 찾기
-                    func_match = re.search(func_pattern, line)
-                    arrow_match = re.search(arrow_func_pattern, line)
-                    class_match = re.search(class_pattern, line)
-                    
-                    if func_match or arrow_match or class_match:
-                        start = i
-                        
-                        if func_match:
-                            name = func_match.group(2)
-                            is_class = False
-                            parent_class = None
-                        elif arrow_match:
-                            name = arrow_match.group(2)
-                            is_class = False
-                            parent_class = None
-                        else:  # class_match
-                            name = class_match.group(1)
-                            is_class = True
-                            parent_class = class_match.group(3) if class_match.group(2) else None
-                        
-                        # 블록 끝 찾기
-                        end = find_block_end(start)
-                        
-                        # 전체 코드 청크
-                        chunk = '\n'.join(lines[start:end+1])
-                        
-                        # 복잡도 추정 (라인 수 + 중첩 레벨)
-                        complexity = (end - start) // 5 + chunk.count('{') - chunk.count('}')
-                        complexity = max(1, complexity)
-                        
-                        # 가변 청크 크기
-                        max_tokens = min(512, 128 + complexity * 32)
-                        overlap = min(128, 32 + complexity * 8)
-                        
-                        if len(enc.encode(chunk)) <= max_tokens:
-                            # 전체 함수/클래스를 하나의 청크로
-                            chunks.append((
-                                chunk, 
-                                0, 
-                                len(enc.encode(chunk)), 
-                                None if is_class else name, 
-                                name if is_class else None, 
-                                start+1, 
-                                end+1,
-                                None,  # parent_func
-                                complexity,
-                                parent_class if is_class else None
-                            ))
-                        else:
-                            # 헤더 (임포트 + 함수/클래스 선언)
-                            header = f"{imports_text}\n\n" if imports_text else ""
-                            header += lines[start]
-                            
-                            chunks.append((
-                                header,
-                                0,
-                                len(enc.encode(header)),
-                                None if is_class else name,
-                                name if is_class else None,
-                                start+1,
-                                start+1,
-                                None,  # parent_func
-                                complexity,
-                                parent_class if is_class else None
-                            ))
-                            
-                            # 본문 청킹
-                            body = '\n'.join(lines[start+1:end+1])
-                            for sub_chunk, t_start, t_end in split_by_tokens(body, max_tokens=max_tokens, overlap=overlap):
-                                chunks.append((
-                                    sub_chunk,
-                                    t_start,
-                                    t_end,
-                                    None if is_class else name,
-                                    name if is_class else None,
-                                    start+2,  # 본문 시작
-                                    end+1,
-                                    None,  # parent_func
-                                    complexity,
-                                    parent_class if is_class else None
-                                ))
-                        
-                        # 클래스 내부 메소드 찾기 (클래스인 경우)
-                        if is_class:
-                            method_start = start + 1
-                            while method_start < end:
-                                method_line = lines[method_start]
-                                method_match = re.search(method_pattern, method_line)
-                                
-                                if method_match:
-                                    method_name = method_match.group(2)
-                                    method_end = find_block_end(method_start)
-                                    
-                                    method_chunk = '\n'.join(lines[method_start:method_end+1])
-                                    method_complexity = (method_end - method_start) // 3
-                                    
-                                    # 메소드 청킹
-                                    if len(enc.encode(method_chunk)) <= max_tokens // 2:
-                                        chunks.append((
-                                            method_chunk,
-                                            0,
-                                            len(enc.encode(method_chunk)),
-                                            method_name,
-                                            name,  # 클래스명
-                                            method_start+1,
-                                            method_end+1,
-                                            None,
-                                            method_complexity,
-                                            None
-                                        ))
-                                    else:
-                                        for sub_chunk, t_start, t_end in split_by_tokens(method_chunk, max_tokens=max_tokens//2, overlap=overlap//2):
-                                            chunks.append((
-                                                sub_chunk,
-                                                t_start,
-                                                t_end,
-                                                method_name,
-                                                name,  # 클래스명
-                                                method_start+1,
-                                                method_end+1,
-                                                None,
-                                                method_complexity,
-                                                None
-                                            ))
-                                    
-                                    method_start = method_end + 1
-                                else:
-                                    method_start += 1
-                        
-                        i = end + 1
-                    else:
-                        i += 1
-                
-                # 청크가 없으면 기본 토큰 기반 청킹 적용
-                if not chunks:
-                    for chunk, t_start, t_end in split_by_tokens(source_code, max_tokens=256, overlap=64):
-                        chunks.append((chunk, t_start, t_end, None, None, 1, len(source_code.splitlines()), None, 0, None))
-                
-                return chunks
-            def chunk_ipynb(ipynb_text):
-                try:
-                    nb = nbformat.reads(ipynb_text, as_version=4)
-                except Exception as e:
-                    print(f"[WARNING] ipynb 파싱 실패: {e}")
-                    return [(ipynb_text, 0, len(enc.encode(ipynb_text)), None, "ipynb", 1, len(ipynb_text.splitlines()))]
-                chunks = []
-                for idx, cell in enumerate(nb.cells):
-                    cell_type = cell.get('cell_type', '')
-                    source = cell.get('source', '')
-                    if not source.strip():
-                        continue
-                    # 셀 타입별로 태그
-                    tag = f"{cell_type} 셀"
-                    # 토큰 단위로 분할
-                    if len(enc.encode(source)) > 256:
-                        for chunk, t_start, t_end in split_by_tokens(source, max_tokens=256, overlap=64):
-                            chunks.append((chunk, t_start, t_end, None, tag, idx+1, idx+1))
-                    else:
-                        chunks.append((source, 0, len(enc.encode(source)), None, tag, idx+1, idx+1))
-                if not chunks:
-                    chunks.append((ipynb_text, 0, len(enc.encode(ipynb_text)), None, "ipynb", 1, len(ipynb_text.splitlines())))
-                return chunks
-            # 1. 전체 청크 수집
-            all_chunks = []
-            for file in files:
-                content = file['content']
-                path = file['path']
-                ext = os.path.splitext(path)[1].lower()
-                file_name = file.get('file_name')
-                file_type = file.get('file_type')
-                sha = file.get('sha')
-                source_url = file.get('source_url')
-                if ext == '.py':
-                    chunks = chunk_python_functions(content)
-                elif ext == '.md':
-                    chunks = chunk_markdown(content)
-                elif ext == '.js':
-                    chunks = chunk_js(content)
-                elif ext == '.ipynb':
-                    chunks = chunk_ipynb(content)
-                else:
-                    # 오류 수정: 일반 파일은 split_by_tokens로 처리하고 7개 필드 구조에 맞게 조정
-                    simple_chunks = split_by_tokens(content, max_tokens=256, overlap=64)
-                    chunks = []
-                    for chunk_data in simple_chunks:
-                        # 처음 3개 값은 유지하고 나머지 4개 필요한 값을 None으로 추가
-                        chunk, t_start, t_end = chunk_data  # 여기서 3개 값만 언패킹
-                        chunks.append((chunk, t_start, t_end, None, None, 1, len(content.splitlines())))
-                
-                # 이 부분이 중요: chunks의 모든 항목이 정확히 7개 값을 가지고 있는지 확인
-                processed_chunks = []
-                for chunk_item in chunks:
-                    # 정확히 7개 값을 가지는 튜플로 변환
-                    if len(chunk_item) == 7:
-                        processed_chunks.append(chunk_item)
-                    else:
-                        # 7개가 아닌 경우 필요한 만큼 None을 추가하거나 잘라서 7개로 맞춤
-                        values = list(chunk_item)[:7]  # 최대 7개까지만 사용
-                        while len(values) < 7:
-                            values.append(None)  # 7개가 될 때까지 None 추가
-                        processed_chunks.append(tuple(values))
-                
-                # 처리된 chunks 사용
-                for i, (chunk, t_start, t_end, func_name, class_name, start_line, end_line) in enumerate(processed_chunks):
-                    all_chunks.append((chunk, file, i, t_start, t_end, func_name, class_name, start_line, end_line))
-                
-                # 파일별 청크 수 요약 로그 (과도한 개별 로그 대신)
-                if processed_chunks:
-                    print(f"[DEBUG] 파일 청킹 완료: {file.get('path')} - {len(processed_chunks)}개 청크")
-            # 2. 배치 임베딩 함수 (대폭 개선)
-            async def batch_embed_chunks(chunks_data, client):
-                """
-                청크를 배치로 임베딩 (API 호출 최소화 + 병렬 처리)
-                동적 배치 크기 + 병렬 배치 처리
-                """
-                # 최적화된 배치 크기: 50개 (Rate Limit 안전 + 높은 동시성)
-                total_chunks = len(chunks_data)
-                batch_size = 50  # 모든 저장소에 50개 배치 사용
-                
-                print(f"[INFO] 동적 배치 크기: {batch_size}개 (전체 {total_chunks}개 청크)")
-                
-                # 배치 분할
-                batches = []
-                for batch_start in range(0, total_chunks, batch_size):
-                    batch_end = min(batch_start + batch_size, total_chunks)
-                    batch = chunks_data[batch_start:batch_end]
-                    batches.append((batch_start, batch_end, batch))
-                
-                # 각 배치를 처리하는 비동기 함수
-                async def process_single_batch(batch_info):
-                    batch_start, batch_end, batch = batch_info
-                    batch_results = []
-                    
-                    # 배치의 모든 텍스트 추출
-                    texts = []
-                    for chunk_data in batch:
-                        chunk = chunk_data[0]
-                        chunk_tokens = len(enc.encode(chunk))
-                        if chunk_tokens > 8000:
-                            chunk = chunk[:8000]
-                        texts.append(chunk)
-                    
-                    # 배치 API 호출
-                    try:
-                        # Rate Limit 여유가 충분하므로 지연 최소화 (0.1초)
-                        await asyncio.sleep(0.1)
-                        
-                        api_call_counter['openai_embedding'] += 1
-                        emb_resp = await client.embeddings.create(
-                            input=texts,
-                            model="text-embedding-3-large"
-                        )
-                        embeddings = [e.embedding for e in emb_resp.data]
-                        
-                        for i, embedding in enumerate(embeddings):
-                            chunk_idx = batch_start + i
-                            chunk_data = chunks_data[chunk_idx]
-                            result = (embedding, '', chunk_data[0], chunk_data[1], chunk_data[2],
-                                    chunk_data[3], chunk_data[4], chunk_data[5], chunk_data[6],
-                                    chunk_data[7], chunk_data[8])
-                            batch_results.append(result)
-                        
-                        print(f"[DEBUG] 배치 {batch_start+1}-{batch_end} 완료 ({len(texts)}개)")
-                        
-                    except Exception as e:
-                        print(f"[WARNING] 배치 {batch_start+1}-{batch_end} 실패: {e}")
-                        for i in range(len(texts)):
-                            chunk_idx = batch_start + i
-                            chunk_data = chunks_data[chunk_idx]
-                            embedding = [0.0] * 3072
-                            result = (embedding, '', chunk_data[0], chunk_data[1], chunk_data[2],
-                                    chunk_data[3], chunk_data[4], chunk_data[5], chunk_data[6],
-                                    chunk_data[7], chunk_data[8])
-                            batch_results.append(result)
-                    
-                    return batch_results
-                
-                # 모든 배치를 병렬로 처리 (Rate Limit 고려)
-                import asyncio
-                # OpenAI Rate Limit 고려: 분당 500 요청 제한 (Tier 1)
-                # 배치 크기 50개 × 동시 5개 = 250개/번 (안전)
-                semaphore = asyncio.Semaphore(5)  # 최대 5개 배치 동시 처리
-                
-                async def process_with_semaphore(batch_info):
-                    async with semaphore:
-                        return await process_single_batch(batch_info)
-                
-                # 모든 배치 병렬 실행
-                tasks = [process_with_semaphore(batch_info) for batch_info in batches]
-                batch_results = await asyncio.gather(*tasks)
-                
-                # 결과 통합
-                results = []
-                for batch_result in batch_results:
-                    results.extend(batch_result)
-                
-                return results
-            # 3. 배치 임베딩 실행 (API 호출 대폭 감소)
-            print(f"[DEBUG] 배치 임베딩 시작 (전체 청크: {len(all_chunks)}개)")
-            print(f"[INFO] 예상 API 호출: {(len(all_chunks) + 99) // 100}회 (기존 {len(all_chunks)}회에서 감소)")
-            
-            async with AsyncOpenAI(api_key=api_key) as client:
-                # 배치 임베딩 함수 호출
-                results = await batch_embed_chunks(all_chunks, client)
-            
-            print(f"[DEBUG] 배치 임베딩 완료: {len(results)}개 청크 처리")
-            # 4. DB 배치 저장 (성능 개선)
-            successful_saves = 0
-            batch_size = 100  # 한 번에 저장할 최대 크기
-            
-            # 배치 데이터 저장용 리스트
-            batch_ids = []
-            batch_embeddings = []
-            batch_documents = []
-            batch_metadatas = []
+            def attach_file_meta(file, records):
+                """청크 레코드에 내용 없는 파일 메타데이터를 연결 (파일 원문은 청킹 후 바로 해제)"""
+                file_meta = {k: v for k, v in file.items() if k != 'content'}
+                return [
+                    (chunk, file_meta, i, t_start, t_end, func_name, class_name, start_line, end_line, token_count)
+                    for i, (chunk, t_start, t_end, func_name, class_name, start_line, end_line, token_count) in enumerate(records)
+                ]
             
-            for embedding, role_tag, chunk, file, i, t_start, t_end, func_name, class_name, start_line, end_line in results:
-                file_name = file.get('file_name')
-                file_type = file.get('file_type')
-                sha = file.get('sha')
-                source_url = file.get('source_url')
-                path = file['path']
-                
+
+            def build_metadata(file, i, t_start, t_end, func_name, class_name, start_line, end_line, token_count, role_tag=''):
+                """청크 하나의 ChromaDB 메타데이터 생성"""
                 # 청크 타입 결정
                 chunk_type = "class" if class_name and not func_name else \
                             "method" if class_name and func_name else \
                             "function" if func_name and not class_name else \
                             "code"
                 
-                # 메타데이터 생성
-                metadata = {
-                    "path": path or '',
-                    "file_name": file_name or '',
-                    "file_type": file_type or '',
-                    "sha": sha or '',
-                    "source_url": source_url or '',
+                return safe_meta({
+                    "path": file['path'] or '',
+                    "file_name": file.get('file_name') or '',
+                    "file_type": file.get('file_type') or '',
+                    "sha": file.get('sha') or '',
+                    "source_url": file.get('source_url') or '',
                     "chunk_index": i,
                     "function_name": func_name or '',
                     "class_name": class_name or '',
@@ -1690,86 +2173,401 @@ class RepositoryEmbedder:
                     "end_line": end_line if end_line is not None else -1,
                     "token_start": t_start if t_start is not None else -1,
                     "token_end": t_end if t_end is not None else -1,
+                    "token_count": token_count if token_count is not None else -1,
                     "role_tag": role_tag,
                     "chunk_type": chunk_type,
                     "complexity": 1,
                     "parent_entity": '',
                     "inheritance": ''
-                }
+                })
+            
+            # 파이프라인: 파일 수집(스레드) -> 청킹(프로세스 풀) -> 임베딩(동시 요청 수는 스케줄러가 조절) -> DB 저장
+            # 단계 사이 큐의 크기를 제한하여 앞 단계가 너무 앞서가면 기다리게 함 (메모리 일정 유지)
+            loop = asyncio.get_running_loop()
+            file_queue = asyncio.Queue(maxsize=PIPELINE_FILE_QUEUE_SIZE)
+            batch_queue = asyncio.Queue(maxsize=PIPELINE_BATCH_QUEUE_SIZE)
+            store_queue = asyncio.Queue(maxsize=PIPELINE_BATCH_QUEUE_SIZE)
+            stop_event = threading.Event()
+            cache = get_embedding_cache() if provider.cacheable else None
+            processed_files = []
+            stats = {'chunks': 0, 'batches': 0, 'embedded_batches': 0, 'stored': 0, 'deferred': 0,
+                     'cache_hit': 0, 'cache_miss': 0, 'chunking_done': False}
+            failure_reasons = []  # 재시도 큐로 보낸 임베딩 배치의 실패 사유
+            # 중복 청크는 임베딩하지 않고 저장 단계 마지막에 대표 청크의 벡터를 공유하여 저장
+            deduplicator = ChunkDeduplicator() if CHUNK_DEDUP else None
+            duplicate_chunks = []  # 저장 단계로 넘길 (대표 청크 ID, 묶음 키, 청크 레코드) (저장 배치마다 비움)
+            
+            def split_duplicates(records):
+                """중복 청크를 duplicate_chunks로 보내고 임베딩할 청크만 반환"""
+                unique = []
+                for record in records:
+                    canonical_id = deduplicator.find(f"{record[1]['path']}_{record[2]}", record[0])
+                    if canonical_id is None:
+                        unique.append(record)
+                    else:
+                        duplicate_chunks.append((canonical_id, deduplicator.group_keys[canonical_id], record))
+                return unique
+            
+            def put_from_thread(item):
+                """수집 스레드에서 file_queue에 넣음 (큐가 가득 차면 대기, 파이프라인 중단 시 False)"""
+                future = asyncio.run_coroutine_threadsafe(file_queue.put(item), loop)
+                while True:
+                    try:
+                        future.result(timeout=0.5)
+                        return True
+                    except concurrent.futures.TimeoutError:
+                        if stop_event.is_set():
+                            future.cancel()
+                            return False
+            
+            def fetch_stage():
+                """파일 제너레이터를 별도 스레드에서 순회 (네트워크/압축 해제가 이벤트 루프를 막지 않도록)"""
+                iterator = iter(files)
+                try:
+                    for file in iterator:
+                        if not put_from_thread(file):
+                            return
+                finally:
+                    close = getattr(iterator, 'close', None)
+                    if close:
+                        close()
+                    if not stop_event.is_set():
+                        put_from_thread(None)
+            
+            async def run_chunk_batch(items):
+                """
+                파일 묶음을 청킹 프로세스 풀에서 실행 (풀을 쓸 수 없으면 스레드에서 실행)
+                CHUNK_TIMEOUT_SECONDS 안에 끝나지 않으면 워커를 종료하고 그 묶음의 파일은 청크 없이 건너뜀
+                """
+                executor = get_chunk_executor()
+                if executor is not None:
+                    try:
+                        return await asyncio.wait_for(loop.run_in_executor(executor, chunk_file_batch, items),
+                                                      CHUNK_TIMEOUT_SECONDS)
+                    except asyncio.TimeoutError:
+                        print(f"[ERROR] 청킹 제한 시간({CHUNK_TIMEOUT_SECONDS:g}초) 초과, 파일 건너뜀: "
+                              f"{', '.join(path for path, _ in items)}")
+                        reset_chunk_executor(executor, terminate=True)
+                        return [[] for _ in items]
+                    except BrokenProcessPool as e:
+                        print(f"[WARNING] 청킹 프로세스 풀 오류, 스레드에서 청킹: {e}")
+                        reset_chunk_executor(executor)
+                return await asyncio.to_thread(chunk_file_batch, items)
+            
+            async def chunk_stage():
+                """
+                파일을 받는 대로 묶어 프로세스 풀에서 청킹하고 토큰 예산 단위로 임베딩 배치를 만들어 전달
+
+                도착해 있는 파일만 즉시 묶어 보내므로 수집이 느리면 파일 하나씩, 빠르면 CHUNK_BATCH_FILES개씩 청킹됩니다.
+                여러 묶음을 동시에 청킹하되 결과는 제출한 순서대로 꺼내 파일/청크 순서를 유지합니다.
+                임베딩 배치는 EMBEDDING_MAX_BATCH_TOKENS 토큰(최대 EMBEDDING_MAX_BATCH_ITEMS개)까지 채우되,
+                임베딩 단계가 놀고 있으면 덜 찬 배치도 바로 보냅니다.
+                """
+                pending = []
+                in_flight = collections.deque()
+                max_in_flight = max(1, CHUNK_WORKERS) * 2
                 
-                # 배치에 추가
-                batch_ids.append(f"{path}_{i}")
-                batch_embeddings.append(embedding)
-                batch_documents.append(chunk)
-                batch_metadatas.append(safe_meta(metadata))
+                async def put_batch(size):
+                    nonlocal pending
+                    batch, pending = pending[:size], pending[size:]
+                    stats['batches'] += 1
+                    await batch_queue.put(batch)
                 
-                # 배치가 가득 차면 DB에 저장
-                if len(batch_ids) >= batch_size:
-                    try:
-                        self.collection.add(
-                            ids=batch_ids,
-                            embeddings=batch_embeddings,
-                            documents=batch_documents,
-                            metadatas=batch_metadatas
-                        )
-                        successful_saves += len(batch_ids)
-                        print(f"[DEBUG] DB 배치 저장: {successful_saves}개 청크")
+                async def emit_oldest():
+                    batch_files, future = in_flight.popleft()
+                    for file, records in zip(batch_files, await future):
+                        processed_files.append({**file, 'content': ''})
+                        stats['chunks'] += len(records)
+                        records = attach_file_meta(file, records)
+                        if deduplicator:
+                            records = await asyncio.to_thread(split_duplicates, records)
+                        pending.extend(records)
+                    # 토큰 예산이 찬 만큼 배치로 보냄
+                    while pending:
+                        size = 0
+                        tokens = 0
+                        while size < len(pending) and size < EMBEDDING_MAX_BATCH_ITEMS:
+                            chunk_tokens = min(pending[size][-1], EMBEDDING_MAX_INPUT_TOKENS)
+                            if size and tokens + chunk_tokens > EMBEDDING_MAX_BATCH_TOKENS:
+                                break
+                            tokens += chunk_tokens
+                            size += 1
+                        if size == len(pending) and size < EMBEDDING_MAX_BATCH_ITEMS and tokens < EMBEDDING_MAX_BATCH_TOKENS:
+                            break
+                        await put_batch(size)
+                    # 임베딩 단계에 여유가 있으면 기다리지 않고 덜 찬 배치를 보냄
+                    if pending and batch_queue.empty() and scheduler.has_capacity():
+                        await put_batch(len(pending))
+                
+                try:
+                    done = False
+                    while not done:
+                        file = await file_queue.get()
+                        if file is None:
+                            break
+                        batch_files = [file]
+                        batch_chars = len(file['content'])
+                        while len(batch_files) < CHUNK_BATCH_FILES and batch_chars < CHUNK_BATCH_CHARS and not file_queue.empty():
+                            file = file_queue.get_nowait()
+                            if file is None:
+                                done = True
+                                break
+                            batch_files.append(file)
+                            batch_chars += len(file['content'])
+                        items = [(f['path'], f['content']) for f in batch_files]
+                        in_flight.append((batch_files, asyncio.ensure_future(run_chunk_batch(items))))
+                        while len(in_flight) >= max_in_flight:
+                            await emit_oldest()
+                    while in_flight:
+                        await emit_oldest()
+                finally:
+                    for _, future in in_flight:
+                        future.cancel()
+                if pending:
+                    await put_batch(len(pending))
+                stats['chunking_done'] = True
+                emit_progress(self.progress_callback, 'chunked', stats['chunks'], stats['chunks'],
+                              f'코드 청크 생성 완료 ({len(processed_files)}개 파일, {stats["chunks"]}개 청크)')
+                await batch_queue.put(None)
+            
+            def batch_finished(chunks_data, embeddings):
+                """임베딩이 끝난 배치를 기록하고 진행 이벤트 전달"""
+                stats['embedded_batches'] += 1
+                print(f"[DEBUG] 임베딩 배치 완료: {stats['embedded_batches']}/{stats['batches']}{'' if stats['chunking_done'] else '+'} "
+                      f"({len(chunks_data)}개, 동시 요청 {scheduler.concurrency}개, {scheduler.tokens_per_second():,.0f} 토큰/초)")
+                # 청킹이 끝나기 전에는 전체 배치 수를 알 수 없으므로 total=0으로 전달
+                emit_progress(self.progress_callback, 'embedding', stats['embedded_batches'],
+                              stats['batches'] if stats['chunking_done'] else 0,
+                              f'임베딩 생성 중 (배치 {stats["embedded_batches"]}/{stats["batches"] if stats["chunking_done"] else "?"})')
+            
+            async def embed_misses(chunks_data, texts, embeddings_by_index, miss_indices, miss_tokens):
+                """
+                캐시에 없는 청크를 임베딩 API로 생성 (스케줄러 자리를 얻은 상태에서 실행, 끝나면 자리 반납)
+                실패한 청크는 벡터를 None으로 두어 저장 단계에서 재시도 큐로 보냄
+                """
+                miss_texts = [texts[idx] for idx in miss_indices]
+                try:
+                    if provider.remote:
+                        api_call_counter['openai_embedding'] += 1
+                    embeddings = await scheduler.create(miss_texts, miss_tokens)
+                    for idx, embedding in zip(miss_indices, embeddings):
+                        embeddings_by_index[idx] = embedding
+                    
+                    # 성공한 임베딩만 캐시에 저장 (실패 시 0 벡터는 저장하지 않음)
+                    if cache:
+                        try:
+                            await asyncio.to_thread(cache.put_many, provider.model, miss_texts, embeddings)
+                        except Exception as e:
+                            print(f"[WARNING] 임베딩 캐시 저장 실패: {e}")
+                except Exception as e:
+                    print(f"[WARNING] 임베딩 배치 실패, 재시도 큐로 보냄 ({len(miss_texts)}개 청크): {e}")
+                    failure_reasons.append(str(e))
+                finally:
+                    await scheduler.release()
+                
+                # 원래 청크 순서 유지
+                embeddings = [embeddings_by_index.get(idx) for idx in range(len(texts))]
+                await store_queue.put((chunks_data, embeddings))
+                batch_finished(chunks_data, embeddings)
+            
+            async def embed_stage():
+                """
+                임베딩 배치를 받아 캐시를 확인하고, 캐시에 없는 청크만 스케줄러가 허용하는 만큼 동시에 요청
+                (캐시에 모두 있는 배치는 API 호출 없이 바로 저장 단계로 전달)
+                """
+                active = set()
+                try:
+                    while True:
+                        chunks_data = await batch_queue.get()
+                        if chunks_data is None:
+                            break
+                        
+                        # 실제 API에 보낼 텍스트 (캐시 키도 이 텍스트 기준)
+                        # 토큰 수는 청킹 때 센 값(token_count)을 사용하여 다시 토큰화하지 않음
+                        # (청커가 상한을 넘는 청크를 나누므로 토큰 경계 자르기는 만일을 위한 것)
+                        texts = []
+                        for chunk_data in chunks_data:
+                            chunk = chunk_data[0]
+                            if chunk_data[-1] > EMBEDDING_MAX_INPUT_TOKENS:
+                                chunk = truncate_to_tokens(chunk)
+                            texts.append(chunk)
                         
-                        # 배치 초기화
-                        batch_ids = []
-                        batch_embeddings = []
-                        batch_documents = []
-                        batch_metadatas = []
-                    except Exception as e:
-                        print(f"[WARNING] DB 배치 저장 실패: {e}")
-                        # 실패 시 개별 저장으로 폴백
-                        for j in range(len(batch_ids)):
+                        embeddings_by_index = {}
+                        if cache:
                             try:
-                                self.collection.add(
-                                    ids=[batch_ids[j]],
-                                    embeddings=[batch_embeddings[j]],
-                                    documents=[batch_documents[j]],
-                                    metadatas=[batch_metadatas[j]]
-                                )
-                                successful_saves += 1
-                            except:
-                                pass
-                        # 배치 초기화
-                        batch_ids = []
-                        batch_embeddings = []
-                        batch_documents = []
-                        batch_metadatas = []
+                                embeddings_by_index = await asyncio.to_thread(cache.get_many, provider.model, texts)
+                            except Exception as e:
+                                print(f"[WARNING] 임베딩 캐시 조회 실패: {e}")
+                        miss_indices = [idx for idx in range(len(texts)) if idx not in embeddings_by_index]
+                        stats['cache_hit'] += len(embeddings_by_index)
+                        stats['cache_miss'] += len(miss_indices)
+                        api_call_counter['embedding_cache_hit'] = api_call_counter.get('embedding_cache_hit', 0) + len(embeddings_by_index)
+                        api_call_counter['embedding_cache_miss'] = api_call_counter.get('embedding_cache_miss', 0) + len(miss_indices)
+                        
+                        if not miss_indices:
+                            embeddings = [embeddings_by_index[idx] for idx in range(len(texts))]
+                            await store_queue.put((chunks_data, embeddings))
+                            batch_finished(chunks_data, embeddings)
+                            continue
+                        
+                        miss_tokens = sum(min(chunks_data[idx][-1], EMBEDDING_MAX_INPUT_TOKENS) for idx in miss_indices)
+                        await scheduler.acquire(miss_tokens)
+                        task = asyncio.create_task(embed_misses(chunks_data, texts, embeddings_by_index, miss_indices, miss_tokens))
+                        active.add(task)
+                        task.add_done_callback(active.discard)
+                    if active:
+                        await asyncio.gather(*active)
+                finally:
+                    for task in active:
+                        task.cancel()
+                await store_queue.put(None)
             
-            # 마지막 남은 배치 저장
-            if batch_ids:
+            async def store_stage():
+                """
+                임베딩 결과를 DB_BATCH_SIZE개씩 모아 ChromaDB에 저장 (임베딩과 동시에 진행)
+                임베딩에 실패한 청크(벡터 None)는 저장하지 않고 재시도 큐에 보관
+                """
+                batch_ids = []
+                batch_embeddings = []
+                batch_documents = []
+                batch_metadatas = []
+                deferred_ids = []
+                deferred_documents = []
+                deferred_metadatas = []
+                resolved_canonicals = set()  # 저장을 시도했거나 재시도 큐로 보낸 대표 청크 ID
+                waiting_duplicates = []  # 대표 청크가 아직 임베딩/저장 중인 중복 청크
+                
+                async def flush_duplicates(final=False):
+                    """
+                    대표 청크의 저장이 끝난 중복 청크를 대표 청크의 벡터를 공유하여 DB_BATCH_SIZE개씩 저장
+                    (중복 청크 원문을 파이프라인 끝까지 들고 있지 않도록 저장 배치마다 호출)
+                    """
+                    arrived = len(duplicate_chunks)
+                    waiting_duplicates.extend(duplicate_chunks[:arrived])
+                    del duplicate_chunks[:arrived]
+                    ready = [item for item in waiting_duplicates if final or item[0] in resolved_canonicals]
+                    if not ready:
+                        return
+                    waiting_duplicates[:] = [item for item in waiting_duplicates if not (final or item[0] in resolved_canonicals)]
+                    for start in range(0, len(ready), DB_BATCH_SIZE):
+                        canonical_ids = []
+                        duplicate_ids = []
+                        duplicate_documents = []
+                        duplicate_metadatas = []
+                        for canonical_id, group_key, (chunk, file, i, t_start, t_end, func_name, class_name, start_line, end_line, token_count) in ready[start:start + DB_BATCH_SIZE]:
+                            metadata = build_metadata(file, i, t_start, t_end, func_name, class_name, start_line, end_line, token_count)
+                            metadata['dup_group'] = group_key
+                            canonical_ids.append(canonical_id)
+                            duplicate_ids.append(f"{file['path']}_{i}")
+                            duplicate_documents.append(chunk)
+                            duplicate_metadatas.append(metadata)
+                        missing = await asyncio.to_thread(self.add_duplicate_chunks, canonical_ids, duplicate_ids,
+                                                          duplicate_documents, duplicate_metadatas)
+                        stats['stored'] += len(duplicate_ids) - len(missing)
+                        # 대표 청크가 임베딩/저장에 실패한 중복 청크는 함께 재시도 큐로 보냄
+                        for j in missing:
+                            deferred_ids.append(duplicate_ids[j])
+                            deferred_documents.append(duplicate_documents[j])
+                            deferred_metadatas.append(duplicate_metadatas[j])
+                
+                async def flush():
+                    saved = await asyncio.to_thread(self.add_chunk_batch, batch_ids, batch_embeddings,
+                                                    batch_documents, batch_metadatas)
+                    stats['stored'] += saved
+                    print(f"[DEBUG] DB 배치 저장: {stats['stored']}개 청크")
+                    if deduplicator:
+                        resolved_canonicals.update(batch_ids)
+                    batch_ids.clear()
+                    batch_embeddings.clear()
+                    batch_documents.clear()
+                    batch_metadatas.clear()
+                    emit_progress(self.progress_callback, 'stored', stats['stored'],
+                                  stats['chunks'] if stats['chunking_done'] else 0,
+                                  f'벡터 DB 저장 중 ({stats["stored"]}/{stats["chunks"] if stats["chunking_done"] else "?"})')
+                    if deduplicator:
+                        await flush_duplicates()
+                
+                while True:
+                    item = await store_queue.get()
+                    if item is None:
+                        break
+                    chunks_data, embeddings = item
+                    for embedding, (chunk, file, i, t_start, t_end, func_name, class_name, start_line, end_line, token_count) in zip(embeddings, chunks_data):
+                        metadata = build_metadata(file, i, t_start, t_end, func_name, class_name, start_line, end_line, token_count)
+                        if deduplicator:
+                            # 중복 묶음 키는 청크 ID 대신 내용 해시로 기록 (대표 청크 파일이 바뀌어도 유효)
+                            metadata['dup_group'] = content_key(chunk)
+                        if embedding is None:
+                            deferred_ids.append(f"{file['path']}_{i}")
+                            deferred_documents.append(chunk)
+                            deferred_metadatas.append(metadata)
+                            if deduplicator:
+                                resolved_canonicals.add(deferred_ids[-1])
+                            continue
+                        batch_ids.append(f"{file['path']}_{i}")
+                        batch_embeddings.append(embedding)
+                        batch_documents.append(chunk)
+                        batch_metadatas.append(metadata)
+                        if len(batch_ids) >= DB_BATCH_SIZE:
+                            await flush()
+                if batch_ids:
+                    await flush()
+                if deduplicator:
+                    # 대표 청크가 모두 저장된 뒤 남은 중복 청크 저장
+                    await flush_duplicates(final=True)
+                if deferred_ids:
+                    stats['deferred'] = len(deferred_ids)
+                    retry_queue = get_retry_queue()
+                    if retry_queue:
+                        reason = failure_reasons[-1] if failure_reasons else '대표 청크 저장 실패'
+                        await asyncio.to_thread(retry_queue.enqueue, self.collection_name, deferred_ids,
+                                                deferred_documents, deferred_metadatas, reason)
+                        start_embedding_retry_worker()
+                    else:
+                        print(f"[ERROR] 재시도 큐를 사용할 수 없어 임베딩 실패 청크 {len(deferred_ids)}개를 저장하지 못했습니다.")
+            
+            print(f"[DEBUG] 스트리밍 임베딩 파이프라인 시작 (제공자 {provider.name}/{provider.model}, "
+                  f"배치 최대 {EMBEDDING_MAX_BATCH_TOKENS:,} 토큰, "
+                  f"동시 요청 {EMBEDDING_INITIAL_CONCURRENCY}~{EMBEDDING_MAX_CONCURRENCY}개 자동 조절)")
+            async with provider.open_scheduler() as scheduler:
+                tasks = [
+                    asyncio.create_task(asyncio.to_thread(fetch_stage)),
+                    asyncio.create_task(chunk_stage()),
+                    asyncio.create_task(embed_stage()),
+                    asyncio.create_task(store_stage()),
+                ]
                 try:
-                    self.collection.add(
-                        ids=batch_ids,
-                        embeddings=batch_embeddings,
-                        documents=batch_documents,
-                        metadatas=batch_metadatas
-                    )
-                    successful_saves += len(batch_ids)
-                    print(f"[DEBUG] DB 최종 배치 저장: {len(batch_ids)}개 청크")
-                except Exception as e:
-                    print(f"[WARNING] DB 최종 배치 저장 실패: {e}")
-                    # 개별 저장으로 폴백
-                    for j in range(len(batch_ids)):
-                        try:
-                            self.collection.add(
-                                ids=[batch_ids[j]],
-                                embeddings=[batch_embeddings[j]],
-                                documents=[batch_documents[j]],
-                                metadatas=[batch_metadatas[j]]
-                            )
-                            successful_saves += 1
-                        except:
-                            pass
+                    await asyncio.gather(*tasks)
+                except BaseException:
+                    # 한 단계라도 실패/취소되면 나머지 단계와 수집 스레드를 멈춤
+                    stop_event.set()
+                    for task in tasks:
+                        task.cancel()
+                    await asyncio.gather(*tasks, return_exceptions=True)
+                    raise
             
             # 전체 처리 완료 요약 로그
-            print(f"[INFO] DB 저장 완료: 총 {successful_saves}개 청크 저장")
+            scheduler_stats = scheduler.get_stats()
+            # 분석 로그에 남길 임베딩 처리량 (API 호출 수가 아니므로 총 호출 합계에서 제외)
+            api_call_counter['embedding_tokens_per_second'] = scheduler_stats['tokens_per_second']
+            api_call_counter['embedding_rate_limited'] = scheduler_stats['rate_limited']
+            api_call_counter['embedding_max_concurrency'] = scheduler_stats['max_concurrency']
+            print(f"[INFO] 임베딩 캐시: 적중 {stats['cache_hit']}개, 미스 {stats['cache_miss']}개")
+            if deduplicator:
+                print(f"[INFO] 중복 청크: 완전 중복 {deduplicator.stats['exact']}개, 유사 중복 {deduplicator.stats['near']}개 "
+                      f"(임베딩 생략, 대표 청크 벡터 공유)")
+            print(f"[INFO] 임베딩 처리량: {scheduler_stats['tokens_per_second']:,.0f} 토큰/초 "
+                  f"(요청 {scheduler_stats['requests']}회, 평균 {scheduler_stats['avg_latency']:.2f}초, "
+                  f"최대 동시 {scheduler_stats['max_concurrency']}개, 429 {scheduler_stats['rate_limited']}회, "
+                  f"재시도 {scheduler_stats['retries']}회)")
+            print(f"[INFO] DB 저장 완료: 총 {stats['stored']}개 청크 저장 ({len(processed_files)}개 파일, 임베딩 배치 {stats['batches']}개)")
+            if stats['deferred']:
+                print(f"[WARNING] 임베딩 실패로 재시도 대기 중인 청크: {stats['deferred']}개 (완료되면 검색에 자동 반영)")
+            emit_progress(self.progress_callback, 'stored', stats['stored'], stats['chunks'],
+                          f'벡터 DB 저장 완료 ({stats["stored"]}개 청크)')
+            return processed_files
         # 동기 함수에서 비동기 실행 - asyncio.run 사용
         if sys.version_info >= (3, 7):
-            asyncio.run(async_process_and_embed(files))
+            return asyncio.run(async_process_and_embed(files))
         else:
             raise RuntimeError("Python 3.7 이상에서만 지원됩니다.")
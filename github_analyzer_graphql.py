@@ -0,0 +1,217 @@
+"""
+GitHub GraphQL 묶음 파일 조회 모듈
+
+파일마다 /contents를 호출하는 대신 GraphQL 쿼리 하나에
+object(expression: "ref:path") { ... on Blob { text } } 조회를 최대 GRAPHQL_BATCH_SIZE개까지 묶어
+작은 파일이 많은 저장소도 수십 번의 요청으로 내용을 가져옵니다.
+바이너리 blob은 서버가 text를 돌려주지 않고(isBinary), 트리 조회로 크기를 아는 큰 파일은
+쿼리에 넣지 않으므로 불필요한 내용은 전송되지 않습니다.
+GraphQL API는 인증이 필요하므로 토큰이 있을 때만 사용합니다.
+분석 파이프라인은 GitHubRepositoryFetcher.iter_file_contents_by_mode('graphql')로 사용하며,
+파일별로 가져올 파일이 GRAPHQL_THRESHOLD개 이상이면 자동으로 선택됩니다.
+
+주요 클래스:
+    - GitHubGraphQLFetcher: GraphQL 묶음 조회로 저장소 전체 파일을 가져오는 수집기
+
+주요 함수:
+    - iter_graphql_file_contents: 수집기의 파일 목록을 GraphQL 묶음 조회로 받는 대로 생성
+    - build_blob_query: blob 묶음 조회 쿼리 생성
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterator, List, Optional
+
+import requests
+
+import github_analyzer
+from github_analyzer import (GitHubRepositoryFetcher, MAX_FILE_CONTENT_SIZE, MINIFIED_FILE_PATTERNS,
+                             emit_progress)
+from github_client import github_post
+
+# ----------------- 상수 정의 -----------------
+GRAPHQL_URL = "https://api.github.com/graphql"
+GRAPHQL_BATCH_SIZE = 100  # 쿼리 하나에 묶을 최대 파일 수
+GRAPHQL_BATCH_MAX_BYTES = 4 * 1024 * 1024  # 쿼리 하나에 묶을 파일 크기 합계 상한 (트리 조회로 크기를 아는 경우)
+GRAPHQL_MAX_BLOB_BYTES = MAX_FILE_CONTENT_SIZE * 4  # 이보다 큰 blob은 조회하지 않음 (UTF-8 한 글자 최대 4바이트)
+GRAPHQL_MAX_WORKERS = 4  # 동시에 보낼 쿼리 수 (GraphQL 2차 호출 제한을 고려해 작게 유지)
+GRAPHQL_TIMEOUT = 60  # 쿼리 읽기 타임아웃 (초)
+
+
+def build_blob_query(count: int) -> str:
+    """
+    blob 묶음 조회 쿼리 생성
+    경로는 문자열 변수($p0, $p1, ...)로 넘기므로 따옴표/역슬래시가 들어간 경로도 이스케이프할 필요가 없습니다.
+
+    Args:
+        count (int): 조회할 파일 수
+
+    Returns:
+        str: GraphQL 쿼리 (별칭 f0, f1, ...에 각 파일의 blob 정보)
+    """
+    variables = ''.join(f", $p{i}: String!" for i in range(count))
+    objects = '\n'.join(
+        f"    f{i}: object(expression: $p{i}) {{ ... on Blob {{ oid byteSize isBinary isTruncated text }} }}"
+        for i in range(count)
+    )
+    return f"query($owner: String!, $name: String!{variables}) {{\n  repository(owner: $owner, name: $name) {{\n{objects}\n  }}\n}}"
+
+
+def plan_batches(paths: List[str], sizes: Dict[str, int]) -> List[List[str]]:
+    """파일 목록을 파일 수(GRAPHQL_BATCH_SIZE)와 크기 합계(GRAPHQL_BATCH_MAX_BYTES) 기준으로 묶음"""
+    batches = []
+    batch = []
+    batch_bytes = 0
+    for path in paths:
+        size = sizes.get(path, 0)
+        if batch and (len(batch) >= GRAPHQL_BATCH_SIZE or batch_bytes + size > GRAPHQL_BATCH_MAX_BYTES):
+            batches.append(batch)
+            batch = []
+            batch_bytes = 0
+        batch.append(path)
+        batch_bytes += size
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def fetch_blob_batch(fetcher: GitHubRepositoryFetcher, ref: str, paths: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    파일 묶음을 GraphQL 쿼리 한 번으로 조회
+
+    Returns:
+        Dict[str, Optional[Dict[str, Any]]]: {경로: blob 정보 (없는 파일은 None)}
+
+    Raises:
+        requests.exceptions.RequestException: HTTP 오류 또는 쿼리 전체 실패 시
+    """
+    variables = {'owner': fetcher.owner, 'name': fetcher.repo}
+    for i, path in enumerate(paths):
+        variables[f"p{i}"] = f"{ref}:{path}"
+
+    response = github_post(GRAPHQL_URL, token=fetcher.token, json={'query': build_blob_query(len(paths)),
+                                                                   'variables': variables},
+                           timeout=GRAPHQL_TIMEOUT)
+    github_analyzer.api_call_counter['github'] += 1  # GitHub API 호출 카운트
+    if response.status_code != 200:
+        raise requests.exceptions.HTTPError(f'GraphQL 조회 실패: HTTP {response.status_code}')
+
+    payload = response.json()
+    repository = (payload.get('data') or {}).get('repository')
+    if repository is None:
+        errors = payload.get('errors') or []
+        message = errors[0].get('message') if errors else '응답에 저장소 정보가 없습니다.'
+        raise requests.exceptions.HTTPError(f'GraphQL 조회 실패: {message}')
+    return {path: repository.get(f"f{i}") for i, path in enumerate(paths)}
+
+
+def iter_graphql_file_contents(fetcher: GitHubRepositoryFetcher, paths: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    수집기의 주요 파일 내용을 GraphQL 묶음 조회로 받는 대로 생성하는 제너레이터
+    묶음 조회가 실패한 파일은 마지막에 파일별 /contents 호출 방식으로 다시 가져옵니다.
+
+    Args:
+        fetcher (GitHubRepositoryFetcher): 저장소 정보/토큰/트리 조회 결과를 가진 수집기
+        paths (Optional[List[str]]): 가져올 파일 경로 목록 (기본값: fetcher.files)
+
+    Yields:
+        Dict[str, Any]: {'path', 'content', 'file_name', 'file_type', 'sha', 'source_url'}
+    """
+    ref = fetcher.commit_sha or fetcher.get_default_branch()
+    if not ref:
+        raise requests.exceptions.RequestException('기본 브랜치를 확인할 수 없습니다.')
+
+    # 트리 조회 결과가 있으면 크기를 알 수 있으므로 큰 파일은 요청 전에 제외
+    sizes = {item['path']: item.get('size') or 0 for item in fetcher.tree_entries if item.get('type') == 'blob'}
+    wanted = []
+    for path in (fetcher.files if paths is None else paths):
+        if any(pattern in path.lower() for pattern in MINIFIED_FILE_PATTERNS):
+            continue
+        if sizes.get(path, 0) > GRAPHQL_MAX_BLOB_BYTES:
+            print(f"[DEBUG] 큰 파일 제외 (크기: {sizes[path]}): {path}")
+            continue
+        wanted.append(path)
+
+    batches = plan_batches(wanted, sizes)
+    print(f"[DEBUG] GraphQL 묶음 파일 조회 시작: {len(wanted)}개 파일, 쿼리 {len(batches)}회")
+    source_url_prefix = f"https://github.com/{fetcher.owner}/{fetcher.repo}/blob/{ref}"
+
+    executor = ThreadPoolExecutor(max_workers=GRAPHQL_MAX_WORKERS)
+    completed_count = 0
+    success_count = 0
+    failed_paths = []
+    try:
+        future_to_batch = {executor.submit(fetch_blob_batch, fetcher, ref, batch): batch for batch in batches}
+        for future in as_completed(future_to_batch):
+            batch = future_to_batch[future]
+            try:
+                blobs = future.result()
+            except (requests.exceptions.RequestException, ValueError) as e:
+                print(f"[WARNING] GraphQL 묶음 조회 실패 ({len(batch)}개 파일): {e}")
+                failed_paths.extend(batch)
+                continue
+
+            for path, blob in blobs.items():
+                completed_count += 1
+                if not blob:
+                    print(f"[WARNING] 파일을 찾을 수 없음: {path}")
+                    continue
+                if blob.get('isBinary') or blob.get('text') is None:
+                    print(f"[DEBUG] 바이너리 파일 제외: {path}")
+                    continue
+                if blob.get('isTruncated') or len(blob['text']) > MAX_FILE_CONTENT_SIZE:
+                    print(f"[DEBUG] 큰 파일 제외 (크기: {blob.get('byteSize')}): {path}")
+                    continue
+
+                file_name = path.split('/')[-1]
+                success_count += 1
+                yield {
+                    'path': path,
+                    'content': blob['text'],
+                    'file_name': file_name,
+                    'file_type': file_name.split('.')[-1],
+                    'sha': blob.get('oid'),
+                    'source_url': f"{source_url_prefix}/{path}",
+                }
+            emit_progress(fetcher.progress_callback, 'files_fetched', completed_count, len(wanted),
+                          f'파일 내용 수집 중 ({completed_count}/{len(wanted)})')
+    finally:
+        # 취소/중단 시 대기 중인 쿼리는 실행하지 않고 정리
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    print(f"[DEBUG] GraphQL 묶음 파일 조회 완료: {success_count}개 성공")
+    if failed_paths:
+        print(f"[WARNING] GraphQL 조회 실패 파일 {len(failed_paths)}개는 파일별 /contents 호출 방식으로 가져옵니다.")
+        yield from fetcher.iter_file_contents(failed_paths)
+
+
+class GitHubGraphQLFetcher(GitHubRepositoryFetcher):
+    """
+    GraphQL 묶음 조회로 저장소 파일을 가져오는 수집기
+
+    파일 목록은 git/trees 재귀 조회 1회로, 파일 내용은 최대 GRAPHQL_BATCH_SIZE개씩 묶은
+    GraphQL 쿼리로 가져옵니다. api_call_count는 마지막 수집에 사용한 GitHub API 호출 수입니다.
+    """
+
+    def __init__(self, repo_url: str, token: Optional[str] = None, session_id: Optional[str] = None,
+                 progress_callback=None):
+        super().__init__(repo_url, token, session_id, progress_callback=progress_callback)
+        self.api_call_count = 0
+
+    def get_all_files_optimized(self) -> List[Dict[str, Any]]:
+        """
+        저장소의 주요 파일 목록과 내용을 최소 호출 수로 가져옴
+
+        Returns:
+            List[Dict[str, Any]]: get_file_contents와 같은 형식의 파일 딕셔너리 리스트
+        """
+        start_count = github_analyzer.api_call_counter['github']
+        try:
+            if not self.load_repo_data(use_tree=True):
+                return []
+            if not self.token:
+                # GraphQL API는 인증이 필요하므로 토큰이 없으면 아카이브 방식 사용
+                print("[WARNING] GitHub 토큰이 없어 GraphQL 대신 아카이브 방식으로 가져옵니다.")
+                return self.get_file_contents_by_mode('archive')
+            return self.get_file_contents_by_mode('graphql')
+        finally:
+            self.api_call_count = github_analyzer.api_call_counter['github'] - start_count
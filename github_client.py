@@ -0,0 +1,485 @@
+"""
+GitHub API 공용 HTTP 클라이언트 모듈
+
+모든 GitHub API 호출이 하나의 requests.Session을 공유하도록 하여
+호스트별 커넥션 풀(keep-alive)을 재사용하고, 기본 타임아웃을 적용합니다.
+일시적인 네트워크 오류/5xx와 호출 제한(403/429)은 Retry-After,
+X-RateLimit-Remaining/X-RateLimit-Reset 헤더에 따라 대기 후 재시도하며,
+호출 제한 상태는 텔레메트리로 조회할 수 있습니다.
+자주 반복되는 메타데이터 조회(브랜치/트리/파일 내용)는 ETag 캐시로
+If-None-Match 조건부 요청을 보내며, 304 응답은 호출 제한에 포함되지 않습니다.
+
+주요 클래스:
+    - GitHubClient: 커넥션 풀/재시도/호출 제한 처리를 포함한 GitHub API 클라이언트
+    - ETagCache: (토큰 범위, URL, Accept) 키의 ETag/응답 본문 캐시 (메모리 LRU + 선택적 디스크)
+
+주요 함수:
+    - get_github_client: 프로세스 공용 GitHubClient 반환
+    - github_get: 공용 클라이언트로 GET 요청
+    - github_post: 공용 클라이언트로 POST 요청 (GraphQL 등)
+    - get_rate_limit_status: 호출 제한 텔레메트리 조회
+"""
+
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# ----------------- 상수 정의 -----------------
+GITHUB_POOL_CONNECTIONS = 4  # 커넥션 풀을 유지할 호스트 수 (api.github.com, codeload.github.com 등)
+GITHUB_POOL_MAXSIZE = 32  # 호스트당 최대 커넥션 수 (파일 내용 수집 스레드 풀 30개 기준)
+GITHUB_CONNECT_TIMEOUT = 10  # 연결 타임아웃 (초)
+GITHUB_READ_TIMEOUT = 30  # 기본 읽기 타임아웃 (초)
+GITHUB_MAX_RETRIES = 4  # 최초 요청 외 최대 재시도 횟수
+GITHUB_BACKOFF_BASE = 1.0  # 지수 백오프 기본 대기 시간 (초)
+GITHUB_BACKOFF_MAX = 30.0  # 지수 백오프 최대 대기 시간 (초)
+GITHUB_MAX_RATE_LIMIT_WAIT = 90  # 호출 제한 해제까지 이보다 오래 기다려야 하면 대기하지 않고 응답을 그대로 반환 (초)
+RETRY_STATUS_CODES = (500, 502, 503, 504)
+ETAG_CACHE_MAX_BYTES = 64 * 1024 * 1024  # 메모리 ETag 캐시에 보관할 응답 본문 총량
+ETAG_CACHE_MAX_BODY_SIZE = 8 * 1024 * 1024  # 이보다 큰 응답 본문은 캐시하지 않음
+ETAG_CACHE_PATH = "./github_cache/etags.sqlite3"  # 디스크 캐시 경로 (None이면 메모리만 사용)
+ETAG_CACHE_DISK_MAX_ENTRIES = 20000
+CACHED_RESPONSE_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Link')
+DEFAULT_HEADERS = {
+    'User-Agent': 'GitHub-Code-Analyzer/1.0',
+    'Accept': 'application/vnd.github.v3+json'
+}
+
+
+def token_key(token: Optional[str]) -> str:
+    """호출 제한은 토큰(인증 주체)별로 적용되므로 토큰 지문을 텔레메트리 키로 사용"""
+    if not token:
+        return 'anonymous'
+    return 'token:' + hashlib.sha256(token.encode('utf-8')).hexdigest()[:8]
+
+
+class ETagCache:
+    """
+    조건부 요청용 ETag/응답 본문 캐시
+
+    메모리 계층은 응답 본문 총 크기(max_bytes) 기준 LRU이며,
+    disk_path가 주어지면 SQLite 디스크 계층에도 저장하여 프로세스 재시작 후에도 재사용합니다.
+    키에 토큰 지문이 포함되므로 다른 사용자의 비공개 저장소 응답이 섞이지 않습니다.
+    """
+
+    def __init__(self, max_bytes: int = ETAG_CACHE_MAX_BYTES, disk_path: Optional[str] = ETAG_CACHE_PATH,
+                 disk_max_entries: int = ETAG_CACHE_DISK_MAX_ENTRIES):
+        """
+        캐시 초기화
+
+        Args:
+            max_bytes (int): 메모리 계층에 보관할 응답 본문 총 바이트 수
+            disk_path (Optional[str]): 디스크 계층 SQLite 파일 경로 (None이면 사용 안 함)
+            disk_max_entries (int): 디스크 계층 최대 항목 수 (초과 시 LRU 방출)
+        """
+        self.max_bytes = max_bytes
+        self.disk_max_entries = disk_max_entries
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.total_bytes = 0
+        self.conn = None
+
+        if disk_path:
+            try:
+                directory = os.path.dirname(disk_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self.conn = sqlite3.connect(disk_path, check_same_thread=False)
+                self.conn.execute("PRAGMA journal_mode=WAL")
+                self.conn.execute("""
+                    CREATE TABLE IF NOT EXISTS etag_cache (
+                        cache_key TEXT PRIMARY KEY,
+                        etag TEXT NOT NULL,
+                        headers TEXT NOT NULL,
+                        body BLOB NOT NULL,
+                        last_access REAL NOT NULL
+                    )
+                """)
+                self.conn.execute("CREATE INDEX IF NOT EXISTS idx_etag_cache_last_access ON etag_cache(last_access)")
+                self.conn.commit()
+            except Exception as e:
+                print(f"[WARNING] ETag 디스크 캐시 초기화 실패 (메모리 캐시만 사용): {e}")
+                self.conn = None
+
+    @staticmethod
+    def make_key(scope: str, url: str, accept: Optional[str]) -> str:
+        """(토큰 범위, URL, Accept 헤더)로 캐시 키 생성"""
+        return hashlib.sha256(f"{scope}\n{accept or ''}\n{url}".encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        캐시 항목 조회 (메모리 -> 디스크 순, 디스크 적중 시 메모리로 승격)
+
+        Returns:
+            Optional[Dict[str, Any]]: {'etag', 'headers', 'body'} 또는 None
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                return entry
+            if self.conn is None:
+                return None
+            row = self.conn.execute(
+                "SELECT etag, headers, body FROM etag_cache WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute("UPDATE etag_cache SET last_access = ? WHERE cache_key = ?", (time.time(), key))
+            self.conn.commit()
+            entry = {'etag': row[0], 'headers': json.loads(row[1]), 'body': bytes(row[2])}
+            self._put_memory(key, entry)
+            return entry
+
+    def put(self, key: str, etag: str, headers: Dict[str, str], body: bytes):
+        """응답을 메모리/디스크 계층에 저장"""
+        if len(body) > ETAG_CACHE_MAX_BODY_SIZE:
+            return
+        entry = {'etag': etag, 'headers': headers, 'body': body}
+        with self.lock:
+            self._put_memory(key, entry)
+            if self.conn is not None:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO etag_cache (cache_key, etag, headers, body, last_access) VALUES (?, ?, ?, ?, ?)",
+                    (key, etag, json.dumps(headers), body, time.time())
+                )
+                count = self.conn.execute("SELECT COUNT(*) FROM etag_cache").fetchone()[0]
+                overflow = count - self.disk_max_entries
+                if overflow > 0:
+                    self.conn.execute(
+                        "DELETE FROM etag_cache WHERE cache_key IN "
+                        "(SELECT cache_key FROM etag_cache ORDER BY last_access ASC LIMIT ?)",
+                        (overflow,)
+                    )
+                self.conn.commit()
+
+    def _put_memory(self, key: str, entry: Dict[str, Any]):
+        """메모리 계층에 저장하고 max_bytes를 넘으면 오래된 항목부터 방출 (잠금 안에서 호출)"""
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.total_bytes -= len(old['body'])
+        self.entries[key] = entry
+        self.total_bytes += len(entry['body'])
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            _, evicted = self.entries.popitem(last=False)
+            self.total_bytes -= len(evicted['body'])
+
+    def stats(self) -> Dict[str, int]:
+        """메모리 계층 항목 수/크기"""
+        with self.lock:
+            return {'entries': len(self.entries), 'bytes': self.total_bytes}
+
+
+class GitHubClient:
+    """
+    GitHub API 공용 클라이언트
+
+    requests.Session은 스레드 간에 공유되며, HTTPAdapter의 커넥션 풀 크기를
+    분석 스레드 풀 크기에 맞춰 TLS 핸드셰이크 없이 커넥션을 재사용합니다.
+    """
+
+    def __init__(self, pool_maxsize: int = GITHUB_POOL_MAXSIZE, max_retries: int = GITHUB_MAX_RETRIES):
+        """
+        클라이언트 초기화
+
+        Args:
+            pool_maxsize (int): 호스트당 최대 커넥션 수
+            max_retries (int): 최초 요청 외 최대 재시도 횟수
+        """
+        self.max_retries = max_retries
+        self.session = requests.Session()
+        # 재시도는 호출 제한 헤더를 해석해야 하므로 어댑터가 아닌 send()에서 직접 처리
+        adapter = HTTPAdapter(pool_connections=GITHUB_POOL_CONNECTIONS, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.etag_cache = ETagCache()
+        self.lock = threading.Lock()
+        self.rate_limits: Dict[str, Dict[str, Any]] = {}  # 토큰 지문 -> 마지막으로 받은 호출 제한 헤더
+        self.stats = {
+            'requests': 0,
+            'retries': 0,
+            'rate_limit_waits': 0,
+            'rate_limit_wait_seconds': 0.0,
+            'rate_limited_responses': 0,
+            'errors': 0,
+            'etag_hits': 0,  # 304 응답으로 캐시 본문을 재사용한 횟수 (호출 제한에 포함되지 않음)
+            'etag_misses': 0
+        }
+
+    def get(self, url: str, token: Optional[str] = None, headers: Optional[Dict[str, str]] = None,
+            timeout: Any = None, stream: bool = False, use_cache: bool = False, **kwargs) -> requests.Response:
+        """
+        GET 요청 (재시도/호출 제한 대기 포함)
+
+        Args:
+            url (str): 요청 URL
+            token (Optional[str]): GitHub 토큰 (headers에 Authorization이 없을 때만 사용)
+            headers (Optional[Dict[str, str]]): 추가 헤더 (기본 헤더를 덮어씀)
+            timeout (Any): 읽기 타임아웃(초) 또는 (연결, 읽기) 튜플 (기본값: GITHUB_READ_TIMEOUT)
+            stream (bool): 응답 본문을 스트리밍으로 받을지 여부
+            use_cache (bool): ETag 캐시로 조건부 요청을 보낼지 여부 (stream과 함께 사용 불가)
+
+        Returns:
+            requests.Response: 최종 응답 (재시도를 모두 소진했거나 대기할 수 없는 경우 마지막 응답)
+                304 응답은 캐시된 본문을 담은 200 응답으로 바꾸어 반환 (response.from_cache = True)
+
+        Raises:
+            requests.exceptions.RequestException: 재시도 후에도 연결/타임아웃 오류가 계속되는 경우
+        """
+        request_headers = dict(DEFAULT_HEADERS)
+        if headers:
+            request_headers.update(headers)
+        if token and 'Authorization' not in request_headers:
+            request_headers['Authorization'] = f'token {token}'
+        if timeout is None:
+            timeout = GITHUB_READ_TIMEOUT
+        if not isinstance(timeout, tuple):
+            timeout = (GITHUB_CONNECT_TIMEOUT, timeout)
+
+        key = token_key(self.auth_token(request_headers))
+
+        cache_key = None
+        cached = None
+        if use_cache and not stream:
+            cache_key = ETagCache.make_key(key, url, request_headers.get('Accept'))
+            cached = self.etag_cache.get(cache_key)
+            if cached:
+                request_headers['If-None-Match'] = cached['etag']
+
+        response = self.send(url, key, request_headers, timeout, stream, **kwargs)
+
+        if cache_key is None:
+            return response
+        if response.status_code == 304 and cached:
+            with self.lock:
+                self.stats['etag_hits'] += 1
+            return self.build_cached_response(url, cached)
+        with self.lock:
+            self.stats['etag_misses'] += 1
+        etag = response.headers.get('ETag')
+        if response.status_code == 200 and etag:
+            headers_to_cache = {h: response.headers[h] for h in CACHED_RESPONSE_HEADERS if h in response.headers}
+            self.etag_cache.put(cache_key, etag, headers_to_cache, response.content)
+        return response
+
+    def post(self, url: str, token: Optional[str] = None, headers: Optional[Dict[str, str]] = None,
+             timeout: Any = None, **kwargs) -> requests.Response:
+        """
+        POST 요청 (재시도/호출 제한 대기 포함, ETag 캐시 없음)
+        GraphQL 조회처럼 부작용이 없는 요청에만 사용합니다 (5xx/연결 오류 시 같은 요청을 다시 보냄).
+
+        Args:
+            url (str): 요청 URL
+            token (Optional[str]): GitHub 토큰 (headers에 Authorization이 없을 때만 사용)
+            headers (Optional[Dict[str, str]]): 추가 헤더 (기본 헤더를 덮어씀)
+            timeout (Any): 읽기 타임아웃(초) 또는 (연결, 읽기) 튜플 (기본값: GITHUB_READ_TIMEOUT)
+
+        Returns:
+            requests.Response: 최종 응답
+        """
+        request_headers = dict(DEFAULT_HEADERS)
+        if headers:
+            request_headers.update(headers)
+        if token and 'Authorization' not in request_headers:
+            request_headers['Authorization'] = f'token {token}'
+        if timeout is None:
+            timeout = GITHUB_READ_TIMEOUT
+        if not isinstance(timeout, tuple):
+            timeout = (GITHUB_CONNECT_TIMEOUT, timeout)
+
+        key = token_key(self.auth_token(request_headers))
+        return self.send(url, key, request_headers, timeout, False, method='POST', **kwargs)
+
+    def send(self, url: str, key: str, request_headers: Dict[str, str], timeout: Tuple[float, float],
+             stream: bool, method: str = 'GET', **kwargs) -> requests.Response:
+        """요청 전송 루프 (호출 제한 대기, 백오프 재시도)"""
+        self.wait_for_rate_limit(key)
+
+        attempt = 0
+        while True:
+            with self.lock:
+                self.stats['requests'] += 1
+            try:
+                response = self.session.request(method, url, headers=request_headers, timeout=timeout,
+                                                stream=stream, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                with self.lock:
+                    self.stats['errors'] += 1
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.backoff_delay(attempt)
+                print(f"[WARNING] GitHub 요청 실패, {delay:.1f}초 후 재시도 ({attempt + 1}/{self.max_retries}): {e}")
+                time.sleep(delay)
+                attempt += 1
+                with self.lock:
+                    self.stats['retries'] += 1
+                continue
+
+            self.record_rate_limit(key, response)
+            delay = self.retry_delay(response, attempt)
+            if delay is None or attempt >= self.max_retries:
+                if self.is_rate_limited(response):
+                    with self.lock:
+                        self.stats['rate_limited_responses'] += 1
+                    print(f"[WARNING] GitHub 호출 제한으로 요청 실패: HTTP {response.status_code} {url}")
+                return response
+
+            print(f"[WARNING] GitHub 응답 HTTP {response.status_code}, {delay:.1f}초 후 재시도 ({attempt + 1}/{self.max_retries}): {url}")
+            response.close()
+            with self.lock:
+                self.stats['retries'] += 1
+                if self.is_rate_limited(response):
+                    self.stats['rate_limit_waits'] += 1
+                    self.stats['rate_limit_wait_seconds'] += delay
+            time.sleep(delay)
+            attempt += 1
+
+    @staticmethod
+    def build_cached_response(url: str, cached: Dict[str, Any]) -> requests.Response:
+        """캐시 항목으로 200 응답 객체를 구성"""
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response._content = cached['body']
+        response.headers.update(cached['headers'])
+        response.encoding = 'utf-8'
+        response.from_cache = True
+        return response
+
+    @staticmethod
+    def auth_token(headers: Dict[str, str]) -> Optional[str]:
+        """Authorization 헤더에서 토큰 값만 추출"""
+        auth = headers.get('Authorization')
+        if not auth:
+            return None
+        return auth.split(' ', 1)[-1]
+
+    @staticmethod
+    def backoff_delay(attempt: int) -> float:
+        """지수 백오프 + 지터 대기 시간"""
+        delay = min(GITHUB_BACKOFF_MAX, GITHUB_BACKOFF_BASE * (2 ** attempt))
+        return delay + random.uniform(0, delay / 2)
+
+    @staticmethod
+    def is_rate_limited(response: requests.Response) -> bool:
+        """응답이 1차/2차 호출 제한에 의한 거절인지 여부"""
+        if response.status_code == 429:
+            return True
+        if response.status_code != 403:
+            return False
+        if response.headers.get('Retry-After') or response.headers.get('X-RateLimit-Remaining') == '0':
+            return True
+        return 'rate limit' in (response.text or '').lower()
+
+    def retry_delay(self, response: requests.Response, attempt: int) -> Optional[float]:
+        """
+        응답을 보고 재시도 전 대기 시간을 결정
+
+        Returns:
+            Optional[float]: 대기 시간(초), 재시도하지 않을 응답이면 None
+        """
+        if self.is_rate_limited(response):
+            retry_after = response.headers.get('Retry-After')
+            if retry_after and retry_after.isdigit():
+                delay = float(retry_after)
+            elif response.headers.get('X-RateLimit-Remaining') == '0' and response.headers.get('X-RateLimit-Reset', '').isdigit():
+                delay = max(0.0, int(response.headers['X-RateLimit-Reset']) - time.time()) + 1
+            else:
+                # 2차 호출 제한은 헤더 없이 올 수 있으므로 최소 1분 대기 권장 (GitHub 문서)
+                delay = max(60.0, self.backoff_delay(attempt))
+            if delay > GITHUB_MAX_RATE_LIMIT_WAIT:
+                print(f"[WARNING] GitHub 호출 제한 해제까지 {delay:.0f}초 필요 - 대기하지 않음")
+                return None
+            return delay
+        if response.status_code in RETRY_STATUS_CODES:
+            return self.backoff_delay(attempt)
+        return None
+
+    def record_rate_limit(self, key: str, response: requests.Response):
+        """응답의 X-RateLimit-* 헤더를 텔레메트리에 기록"""
+        remaining = response.headers.get('X-RateLimit-Remaining')
+        if remaining is None:
+            return
+        info = {
+            'limit': response.headers.get('X-RateLimit-Limit'),
+            'remaining': remaining,
+            'used': response.headers.get('X-RateLimit-Used'),
+            'reset': response.headers.get('X-RateLimit-Reset'),
+            'resource': response.headers.get('X-RateLimit-Resource'),
+            'updated_at': time.time()
+        }
+        with self.lock:
+            self.rate_limits[key] = {k: (int(v) if isinstance(v, str) and v.isdigit() else v) for k, v in info.items()}
+
+    def wait_for_rate_limit(self, key: str):
+        """
+        마지막 응답 기준으로 남은 호출 수가 0이면 요청 전에 해제 시각까지 대기
+        (대기 시간이 GITHUB_MAX_RATE_LIMIT_WAIT를 넘으면 바로 요청하여 403을 그대로 돌려줌)
+        """
+        with self.lock:
+            info = self.rate_limits.get(key)
+        if not info or info.get('remaining') != 0 or not isinstance(info.get('reset'), int):
+            return
+        delay = info['reset'] - time.time() + 1
+        if 0 < delay <= GITHUB_MAX_RATE_LIMIT_WAIT:
+            print(f"[INFO] GitHub 호출 제한 소진 - 해제까지 {delay:.0f}초 대기")
+            with self.lock:
+                self.stats['rate_limit_waits'] += 1
+                self.stats['rate_limit_wait_seconds'] += delay
+            time.sleep(delay)
+
+    def get_rate_limit_status(self) -> Dict[str, Any]:
+        """
+        호출 제한 텔레메트리 조회
+
+        Returns:
+            Dict[str, Any]: {'stats': 요청/재시도/대기/ETag 적중 집계, 'rate_limits': 토큰 지문별 마지막 호출 제한 상태,
+                             'etag_cache': 메모리 ETag 캐시 크기}
+        """
+        with self.lock:
+            status = {
+                'stats': dict(self.stats),
+                'rate_limits': {k: dict(v) for k, v in self.rate_limits.items()}
+            }
+        status['etag_cache'] = self.etag_cache.stats()
+        return status
+
+
+_default_client: Optional[GitHubClient] = None
+_default_client_lock = threading.Lock()
+
+
+def get_github_client() -> GitHubClient:
+    """프로세스 공용 GitHubClient를 반환 (최초 호출 시 생성)"""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = GitHubClient()
+        return _default_client
+
+
+def github_get(url: str, token: Optional[str] = None, headers: Optional[Dict[str, str]] = None,
+               timeout: Any = None, stream: bool = False, use_cache: bool = False, **kwargs) -> requests.Response:
+    """공용 클라이언트로 GitHub API GET 요청 (GitHubClient.get 참고)"""
+    return get_github_client().get(url, token=token, headers=headers, timeout=timeout, stream=stream,
+                                   use_cache=use_cache, **kwargs)
+
+
+def github_post(url: str, token: Optional[str] = None, headers: Optional[Dict[str, str]] = None,
+                timeout: Any = None, **kwargs) -> requests.Response:
+    """공용 클라이언트로 GitHub API POST 요청 (GitHubClient.post 참고)"""
+    return get_github_client().post(url, token=token, headers=headers, timeout=timeout, **kwargs)
+
+
+def get_rate_limit_status() -> Dict[str, Any]:
+    """공용 클라이언트의 호출 제한 텔레메트리 조회"""
+    return get_github_client().get_rate_limit_status()
@@ -0,0 +1,383 @@
+"""
+저장소별 어휘(BM25) + 식별자 역색인 모듈
+
+벡터 검색만으로는 "parse_llm_code_response 설명해줘"처럼 정확한 심볼을 묻는 질문에서
+해당 함수 청크를 놓칠 수 있습니다. 이 모듈은 청크를 저장할 때(add_chunk_batch) 청크 본문과
+function_name/class_name/path 메타데이터로 컬렉션별 SQLite FTS5 색인을 함께 만들고,
+검색 시 BM25 결과를 벡터 검색 결과와 RRF(reciprocal-rank fusion)로 합칩니다.
+질문의 식별자가 저장소의 함수/클래스 하나와 정확히 일치하면 임베딩 없이 바로 그 청크를 돌려줍니다.
+
+식별자는 원형(parse_llm_code_response)과 구성 단어(parse, llm, code, response)를 함께 색인하므로
+정확한 이름과 부분 단어 모두로 찾을 수 있습니다. 컬렉션마다 별도 테이블을 두어
+BM25 통계(문서 수, 평균 길이, 문서 빈도)가 저장소 단위로 계산됩니다.
+
+주요 클래스:
+    - LexicalIndex: 컬렉션별 FTS5 색인을 보관하는 디스크 저장소
+
+주요 함수:
+    - fuse_results: 벡터 검색 결과와 어휘 검색 결과를 RRF로 결합
+    - get_lexical_index: 프로세스 공용 색인 저장소
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+# ----------------- 상수 정의 -----------------
+LEXICAL_INDEX_PATH = "./repo_analysis_db/lexical_index.sqlite3"
+LEXICAL_SYMBOL_WEIGHT = 5.0  # BM25 계산 시 심볼 열(함수/클래스/경로)의 가중치 (본문 열은 1.0)
+LEXICAL_MAX_QUERY_TERMS = 32  # 질문에서 검색에 사용할 최대 단어 수
+LEXICAL_SYMBOL_MAX_CHUNKS = 20  # 정확한 심볼 일치 시 반환할 최대 청크 수
+RRF_K = 60  # RRF 상수 (score = sum(1 / (RRF_K + 순위)))
+
+TERM_PATTERN = re.compile(r'[A-Za-z_][A-Za-z0-9_]*|[0-9]+|[가-힣]+')
+IDENTIFIER_PART_PATTERN = re.compile(r'[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+')
+
+
+def expand_terms(text: str) -> Iterator[str]:
+    """
+    색인/검색용 단어 생성 (소문자)
+    복합 식별자는 원형과 구성 단어를 함께 생성합니다 (parseLLMResponse -> parsellmresponse, parse, llm, response).
+    """
+    for token in TERM_PATTERN.findall(text or ''):
+        yield token.lower()
+        if token[0].isascii() and ('_' in token or not (token.islower() or token.isupper())):
+            parts = IDENTIFIER_PART_PATTERN.findall(token)
+            if len(parts) > 1:
+                for part in parts:
+                    yield part.lower()
+
+
+def symbol_candidates(question: str) -> List[str]:
+    """
+    질문에서 코드 심볼로 보이는 식별자 추출
+    (밑줄/대소문자 혼용/숫자가 들어간 식별자, 괄호가 붙은 이름, 'X 함수'/'X 클래스' 형태의 이름)
+    """
+    candidates = []
+    for match in re.finditer(r'[A-Za-z_][A-Za-z0-9_]*', question):
+        name = match.group()
+        if len(name) < 3:
+            continue
+        looks_like_code = (
+            '_' in name.strip('_') or any(ch.isdigit() for ch in name)
+            or (not name.islower() and not name.isupper() and not name.istitle())
+            or question[match.end():match.end() + 1] == '('
+            or re.match(r'\s?(함수|클래스|메서드|메소드)', question[match.end():])
+        )
+        if looks_like_code and name not in candidates:
+            candidates.append(name)
+    return candidates
+
+
+def table_key(collection_name: str) -> str:
+    """컬렉션별 테이블 이름 접두사 (컬렉션 이름은 SQL 식별자로 쓸 수 없는 문자를 포함할 수 있음)"""
+    return 'lex_' + hashlib.sha1(collection_name.encode('utf-8')).hexdigest()[:16]
+
+
+class LexicalIndex:
+    """
+    컬렉션별 어휘 색인을 보관하는 디스크 저장소
+
+    컬렉션마다 청크 정보 테이블(<key>_docs: 청크 ID, 경로, 함수/클래스 이름, 청크 순번)과
+    FTS5 테이블(<key>_fts: symbols, body 열)을 두며, 두 테이블의 rowid가 같은 청크를 가리킵니다.
+    여러 스레드에서 동시에 사용할 수 있도록 내부 잠금을 사용합니다.
+    """
+
+    def __init__(self, db_path: str = LEXICAL_INDEX_PATH):
+        """
+        저장소 초기화
+
+        Args:
+            db_path (str): SQLite 파일 경로
+        """
+        self.db_path = db_path
+        self.lock = threading.Lock()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # FTS5가 없는 SQLite 빌드면 여기서 예외가 발생하여 어휘 색인을 사용하지 않음
+        self.conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS temp.fts5_check USING fts5(x)")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS lexical_collections (
+                collection_name TEXT PRIMARY KEY,
+                table_key TEXT NOT NULL
+            )
+        """)
+        self.conn.commit()
+        self.known = {name: key for name, key in self.conn.execute(
+            "SELECT collection_name, table_key FROM lexical_collections")}
+
+    def ensure_tables(self, collection_name: str) -> str:
+        """컬렉션의 색인 테이블을 만들고 테이블 접두사 반환 (잠금을 잡은 상태에서 호출)"""
+        key = self.known.get(collection_name)
+        if key:
+            return key
+        key = table_key(collection_name)
+        self.conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {key}_docs (
+                rowid INTEGER PRIMARY KEY,
+                chunk_id TEXT NOT NULL UNIQUE,
+                path TEXT NOT NULL,
+                function_name TEXT NOT NULL,
+                class_name TEXT NOT NULL,
+                chunk_index INTEGER NOT NULL
+            )
+        """)
+        self.conn.execute(f"CREATE INDEX IF NOT EXISTS {key}_docs_path ON {key}_docs(path)")
+        self.conn.execute(f"CREATE INDEX IF NOT EXISTS {key}_docs_function ON {key}_docs(function_name)")
+        self.conn.execute(f"CREATE INDEX IF NOT EXISTS {key}_docs_class ON {key}_docs(class_name)")
+        self.conn.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {key}_fts USING fts5(symbols, body, tokenize=\"unicode61 tokenchars '_'\")"
+        )
+        self.conn.execute("INSERT OR REPLACE INTO lexical_collections (collection_name, table_key) VALUES (?, ?)",
+                          (collection_name, key))
+        self.known[collection_name] = key
+        return key
+
+    def has_collection(self, collection_name: str) -> bool:
+        """컬렉션 색인이 있는지 여부"""
+        with self.lock:
+            return collection_name in self.known
+
+    def add_many(self, collection_name: str, ids: List[str], documents: List[str],
+                 metadatas: List[Dict[str, Any]]):
+        """청크를 색인 (같은 청크 ID가 이미 있으면 교체)"""
+        if not ids:
+            return
+        with self.lock:
+            key = self.ensure_tables(collection_name)
+            for chunk_id, document, metadata in zip(ids, documents, metadatas):
+                metadata = metadata or {}
+                function_name = metadata.get('function_name') or ''
+                class_name = metadata.get('class_name') or ''
+                path = metadata.get('path') or ''
+                chunk_index = metadata.get('chunk_index')
+                row = self.conn.execute(f"SELECT rowid FROM {key}_docs WHERE chunk_id = ?", (chunk_id,)).fetchone()
+                if row:
+                    self.conn.execute(f"DELETE FROM {key}_fts WHERE rowid = ?", (row[0],))
+                    self.conn.execute(f"DELETE FROM {key}_docs WHERE rowid = ?", (row[0],))
+                cursor = self.conn.execute(
+                    f"INSERT INTO {key}_docs (chunk_id, path, function_name, class_name, chunk_index) VALUES (?, ?, ?, ?, ?)",
+                    (chunk_id, path, function_name, class_name, chunk_index if isinstance(chunk_index, int) else -1)
+                )
+                symbols = ' '.join(expand_terms(f"{function_name} {class_name} {path.replace('/', ' ').replace('.', ' ')}"))
+                self.conn.execute(f"INSERT INTO {key}_fts (rowid, symbols, body) VALUES (?, ?, ?)",
+                                  (cursor.lastrowid, symbols, ' '.join(expand_terms(document))))
+            self.conn.commit()
+
+    def delete(self, collection_name: str, paths: Optional[List[str]] = None):
+        """컬렉션(또는 컬렉션의 지정 파일)의 색인 삭제"""
+        with self.lock:
+            key = self.known.get(collection_name)
+            if not key:
+                return
+            if paths is None:
+                self.conn.execute(f"DROP TABLE IF EXISTS {key}_fts")
+                self.conn.execute(f"DROP TABLE IF EXISTS {key}_docs")
+                self.conn.execute("DELETE FROM lexical_collections WHERE collection_name = ?", (collection_name,))
+                del self.known[collection_name]
+            else:
+                for path in paths:
+                    self.conn.execute(
+                        f"DELETE FROM {key}_fts WHERE rowid IN (SELECT rowid FROM {key}_docs WHERE path = ?)", (path,))
+                    self.conn.execute(f"DELETE FROM {key}_docs WHERE path = ?", (path,))
+            self.conn.commit()
+
+    def copy(self, source_collection: str, target_collection: str, paths: List[str]):
+        """다른 컬렉션에서 지정 파일의 색인을 복사 (변경 없는 파일을 새 커밋 인덱스로 옮길 때)"""
+        with self.lock:
+            source_key = self.known.get(source_collection)
+            if not source_key or not paths:
+                return
+            target_key = self.ensure_tables(target_collection)
+            for path in paths:
+                rows = self.conn.execute(
+                    f"SELECT d.chunk_id, d.path, d.function_name, d.class_name, d.chunk_index, f.symbols, f.body "
+                    f"FROM {source_key}_docs d JOIN {source_key}_fts f ON f.rowid = d.rowid WHERE d.path = ?", (path,)
+                ).fetchall()
+                for chunk_id, path_value, function_name, class_name, chunk_index, symbols, body in rows:
+                    self.conn.execute(
+                        f"DELETE FROM {target_key}_fts WHERE rowid IN (SELECT rowid FROM {target_key}_docs WHERE chunk_id = ?)",
+                        (chunk_id,))
+                    self.conn.execute(f"DELETE FROM {target_key}_docs WHERE chunk_id = ?", (chunk_id,))
+                    cursor = self.conn.execute(
+                        f"INSERT INTO {target_key}_docs (chunk_id, path, function_name, class_name, chunk_index) VALUES (?, ?, ?, ?, ?)",
+                        (chunk_id, path_value, function_name, class_name, chunk_index)
+                    )
+                    self.conn.execute(f"INSERT INTO {target_key}_fts (rowid, symbols, body) VALUES (?, ?, ?)",
+                                      (cursor.lastrowid, symbols, body))
+            self.conn.commit()
+
+    def search(self, collection_name: str, question: str, limit: int) -> List[str]:
+        """
+        질문의 단어로 BM25 검색
+
+        Returns:
+            List[str]: 점수 순 청크 ID 목록 (색인이 없거나 검색할 단어가 없으면 빈 리스트)
+        """
+        terms = list(dict.fromkeys(expand_terms(question)))[:LEXICAL_MAX_QUERY_TERMS]
+        if not terms:
+            return []
+        match = ' OR '.join('"' + term.replace('"', '""') + '"' for term in terms)
+        with self.lock:
+            key = self.known.get(collection_name)
+            if not key:
+                return []
+            rows = self.conn.execute(
+                f"SELECT d.chunk_id FROM {key}_fts JOIN {key}_docs d ON d.rowid = {key}_fts.rowid "
+                f"WHERE {key}_fts MATCH ? ORDER BY bm25({key}_fts, ?, 1.0) LIMIT ?",
+                (match, LEXICAL_SYMBOL_WEIGHT, limit)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def lookup_symbol(self, collection_name: str, names: List[str]) -> Optional[List[str]]:
+        """
+        질문의 식별자가 저장소의 함수/클래스 하나와만 정확히 일치하면 그 청크 ID 목록 반환
+
+        함수 이름은 (경로, 클래스, 함수) 단위로, 클래스 이름은 클래스 본문 청크(함수 이름 없음) 단위로 비교하며
+        여러 대상과 일치하거나 일치하는 대상이 없으면 None을 반환합니다.
+
+        Returns:
+            Optional[List[str]]: 청크 순서대로 정렬한 청크 ID 목록 또는 None
+        """
+        if not names:
+            return None
+        with self.lock:
+            key = self.known.get(collection_name)
+            if not key:
+                return None
+            placeholders = ','.join('?' * len(names))
+            rows = self.conn.execute(
+                f"SELECT chunk_id, path, class_name, function_name, chunk_index FROM {key}_docs "
+                f"WHERE function_name IN ({placeholders}) OR (class_name IN ({placeholders}) AND function_name = '')",
+                list(names) + list(names)
+            ).fetchall()
+        entities = {(path, class_name, function_name) for _, path, class_name, function_name, _ in rows}
+        if len(entities) != 1:
+            return None
+        rows.sort(key=lambda row: row[4])
+        return [row[0] for row in rows[:LEXICAL_SYMBOL_MAX_CHUNKS]]
+
+    def index_collection(self, collection, page_size: int = 1000):
+        """
+        색인 없이 만들어진 기존 컬렉션의 청크를 읽어 색인 생성 (로컬 DB만 읽으며 임베딩 호출 없음)
+
+        Args:
+            collection: ChromaDB 컬렉션
+            page_size (int): 한 번에 읽을 청크 수
+        """
+        offset = 0
+        while True:
+            rows = collection.get(include=['documents', 'metadatas'], limit=page_size, offset=offset)
+            ids = rows.get('ids') or []
+            if not ids:
+                break
+            self.add_many(collection.name, ids, rows['documents'], rows['metadatas'])
+            if len(ids) < page_size:
+                break
+            offset += page_size
+        with self.lock:
+            # 빈 컬렉션도 다시 색인하지 않도록 테이블은 만들어 둠
+            self.ensure_tables(collection.name)
+            self.conn.commit()
+        print(f"[INFO] 어휘 색인 생성: {collection.name} ({offset + len(ids)}개 청크)")
+
+    def close(self):
+        """DB 연결 종료"""
+        with self.lock:
+            self.conn.close()
+
+
+def as_query_results(rows: Dict[str, Any], order: List[str], distances: Dict[str, float],
+                     scores: Dict[str, float]) -> Dict[str, Any]:
+    """collection.get 결과를 order 순서의 collection.query 형식(+ 'scores')으로 변환"""
+    by_id = {chunk_id: position for position, chunk_id in enumerate(rows.get('ids') or [])}
+    order = [chunk_id for chunk_id in order if chunk_id in by_id]
+    return {
+        'ids': [order],
+        'documents': [[rows['documents'][by_id[chunk_id]] for chunk_id in order]],
+        'metadatas': [[rows['metadatas'][by_id[chunk_id]] for chunk_id in order]],
+        'distances': [[distances[chunk_id] for chunk_id in order]],
+        'scores': [[scores[chunk_id] for chunk_id in order]],
+    }
+
+
+def symbol_results(collection, chunk_ids: List[str]) -> Dict[str, Any]:
+    """정확한 심볼 일치 청크를 collection.query 형식으로 조회 (거리 0, 점수 1)"""
+    rows = collection.get(ids=chunk_ids, include=['documents', 'metadatas'])
+    return as_query_results(rows, chunk_ids, {chunk_id: 0.0 for chunk_id in chunk_ids},
+                            {chunk_id: 1.0 for chunk_id in chunk_ids})
+
+
+def fuse_results(collection, vector_results: Dict[str, Any], lexical_ids: List[str], n_results: int) -> Dict[str, Any]:
+    """
+    벡터 검색 결과와 어휘 검색 결과를 RRF로 결합
+
+    각 목록의 순위로 1 / (RRF_K + 순위)를 더해 정렬하며, 'scores'에는 최고점을 1로 정규화한 점수를 담습니다.
+    어휘 검색에만 나온 청크는 컬렉션에서 내용을 읽어 오고 거리는 1.0(벡터 유사도 정보 없음)으로 둡니다.
+
+    Args:
+        collection: ChromaDB 컬렉션
+        vector_results (Dict[str, Any]): collection.query 형식의 벡터 검색 결과
+        lexical_ids (List[str]): 어휘 검색 순위대로 정렬한 청크 ID 목록
+        n_results (int): 반환할 최대 청크 수
+
+    Returns:
+        Dict[str, Any]: collection.query 형식 결과 + 'scores'
+    """
+    vector_ids = (vector_results.get('ids') or [[]])[0]
+    fused = {}
+    for ranked in (vector_ids, lexical_ids):
+        for rank, chunk_id in enumerate(ranked):
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+    if not fused:
+        return vector_results
+    order = sorted(fused, key=lambda chunk_id: -fused[chunk_id])[:n_results]
+    best = fused[order[0]]
+    scores = {chunk_id: fused[chunk_id] / best for chunk_id in order}
+
+    rows = {'ids': [], 'documents': [], 'metadatas': []}
+    distances = {}
+    for position, chunk_id in enumerate(vector_ids):
+        if chunk_id in scores:
+            rows['ids'].append(chunk_id)
+            rows['documents'].append(vector_results['documents'][0][position])
+            rows['metadatas'].append(vector_results['metadatas'][0][position])
+            distances[chunk_id] = vector_results['distances'][0][position]
+    missing = [chunk_id for chunk_id in order if chunk_id not in distances]
+    if missing:
+        extra = collection.get(ids=missing, include=['documents', 'metadatas'])
+        for key in rows:
+            rows[key].extend(extra.get(key) or [])
+        for chunk_id in extra.get('ids') or []:
+            distances[chunk_id] = 1.0
+    return as_query_results(rows, order, distances, scores)
+
+
+_default_index: Optional[LexicalIndex] = None
+_default_index_lock = threading.Lock()
+
+
+def get_lexical_index() -> Optional[LexicalIndex]:
+    """
+    프로세스 공용 어휘 색인 저장소를 반환 (최초 호출 시 생성)
+
+    Returns:
+        Optional[LexicalIndex]: 저장소 객체 또는 None (파일을 열 수 없거나 FTS5를 쓸 수 없는 경우)
+    """
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            try:
+                _default_index = LexicalIndex()
+            except Exception as e:
+                print(f"[WARNING] 어휘 색인 저장소 초기화 실패: {e}")
+                return None
+        return _default_index
@@ -0,0 +1,334 @@
+"""
+파일별 코드 개요(outline) 색인 모듈
+
+"전체 함수 설명해줘", "app.py 전체 보여줘" 같은 질문은 유사도 검색(EXTENDED_TOP_K개 ANN 조회)으로는
+모든 함수를 빠짐없이 찾는다는 보장이 없고, 많은 청크를 토큰화/역할 태깅하느라 비용도 큽니다.
+이 모듈은 청크를 저장할 때(add_chunk_batch) 청커가 붙인 메타데이터(함수/클래스 이름, 라인 범위)와
+청크 본문에서 찾은 선언 줄/docstring으로 파일별 개요를 SQLite에 함께 만들고,
+이런 질문은 유사도 검색 대신 개요를 직접 조회하여 파일의 모든 함수/클래스/메서드를 순서대로 제공합니다.
+
+주요 클래스:
+    - OutlineIndex: (컬렉션, 파일)별 함수/클래스/메서드 개요를 보관하는 디스크 저장소
+
+주요 함수:
+    - render_outline: 개요를 프롬프트 컨텍스트용 텍스트로 변환
+    - get_outline_index: 프로세스 공용 개요 저장소
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# ----------------- 상수 정의 -----------------
+OUTLINE_INDEX_PATH = "./repo_analysis_db/outline_index.sqlite3"
+OUTLINE_SIGNATURE_MAX_CHARS = 200  # 저장할 선언 줄 최대 길이
+OUTLINE_DOCSTRING_MAX_CHARS = 200  # 저장할 docstring(첫 문단) 최대 길이
+
+
+def find_declaration(document: str, name: str) -> Tuple[str, str]:
+    """
+    청크 본문에서 이름의 선언 줄과 docstring(첫 문단) 찾기
+
+    Python은 선언 다음의 삼중 따옴표 문자열을, 그 밖의 언어는 선언 바로 위의 /** */ 또는 // 주석을 사용합니다.
+
+    Returns:
+        Tuple[str, str]: (선언 줄, docstring) (찾지 못하면 빈 문자열)
+    """
+    if not document or not name:
+        return '', ''
+    lines = document.split('\n')
+    pattern = re.compile(
+        rf"(\b(def|class|function|func|fn|interface|struct|enum|trait|type)\s+{re.escape(name)}\b)"
+        rf"|(\b{re.escape(name)}\s*(=\s*(async\s*)?(function\b|\()|\([^)]*\)\s*\{{))"
+    )
+    for index, line in enumerate(lines):
+        if not pattern.search(line):
+            continue
+        signature = line.strip()[:OUTLINE_SIGNATURE_MAX_CHARS]
+
+        # Python docstring: 선언 다음(여러 줄 선언이면 ':'로 끝나는 줄 다음)의 첫 문자열
+        docstring = ''
+        body = index + 1
+        while body < len(lines) and body <= index + 5 and not lines[body - 1].rstrip().endswith(':'):
+            body += 1
+        while body < len(lines) and not lines[body].strip():
+            body += 1
+        if body < len(lines) and lines[body].strip()[:3] in ('"""', "'''"):
+            quote = lines[body].strip()[:3]
+            text = lines[body].strip()[3:]
+            parts = []
+            line_index = body
+            while True:
+                if quote in text:
+                    parts.append(text.split(quote)[0])
+                    break
+                if not text and parts:
+                    break  # 첫 문단까지만 사용
+                parts.append(text)
+                line_index += 1
+                if line_index >= len(lines):
+                    break
+                text = lines[line_index].strip()
+            docstring = ' '.join(part.strip() for part in parts).strip()
+        else:
+            # 선언 바로 위의 주석 (/** ... */, // ..., # ...)
+            comments = []
+            above = index - 1
+            while above >= 0 and lines[above].strip().startswith(('*', '/**', '/*', '//', '#')):
+                text = lines[above].strip().lstrip('/*#').rstrip('*/').strip()
+                if text and not text.startswith('@'):
+                    comments.insert(0, text)
+                above -= 1
+            docstring = ' '.join(comments)
+        return signature, docstring.split('. ')[0][:OUTLINE_DOCSTRING_MAX_CHARS]
+    return '', ''
+
+
+class OutlineIndex:
+    """
+    (컬렉션, 파일)별 함수/클래스/메서드 개요를 보관하는 디스크 저장소
+
+    항목은 (컬렉션, 경로, 클래스 이름, 함수 이름) 단위이며, 여러 청크로 나뉜 함수는
+    라인 범위를 합치고 선언 줄/docstring은 처음 찾은 값을 유지합니다.
+    여러 스레드에서 동시에 사용할 수 있도록 내부 잠금을 사용합니다.
+    """
+
+    def __init__(self, db_path: str = OUTLINE_INDEX_PATH):
+        """
+        저장소 초기화
+
+        Args:
+            db_path (str): SQLite 파일 경로
+        """
+        self.db_path = db_path
+        self.lock = threading.Lock()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS outline_entries (
+                collection_name TEXT NOT NULL,
+                path TEXT NOT NULL,
+                class_name TEXT NOT NULL,
+                function_name TEXT NOT NULL,
+                start_line INTEGER NOT NULL,
+                end_line INTEGER NOT NULL,
+                signature TEXT NOT NULL,
+                docstring TEXT NOT NULL,
+                PRIMARY KEY (collection_name, path, class_name, function_name)
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS outline_collections (
+                collection_name TEXT PRIMARY KEY
+            )
+        """)
+        self.conn.commit()
+
+    def has_collection(self, collection_name: str) -> bool:
+        """컬렉션 개요가 만들어졌는지 여부"""
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM outline_collections WHERE collection_name = ?",
+                                     (collection_name,)).fetchone() is not None
+
+    def add_many(self, collection_name: str, documents: List[str], metadatas: List[Dict[str, Any]]):
+        """청크 메타데이터로 개요 항목 추가/갱신 (함수/클래스가 없는 청크는 무시)"""
+        rows = []
+        for document, metadata in zip(documents, metadatas):
+            metadata = metadata or {}
+            function_name = metadata.get('function_name') or ''
+            class_name = metadata.get('class_name') or ''
+            if not function_name and not class_name:
+                continue
+            start_line = metadata.get('start_line')
+            end_line = metadata.get('end_line')
+            signature, docstring = find_declaration(document, function_name or class_name)
+            rows.append((collection_name, metadata.get('path') or '', class_name, function_name,
+                         start_line if isinstance(start_line, int) else -1,
+                         end_line if isinstance(end_line, int) else -1, signature, docstring))
+        with self.lock:
+            self.conn.execute("INSERT OR IGNORE INTO outline_collections (collection_name) VALUES (?)", (collection_name,))
+            self.conn.executemany("""
+                INSERT INTO outline_entries
+                    (collection_name, path, class_name, function_name, start_line, end_line, signature, docstring)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (collection_name, path, class_name, function_name) DO UPDATE SET
+                    start_line = CASE WHEN start_line < 0 OR (excluded.start_line >= 0 AND excluded.start_line < start_line)
+                                      THEN excluded.start_line ELSE start_line END,
+                    end_line = MAX(end_line, excluded.end_line),
+                    signature = CASE WHEN signature = '' THEN excluded.signature ELSE signature END,
+                    docstring = CASE WHEN docstring = '' THEN excluded.docstring ELSE docstring END
+            """, rows)
+            self.conn.commit()
+
+    def delete(self, collection_name: str, paths: Optional[List[str]] = None):
+        """컬렉션(또는 컬렉션의 지정 파일)의 개요 삭제"""
+        with self.lock:
+            if paths is None:
+                self.conn.execute("DELETE FROM outline_entries WHERE collection_name = ?", (collection_name,))
+                self.conn.execute("DELETE FROM outline_collections WHERE collection_name = ?", (collection_name,))
+            else:
+                self.conn.executemany(
+                    "DELETE FROM outline_entries WHERE collection_name = ? AND path = ?",
+                    [(collection_name, path) for path in paths]
+                )
+            self.conn.commit()
+
+    def copy(self, source_collection: str, target_collection: str, paths: List[str]):
+        """다른 컬렉션에서 지정 파일의 개요를 복사 (변경 없는 파일을 새 커밋 인덱스로 옮길 때)"""
+        with self.lock:
+            if not paths or self.conn.execute("SELECT 1 FROM outline_collections WHERE collection_name = ?",
+                                              (source_collection,)).fetchone() is None:
+                return
+            self.conn.execute("INSERT OR IGNORE INTO outline_collections (collection_name) VALUES (?)", (target_collection,))
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO outline_entries "
+                "SELECT ?, path, class_name, function_name, start_line, end_line, signature, docstring "
+                "FROM outline_entries WHERE collection_name = ? AND path = ?",
+                [(target_collection, source_collection, path) for path in paths]
+            )
+            self.conn.commit()
+
+    def list_files(self, collection_name: str) -> List[str]:
+        """개요가 있는 파일 경로 목록 (경로 순)"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT DISTINCT path FROM outline_entries WHERE collection_name = ? ORDER BY path", (collection_name,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def match_files(self, collection_name: str, names: List[str]) -> List[str]:
+        """
+        질문에 나온 파일 이름/경로와 일치하는 파일 경로 목록
+
+        경로가 같거나 '/이름'으로 끝나는 파일을 우선하고, 없으면 파일 이름에 포함된 파일을 찾습니다.
+        """
+        paths = self.list_files(collection_name)
+        matched = []
+        for name in names:
+            exact = [path for path in paths if path == name or path.endswith('/' + name)]
+            partial = exact or [path for path in paths if name in path.rsplit('/', 1)[-1]]
+            for path in partial:
+                if path not in matched:
+                    matched.append(path)
+        return matched
+
+    def get_outline(self, collection_name: str, paths: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        파일별 개요 항목 조회
+
+        Returns:
+            Dict[str, List[Dict[str, Any]]]: {경로: [{'kind', 'name', 'class_name', 'start_line', 'end_line',
+                                                      'signature', 'docstring'}, ...]} (라인 순, paths 순서 유지)
+        """
+        outline = {path: [] for path in paths}
+        with self.lock:
+            for path in paths:
+                rows = self.conn.execute(
+                    "SELECT class_name, function_name, start_line, end_line, signature, docstring FROM outline_entries "
+                    "WHERE collection_name = ? AND path = ? ORDER BY start_line, class_name, function_name",
+                    (collection_name, path)
+                ).fetchall()
+                for class_name, function_name, start_line, end_line, signature, docstring in rows:
+                    kind = 'class' if not function_name else 'method' if class_name else 'function'
+                    outline[path].append({
+                        'kind': kind, 'name': function_name or class_name, 'class_name': class_name,
+                        'start_line': start_line, 'end_line': end_line,
+                        'signature': signature, 'docstring': docstring
+                    })
+        return outline
+
+    def index_collection(self, collection, page_size: int = 1000):
+        """
+        개요 없이 만들어진 기존 컬렉션의 청크를 읽어 개요 생성 (로컬 DB만 읽으며 임베딩 호출 없음)
+
+        Args:
+            collection: ChromaDB 컬렉션
+            page_size (int): 한 번에 읽을 청크 수
+        """
+        offset = 0
+        total = 0
+        while True:
+            rows = collection.get(include=['documents', 'metadatas'], limit=page_size, offset=offset)
+            ids = rows.get('ids') or []
+            total += len(ids)
+            self.add_many(collection.name, rows.get('documents') or [], rows.get('metadatas') or [])
+            if len(ids) < page_size:
+                break
+            offset += page_size
+        print(f"[INFO] 코드 개요 색인 생성: {collection.name} ({total}개 청크)")
+
+    def close(self):
+        """DB 연결 종료"""
+        with self.lock:
+            self.conn.close()
+
+
+def render_outline(outline: Dict[str, List[Dict[str, Any]]], max_tokens: int,
+                   count_tokens: Callable[[str], int], detailed: bool = True) -> Tuple[str, int]:
+    """
+    개요를 프롬프트 컨텍스트용 텍스트로 변환 (max_tokens를 넘으면 뒤쪽 항목 생략)
+
+    Args:
+        outline (Dict[str, List[Dict[str, Any]]]): get_outline 결과
+        max_tokens (int): 최대 토큰 수
+        count_tokens (Callable[[str], int]): 토큰 수 계산 함수
+        detailed (bool): 선언 줄/docstring 포함 여부 (저장소 전체 개요는 이름/라인만 표시)
+
+    Returns:
+        Tuple[str, int]: (개요 텍스트, 포함한 항목 수)
+    """
+    lines = []
+    tokens = 0
+    included = 0
+    for path, entries in outline.items():
+        header = f"// FILE: {path} (함수/클래스 {len(entries)}개)"
+        tokens += count_tokens(header)
+        if tokens > max_tokens:
+            break
+        lines.append(header)
+        for entry in entries:
+            indent = '    ' if entry['kind'] == 'method' else ''
+            kind = {'class': '클래스', 'method': '메서드', 'function': '함수'}[entry['kind']]
+            line = f"{indent}- [{kind}] {entry['class_name'] + '.' if entry['kind'] == 'method' else ''}{entry['name']}"
+            if entry['start_line'] >= 0:
+                line += f" (라인 {entry['start_line']}~{entry['end_line']})"
+            if detailed and entry['signature']:
+                line += f"\n{indent}  선언: {entry['signature']}"
+            if detailed and entry['docstring']:
+                line += f"\n{indent}  설명: {entry['docstring']}"
+            tokens += count_tokens(line)
+            if tokens > max_tokens:
+                lines.append("... (토큰 제한으로 이후 항목 생략)")
+                return '\n'.join(lines), included
+            lines.append(line)
+            included += 1
+    return '\n'.join(lines), included
+
+
+_default_index: Optional[OutlineIndex] = None
+_default_index_lock = threading.Lock()
+
+
+def get_outline_index() -> Optional[OutlineIndex]:
+    """
+    프로세스 공용 개요 저장소를 반환 (최초 호출 시 생성)
+
+    Returns:
+        Optional[OutlineIndex]: 저장소 객체 또는 None (파일을 열 수 없는 경우)
+    """
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            try:
+                _default_index = OutlineIndex()
+            except Exception as e:
+                print(f"[WARNING] 코드 개요 저장소 초기화 실패: {e}")
+                return None
+        return _default_index
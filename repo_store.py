@@ -0,0 +1,332 @@
+"""
+저장소 로컬 저장소(backing store) 모듈
+
+채팅/코드 수정 기능이 읽는 ./repos/{session_id} 작업 디렉토리를 만들어 줍니다.
+세션마다 전체 클론을 하는 대신 owner/repo별로 blob 없는 부분 클론(--filter=blob:none) bare 미러를
+하나만 두고, 세션마다 그 미러에서 git worktree를 만듭니다.
+
+- 미러에는 커밋/트리만 받아 두고 파일 내용(blob)은 실제로 필요한 파일만 그때그때 받습니다.
+- worktree는 --no-checkout으로 만들고 인덱스만 채우므로 세션을 만들어도 파일을 내려받지 않습니다.
+- 파일을 읽을 때 로컬에 없는 파일만 git checkout으로 꺼내며, 이때 누락된 blob을 한 번에 받아옵니다.
+- 디스크 사용량은 세션 수가 아니라 저장소 수에 비례합니다.
+
+원격 주소는 REPO_REMOTE_URL_TEMPLATE으로 바꿀 수 있어 로컬 bare 저장소를 GitHub 대신 쓸 수 있습니다.
+(예: file:///tmp/remotes/{owner}/{repo}.git - 부분 클론을 쓰려면 원본에 uploadpack.allowFilter=true 필요)
+
+주요 클래스:
+    - RepoStore: 저장소별 미러와 세션별 worktree 관리
+"""
+
+import base64
+import os
+import re
+import shutil
+import threading
+import time
+from typing import Dict, List, Optional, Tuple, Any
+
+import git
+
+# ----------------- 상수 정의 -----------------
+REPO_MIRROR_ROOT = os.environ.get('REPO_MIRROR_ROOT', './repo_mirrors')  # owner/repo별 bare 미러 위치
+REPO_WORKTREE_ROOT = os.environ.get('REPO_WORKTREE_ROOT', './repos')  # 세션별 worktree 위치 (./repos/{session_id})
+REPO_REMOTE_URL_TEMPLATE = os.environ.get('REPO_REMOTE_URL_TEMPLATE', 'https://github.com/{owner}/{repo}.git')
+MIRROR_FETCH_INTERVAL = 60  # 커밋을 지정하지 않은 요청에서 미러를 다시 fetch하는 최소 간격 (초)
+MIRROR_FETCH_REFSPEC = '+refs/heads/*:refs/heads/*'
+PARTIAL_CLONE_FILTER = 'blob:none'
+
+
+def parse_repo_url(repo_url: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    GitHub 저장소 URL에서 (owner, repo) 추출
+
+    Args:
+        repo_url (str): GitHub 저장소 URL (https://github.com/owner/repo[.git][/...])
+
+    Returns:
+        Tuple[Optional[str], Optional[str]]: (owner, repo) 또는 (None, None)
+    """
+    match = re.search(r'github\.com[/:]([^/\s]+)/([^/\s]+?)(?:\.git)?(?:/.*)?$', (repo_url or '').strip().rstrip('/'))
+    if not match:
+        return None, None
+    return match.group(1), match.group(2)
+
+
+def git_env(token: Optional[str] = None) -> Dict[str, str]:
+    """
+    git 명령 실행 환경 변수
+
+    토큰은 원격 URL이나 설정 파일에 남기지 않고 환경 변수 설정(GIT_CONFIG_*)으로만 전달합니다.
+    부분 클론의 지연 blob fetch도 같은 환경을 물려받으므로 비공개 저장소에서도 동작합니다.
+    """
+    env = {'GIT_TERMINAL_PROMPT': '0', 'GIT_LITERAL_PATHSPECS': '1'}
+    if token:
+        credentials = base64.b64encode(f"x-access-token:{token}".encode()).decode()
+        env.update({
+            'GIT_CONFIG_COUNT': '1',
+            'GIT_CONFIG_KEY_0': 'http.extraHeader',
+            'GIT_CONFIG_VALUE_0': f"Authorization: Basic {credentials}",
+        })
+    return env
+
+
+def is_safe_path(path: str) -> bool:
+    """저장소 밖을 가리키지 않는 상대 경로인지 확인"""
+    normalized = os.path.normpath(path or '')
+    return bool(path) and not os.path.isabs(normalized) and normalized != '..' and not normalized.startswith('..' + os.sep)
+
+
+class RepoStore:
+    """
+    owner/repo별 blob 없는 bare 미러와 세션별 worktree를 관리하는 클래스
+
+    같은 저장소의 미러를 동시에 클론/fetch하거나 worktree를 동시에 추가하지 않도록
+    저장소별 잠금을 사용합니다.
+    """
+
+    def __init__(self, mirror_root: str = REPO_MIRROR_ROOT, worktree_root: str = REPO_WORKTREE_ROOT,
+                 remote_url_template: str = REPO_REMOTE_URL_TEMPLATE):
+        """
+        저장소 관리자 초기화
+
+        Args:
+            mirror_root (str): bare 미러를 저장할 디렉토리
+            worktree_root (str): 세션별 worktree를 만들 디렉토리
+            remote_url_template (str): 원격 저장소 주소 템플릿 ({owner}, {repo} 치환)
+        """
+        self.mirror_root = mirror_root
+        self.worktree_root = worktree_root
+        self.remote_url_template = remote_url_template
+        self.locks = {}
+        self.locks_guard = threading.Lock()
+        self.last_fetch = {}
+
+    def get_lock(self, key: str) -> threading.RLock:
+        """저장소별 잠금 반환"""
+        with self.locks_guard:
+            return self.locks.setdefault(key, threading.RLock())
+
+    def mirror_path(self, owner: str, repo: str) -> str:
+        """미러 경로 (GitHub 이름은 대소문자를 구분하지 않으므로 소문자로 통일)"""
+        return os.path.join(self.mirror_root, owner.lower(), f"{repo.lower()}.git")
+
+    def worktree_path(self, session_id: str) -> str:
+        """세션 worktree 경로"""
+        return os.path.join(self.worktree_root, session_id)
+
+    def has_commit(self, mirror: str, commit_sha: str) -> bool:
+        """미러에 커밋이 있는지 확인"""
+        try:
+            git.Git(mirror).cat_file('-e', f"{commit_sha}^{{commit}}")
+            return True
+        except git.GitCommandError:
+            return False
+
+    def ensure_mirror(self, owner: str, repo: str, token: Optional[str] = None,
+                      commit_sha: Optional[str] = None) -> str:
+        """
+        저장소의 blob 없는 bare 미러를 준비 (없으면 부분 클론, 있으면 필요할 때만 fetch)
+
+        Args:
+            owner (str): 저장소 소유자
+            repo (str): 저장소 이름
+            token (Optional[str]): GitHub 토큰
+            commit_sha (Optional[str]): 필요한 커밋 (이미 미러에 있으면 fetch 생략)
+
+        Returns:
+            str: 미러 경로
+
+        Raises:
+            git.GitCommandError: 클론/fetch 실패 시
+        """
+        mirror = self.mirror_path(owner, repo)
+        env = git_env(token)
+        key = f"{owner.lower()}/{repo.lower()}"
+
+        with self.get_lock(key):
+            if not os.path.exists(os.path.join(mirror, 'HEAD')):
+                remote_url = self.remote_url_template.format(owner=owner, repo=repo)
+                tmp_path = f"{mirror}.tmp-{os.getpid()}-{threading.get_ident()}"
+                shutil.rmtree(tmp_path, ignore_errors=True)
+                os.makedirs(os.path.dirname(mirror), exist_ok=True)
+                start = time.time()
+                print(f"[INFO] 저장소 미러 생성 (filter={PARTIAL_CLONE_FILTER}): {key}")
+                try:
+                    git.Repo.clone_from(remote_url, tmp_path, bare=True, filter=PARTIAL_CLONE_FILTER, env=env)
+                    # 이후 fetch가 브랜치를 그대로 갱신하도록 refspec 설정
+                    git.Git(tmp_path).config('remote.origin.fetch', MIRROR_FETCH_REFSPEC)
+                    os.rename(tmp_path, mirror)
+                except Exception:
+                    shutil.rmtree(tmp_path, ignore_errors=True)
+                    raise
+                self.last_fetch[key] = time.time()
+                print(f"[TIMING] 저장소 미러 생성 완료: {key} ({time.time() - start:.2f}초)")
+                if not commit_sha or self.has_commit(mirror, commit_sha):
+                    return mirror
+
+            if commit_sha and self.has_commit(mirror, commit_sha):
+                return mirror
+            if not commit_sha and time.time() - self.last_fetch.get(key, 0) < MIRROR_FETCH_INTERVAL:
+                return mirror
+
+            start = time.time()
+            git.Git(mirror).fetch('--prune', 'origin', env=env)
+            self.last_fetch[key] = time.time()
+            if commit_sha and not self.has_commit(mirror, commit_sha):
+                # 브랜치에서 더 이상 가리키지 않는 커밋은 SHA로 직접 요청
+                git.Git(mirror).fetch('origin', commit_sha, env=env)
+            print(f"[TIMING] 저장소 미러 fetch 완료: {key} ({time.time() - start:.2f}초)")
+            return mirror
+
+    def get_worktree_commit(self, session_id: str) -> Optional[str]:
+        """세션 worktree의 HEAD 커밋 (worktree가 없으면 None)"""
+        path = self.worktree_path(session_id)
+        if not os.path.exists(os.path.join(path, '.git')):
+            return None
+        try:
+            return git.Git(path).rev_parse('HEAD')
+        except git.GitCommandError:
+            return None
+
+    def ensure_session_worktree(self, session_id: str, repo_url: str, token: Optional[str] = None,
+                                commit_sha: Optional[str] = None) -> Dict[str, Any]:
+        """
+        세션 worktree를 준비 (이미 있으면 재사용, 커밋이 바뀌었으면 다시 만듦)
+
+        worktree는 파일을 체크아웃하지 않고 인덱스만 채워 두므로 만드는 비용이 트리 크기에만 비례합니다.
+
+        Args:
+            session_id (str): 세션 ID
+            repo_url (str): GitHub 저장소 URL
+            token (Optional[str]): GitHub 토큰
+            commit_sha (Optional[str]): 고정할 커밋 (없으면 기존 worktree 또는 미러의 기본 브랜치)
+
+        Returns:
+            Dict[str, Any]: {'success', 'repo_path', 'commit_sha', 'error'}
+        """
+        owner, repo = parse_repo_url(repo_url)
+        if not owner or not repo:
+            return {'success': False, 'error': f'잘못된 저장소 URL입니다: {repo_url}'}
+
+        path = self.worktree_path(session_id)
+        git_marker = os.path.join(path, '.git')
+        try:
+            with self.get_lock(f"{owner.lower()}/{repo.lower()}"):
+                if os.path.isdir(git_marker):
+                    # 이전 방식으로 만들어진 전체 클론은 그대로 사용
+                    return {'success': True, 'repo_path': path, 'commit_sha': self.get_worktree_commit(session_id)}
+
+                current = self.get_worktree_commit(session_id)
+                if current and (not commit_sha or current == commit_sha):
+                    return {'success': True, 'repo_path': path, 'commit_sha': current}
+                if os.path.exists(path) and not os.path.isfile(git_marker):
+                    return {'success': False, 'error': f'worktree 경로가 이미 사용 중입니다: {path}'}
+
+                mirror = self.ensure_mirror(owner, repo, token, commit_sha)
+                target = commit_sha or git.Git(mirror).rev_parse('HEAD')
+                if current:
+                    # 새 커밋으로 재분석된 경우 (로컬에만 있는 수정 커밋은 버려짐)
+                    print(f"[INFO] 세션 worktree 커밋 변경: {session_id} ({current[:7]} -> {target[:7]})")
+                    self.remove_worktree_path(mirror, path)
+
+                start = time.time()
+                os.makedirs(self.worktree_root, exist_ok=True)
+                git.Git(mirror).worktree('prune')
+                git.Git(mirror).worktree('add', '--no-checkout', '--detach', os.path.abspath(path), target)
+                # 트리만으로 인덱스를 채움 (blob을 받지 않음)
+                git.Git(path).read_tree('HEAD')
+                print(f"[TIMING] 세션 worktree 생성: {session_id} @ {target[:7]} ({time.time() - start:.2f}초)")
+                return {'success': True, 'repo_path': path, 'commit_sha': target}
+        except Exception as e:
+            print(f"[ERROR] 세션 worktree 준비 실패 ({session_id}): {e}")
+            return {'success': False, 'error': str(e)}
+
+    def materialize(self, session_id: str, paths: List[str], token: Optional[str] = None) -> List[str]:
+        """
+        worktree에 아직 없는 파일을 체크아웃 (누락된 blob은 한 번의 fetch로 받아옴)
+
+        Args:
+            session_id (str): 세션 ID
+            paths (List[str]): 저장소 기준 파일 경로 목록
+            token (Optional[str]): GitHub 토큰 (지연 blob fetch용)
+
+        Returns:
+            List[str]: 로컬 디스크에 있는 파일 경로 목록
+        """
+        path = self.worktree_path(session_id)
+        paths = [p for p in dict.fromkeys(paths) if is_safe_path(p)]
+        missing = [p for p in paths if not os.path.isfile(os.path.join(path, p))]
+        if missing and os.path.isfile(os.path.join(path, '.git')):
+            env = git_env(token)
+            try:
+                tracked = git.Git(path).ls_files('-z', '--', *missing, env=env).split('\0')
+                tracked = [p for p in tracked if p]
+                if tracked:
+                    start = time.time()
+                    git.Git(path).checkout('--', *tracked, env=env)
+                    print(f"[DEBUG] worktree 파일 {len(tracked)}개 체크아웃 ({time.time() - start:.2f}초)")
+            except git.GitCommandError as e:
+                print(f"[WARNING] worktree 파일 체크아웃 실패 ({session_id}): {e}")
+        return [p for p in paths if os.path.isfile(os.path.join(path, p))]
+
+    def ensure_session_files(self, session_id: str, repo_url: str, token: Optional[str],
+                             paths: List[str]) -> Dict[str, Any]:
+        """
+        세션 worktree를 준비하고 요청한 파일을 로컬 디스크에 꺼냄
+
+        Returns:
+            Dict[str, Any]: {'success', 'repo_path', 'files': 로컬에 있는 파일 목록, 'error'}
+        """
+        result = self.ensure_session_worktree(session_id, repo_url, token)
+        if not result.get('success'):
+            return result
+        result['files'] = self.materialize(session_id, paths, token)
+        return result
+
+    def remove_worktree_path(self, mirror: Optional[str], path: str):
+        """worktree 디렉토리 삭제 및 미러의 worktree 등록 정리"""
+        if mirror and os.path.isdir(mirror):
+            try:
+                git.Git(mirror).worktree('remove', '--force', os.path.abspath(path))
+            except git.GitCommandError as e:
+                print(f"[DEBUG] git worktree remove 실패, 디렉토리 직접 삭제: {e}")
+        shutil.rmtree(path, ignore_errors=True)
+        if mirror and os.path.isdir(mirror):
+            git.Git(mirror).worktree('prune')
+
+    def remove_session_worktree(self, session_id: str, repo_url: Optional[str] = None) -> bool:
+        """
+        세션 worktree 삭제 (미러는 다른 세션이 함께 쓰므로 남겨 둠)
+
+        Returns:
+            bool: 삭제 여부
+        """
+        path = self.worktree_path(session_id)
+        if not os.path.isfile(os.path.join(path, '.git')):
+            return False
+        owner, repo = parse_repo_url(repo_url or '')
+        mirror = self.mirror_path(owner, repo) if owner and repo else None
+        try:
+            if mirror:
+                with self.get_lock(f"{owner.lower()}/{repo.lower()}"):
+                    self.remove_worktree_path(mirror, path)
+            else:
+                self.remove_worktree_path(None, path)
+            print(f"[INFO] 세션 worktree 삭제: {session_id}")
+            return True
+        except Exception as e:
+            print(f"[WARNING] 세션 worktree 삭제 실패 ({session_id}): {e}")
+            return False
+
+
+# 모듈 전역 저장소 관리자 (처음 사용할 때 생성)
+_default_store = None
+_default_store_lock = threading.Lock()
+
+def get_repo_store() -> RepoStore:
+    """모듈 전역 RepoStore 인스턴스 반환"""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = RepoStore()
+        return _default_store
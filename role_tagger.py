@@ -0,0 +1,218 @@
+"""
+코드 청크 역할 태깅(role_tag) 백그라운드 작업 모듈
+
+채팅 경로에서 질문에 '역할/기능/설명'이 있을 때마다 컨텍스트 청크마다 LLM을 순서대로 호출하면
+답변 생성 전에 최대 수십 번의 왕복이 생기고, 만든 태그는 버려져 다음 질문에서 다시 비용을 냅니다.
+이 모듈은 인덱스 빌드가 끝난 컬렉션(또는 태그 없이 만들어진 기존 컬렉션)의 태그 없는 청크를
+여러 청크씩 한 프롬프트로 묶어 제한된 동시 실행 수로 태깅하고 결과를 컬렉션 메타데이터('role_tag')에 기록합니다.
+채팅 경로는 저장된 태그를 읽기만 합니다.
+
+주요 클래스:
+    - RoleTagWorker: 태깅할 컬렉션을 차례로 처리하는 백그라운드 스레드
+
+주요 함수:
+    - tag_collection: 컬렉션의 태그 없는 청크를 태깅하여 메타데이터에 기록
+"""
+
+import json
+import os
+import threading
+import collections
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List
+
+import openai
+
+# ----------------- 상수 정의 -----------------
+ROLE_TAGGING = os.environ.get('ROLE_TAGGING', '1') != '0'  # 인덱스 빌드 후 역할 태깅 사용 여부
+ROLE_TAG_MODEL = os.environ.get('ROLE_TAG_MODEL', 'gpt-4o-mini')
+ROLE_TAG_BATCH_SIZE = 20  # 프롬프트 하나에 묶는 청크 수
+ROLE_TAG_CONCURRENCY = int(os.environ.get('ROLE_TAG_CONCURRENCY', 4))  # 동시에 보내는 태깅 요청 수
+ROLE_TAG_MAX_CHARS = 500  # 청크당 프롬프트에 넣는 최대 코드 길이
+ROLE_TAG_MAX_TOKENS_PER_CHUNK = 60  # 청크당 응답 토큰 예산
+ROLE_TAG_MAX_ATTEMPTS = 3  # 청크당 태깅 시도 횟수 (메타데이터 'role_tag_attempts', 넘으면 태그 없이 둠)
+
+
+def build_prompt(documents: List[str], metadatas: List[Dict[str, Any]]) -> str:
+    """청크 묶음의 역할 태깅 프롬프트 (번호를 키로 하는 JSON 객체로 답하도록 요청)"""
+    sections = []
+    for number, (document, metadata) in enumerate(zip(documents, metadatas), 1):
+        entity_name = metadata.get('function_name') or metadata.get('class_name') or ''
+        header = f"[{number}] 파일: {metadata.get('path', '')}"
+        if entity_name:
+            header += f" / 이름: {entity_name}"
+        sections.append(f"{header}\n```\n{document[:ROLE_TAG_MAX_CHARS]}\n```")
+    return (
+        "아래 코드 청크 각각의 역할/기능을 한글 한 문장으로 요약해줘.\n"
+        "청크 번호를 키로 하는 JSON 객체로만 답해줘. 예: {\"1\": \"...\", \"2\": \"...\"}\n\n"
+        + '\n\n'.join(sections)
+    )
+
+
+def tag_batch(documents: List[str], metadatas: List[Dict[str, Any]]) -> List[str]:
+    """
+    청크 묶음을 한 번의 요청으로 태깅
+
+    Returns:
+        List[str]: 청크별 역할 태그 (응답에 없는 청크는 빈 문자열)
+    """
+    response = openai.chat.completions.create(
+        model=ROLE_TAG_MODEL,
+        messages=[{"role": "user", "content": build_prompt(documents, metadatas)}],
+        temperature=0.0,
+        max_tokens=ROLE_TAG_MAX_TOKENS_PER_CHUNK * len(documents) + 20,
+        response_format={"type": "json_object"}
+    )
+    tags = json.loads(response.choices[0].message.content or '{}')
+    return [str(tags.get(str(number), '')).strip() for number in range(1, len(documents) + 1)]
+
+
+def tag_collection(collection, batch_size: int = ROLE_TAG_BATCH_SIZE,
+                   concurrency: int = ROLE_TAG_CONCURRENCY) -> Dict[str, int]:
+    """
+    컬렉션의 태그 없는 청크를 태깅하여 메타데이터('role_tag')에 기록
+
+    같은 중복 묶음(메타데이터 'dup_group')의 청크는 한 청크만 태깅하고 나머지는 그 태그를 복사하며,
+    묶음에 이미 태그가 있는 청크가 있으면 그 태그를 사용합니다.
+    태깅하지 못한 청크는 시도 횟수('role_tag_attempts')를 늘려 태그 없이 남기고,
+    ROLE_TAG_MAX_ATTEMPTS번 실패한 청크는 더 이상 요청하지 않습니다.
+
+    Args:
+        collection: ChromaDB 컬렉션
+        batch_size (int): 프롬프트 하나에 묶는 청크 수
+        concurrency (int): 동시에 보내는 태깅 요청 수
+
+    Returns:
+        Dict[str, int]: {'tagged': 태깅한 청크 수, 'failed': 태깅하지 못한 청크 수}
+    """
+    rows = collection.get(where={'role_tag': ''}, include=['metadatas'])
+    ids = rows.get('ids') or []
+    metadatas = rows.get('metadatas') or []
+    stats = {'tagged': 0, 'failed': 0}
+
+    # 묶음 키 -> 태그 없는 청크 ID 목록 (묶음 키가 없는 청크는 자기 혼자 묶음)
+    groups = collections.OrderedDict()
+    metadata_by_id = {}
+    for chunk_id, metadata in zip(ids, metadatas):
+        if (metadata or {}).get('role_tag_attempts', 0) >= ROLE_TAG_MAX_ATTEMPTS:
+            continue
+        metadata_by_id[chunk_id] = metadata or {}
+        groups.setdefault(metadata_by_id[chunk_id].get('dup_group') or chunk_id, []).append(chunk_id)
+
+    if not groups:
+        return stats
+
+    # 묶음에 이미 태그된 청크가 있으면 그 태그 사용
+    tags_by_group = {}
+    group_keys = [key for key, members in groups.items() if key not in metadata_by_id]
+    for start in range(0, len(group_keys), 1000):
+        stored = collection.get(where={'$and': [{'dup_group': {'$in': group_keys[start:start + 1000]}},
+                                                {'role_tag': {'$ne': ''}}]}, include=['metadatas'])
+        for metadata in stored.get('metadatas') or []:
+            if (metadata or {}).get('role_tag'):
+                tags_by_group.setdefault(metadata['dup_group'], metadata['role_tag'])
+
+    representatives = {members[0]: key for key, members in groups.items() if key not in tags_by_group}
+    print(f"[INFO] 역할 태깅 시작: {collection.name} ({len(representatives)}개 청크, 태그 복사 {len(metadata_by_id) - len(representatives)}개)")
+
+    def run_batch(batch_ids: List[str]):
+        batch = collection.get(ids=batch_ids, include=['documents', 'metadatas'])
+        return batch['ids'], tag_batch(batch['documents'], batch['metadatas'])
+
+    canonical_ids = list(representatives)
+    batches = [canonical_ids[start:start + batch_size] for start in range(0, len(canonical_ids), batch_size)]
+    # 요청은 병렬로 보내고 컬렉션 기록은 이 스레드에서만 수행
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix='role-tag') as executor:
+        futures = {executor.submit(run_batch, batch_ids): batch_ids for batch_ids in batches}
+        for future in as_completed(futures):
+            try:
+                batch_ids, tags = future.result()
+            except Exception as e:
+                print(f"[WARNING] 역할 태깅 실패 ({len(futures[future])}개 청크): {e}")
+                continue
+            tags_by_group.update({representatives[chunk_id]: tag for chunk_id, tag in zip(batch_ids, tags) if tag})
+
+    # 묶음의 태그를 묶음의 모든 태그 없는 청크에 기록하고, 태깅하지 못한 청크는 시도 횟수 증가
+    updates = []
+    for key, members in groups.items():
+        for chunk_id in members:
+            metadata = metadata_by_id[chunk_id]
+            if tags_by_group.get(key):
+                updates.append((chunk_id, dict(metadata, role_tag=tags_by_group[key])))
+                stats['tagged'] += 1
+            else:
+                updates.append((chunk_id, dict(metadata, role_tag_attempts=metadata.get('role_tag_attempts', 0) + 1)))
+                stats['failed'] += 1
+    for start in range(0, len(updates), 1000):
+        part = updates[start:start + 1000]
+        collection.update(ids=[chunk_id for chunk_id, _ in part], metadatas=[metadata for _, metadata in part])
+
+    print(f"[INFO] 역할 태깅 완료: {collection.name} (태깅 {stats['tagged']}개, 실패 {stats['failed']}개)")
+    return stats
+
+
+class RoleTagWorker:
+    """
+    태깅할 컬렉션을 차례로 처리하는 백그라운드 스레드
+
+    같은 컬렉션은 대기열에 한 번만 들어가며, 한 번 처리한 컬렉션은 force=True로 다시 예약될 때까지 건너뜁니다
+    (채팅 질문마다 예약되어도 태깅하지 못한 청크를 매번 다시 요청하지 않음).
+    컬렉션 조회는 생성 시 받은 함수에 맡기므로 이 모듈은 ChromaDB 클라이언트에 의존하지 않습니다.
+    """
+
+    def __init__(self, get_collection: Callable[[str], Any]):
+        """
+        작업자 초기화
+
+        Args:
+            get_collection: 컬렉션 이름으로 ChromaDB 컬렉션을 반환하는 함수 (없으면 예외 발생)
+        """
+        self.get_collection = get_collection
+        self.pending = collections.deque()
+        self.completed = set()  # 태깅 작업을 한 번 마친 컬렉션 이름
+        self.lock = threading.Lock()
+        self.wake_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='role-tagger', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def enqueue(self, collection_name: str, force: bool = False):
+        """
+        컬렉션 태깅 예약
+
+        Args:
+            collection_name (str): 컬렉션 이름
+            force (bool): True면 이미 처리한 컬렉션도 다시 확인 (새 청크가 추가된 경우, 실패한 청크도 재시도)
+        """
+        with self.lock:
+            if force:
+                self.completed.discard(collection_name)
+            if collection_name in self.completed or collection_name in self.pending:
+                return
+            self.pending.append(collection_name)
+        self.wake_event.set()
+
+    def run_once(self):
+        """대기열의 컬렉션을 모두 처리"""
+        while True:
+            with self.lock:
+                if not self.pending:
+                    return
+                collection_name = self.pending.popleft()
+            try:
+                tag_collection(self.get_collection(collection_name))
+            except Exception as e:
+                print(f"[WARNING] 역할 태깅 작업 실패 ({collection_name}): {e}")
+            # 실패한 청크는 다음 force 예약(인덱스 갱신) 때만 다시 시도
+            with self.lock:
+                self.completed.add(collection_name)
+
+    def run(self):
+        while True:
+            self.wake_event.wait()
+            self.wake_event.clear()
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"[ERROR] 역할 태깅 작업자 오류: {e}")
@@ -0,0 +1,754 @@
+"""
+저장소 분석 파이프라인 오프라인 벤치마크
+- 로컬 GitHub API 대역(stand-in) 서버가 크기/구조를 지정한 합성 저장소를 제공
+- 지연 시간을 설정할 수 있는 가짜 임베딩 서버(OpenAI 호환 /v1/embeddings)
+- analyze_repository의 단계별(목록, 수집, 청킹, 임베딩, 저장) 시간을 측정하여 JSON으로 저장
+- github_analyzer.py와 github_analyzer_v*.py 버전을 같은 머신에서 네트워크 없이 비교
+
+사용 예:
+    python test/benchmark_pipeline.py
+    python test/benchmark_pipeline.py --modules github_analyzer github_analyzer_v6 --shapes small medium
+    python test/benchmark_pipeline.py --files 800 --depth 4 --embed-latency 200 --runs 3
+
+각 실행은 별도 프로세스(임시 작업 디렉토리)에서 진행되므로 모듈 전역 상태, ChromaDB,
+임베딩/ETag 캐시가 실행 간에 공유되지 않으며 프로세스별 최대 메모리(RSS)도 함께 기록합니다.
+"""
+
+import argparse
+import base64
+import hashlib
+import importlib
+import inspect
+import io
+import json
+import os
+import random
+import shutil
+import struct
+import subprocess
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import unquote, urlparse
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+# 합성 저장소 모양 프리셋
+REPO_SHAPES = {
+    "tiny": {"files": 10, "depth": 1, "fanout": 2, "lines": 40},
+    "small": {"files": 60, "depth": 2, "fanout": 3, "lines": 80},
+    "medium": {"files": 300, "depth": 3, "fanout": 4, "lines": 120},
+    "large": {"files": 1500, "depth": 4, "fanout": 5, "lines": 150},
+    "deep": {"files": 300, "depth": 8, "fanout": 2, "lines": 100},
+    "wide": {"files": 600, "depth": 1, "fanout": 40, "lines": 60},
+}
+
+# 확장자별 비율 (MAIN_EXTENSIONS 밖의 파일도 섞어 필터링 비용까지 포함)
+FILE_MIX = [(".py", 0.45), (".js", 0.2), (".md", 0.12), (".ts", 0.05), (".txt", 0.05),
+            (".ipynb", 0.03), (".json", 0.05), (".min.js", 0.02), (".png", 0.03)]
+
+BENCH_OWNER = "bench"
+TIKTOKEN_HOST = "https://openaipublic.blob.core.windows.net"
+# tiktoken 캐시 형식의 인코딩 사본 위치 (네트워크가 될 때 한 번 채워 둠:
+#   TIKTOKEN_CACHE_DIR=test/tiktoken_cache python -c "import tiktoken; tiktoken.get_encoding('cl100k_base')")
+TIKTOKEN_CACHE_DIR = PROJECT_ROOT / "test" / "tiktoken_cache"
+STANDIN_VOCAB_SIZE = 50000  # 인코딩 사본이 없을 때 쓰는 대역 어휘 크기
+CL100K_PAT_STR = r"""'(?i:[sdmt]|ll|ve|re)|[^\r\n\p{L}\p{N}]?+\p{L}++|\p{N}{1,3}+| ?[^\s\p{L}\p{N}]++[\r\n]*+|\s++$|\s*[\r\n]|\s+(?!\S)|\s"""
+EMBEDDING_DIMENSIONS = 3072
+DEFAULT_MODULES = ["github_analyzer"]
+DEFAULT_SHAPES = ["small", "medium"]
+
+
+# ----------------- 합성 저장소 -----------------
+
+class SyntheticRepo:
+    """시드로 결정되는 합성 저장소 (같은 설정이면 항상 같은 파일/SHA/아카이브)"""
+
+    def __init__(self, name: str, files: int, depth: int, fanout: int, lines: int, seed: int = 42):
+        self.name = name
+        self.shape = {"files": files, "depth": depth, "fanout": fanout, "lines": lines, "seed": seed}
+        rng = random.Random(f"{name}:{seed}")
+
+        directories = [""]
+        frontier = [""]
+        for level in range(depth):
+            next_frontier = []
+            for parent in frontier:
+                for i in range(fanout):
+                    path = f"{parent}/d{level}_{i}".lstrip("/")
+                    directories.append(path)
+                    next_frontier.append(path)
+            frontier = next_frontier
+
+        extensions = [ext for ext, _ in FILE_MIX]
+        weights = [weight for _, weight in FILE_MIX]
+        self.files: Dict[str, bytes] = {"README.md": self.make_markdown(rng, lines).encode("utf-8")}
+        for i in range(files - 1):
+            ext = rng.choices(extensions, weights)[0]
+            directory = rng.choice(directories)
+            path = f"{directory}/f{i}{ext}".lstrip("/")
+            self.files[path] = self.make_content(rng, ext, rng.randint(lines // 2, lines * 2))
+
+        self.directories = set()
+        for path in self.files:
+            parts = path.split("/")
+            for i in range(1, len(parts)):
+                self.directories.add("/".join(parts[:i]))
+
+        self.shas = {path: hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest() for path, data in self.files.items()}
+        self.commit_sha = hashlib.sha1("".join(sorted(self.shas.values())).encode()).hexdigest()
+        self.tarball = self.make_tarball()
+
+    @staticmethod
+    def make_python(rng: random.Random, lines: int) -> str:
+        out = ["import os", "import sys", ""]
+        while len(out) < lines:
+            if rng.random() < 0.3:
+                cls = f"Service{rng.randint(0, 999)}"
+                out += [f"class {cls}:", f'    """{cls} 처리 클래스"""', "",
+                        "    def __init__(self, value):", "        self.value = value", ""]
+                for m in range(rng.randint(1, 4)):
+                    out += [f"    def method_{m}(self, x):",
+                            f"        if x > {rng.randint(0, 50)}:",
+                            f"            return self.value * x + {rng.randint(0, 9)}",
+                            "        for i in range(x):",
+                            "            x += i",
+                            "        return x", ""]
+            else:
+                fn = f"func_{rng.randint(0, 9999)}"
+                out += [f"def {fn}(items, limit={rng.randint(1, 100)}):",
+                        f'    """{fn}: 항목을 걸러서 반환"""',
+                        "    result = []",
+                        "    for item in items:",
+                        "        if item and len(result) < limit:",
+                        "            result.append(item)",
+                        "    return result", ""]
+        return "\n".join(out[:lines]) + "\n"
+
+    @staticmethod
+    def make_javascript(rng: random.Random, lines: int) -> str:
+        out = ["'use strict';", ""]
+        while len(out) < lines:
+            fn = f"handle{rng.randint(0, 9999)}"
+            out += [f"function {fn}(req, res) {{",
+                    f"  const limit = {rng.randint(1, 100)};",
+                    "  if (!req.items) {",
+                    "    return res.status(400).json({ error: 'missing' });",
+                    "  }",
+                    "  const items = req.items.filter((x) => x.size < limit);",
+                    "  return res.json(items);",
+                    "}", ""]
+        return "\n".join(out[:lines]) + "\n"
+
+    @staticmethod
+    def make_markdown(rng: random.Random, lines: int) -> str:
+        out = [f"# 문서 {rng.randint(0, 999)}", ""]
+        while len(out) < lines:
+            out += [f"## 섹션 {rng.randint(0, 999)}", "",
+                    "이 섹션은 벤치마크용 합성 문서입니다. " * rng.randint(1, 4), "",
+                    "```python", f"print({rng.randint(0, 99)})", "```", ""]
+        return "\n".join(out[:lines]) + "\n"
+
+    @classmethod
+    def make_notebook(cls, rng: random.Random, lines: int) -> str:
+        cells = []
+        for _ in range(max(2, lines // 20)):
+            if rng.random() < 0.5:
+                cells.append({"cell_type": "markdown", "metadata": {}, "source": cls.make_markdown(rng, 8)})
+            else:
+                cells.append({"cell_type": "code", "metadata": {}, "execution_count": None, "outputs": [],
+                              "source": cls.make_python(rng, 15)})
+        return json.dumps({"cells": cells, "metadata": {}, "nbformat": 4, "nbformat_minor": 5})
+
+    def make_content(self, rng: random.Random, ext: str, lines: int) -> bytes:
+        if ext == ".py":
+            return self.make_python(rng, lines).encode("utf-8")
+        if ext in (".js", ".ts", ".min.js"):
+            return self.make_javascript(rng, lines).encode("utf-8")
+        if ext in (".md", ".txt"):
+            return self.make_markdown(rng, lines).encode("utf-8")
+        if ext == ".ipynb":
+            return self.make_notebook(rng, lines).encode("utf-8")
+        if ext == ".json":
+            return json.dumps({"key": rng.randint(0, 999), "items": list(range(lines))}).encode("utf-8")
+        return bytes(rng.getrandbits(8) for _ in range(lines * 8))  # 바이너리 파일
+
+    def make_tarball(self) -> bytes:
+        """GitHub tarball과 같은 구조 ({owner}-{repo}-{sha}/ 최상위 디렉토리, pax 글로벌 헤더)"""
+        buffer = io.BytesIO()
+        prefix = f"{BENCH_OWNER}-{self.name}-{self.commit_sha[:7]}"
+        with tarfile.open(fileobj=buffer, mode="w:gz", format=tarfile.PAX_FORMAT,
+                          pax_headers={"comment": self.commit_sha}) as tar:
+            for path, data in self.files.items():
+                info = tarfile.TarInfo(f"{prefix}/{path}")
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+        return buffer.getvalue()
+
+    def tree(self) -> List[Dict[str, Any]]:
+        entries = [{"path": d, "mode": "040000", "type": "tree", "sha": hashlib.sha1(d.encode()).hexdigest()}
+                   for d in self.directories]
+        entries += [{"path": p, "mode": "100644", "type": "blob", "sha": self.shas[p], "size": len(data)}
+                    for p, data in self.files.items()]
+        return sorted(entries, key=lambda e: e["path"])
+
+    def list_directory(self, path: str) -> Optional[List[Dict[str, Any]]]:
+        if path and path not in self.directories:
+            return None
+        children = {}
+        for candidate in list(self.files) + list(self.directories):
+            parent, _, child = candidate.rpartition("/")
+            if parent == path:
+                children[candidate] = child
+        return [
+            {"name": name, "path": p, "type": "file" if p in self.files else "dir",
+             "sha": self.shas.get(p, ""), "size": len(self.files.get(p, b""))}
+            for p, name in sorted(children.items())
+        ]
+
+
+# ----------------- 로컬 서비스 (GitHub / OpenAI 대역) -----------------
+
+class RequestLog:
+    """서버가 처리한 요청 기록 (부모 프로세스에서 실행별로 잘라서 집계)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.records: List[Dict[str, Any]] = []
+
+    def add(self, **record):
+        with self.lock:
+            self.records.append(record)
+
+    def between(self, start: float, end: float) -> List[Dict[str, Any]]:
+        with self.lock:
+            return [r for r in self.records if r["start"] >= start and r["end"] <= end]
+
+
+class QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive (클라이언트 커넥션 재사용 효과까지 측정)
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, status: int, body: bytes, content_type: str = "application/json", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self.wfile.write(body)
+
+    def send_json(self, status: int, data: Any, headers=None):
+        body = json.dumps(data).encode("utf-8")
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        if status == 200 and self.headers.get("If-None-Match") == etag:
+            self.send_body(304, b"", headers={"ETag": etag})
+            return 304
+        self.send_body(status, body, headers={"ETag": etag, **(headers or {})})
+        return status
+
+
+class FakeGitHubHandler(QuietHandler):
+    """api.github.com REST 대역: 저장소 정보, contents, git/trees, tarball, commits, branches"""
+
+    def do_GET(self):
+        start = time.time()
+        time.sleep(self.server.latency)
+        parsed = urlparse(self.path)
+        parts = [unquote(p) for p in parsed.path.strip("/").split("/")]
+        kind, status, size = "unknown", 404, 0
+
+        repo = None
+        if len(parts) >= 3 and parts[0] == "repos" and parts[1] == BENCH_OWNER:
+            repo = self.server.repos.get(parts[2])
+
+        if repo is None:
+            status = self.send_json(404, {"message": "Not Found"})
+        else:
+            rest = parts[3:]
+            if not rest:
+                kind = "repo_info"
+                status = self.send_json(200, {"name": repo.name, "full_name": f"{BENCH_OWNER}/{repo.name}",
+                                              "private": False, "default_branch": "main",
+                                              "owner": {"login": BENCH_OWNER}})
+            elif rest[0] == "branches":
+                kind = "listing"
+                status = self.send_json(200, [{"name": "main", "commit": {"sha": repo.commit_sha}}])
+            elif rest[0] == "commits" and len(rest) > 1:
+                kind = "listing"
+                if "sha" in (self.headers.get("Accept") or ""):
+                    body = repo.commit_sha.encode()
+                    self.send_body(200, body, "text/plain")
+                    status, size = 200, len(body)
+                else:
+                    status = self.send_json(200, {"sha": repo.commit_sha})
+            elif rest[:2] == ["git", "trees"]:
+                kind = "listing"
+                status = self.send_json(200, {"sha": repo.commit_sha, "tree": repo.tree(), "truncated": False})
+            elif rest[0] == "tarball":
+                kind = "fetch"
+                self.send_body(200, repo.tarball, "application/x-gzip")
+                status, size = 200, len(repo.tarball)
+            elif rest[0] == "contents":
+                path = "/".join(rest[1:])
+                if path in repo.files:
+                    kind = "fetch"
+                    data = repo.files[path]
+                    status = self.send_json(200, {
+                        "type": "file", "name": path.split("/")[-1], "path": path, "sha": repo.shas[path],
+                        "size": len(data), "encoding": "base64", "content": base64.b64encode(data).decode(),
+                        "html_url": f"https://github.com/{BENCH_OWNER}/{repo.name}/blob/main/{path}",
+                        "download_url": None})
+                else:
+                    kind = "listing"
+                    listing = repo.list_directory(path)
+                    status = self.send_json(200 if listing is not None else 404,
+                                            listing if listing is not None else {"message": "Not Found"})
+
+        self.server.log.add(kind=kind, path=parsed.path, status=status, size=size,
+                            start=start, end=time.time())
+
+
+class FakeOpenAIHandler(QuietHandler):
+    """OpenAI 호환 대역: /v1/embeddings (float/base64), /v1/chat/completions (역할 태깅용)"""
+
+    def do_POST(self):
+        start = time.time()
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        path = urlparse(self.path).path
+
+        if path.endswith("/embeddings"):
+            inputs = payload.get("input") or []
+            if isinstance(inputs, str):
+                inputs = [inputs]
+            dimensions = payload.get("dimensions") or EMBEDDING_DIMENSIONS
+            time.sleep(self.server.latency + self.server.per_text_latency * len(inputs))
+            data = []
+            for i, text in enumerate(inputs):
+                seed = hashlib.sha256(str(text).encode("utf-8")).digest()
+                vector = [((seed[j % 32] + j) % 255) / 255.0 for j in range(dimensions)]
+                if payload.get("encoding_format") == "base64":
+                    embedding = base64.b64encode(struct.pack(f"<{dimensions}f", *vector)).decode()
+                else:
+                    embedding = vector
+                data.append({"object": "embedding", "index": i, "embedding": embedding})
+            tokens = sum(len(str(t)) // 4 for t in inputs)
+            self.send_json(200, {"object": "list", "data": data, "model": payload.get("model"),
+                                 "usage": {"prompt_tokens": tokens, "total_tokens": tokens}})
+            self.server.log.add(kind="embedding", texts=len(inputs), start=start, end=time.time())
+        elif path.endswith("/chat/completions"):
+            time.sleep(self.server.latency)
+            self.send_json(200, {"id": "bench", "object": "chat.completion", "created": int(start),
+                                 "model": payload.get("model"),
+                                 "choices": [{"index": 0, "finish_reason": "stop",
+                                              "message": {"role": "assistant", "content": "기타"}}],
+                                 "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}})
+            self.server.log.add(kind="chat", texts=1, start=start, end=time.time())
+        else:
+            self.send_json(404, {"error": {"message": "not found"}})
+
+
+def start_server(handler_cls, **attributes) -> ThreadingHTTPServer:
+    """127.0.0.1의 빈 포트에서 스레드 서버를 백그라운드로 시작"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler_cls)
+    server.daemon_threads = True
+    server.log = RequestLog()
+    for key, value in attributes.items():
+        setattr(server, key, value)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ----------------- 오프라인 토크나이저 -----------------
+
+def standin_bpe_ranks(pat_str: str, vocab_size: int = STANDIN_VOCAB_SIZE) -> Dict[bytes, int]:
+    """
+    프로젝트 소스에서 만든 대역 BPE 어휘 (256 바이트 + 자주 나오는 조각의 접두어)
+    실제 cl100k_base와 토큰 수는 조금 다르지만 같은 Rust BPE 경로를 타므로 청킹 비용은 비슷하게 측정됩니다.
+    """
+    import regex
+    from collections import Counter
+    counts = Counter()
+    for path in sorted(PROJECT_ROOT.glob("*.py")):
+        for piece in regex.findall(pat_str, path.read_text(encoding="utf-8", errors="ignore")):
+            counts[piece.encode("utf-8")] += 1
+    ranks = {bytes([i]): i for i in range(256)}
+    for piece, _ in counts.most_common():
+        # 접두어를 차례로 넣어 모든 토큰이 더 낮은 순위 토큰 두 개의 병합으로 만들어지게 함
+        for end in range(2, len(piece) + 1):
+            ranks.setdefault(piece[:end], len(ranks))
+        if len(ranks) >= vocab_size:
+            break
+    return ranks
+
+
+def install_offline_tokenizer() -> str:
+    """
+    네트워크 없이 tiktoken 인코딩을 쓸 수 있게 준비하고 사용한 토크나이저를 반환
+    - TIKTOKEN_CACHE_DIR에 인코딩 사본이 있으면 그대로 사용 ("cl100k_base")
+    - 없으면 어휘 로딩만 대역 어휘로 바꾸고 정규식/특수 토큰은 원래 정의를 사용 ("standin")
+    인코딩 파일 요청은 run_worker에서 외부로 나가지 않도록 막혀 있습니다.
+    """
+    os.environ.setdefault("TIKTOKEN_CACHE_DIR", str(TIKTOKEN_CACHE_DIR))
+    from tiktoken_ext import openai_public
+    original_load = openai_public.load_tiktoken_bpe
+    used = {"tokenizer": "cl100k_base"}
+
+    def load_bpe(blobpath, expected_hash=None):
+        try:
+            return original_load(blobpath, expected_hash=expected_hash)
+        except Exception as e:
+            print(f"[벤치마크] 인코딩 사본 없음 ({os.path.basename(blobpath)}: {type(e).__name__}), 대역 어휘 사용")
+            used["tokenizer"] = "standin"
+            return standin_bpe_ranks(CL100K_PAT_STR)
+
+    openai_public.load_tiktoken_bpe = load_bpe
+    import tiktoken
+    tiktoken.get_encoding("cl100k_base")  # 측정 시간에 어휘 준비가 들어가지 않도록 미리 로드
+    return used["tokenizer"]
+
+
+# ----------------- 실행 프로세스 (모듈 하나, 저장소 하나) -----------------
+
+def run_worker(args):
+    """
+    임시 작업 디렉토리에서 analyze_repository를 한 번 실행하고 측정값을 result_file에 기록
+    GitHub 호출은 requests 전송 단계에서 로컬 대역 서버로 주소만 바꾸어 보내므로
+    github_analyzer_v*.py를 수정하지 않고도 같은 조건으로 비교할 수 있습니다.
+    """
+    os.chdir(args.workdir)
+    sys.path.insert(0, str(PROJECT_ROOT))
+    os.environ["OPENAI_BASE_URL"] = args.openai_url
+    os.environ["OPENAI_API_KEY"] = "sk-benchmark"
+
+    import requests
+    original_request = requests.Session.request
+
+    def local_request(self, method, url, *a, **kw):
+        if isinstance(url, str) and url.startswith("https://api.github.com"):
+            url = args.github_url + url[len("https://api.github.com"):]
+        if isinstance(url, str) and url.startswith(TIKTOKEN_HOST):
+            raise requests.ConnectionError(f"benchmark is offline: {url}")
+        return original_request(self, method, url, *a, **kw)
+
+    requests.Session.request = local_request
+    tokenizer = install_offline_tokenizer()
+
+    # ChromaDB 저장 시간 측정 (모든 버전이 Collection.add로 저장)
+    from chromadb.api.models.Collection import Collection
+    store_records = []
+    original_add = Collection.add
+
+    def timed_add(self, *a, **kw):
+        start = time.time()
+        try:
+            return original_add(self, *a, **kw)
+        finally:
+            ids = kw.get("ids") if "ids" in kw else (a[0] if a else [])
+            store_records.append({"start": start, "end": time.time(), "rows": len(ids or [])})
+
+    Collection.add = timed_add
+
+    module = importlib.import_module(args.module)
+    chunker = sys.modules.get("code_chunker")
+    if chunker is not None and hasattr(chunker, "start_chunk_executor"):
+        chunker.start_chunk_executor()  # app.py처럼 스레드를 만들기 전에 청킹 프로세스 풀 생성
+    events = []
+
+    def progress_callback(stage, current=0, total=0, message=""):
+        events.append({"time": time.time(), "stage": stage, "current": current, "total": total})
+
+    kwargs = {}
+    if "progress_callback" in inspect.signature(module.analyze_repository).parameters:
+        kwargs["progress_callback"] = progress_callback
+
+    session_id = f"bench_{args.module.replace('github_analyzer', 'ga')}"[:40]
+    start = time.time()
+    error = None
+    try:
+        result = module.analyze_repository(args.repo_url, None, session_id, **kwargs)
+    except Exception as e:
+        result = {"success": False, "error": str(e)}
+    end = time.time()
+    if not result.get("success"):
+        error = result.get("error")
+
+    try:
+        import resource
+        peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:
+        peak_rss_mb = None
+
+    with open(args.result_file, "w", encoding="utf-8") as f:
+        json.dump({
+            "start": start,
+            "end": end,
+            "success": bool(result.get("success")),
+            "error": error,
+            "files": result.get("total_files", len(result.get("files", []) or [])),
+            "events": events,
+            "store_records": store_records,
+            "peak_rss_mb": peak_rss_mb,
+            "tokenizer": tokenizer,
+        }, f)
+
+
+# ----------------- 벤치마크 실행/집계 -----------------
+
+def summarize_window(records: List[Dict[str, Any]], origin: float) -> Optional[Dict[str, Any]]:
+    """요청/호출 기록 -> {start, end, duration(구간), busy(개별 시간 합), count} (실행 시작 기준 초)"""
+    if not records:
+        return None
+    start = min(r["start"] for r in records)
+    end = max(r["end"] for r in records)
+    return {
+        "start": round(start - origin, 3),
+        "end": round(end - origin, 3),
+        "duration": round(end - start, 3),
+        "busy": round(sum(r["end"] - r["start"] for r in records), 3),
+        "count": len(records),
+    }
+
+
+class PipelineBenchmark:
+    def __init__(self, args):
+        self.args = args
+        self.repos: Dict[str, SyntheticRepo] = {}
+        self.results = {
+            "metadata": {
+                "timestamp": datetime.now().isoformat(),
+                "python": sys.version.split()[0],
+                "platform": sys.platform,
+                "cpu_count": os.cpu_count(),
+                "github_latency_ms": args.github_latency,
+                "embed_latency_ms": args.embed_latency,
+                "embed_per_text_latency_ms": args.embed_per_text_latency,
+                "runs": args.runs,
+            },
+            "repositories": {},
+            "runs": [],
+        }
+
+    def build_repositories(self):
+        """프리셋 또는 --files/--depth 등으로 지정한 합성 저장소 생성"""
+        if self.args.files:
+            shapes = {"custom": {"files": self.args.files, "depth": self.args.depth,
+                                 "fanout": self.args.fanout, "lines": self.args.lines}}
+        else:
+            shapes = {name: REPO_SHAPES[name] for name in self.args.shapes}
+        for name, shape in shapes.items():
+            repo = SyntheticRepo(name, seed=self.args.seed, **shape)
+            self.repos[name] = repo
+            self.results["repositories"][name] = {
+                **repo.shape,
+                "total_files": len(repo.files),
+                "total_bytes": sum(len(d) for d in repo.files.values()),
+                "tarball_bytes": len(repo.tarball),
+                "commit_sha": repo.commit_sha,
+            }
+            print(f"합성 저장소 생성: {name} ({len(repo.files)}개 파일, 아카이브 {len(repo.tarball) / 1024:.0f}KB)")
+
+    def run_single(self, module: str, repo_name: str, run_index: int) -> Dict[str, Any]:
+        """자식 프로세스에서 한 번 실행하고 서버 기록과 합쳐 단계별 시간 계산"""
+        workdir = tempfile.mkdtemp(prefix="bench_pipeline_")
+        result_file = os.path.join(workdir, "result.json")
+        command = [
+            sys.executable, str(Path(__file__).resolve()), "--worker",
+            "--module", module,
+            "--repo-url", f"https://github.com/{BENCH_OWNER}/{repo_name}",
+            "--github-url", self.github_url,
+            "--openai-url", self.openai_url,
+            "--workdir", workdir,
+            "--result-file", result_file,
+        ]
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(PROJECT_ROOT), env.get("PYTHONPATH")]))
+        log_path = os.path.join(workdir, "worker.log")
+        try:
+            with open(log_path, "w", encoding="utf-8") as log_file:
+                completed = subprocess.run(command, stdout=log_file, stderr=subprocess.STDOUT, env=env,
+                                           timeout=self.args.timeout)
+            if not os.path.exists(result_file):
+                with open(log_path, encoding="utf-8", errors="replace") as f:
+                    tail = f.read()[-2000:]
+                return {"module": module, "repo": repo_name, "run": run_index, "success": False,
+                        "error": f"worker exited with {completed.returncode}", "log_tail": tail}
+            with open(result_file, encoding="utf-8") as f:
+                worker = json.load(f)
+        except subprocess.TimeoutExpired:
+            return {"module": module, "repo": repo_name, "run": run_index, "success": False,
+                    "error": f"timeout after {self.args.timeout}s"}
+        finally:
+            if not self.args.keep_workdirs:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+        origin, finish = worker["start"], worker["end"]
+        github = [r for r in self.github_server.log.between(origin, finish)
+                  if r["path"].startswith(f"/repos/{BENCH_OWNER}/{repo_name}")]
+        openai_records = self.openai_server.log.between(origin, finish)
+        embedding = [r for r in openai_records if r["kind"] == "embedding"]
+        chat = [r for r in openai_records if r["kind"] == "chat"]
+
+        stages = {
+            "listing": summarize_window([r for r in github if r["kind"] in ("listing", "repo_info")], origin),
+            "fetching": summarize_window([r for r in github if r["kind"] == "fetch"], origin),
+            "embedding": summarize_window(embedding, origin),
+            "storing": summarize_window(worker["store_records"], origin),
+        }
+        stages["chunking"] = self.chunking_window(worker["events"], stages, origin)
+
+        return {
+            "module": module,
+            "repo": repo_name,
+            "run": run_index,
+            "success": worker["success"],
+            "error": worker["error"],
+            "total_seconds": round(finish - origin, 3),
+            "files": worker["files"],
+            "peak_rss_mb": round(worker["peak_rss_mb"], 1) if worker["peak_rss_mb"] else None,
+            "tokenizer": worker.get("tokenizer"),
+            "stages": stages,
+            "github_requests": len(github),
+            "github_not_modified": sum(1 for r in github if r["status"] == 304),
+            "embedding_requests": len(embedding),
+            "embedded_texts": sum(r["texts"] for r in embedding),
+            "chat_requests": len(chat),
+            "progress_events": len(worker["events"]),
+        }
+
+    @staticmethod
+    def chunking_window(events: List[Dict[str, Any]], stages: Dict[str, Any], origin: float) -> Optional[Dict[str, Any]]:
+        """
+        청킹 구간 추정
+        - 진행 이벤트를 지원하는 버전: 첫 파일 수신 ~ 'chunked' 이벤트 (수집/임베딩과 겹칠 수 있음)
+        - 단계별로 순차 실행하는 이전 버전: 파일 수집 종료 ~ 첫 임베딩 요청
+        """
+        chunked = [e["time"] for e in events if e["stage"] == "chunked"]
+        fetched = [e["time"] for e in events if e["stage"] == "files_fetched"]
+        if chunked:
+            start = fetched[0] if fetched else chunked[-1]
+            end = chunked[-1]
+        elif stages["fetching"] and stages["embedding"]:
+            start = origin + stages["fetching"]["end"]
+            end = origin + stages["embedding"]["start"]
+        else:
+            return None
+        return {"start": round(start - origin, 3), "end": round(end - origin, 3),
+                "duration": round(max(0.0, end - start), 3), "estimated": not chunked}
+
+    def run_benchmark(self):
+        self.build_repositories()
+        self.github_server = start_server(FakeGitHubHandler, repos=self.repos,
+                                          latency=self.args.github_latency / 1000)
+        self.openai_server = start_server(FakeOpenAIHandler, latency=self.args.embed_latency / 1000,
+                                          per_text_latency=self.args.embed_per_text_latency / 1000)
+        self.github_url = f"http://127.0.0.1:{self.github_server.server_address[1]}"
+        self.openai_url = f"http://127.0.0.1:{self.openai_server.server_address[1]}/v1"
+        print(f"GitHub 대역 서버: {self.github_url}, 임베딩 서버: {self.openai_url}")
+
+        try:
+            for repo_name in self.repos:
+                for module in self.args.modules:
+                    for run_index in range(self.args.runs):
+                        print(f"\n[{module}] {repo_name} 실행 {run_index + 1}/{self.args.runs}...")
+                        run = self.run_single(module, repo_name, run_index)
+                        self.results["runs"].append(run)
+                        if run["success"]:
+                            print(f"  완료: {run['total_seconds']:.2f}초, {run['files']}개 파일, "
+                                  f"GitHub {run['github_requests']}회, 임베딩 {run['embedding_requests']}회, "
+                                  f"최대 메모리 {run['peak_rss_mb']}MB")
+                        else:
+                            print(f"  실패: {run['error']}")
+        finally:
+            self.github_server.shutdown()
+            self.openai_server.shutdown()
+
+        self.save_results()
+        self.print_summary()
+
+    def save_results(self):
+        """결과를 JSON 파일로 저장"""
+        if self.args.output:
+            result_file = Path(self.args.output)
+        else:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            result_file = Path(__file__).parent / f"benchmark_pipeline_{timestamp}.json"
+        with open(result_file, "w", encoding="utf-8") as f:
+            json.dump(self.results, f, indent=2, ensure_ascii=False)
+        print(f"\n결과 저장: {result_file}")
+
+    def print_summary(self):
+        """모듈/저장소별 중앙값 요약 출력"""
+        print("\n" + "=" * 100)
+        print(f"{'저장소':<10} {'모듈':<28} {'총 시간':>8} {'목록':>7} {'수집':>7} {'청킹':>7} {'임베딩':>7} {'저장':>7} {'메모리MB':>9}")
+        print("-" * 100)
+
+        def median(values):
+            values = sorted(v for v in values if v is not None)
+            return values[len(values) // 2] if values else None
+
+        def fmt(value):
+            return f"{value:.2f}" if value is not None else "-"
+
+        for repo_name in self.repos:
+            for module in self.args.modules:
+                runs = [r for r in self.results["runs"] if r["module"] == module and r["repo"] == repo_name and r["success"]]
+                if not runs:
+                    print(f"{repo_name:<10} {module:<28} {'실패':>8}")
+                    continue
+                stage_medians = {
+                    stage: median([(r["stages"].get(stage) or {}).get("duration") for r in runs])
+                    for stage in ("listing", "fetching", "chunking", "embedding", "storing")
+                }
+                print(f"{repo_name:<10} {module:<28} {fmt(median([r['total_seconds'] for r in runs])):>8} "
+                      f"{fmt(stage_medians['listing']):>7} {fmt(stage_medians['fetching']):>7} "
+                      f"{fmt(stage_medians['chunking']):>7} {fmt(stage_medians['embedding']):>7} "
+                      f"{fmt(stage_medians['storing']):>7} {fmt(median([r['peak_rss_mb'] for r in runs])):>9}")
+        print("(단계 시간은 구간 길이(초)이며, 스트리밍 파이프라인에서는 단계 구간이 서로 겹칩니다)")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="저장소 분석 파이프라인 오프라인 벤치마크")
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES,
+                        help="비교할 모듈 이름 (예: github_analyzer github_analyzer_v6)")
+    parser.add_argument("--shapes", nargs="+", default=DEFAULT_SHAPES, choices=sorted(REPO_SHAPES),
+                        help="합성 저장소 프리셋")
+    parser.add_argument("--files", type=int, help="직접 지정할 파일 수 (지정 시 --shapes 무시)")
+    parser.add_argument("--depth", type=int, default=3, help="디렉토리 깊이 (--files와 함께 사용)")
+    parser.add_argument("--fanout", type=int, default=4, help="디렉토리당 하위 디렉토리 수 (--files와 함께 사용)")
+    parser.add_argument("--lines", type=int, default=120, help="파일당 평균 줄 수 (--files와 함께 사용)")
+    parser.add_argument("--seed", type=int, default=42, help="합성 저장소 시드")
+    parser.add_argument("--runs", type=int, default=1, help="조합별 반복 실행 횟수")
+    parser.add_argument("--github-latency", type=float, default=20, help="GitHub 대역 응답 지연 (ms)")
+    parser.add_argument("--embed-latency", type=float, default=150, help="임베딩 요청당 지연 (ms)")
+    parser.add_argument("--embed-per-text-latency", type=float, default=1, help="임베딩 텍스트당 추가 지연 (ms)")
+    parser.add_argument("--timeout", type=int, default=1800, help="실행당 제한 시간 (초)")
+    parser.add_argument("--output", help="결과 JSON 경로 (기본값: test/benchmark_pipeline_<시각>.json)")
+    parser.add_argument("--keep-workdirs", action="store_true", help="실행별 임시 디렉토리(로그 포함)를 남김")
+    # 내부용: 자식 프로세스 실행 인자
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--module", help=argparse.SUPPRESS)
+    parser.add_argument("--repo-url", help=argparse.SUPPRESS)
+    parser.add_argument("--github-url", help=argparse.SUPPRESS)
+    parser.add_argument("--openai-url", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    if arguments.worker:
+        run_worker(arguments)
+    else:
+        PipelineBenchmark(arguments).run_benchmark()
@@ -0,0 +1,17 @@
+"""
+pytest 공통 설정
+- 프로젝트 루트를 import 경로에 추가
+- 모듈이 import 시점에 작업 디렉토리 기준으로 만드는 저장소(./repo_analysis_db, ./embedding_cache 등)가
+  저장소를 더럽히지 않도록 임시 디렉토리에서 실행
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+os.chdir(tempfile.mkdtemp(prefix="repo_analyzer_test_"))
@@ -0,0 +1,161 @@
+"""
+EmbeddingRetryQueue 상태 전이 테스트
+임시 SQLite 파일에서 enqueue -> due_batches -> fail(분할/포기) -> complete/discard/copy 흐름을 직접 확인합니다.
+"""
+
+import pytest
+
+import embedding_retry_queue
+from embedding_retry_queue import RETRY_MAX_ATTEMPTS, EmbeddingRetryQueue
+
+COLLECTION = "repo_octo_demo_0123abc"
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = EmbeddingRetryQueue(str(tmp_path / "retry_queue.sqlite3"))
+    yield queue
+    queue.close()
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    """재시도 대기 없이 바로 기한이 되도록 백오프를 0으로"""
+    monkeypatch.setattr(embedding_retry_queue, "retry_delay", lambda attempts: 0.0)
+
+
+def enqueue_chunks(queue, ids, collection=COLLECTION, path="a.py"):
+    queue.enqueue(collection, ids, [f"doc {chunk_id}" for chunk_id in ids],
+                  [{"path": path, "chunk_index": i} for i, _ in enumerate(ids)], "timeout")
+
+
+def test_enqueued_batch_waits_for_backoff(queue):
+    enqueue_chunks(queue, ["a.py_0", "a.py_1"])
+
+    assert queue.due_batches() == []
+    assert queue.has_pending()
+    assert queue.pending_counts(COLLECTION) == {"pending": 2, "failed": 0}
+
+
+def test_due_batch_round_trips_documents_and_metadata(queue, no_backoff):
+    enqueue_chunks(queue, ["a.py_0", "a.py_1"])
+
+    [batch] = queue.due_batches()
+
+    assert batch["collection_name"] == COLLECTION
+    assert batch["attempts"] == 1
+    assert batch["ids"] == ["a.py_0", "a.py_1"]
+    assert batch["documents"] == ["doc a.py_0", "doc a.py_1"]
+    assert batch["metadatas"] == [{"path": "a.py", "chunk_index": 0}, {"path": "a.py", "chunk_index": 1}]
+
+    queue.complete(COLLECTION, batch["ids"])
+    assert queue.due_batches() == []
+    assert not queue.has_pending()
+
+
+def test_failed_batch_is_bisected(queue, no_backoff):
+    ids = [f"a.py_{i}" for i in range(5)]
+    enqueue_chunks(queue, ids)
+
+    [batch] = queue.due_batches()
+    queue.fail(batch, "rate limited", transient=True)
+
+    halves = queue.due_batches()
+    assert sorted(len(half["ids"]) for half in halves) == [2, 3]
+    assert sorted(chunk_id for half in halves for chunk_id in half["ids"]) == ids
+    assert all(half["attempts"] == 2 for half in halves)
+    assert len({half["batch_id"] for half in halves} | {batch["batch_id"]}) == 3
+
+    # 다시 실패하면 각각 또 반으로 나뉨
+    for half in halves:
+        queue.fail(half, "rate limited", transient=True)
+    assert sorted(len(part["ids"]) for part in queue.due_batches()) == [1, 1, 1, 2]
+
+
+def failed_pair(queue, monkeypatch):
+    """바로 기한이 된 두 청크 묶음을 꺼낸 뒤, 이후 재예약에는 긴 백오프가 적용되도록 설정"""
+    monkeypatch.setattr(embedding_retry_queue, "retry_delay", lambda attempts: 0.0)
+    enqueue_chunks(queue, ["a.py_0", "a.py_1"])
+    [batch] = queue.due_batches()
+    monkeypatch.setattr(embedding_retry_queue, "retry_delay", lambda attempts: 1000.0)
+    return batch
+
+
+def test_transient_failure_waits_for_backoff(queue, monkeypatch):
+    queue.fail(failed_pair(queue, monkeypatch), "rate limited", transient=True)
+
+    assert queue.due_batches() == []
+    assert queue.pending_counts(COLLECTION) == {"pending": 2, "failed": 0}
+
+
+def test_rejected_batch_split_retries_immediately(queue, monkeypatch):
+    # 요청 거부(일시적 오류 아님): 실패 원인 청크를 찾기 위해 나눈 묶음을 백오프 없이 재시도
+    queue.fail(failed_pair(queue, monkeypatch), "invalid input", transient=False)
+
+    assert sorted(batch["ids"] for batch in queue.due_batches()) == [["a.py_0"], ["a.py_1"]]
+    assert queue.pending_counts(COLLECTION) == {"pending": 2, "failed": 0}
+
+
+def test_rejected_single_chunk_fails_immediately(queue, no_backoff):
+    enqueue_chunks(queue, ["a.py_0"])
+
+    [batch] = queue.due_batches()
+    queue.fail(batch, "invalid input", transient=False)
+
+    assert queue.due_batches() == []
+    assert queue.pending_counts(COLLECTION) == {"pending": 0, "failed": 1}
+    assert not queue.has_pending()
+
+
+def test_single_chunk_fails_after_max_attempts(queue, no_backoff):
+    enqueue_chunks(queue, ["a.py_0"])
+
+    retries = 0
+    while True:
+        batches = queue.due_batches()
+        if not batches:
+            break
+        [batch] = batches
+        assert batch["attempts"] == retries + 1
+        queue.fail(batch, "timeout", transient=True)
+        retries += 1
+
+    # enqueue가 첫 실패이므로 RETRY_MAX_ATTEMPTS번째 실패에서 포기
+    assert retries == RETRY_MAX_ATTEMPTS
+    assert queue.pending_counts(COLLECTION) == {"pending": 0, "failed": 1}
+
+
+def test_discard_is_scoped_to_collection_and_paths(queue, no_backoff):
+    enqueue_chunks(queue, ["a.py_0", "a.py_1"], path="a.py")
+    enqueue_chunks(queue, ["b.py_0"], path="b.py")
+    enqueue_chunks(queue, ["a.py_0"], collection="repo_other", path="a.py")
+
+    queue.discard(COLLECTION, paths=["a.py"])
+
+    assert queue.pending_counts(COLLECTION) == {"pending": 1, "failed": 0}
+    assert queue.pending_counts("repo_other") == {"pending": 1, "failed": 0}
+
+    queue.discard(COLLECTION)
+
+    assert queue.pending_counts(COLLECTION) == {"pending": 0, "failed": 0}
+    assert [batch["collection_name"] for batch in queue.due_batches()] == ["repo_other"]
+
+
+def test_copy_moves_selected_paths_to_new_collection(queue, no_backoff):
+    enqueue_chunks(queue, ["a.py_0", "a.py_1"], path="a.py")
+    enqueue_chunks(queue, ["b.py_0"], path="b.py")
+    [single] = [batch for batch in queue.due_batches() if batch["ids"] == ["b.py_0"]]
+    queue.fail(single, "invalid input", transient=False)
+
+    queue.copy(COLLECTION, "repo_new", ["a.py", "b.py"])
+    queue.copy(COLLECTION, "repo_new", [])
+
+    # 상태/시도 횟수는 그대로, 묶음은 컬렉션별로 따로 재시도
+    assert queue.pending_counts("repo_new") == {"pending": 2, "failed": 1}
+    copied = [batch for batch in queue.due_batches() if batch["collection_name"] == "repo_new"]
+    assert [batch["ids"] for batch in copied] == [["a.py_0", "a.py_1"]]
+    assert copied[0]["documents"] == ["doc a.py_0", "doc a.py_1"]
+
+    # 원본 컬렉션을 정리해도 복사본은 남음
+    queue.discard(COLLECTION)
+    assert queue.pending_counts("repo_new") == {"pending": 2, "failed": 1}
@@ -0,0 +1,125 @@
+"""
+RepoStore(부분 클론 미러 + 세션 worktree) 테스트
+원격 주소 템플릿을 file:// 로컬 저장소로 바꾸어 네트워크 없이 실행합니다.
+원본 저장소에 uploadpack.allowFilter=true를 설정해 GitHub처럼 blob 없는 부분 클론이 되도록 합니다.
+"""
+
+import os
+import shutil
+
+import git
+import pytest
+
+from repo_store import RepoStore
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="git 실행 파일 필요")
+
+AUTHOR = git.Actor("Test", "test@example.com")
+REPO_URL = "https://github.com/Octo/Demo"
+
+
+def commit_files(repo, files, message):
+    for path, content in files.items():
+        full_path = os.path.join(repo.working_tree_dir, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "w", encoding="utf-8") as f:
+            f.write(content)
+    repo.index.add(list(files))
+    return repo.index.commit(message, author=AUTHOR, committer=AUTHOR).hexsha
+
+
+@pytest.fixture
+def remote(tmp_path):
+    """file:// 원격으로 쓸 원본 저장소 (remote/Octo/Demo.git)"""
+    repo = git.Repo.init(tmp_path / "remote" / "Octo" / "Demo.git", initial_branch="main")
+    repo.git.config("uploadpack.allowFilter", "true")
+    repo.git.config("uploadpack.allowAnySHA1InWant", "true")
+    commit_files(repo, {"a.py": "a = 1\n", "sub/b.py": "b = 2\n", "README.md": "# demo\n"}, "init")
+    return repo
+
+
+@pytest.fixture
+def store(tmp_path, remote):
+    template = f"file://{tmp_path / 'remote'}/{{owner}}/{{repo}}.git"
+    return RepoStore(mirror_root=str(tmp_path / "mirrors"), worktree_root=str(tmp_path / "repos"),
+                     remote_url_template=template)
+
+
+def missing_objects(path):
+    """미러에 없는(지연 fetch 대상) 객체 수"""
+    output = git.Git(path).rev_list("--objects", "--all", "--missing=print")
+    return sum(1 for line in output.splitlines() if line.startswith("?"))
+
+
+def test_worktree_is_created_without_blobs(store, remote):
+    result = store.ensure_session_worktree("s1", REPO_URL)
+
+    assert result["success"], result.get("error")
+    assert result["commit_sha"] == remote.head.commit.hexsha
+    worktree = store.worktree_path("s1")
+    assert os.path.isfile(os.path.join(worktree, ".git"))
+    # 체크아웃 없이 인덱스만 채움
+    assert not os.path.exists(os.path.join(worktree, "a.py"))
+    assert git.Git(worktree).ls_files().split() == ["README.md", "a.py", "sub/b.py"]
+    # 미러는 소문자 경로의 blob 없는 부분 클론
+    mirror = store.mirror_path("Octo", "Demo")
+    assert mirror.endswith(os.path.join("octo", "demo.git"))
+    assert missing_objects(mirror) == 3
+
+    # 같은 세션은 재사용
+    assert store.ensure_session_worktree("s1", REPO_URL)["commit_sha"] == result["commit_sha"]
+
+
+def test_materialize_checks_out_only_requested_files(store):
+    assert store.ensure_session_worktree("s1", REPO_URL)["success"]
+
+    files = store.materialize("s1", ["sub/b.py", "a.py", "sub/b.py", "missing.py", "../escape.py"])
+
+    worktree = store.worktree_path("s1")
+    assert files == ["sub/b.py", "a.py"]
+    with open(os.path.join(worktree, "sub", "b.py"), encoding="utf-8") as f:
+        assert f.read() == "b = 2\n"
+    assert not os.path.exists(os.path.join(worktree, "README.md"))
+    assert missing_objects(store.mirror_path("Octo", "Demo")) == 1
+
+
+def test_worktree_moves_to_new_commit(store, remote):
+    first = store.ensure_session_worktree("s1", REPO_URL)["commit_sha"]
+    second = commit_files(remote, {"a.py": "a = 3\n"}, "update")
+
+    result = store.ensure_session_worktree("s1", REPO_URL, commit_sha=second)
+
+    assert result["success"], result.get("error")
+    assert result["commit_sha"] == second != first
+    assert store.materialize("s1", ["a.py"]) == ["a.py"]
+    with open(os.path.join(store.worktree_path("s1"), "a.py"), encoding="utf-8") as f:
+        assert f.read() == "a = 3\n"
+
+
+def test_remove_session_worktree_keeps_mirror(store):
+    assert store.ensure_session_worktree("s1", REPO_URL)["success"]
+    assert store.ensure_session_worktree("s2", REPO_URL)["success"]
+
+    assert store.remove_session_worktree("s1", REPO_URL)
+    assert not store.remove_session_worktree("s1", REPO_URL)
+
+    mirror = store.mirror_path("Octo", "Demo")
+    assert not os.path.exists(store.worktree_path("s1"))
+    assert os.path.isdir(mirror)
+    worktrees = git.Git(mirror).worktree("list", "--porcelain")
+    assert os.path.abspath(store.worktree_path("s2")) in worktrees
+    assert os.path.abspath(store.worktree_path("s1")) not in worktrees
+
+
+def test_invalid_repo_url(store):
+    result = store.ensure_session_worktree("s1", "not a repo url")
+
+    assert not result["success"]
+    assert "error" in result
+
+
+def test_token_is_not_written_to_mirror_config(store):
+    assert store.ensure_session_worktree("s1", REPO_URL, token="ghp_secret")["success"]
+
+    with open(os.path.join(store.mirror_path("Octo", "Demo"), "config"), encoding="utf-8") as f:
+        assert "ghp_secret" not in f.read()
@@ -0,0 +1,129 @@
+"""
+iter_tar_archive_files / 아카이브 수집 폴백 테스트
+GitHub tarball과 같은 구조({owner}-{repo}-{sha}/ 아래 파일)의 메모리 아카이브를 사용하며 네트워크를 쓰지 않습니다.
+"""
+
+import base64
+import contextlib
+import gzip
+import hashlib
+import io
+import os
+import tarfile
+
+import pytest
+
+import github_analyzer
+from github_analyzer import (ARCHIVE_ERRORS, MAX_FILE_CONTENT_SIZE, GitHubRepositoryFetcher,
+                             iter_tar_archive_files)
+
+PREFIX = "octo-repo-0123abc"
+SOURCE_URL = "https://github.com/octo/repo/blob/0123abc"
+
+
+def make_tarball(files, symlinks=()):
+    """{경로: bytes} -> GitHub tarball 형식의 gzip 압축 tar 바이트"""
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as tar:
+        directory = tarfile.TarInfo(PREFIX)
+        directory.type = tarfile.DIRTYPE
+        tar.addfile(directory)
+        for path, data in files.items():
+            info = tarfile.TarInfo(f"{PREFIX}/{path}")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+        for path, target in symlinks:
+            info = tarfile.TarInfo(f"{PREFIX}/{path}")
+            info.type = tarfile.SYMTYPE
+            info.linkname = target
+            tar.addfile(info)
+    return gzip.compress(buffer.getvalue())
+
+
+def read_archive(data, wanted_paths=None):
+    return {file["path"]: file for file in iter_tar_archive_files(io.BytesIO(data), SOURCE_URL, wanted_paths)}
+
+
+def test_blob_sha_matches_git():
+    files = read_archive(make_tarball({"hello.py": b"hello\n"}))
+
+    # git hash-object로 계산한 값 (/contents API의 sha와 같음)
+    assert files["hello.py"]["sha"] == "ce013625030ba8dba906f756967f9e9ca394464a"
+    assert files["hello.py"]["content"] == "hello\n"
+    assert files["hello.py"]["file_name"] == "hello.py"
+    assert files["hello.py"]["file_type"] == "py"
+    assert files["hello.py"]["source_url"] == f"{SOURCE_URL}/hello.py"
+
+
+def test_filters():
+    files = read_archive(make_tarball({
+        "src/app.py": b"print('app')\n",
+        "docs/guide.md": b"# guide\n",
+        "data/config.json": b"{}",  # MAIN_EXTENSIONS 밖
+        "image.png": b"\x89PNG",
+        "static/vendor.min.js": b"var a=1;",  # 압축 파일
+        "static/main.js": b"var b = 2;\n",
+        "big.py": b"a" * (MAX_FILE_CONTENT_SIZE + 1),  # 글자 수 제한 초과
+        "huge.txt": b"b" * (MAX_FILE_CONTENT_SIZE * 4 + 1),  # 읽지 않고 건너뛰는 크기
+        "latin1.py": "caf\xe9\n".encode("latin-1"),  # UTF-8 아님
+        "limit.py": b"c" * MAX_FILE_CONTENT_SIZE,  # 경계값은 포함
+    }, symlinks=[("link.py", "src/app.py")]))
+
+    assert sorted(files) == ["docs/guide.md", "limit.py", "src/app.py", "static/main.js"]
+
+
+def test_wanted_paths_replace_extension_filter():
+    data = make_tarball({"a.py": b"a\n", "b.py": b"b\n", "setup.cfg": b"[x]\n", "c.min.js": b"x"})
+
+    files = read_archive(data, wanted_paths={"b.py", "setup.cfg", "c.min.js"})
+
+    # 트리 조회 결과가 있으면 그 목록만 사용 (압축 파일 제외는 그대로)
+    assert sorted(files) == ["b.py", "setup.cfg"]
+
+
+def make_truncated_tarball():
+    """앞의 작은 파일 두 개는 온전하고 뒤의 큰 파일 중간에서 끊긴 아카이브"""
+    random_text = base64.b64encode(os.urandom(60000))
+    data = make_tarball({"a.py": b"a = 1\n", "b.md": b"# b\n", "c.py": b"c = '" + random_text + b"'\n"})
+    return data[:int(len(data) * 0.6)]
+
+
+def test_truncated_archive_raises_archive_error():
+    received = []
+    with pytest.raises(ARCHIVE_ERRORS):
+        for file in iter_tar_archive_files(io.BytesIO(make_truncated_tarball()), SOURCE_URL):
+            received.append(file["path"])
+
+    assert received == ["a.py", "b.md"]
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, data):
+        self.raw = io.BytesIO(data)
+
+
+def test_archive_failure_falls_back_to_per_file_fetch(monkeypatch):
+    data = make_truncated_tarball()
+    monkeypatch.setattr(github_analyzer, "github_get",
+                        lambda *args, **kwargs: contextlib.nullcontext(FakeResponse(data)))
+
+    fetcher = GitHubRepositoryFetcher("https://github.com/octo/repo", session_id="tar_archive_test")
+    fetcher.commit_sha = "0123abc"
+    fetcher.files = ["a.py", "b.md", "c.py", "d.py"]
+    fetched_per_file = []
+
+    def fake_per_file(paths=None):
+        fetched_per_file.extend(paths)
+        for path in paths:
+            yield {"path": path, "content": "", "file_name": path, "file_type": "py",
+                   "sha": hashlib.sha1(path.encode()).hexdigest(), "source_url": ""}
+
+    monkeypatch.setattr(fetcher, "iter_file_contents", fake_per_file)
+
+    paths = [file["path"] for file in fetcher.iter_file_contents_by_mode("archive")]
+
+    # 아카이브에서 받은 파일은 다시 받지 않고 나머지만 파일별로 가져옴
+    assert paths == ["a.py", "b.md", "c.py", "d.py"]
+    assert fetched_per_file == ["c.py", "d.py"]